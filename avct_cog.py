@@ -3,6 +3,11 @@ from discord.ext import commands
 from discord import app_commands
 import importlib
 import pkgutil
+import journal
+import metrics
+from config import TRACE_PATH, TRACE_SAMPLE_RATE, TRACE_SALT
+from pins import PinManager
+from traces import TraceWriter
 
 # --- Command registry and decorator ---
 COMMAND_REGISTRY = []
@@ -57,6 +62,12 @@ def discover_and_register_commands(cog):
 class AvctCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.pins = PinManager(bot)
+        self.traces = (
+            TraceWriter(TRACE_PATH, TRACE_SAMPLE_RATE, TRACE_SALT)
+            if TRACE_PATH
+            else None
+        )
 
         # Initialize command groups
         self.avct_group = discord.app_commands.Group(
@@ -83,12 +94,18 @@ class AvctCog(commands.Cog):
             name="character", description="Character related commands"
         )
 
+        # Define groups for avct
+        self.party_group = app_commands.Group(
+            name="party", description="Group characters into a party"
+        )
+
         # Do NOT register commands here to avoid double registration
         # discover_and_register_commands(self)  # <-- REMOVE from __init__
 
     async def cog_load(self):
         # Register all commands to their groups (only once, when cog is loaded)
         discover_and_register_commands(self)
+        self.pins.start()
 
         # Add subgroups to configav group
         self.configav_group.add_command(self.add_group)
@@ -97,10 +114,43 @@ class AvctCog(commands.Cog):
         self.configav_group.add_command(self.edit_group)
         self.configav_group.add_command(self.character_group)
 
+        # Add subgroups to avct group
+        self.avct_group.add_command(self.party_group)
+
         # Add main groups to bot
         self.bot.tree.add_command(self.avct_group)
         self.bot.tree.add_command(self.configav_group)
 
+    async def cog_unload(self):
+        self.pins.stop()
+        if self.traces is not None:
+            self.traces.close()
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        await self.pins.load()
+
+    @commands.Cog.listener()
+    async def on_app_command_completion(self, interaction, command):
+        # Tagged by shard so per-worker metrics can be compared across the cluster
+        shard_id = interaction.guild.shard_id if interaction.guild else 0
+        metrics.increment(
+            "app_commands", shard=shard_id, command=command.qualified_name
+        )
+        if self.traces is not None:
+            created = interaction.created_at
+            self.traces.record(
+                command.qualified_name,
+                interaction.user.id,
+                interaction.guild_id,
+                dict(interaction.namespace),
+                created.timestamp(),
+                (discord.utils.utcnow() - created).total_seconds(),
+            )
+        # Runs in a copy of the command's context, so this sees its writes
+        if journal.queued.get() and interaction.response.is_done():
+            await interaction.followup.send(journal.QUEUED_MESSAGE, ephemeral=True)
+
 
 async def setup(bot):
     await bot.add_cog(AvctCog(bot))
@@ -109,7 +159,7 @@ async def setup(bot):
 # Documentation:
 # - To add a new command, create a function in a module under 'commands' and decorate it with @register_command("group_name").
 # - The function should take the cog as an argument and register commands to the specified group.
-# - Supported group names: avct_group, add_group, rename_group, remove_group, edit_group, character_group.
+# - Supported group names: avct_group, add_group, rename_group, remove_group, edit_group, character_group, party_group.
 
 # No changes needed if you follow the existing registration pattern.
 # The new command will be registered via @register_command("configav_group") in health_commands.py.
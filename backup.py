@@ -0,0 +1,180 @@
+"""
+Streaming backup and restore of the characters collection as NDJSON.
+
+    python backup.py export characters.ndjson.gz
+    python backup.py import characters.ndjson.gz            # resumes if interrupted
+    python backup.py import characters.ndjson.gz --restart  # ignore saved progress
+
+Export reads the collection through a batched cursor in _id order and writes
+one document per line in MongoDB Extended JSON, so ObjectIds survive the round
+trip. Paths ending in .gz are gzip-compressed. Memory use does not grow with
+the collection. Documents are written exactly as stored, whatever their
+counter layout, and the file only appears once the export is complete.
+
+Import streams a file back in batches with an unordered bulk_write of
+upserting replaces, so importing a document twice is harmless. The number of
+lines imported is checkpointed after each batch; an interrupted import skips
+that many lines and carries on. Documents are written straight to the
+collection, so running bots pick them up through their cache invalidation.
+"""
+
+import argparse
+import gzip
+import json
+import os
+
+from bson import json_util
+from pymongo import ReplaceOne
+
+import utils
+from migrate import stream_by_id
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_STATE_PATH = "import_state.json"
+
+
+def _open(path, mode, compress):
+    if compress:
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def export_collection(collection, path, batch_size=DEFAULT_BATCH_SIZE, log=print):
+    """
+    Write every document of collection to path as NDJSON.
+    Returns the number of documents written.
+    """
+    log = log or (lambda message: None)
+    partial = path + ".part"
+    count = 0
+    with _open(partial, "w", compress=path.endswith(".gz")) as f:
+        for doc in stream_by_id(collection, None, batch_size):
+            f.write(json_util.dumps(doc) + "\n")
+            count += 1
+            if count % batch_size == 0:
+                log(f"Exported {count} documents")
+    os.replace(partial, path)
+    log(f"Exported {count} documents to {path}")
+    return count
+
+
+def _replace_all(collection, docs):
+    if hasattr(collection, "bulk_write"):
+        collection.bulk_write(
+            [ReplaceOne({"_id": d["_id"]}, d, upsert=True) for d in docs],
+            ordered=False,
+        )
+        return
+    # SQLite collections have neither bulk_write nor upserts
+    for doc in docs:
+        collection.delete_one({"_id": doc["_id"]})
+        collection.insert_one(doc)
+
+
+class Importer:
+    """
+    Load an NDJSON export into a collection, batch by batch.
+    """
+
+    def __init__(
+        self,
+        collection,
+        path,
+        batch_size=DEFAULT_BATCH_SIZE,
+        state_path=DEFAULT_STATE_PATH,
+        log=print,
+    ):
+        self.collection = collection
+        self.path = path
+        self.batch_size = batch_size
+        self.state_path = state_path
+        self.log = log or (lambda message: None)
+        # Lines of the file already imported, blank ones included
+        self.lines = 0
+        self.imported = 0
+
+    def load_state(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        with open(self.state_path) as f:
+            state = json.load(f)
+        if state.get("path") != os.path.abspath(self.path):
+            self.log(f"Ignoring saved progress for {state.get('path')}")
+            return
+        self.lines = state.get("lines", 0)
+        self.imported = state.get("imported", 0)
+
+    def save_state(self):
+        if not self.state_path:
+            return
+        with open(self.state_path, "w") as f:
+            json.dump(
+                {
+                    "path": os.path.abspath(self.path),
+                    "lines": self.lines,
+                    "imported": self.imported,
+                },
+                f,
+            )
+
+    def _flush(self, batch, lines):
+        if batch:
+            _replace_all(self.collection, batch)
+        self.imported += len(batch)
+        self.lines = lines
+        self.save_state()
+        self.log(f"Imported {self.imported} documents ({lines} lines)")
+
+    def run(self, resume=True):
+        if resume:
+            self.load_state()
+        skip = self.lines
+        batch = []
+        line_no = skip
+        with _open(self.path, "r", compress=self.path.endswith(".gz")) as f:
+            for line_no, line in enumerate(f, start=1):
+                if line_no <= skip or not line.strip():
+                    continue
+                batch.append(json_util.loads(line))
+                if len(batch) >= self.batch_size:
+                    self._flush(batch, line_no)
+                    batch = []
+        if batch or line_no > self.lines:
+            self._flush(batch, line_no)
+        # A finished import starts from the beginning next time
+        if self.state_path and os.path.exists(self.state_path):
+            os.remove(self.state_path)
+        return self.imported
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Export or import the characters collection as NDJSON"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export")
+    export_parser.add_argument("path")
+    export_parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    import_parser = commands.add_parser("import")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    import_parser.add_argument("--state", default=DEFAULT_STATE_PATH)
+    import_parser.add_argument("--restart", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        export_collection(
+            utils.characters_collection, args.path, batch_size=args.batch_size
+        )
+    else:
+        importer = Importer(
+            utils.characters_collection,
+            args.path,
+            batch_size=args.batch_size,
+            state_path=args.state,
+        )
+        importer.run(resume=not args.restart)
+
+
+if __name__ == "__main__":
+    main()
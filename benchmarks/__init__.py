@@ -0,0 +1,2 @@
+# Benchmarks and load tools. Run from the repository root, e.g.
+#   python -m benchmarks.bench_storage
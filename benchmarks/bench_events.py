@@ -0,0 +1,84 @@
+"""
+Measure the cost of reading an event-sourced character as its history grows.
+
+    python -m benchmarks.bench_events --changes 100 1000 5000
+
+Each run applies that many counter changes to one character with EVENT_LOG on,
+then times reading it back, which replays the uncompacted event tail on top of
+the stored snapshot. With the tail bounded by EVENT_TAIL_LIMIT the read cost
+stays flat however long the history gets; with compaction disabled (an
+unbounded tail) it grows with the number of changes.
+"""
+
+import argparse
+import json
+import os
+import tempfile
+from unittest.mock import patch
+
+from benchmarks.stats import Recorder, format_table, prepare_environment
+
+prepare_environment()
+
+import utils  # noqa: E402
+from sqlite_storage import SqliteDatabase  # noqa: E402
+
+READS = 50
+
+
+def run_history(recorder, db, changes, tail_limit):
+    """
+    Apply changes counter updates to a new character and time reading it.
+    Returns the length of the event tail left on the stored document.
+    """
+    label = f"limit {tail_limit}" if tail_limit else "unbounded"
+    with (
+        patch("utils.characters_collection", db["characters_events"]),
+        patch("utils.events_collection", db["counter_events"]),
+        patch("utils.EVENT_LOG", True),
+        patch("utils.EVENT_TAIL_LIMIT", tail_limit or changes + 1),
+    ):
+        name = f"Bench {label} {changes}"
+        utils.add_user_character("bench-user", name)
+        character_id = utils.get_character_id_by_user_and_name("bench-user", name)
+        utils.add_counter(character_id, "willpower", 10, counter_type="single_number")
+        for i in range(changes):
+            with recorder.time(f"append ({label})"):
+                utils.update_counter(character_id, "willpower", "temp", 1 - 2 * (i % 2))
+        for _ in range(READS):
+            with recorder.time(f"read after {changes} ({label})"):
+                utils.get_counters_for_character(character_id)
+        stored = db["characters_events"].find_one({"_id": utils.ObjectId(character_id)})
+        return len(stored.get("event_tail", []))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--changes", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--tail-limit", type=int, default=utils.EVENT_TAIL_LIMIT)
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    recorder = Recorder()
+    tails = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for changes in args.changes:
+            for limit in (args.tail_limit, None):
+                # A fresh database per run keeps earlier runs out of the timings
+                path = os.path.join(tmp, f"bench-{changes}-{limit}.sqlite3")
+                db = SqliteDatabase(path)
+                tail = run_history(recorder, db, changes, limit)
+                tails[f"{changes} ({'limit' if limit else 'unbounded'})"] = tail
+                db.close()
+
+    summary = recorder.summary()
+    print(format_table(summary, title="\n== event replay =="))
+    for run, tail in tails.items():
+        print(f"tail after {run}: {tail} events")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"timings": summary, "tails": tails}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
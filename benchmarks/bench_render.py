@@ -0,0 +1,196 @@
+"""
+Microbenchmarks for the counter and health rendering and model hot paths.
+
+    python -m benchmarks.bench_render --json head.json
+    python -m benchmarks.bench_render --baseline base.json --threshold 0.15
+    python -m benchmarks.bench_render --filter pretty
+    pytest benchmarks/bench_render.py            # BENCH_JSON=head.json to save
+
+Cases cover Counter.generate_display_pretty and generate_display_basic for
+every counter type and several perm sizes, generate_counters_output for 1 to
+100 counters, display_health single and paired, CounterFactory.from_dict on
+valid and invalid dicts, and Health.add_damage / remove_damage.
+
+Each sample times --number calls of a case, so the reported milliseconds are
+per 1000 calls by default, i.e. microseconds per call. --baseline compares
+against a saved --json file and exits non-zero if any case's p50 grew by
+more than --threshold.
+"""
+
+import argparse
+import json
+import os
+import time
+
+import pytest
+
+from benchmarks.stats import (
+    Recorder,
+    compare_summaries,
+    format_table,
+    prepare_environment,
+)
+
+prepare_environment()
+
+import utils  # noqa: E402
+from counter import Counter, CounterFactory, CounterTypeEnum  # noqa: E402
+from health import DamageEnum, Health, HealthTypeEnum, display_health  # noqa: E402
+
+NUMBER = 1000
+REPEAT = 20
+PERM_SIZES = (1, 5, 10, 15, 30)
+COUNTER_COUNTS = (1, 10, 25, 50, 100)
+RENDERED_TYPES = [
+    t.value for t in CounterTypeEnum if t is not CounterTypeEnum.invalid_counter
+]
+
+
+def _unescape(s):
+    return s
+
+
+def _counter(counter_type, perm, name="Willpower", category="general"):
+    return Counter(
+        counter=name,
+        temp=perm // 2,
+        perm=perm,
+        category=category,
+        comment="",
+        bedlam=perm // 3,
+        counter_type=counter_type,
+    )
+
+
+def _damaged(health_type, levels):
+    health = Health(health_type)
+    health.add_damage(levels, DamageEnum.Lethal)
+    return health
+
+
+def _add_then_remove():
+    health = Health(HealthTypeEnum.normal.value)
+    health.add_damage(3, DamageEnum.Bashing)
+    health.add_damage(2, DamageEnum.Lethal)
+    health.remove_damage(2)
+
+
+def build_cases():
+    """
+    Return {name: zero-argument callable} for every benchmark case.
+    """
+    cases = {}
+    for counter_type in RENDERED_TYPES:
+        for perm in PERM_SIZES:
+            counter = _counter(counter_type, perm)
+            cases[f"pretty {counter_type}/{perm}"] = (
+                lambda c=counter: c.generate_display_pretty(_unescape)
+            )
+            cases[f"basic {counter_type}/{perm}"] = (
+                lambda c=counter: c.generate_display_basic(_unescape)
+            )
+    categories = ["tempers", "reknown", "general", "items", "other"]
+    for count in COUNTER_COUNTS:
+        counters = [
+            _counter(
+                RENDERED_TYPES[i % len(RENDERED_TYPES)],
+                5 + i % 6,
+                name=f"Counter {i}",
+                category=categories[i % len(categories)],
+            )
+            for i in range(count)
+        ]
+        cases[f"counters_output/{count}"] = (
+            lambda cs=counters: utils.generate_counters_output(cs, _unescape)
+        )
+    normal = _damaged(HealthTypeEnum.normal.value, 3)
+    chimerical = _damaged(HealthTypeEnum.chimerical.value, 2)
+    cases["display_health single"] = lambda: display_health(normal)
+    cases["display_health paired"] = lambda: display_health(normal, chimerical)
+    valid = {
+        "counter": "Willpower",
+        "temp": 3,
+        "perm": 5,
+        "category": "tempers",
+        "counter_type": "perm_is_maximum",
+    }
+    # Negative values make an invalid_counter; bedlam above perm is clamped
+    negative = dict(valid, temp=-1)
+    bedlam = dict(valid, counter_type="perm_is_maximum_bedlam", bedlam=9)
+    cases["from_dict valid"] = lambda: CounterFactory.from_dict(valid)
+    cases["from_dict negative"] = lambda: CounterFactory.from_dict(negative)
+    cases["from_dict bedlam>perm"] = lambda: CounterFactory.from_dict(bedlam)
+    cases["add_damage/remove_damage"] = _add_then_remove
+    return cases
+
+
+def measure(recorder, name, case, number=NUMBER, repeat=REPEAT):
+    # One untimed call so first-call costs stay out of the samples
+    case()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            case()
+        recorder.add(name, time.perf_counter() - start)
+
+
+def run(cases, number=NUMBER, repeat=REPEAT):
+    recorder = Recorder()
+    for name, case in cases.items():
+        measure(recorder, name, case, number, repeat)
+    return recorder.summary()
+
+
+# --- pytest entry point: pytest benchmarks/bench_render.py ---
+
+_pytest_recorder = Recorder()
+
+
+@pytest.fixture(scope="module", autouse=True)
+def _save_results():
+    yield
+    path = os.getenv("BENCH_JSON")
+    if path:
+        with open(path, "w") as f:
+            json.dump(_pytest_recorder.summary(), f, indent=2)
+
+
+@pytest.mark.parametrize("name, case", list(build_cases().items()))
+def test_benchmark(name, case):
+    measure(_pytest_recorder, name, case, number=NUMBER // 10, repeat=5)
+    assert len(_pytest_recorder.samples[name]) == 5
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--number", type=int, default=NUMBER)
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--filter", help="Only run cases whose name contains this")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    parser.add_argument("--baseline", help="Compare with results saved by --json")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    cases = build_cases()
+    if args.filter:
+        cases = {n: c for n, c in cases.items() if args.filter in n}
+    summary = run(cases, args.number, args.repeat)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+    print(format_table(summary, title=f"\n== ms per {args.number} calls =="))
+    if not args.baseline:
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if args.filter:
+        baseline = {n: s for n, s in baseline.items() if args.filter in n}
+    lines, regressions = compare_summaries(
+        baseline, summary, args.threshold, key="p50_ms"
+    )
+    print("\n" + "\n".join(lines))
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
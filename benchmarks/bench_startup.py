@@ -0,0 +1,189 @@
+"""
+Startup benchmark: import time, cog load and first-command readiness.
+
+    python -m benchmarks.bench_startup --repeat 10 --json head.json
+    python -m benchmarks.bench_startup --baseline base.json --threshold 0.15
+    python -m benchmarks.bench_startup --mongo-uri mongodb://localhost:27017/
+    python -m benchmarks.bench_startup --importtime 15
+
+Every sample is a fresh interpreter, so nothing is cached between runs. The
+child process times each startup phase in order:
+
+    import main       config, utils, discord and the bot object
+    import avct_cog   the cog module
+    cog load          discover_and_register_commands, as setup_hook does
+    connect           utils.get_database(), the first connection
+    first command     /avct show for a character created beforehand
+    ready             from the first line of the child to the first reply
+
+The parent also times the whole child process ("process") and a bare
+interpreter ("interpreter") for scale. Storage is an in-memory SQLite
+database unless --mongo-uri is given, in which case a throwaway database is
+used and dropped afterwards. --importtime N runs python -X importtime once and
+lists the N packages that take longest to import with main.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.stats import (
+    REPO_ROOT,
+    Recorder,
+    compare_summaries,
+    format_table,
+    prepare_environment,
+)
+
+REPEAT = 10
+PHASES = (
+    "import main",
+    "import avct_cog",
+    "cog load",
+    "connect",
+    "first command",
+    "ready",
+)
+
+
+async def _start_bot(recorder, started):
+    import importlib
+    from types import SimpleNamespace
+
+    with recorder.time("import main"):
+        importlib.import_module("main")
+    with recorder.time("import avct_cog"):
+        from avct_cog import AvctCog
+    with recorder.time("cog load"):
+        cog = AvctCog(SimpleNamespace(tree=SimpleNamespace(add_command=lambda c: None)))
+        await cog.cog_load()
+
+    import utils
+    from benchmarks.loadgen import SyntheticInteraction, find_command
+
+    with recorder.time("connect"):
+        utils.get_database()
+    utils.add_user_character("1", "Startup")
+    show = find_command(cog.avct_group, "show")
+    with recorder.time("first command"):
+        await show.callback(SyntheticInteraction(1), "Startup")
+    recorder.add("ready", time.perf_counter() - started)
+    cog.pins.stop()
+
+
+def child():
+    """
+    Start the bot's pieces once and print the phase timings as JSON.
+    """
+    started = time.perf_counter()
+    prepare_environment()
+    import asyncio
+
+    recorder = Recorder()
+    asyncio.run(_start_bot(recorder, started))
+    print(json.dumps(recorder.samples))
+
+
+def child_env(mongo_uri=None):
+    env = dict(os.environ)
+    if mongo_uri:
+        env.update(
+            STORAGE_BACKEND="mongo",
+            MONGO_CONNECTION_STRING=mongo_uri,
+            MONGO_DB_NAME=f"avct_startup_{os.getpid()}",
+        )
+    return env
+
+
+def run(repeat=REPEAT, mongo_uri=None):
+    recorder = Recorder()
+    env = child_env(mongo_uri)
+    command = [sys.executable, "-m", "benchmarks.bench_startup", "--child"]
+    for _ in range(repeat):
+        with recorder.time("interpreter"):
+            subprocess.run([sys.executable, "-c", "pass"], check=True)
+        start = time.perf_counter()
+        result = subprocess.run(
+            command, cwd=REPO_ROOT, env=env, check=True, capture_output=True, text=True
+        )
+        recorder.add("process", time.perf_counter() - start)
+        samples = json.loads(result.stdout.strip().splitlines()[-1])
+        for phase in PHASES:
+            recorder.add(phase, samples[phase][0])
+    if mongo_uri:
+        from pymongo import MongoClient
+
+        client = MongoClient(mongo_uri, serverSelectionTimeoutMS=2000)
+        client.drop_database(env["MONGO_DB_NAME"])
+        client.close()
+    return recorder.summary()
+
+
+def import_costs(module="main", top=10):
+    """
+    Return [(ms, package)] for the packages that take longest to import
+    along with module, summing python -X importtime's self time per package.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT,
+        env=child_env(),
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    costs = {}
+    for line in result.stderr.splitlines():
+        fields = line.partition("import time:")[2].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        package = fields[2].strip().split(".")[0]
+        costs[package] = costs.get(package, 0) + int(fields[0]) / 1000
+    return sorted(((ms, p) for p, ms in costs.items()), reverse=True)[:top]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--mongo-uri", help="Connect to this MongoDB server")
+    parser.add_argument(
+        "--importtime", type=int, metavar="N", help="List the N costliest imports"
+    )
+    parser.add_argument("--json", help="Write results to this JSON file")
+    parser.add_argument("--baseline", help="Compare with results saved by --json")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        child()
+        return 0
+    prepare_environment()
+    if args.importtime:
+        print(f"\n{'import ms':>10}  package")
+        for ms, package in import_costs(top=args.importtime):
+            print(f"{ms:>10.1f}  {package}")
+
+    summary = run(args.repeat, args.mongo_uri)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+    print(
+        format_table(summary, title=f"\n== startup, {args.repeat} fresh processes ==")
+    )
+    if not args.baseline:
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    lines, regressions = compare_summaries(
+        baseline, summary, args.threshold, key="p50_ms"
+    )
+    print("\n" + "\n".join(lines))
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,126 @@
+"""
+Compare the MongoDB and SQLite storage backends on the utils.py command paths.
+
+    python -m benchmarks.bench_storage --characters 200
+    python -m benchmarks.bench_storage --mongo-uri mongodb://localhost:27017/
+
+The SQLite backend always runs (against a temporary file). MongoDB runs when a
+connection string is given or MONGO_CONNECTION_STRING is set and reachable; it
+uses a throwaway database that is dropped afterwards.
+"""
+
+import argparse
+import json
+import os
+import tempfile
+from unittest.mock import patch
+
+from benchmarks.stats import Recorder, format_table, prepare_environment
+
+prepare_environment()
+
+import utils  # noqa: E402
+from sqlite_storage import SqliteDatabase  # noqa: E402
+
+COUNTERS = [
+    ("willpower", "perm_is_maximum"),
+    ("mana", "perm_is_maximum"),
+    ("glory", "perm_not_maximum"),
+    ("xp", "single_number"),
+    ("Daily Power", "perm_is_maximum"),
+]
+
+
+def run_workload(recorder, characters):
+    """Exercise the same utils functions the slash commands call."""
+    for i in range(characters):
+        user, name = f"bench-user-{i % 50}", f"Bench {i}"
+        with recorder.time("add_user_character"):
+            utils.add_user_character(user, name)
+        with recorder.time("get_character_id"):
+            character_id = utils.get_character_id_by_user_and_name(user, name)
+        for counter, counter_type in COUNTERS:
+            with recorder.time("add_counter"):
+                utils.add_counter(
+                    character_id,
+                    counter,
+                    7,
+                    counter_type=counter_type,
+                    is_resettable=counter == "Daily Power" or None,
+                )
+        for _ in range(5):
+            with recorder.time("update_counter"):
+                utils.update_counter(character_id, "willpower", "temp", -1)
+        with recorder.time("get_counters_for_character"):
+            utils.get_counters_for_character(character_id)
+        with recorder.time("render_sheet"):
+            doc = utils.CharacterRepository.find_one(
+                {"_id": utils.ObjectId(character_id)}
+            )
+            utils.generate_character_output(doc, utils.fully_unescape)
+        with recorder.time("reset_if_eligible"):
+            utils.reset_if_eligible(character_id)
+    with recorder.time("reset_if_eligible_many"):
+        utils.reset_if_eligible_many({"user": "bench-user-0"})
+    for i in range(characters):
+        with recorder.time("remove_character"):
+            utils.remove_character(f"bench-user-{i % 50}", f"Bench {i}")
+
+
+def bench_sqlite(characters):
+    recorder = Recorder()
+    with tempfile.TemporaryDirectory() as tmp:
+        db = SqliteDatabase(os.path.join(tmp, "bench.sqlite3"))
+        with patch("utils.characters_collection", db["characters"]):
+            run_workload(recorder, characters)
+        db.close()
+    return recorder.summary()
+
+
+def bench_mongo(uri, characters):
+    from pymongo import MongoClient
+    from pymongo.errors import PyMongoError
+
+    client = MongoClient(uri, serverSelectionTimeoutMS=2000)
+    try:
+        client.admin.command("ping")
+    except PyMongoError as e:
+        print(f"Skipping MongoDB: {e}")
+        return None
+    db_name = f"avct_bench_{os.getpid()}"
+    collection = client[db_name]["characters"]
+    collection.create_index([("user", 1), ("character", 1)])
+    recorder = Recorder()
+    try:
+        with patch("utils.characters_collection", collection):
+            run_workload(recorder, characters)
+    finally:
+        client.drop_database(db_name)
+        client.close()
+    return recorder.summary()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--characters", type=int, default=100)
+    parser.add_argument(
+        "--mongo-uri", default=os.getenv("MONGO_CONNECTION_STRING") or None
+    )
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    results = {"sqlite": bench_sqlite(args.characters)}
+    if args.mongo_uri:
+        mongo = bench_mongo(args.mongo_uri, args.characters)
+        if mongo is not None:
+            results["mongo"] = mongo
+
+    for backend, summary in results.items():
+        print(format_table(summary, title=f"\n== {backend} =="))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""
+Load generator driving the real slash command callbacks with synthetic interactions.
+
+    python -m benchmarks.loadgen --users 200 --concurrency 32 --requests 5000
+    python -m benchmarks.loadgen --mix plus=5,minus=5,show=2,damage=1,heal=1
+    python -m benchmarks.loadgen --mongo-uri mongodb://localhost:27017/
+
+The cog is loaded with discover_and_register_commands, exactly as the bot does,
+and each request awaits a command's callback with a stand-in for
+discord.Interaction that records what would have been sent. Every simulated
+user gets a Vampire character, created through /configav add
+character_vampire. Requests are picked at random according to --mix and
+issued by --concurrency workers sharing one event loop, like the bot's.
+
+Storage is an in-memory SQLite database unless a MongoDB connection string is
+given, in which case a throwaway database is used and dropped afterwards.
+The report lists throughput and latency percentiles per command, plus the
+bytes each command would have sent to Discord.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from benchmarks.stats import Recorder, format_table, prepare_environment
+
+prepare_environment()
+
+import caches  # noqa: E402
+from avct_cog import AvctCog  # noqa: E402
+from commands.autocomplete import character_name_autocomplete  # noqa: E402
+from sqlite_storage import SqliteDatabase  # noqa: E402
+
+DEFAULT_MIX = "plus=4,minus=4,show=2,damage=1,heal=1,autocomplete=3"
+
+# Arguments for each command in the mix, given the random source and a
+# character name; "autocomplete" types a prefix of the name instead
+COMMAND_ARGS = {
+    "plus": lambda rng, name: (name, "willpower", 1),
+    "minus": lambda rng, name: (name, "willpower", 1),
+    "show": lambda rng, name: (name,),
+    "damage": lambda rng, name: (name, rng.choice(["Bashing", "Lethal"]), 1),
+    "heal": lambda rng, name: (name, 1),
+    "adjust": lambda rng, name: (
+        name,
+        f"willpower:{rng.choice([-1, 1])}, blood pool:{rng.choice([-1, 1])}",
+    ),
+    "reset_eligible": lambda rng, name: (name,),
+    "autocomplete": lambda rng, name: (name[: rng.randint(0, len(name))],),
+}
+
+
+class SyntheticResponse:
+    """
+    Stand-in for discord.InteractionResponse that records what is sent.
+    """
+
+    def __init__(self):
+        self.messages = []
+        self._done = False
+
+    def is_done(self):
+        return self._done
+
+    async def send_message(self, content=None, **kwargs):
+        self._done = True
+        self.messages.append(content or "")
+
+    async def edit_message(self, content=None, **kwargs):
+        self._done = True
+        self.messages.append(content or "")
+
+    async def defer(self, **kwargs):
+        self._done = True
+
+
+class SyntheticInteraction:
+    """
+    The parts of discord.Interaction the command callbacks use.
+    """
+
+    def __init__(self, user_id, guild_id=1, channel_id=1):
+        self.user = SimpleNamespace(id=user_id, name=f"load-{user_id}")
+        self.guild_id = guild_id
+        self.channel_id = channel_id
+        self.guild = None
+        self.permissions = SimpleNamespace(manage_guild=False)
+        self.response = SyntheticResponse()
+        self.followup = SimpleNamespace(send=self.response.send_message)
+
+    async def original_response(self):
+        return SimpleNamespace(id=random.getrandbits(48))
+
+    def sent_bytes(self):
+        return sum(len(m.encode("utf-8")) for m in self.response.messages)
+
+
+def parse_mix(text):
+    """
+    Parse "plus=4,show=1" into {"plus": 4, "show": 1}.
+    """
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.strip().partition("=")
+        if name not in COMMAND_ARGS:
+            raise ValueError(
+                f"Unknown command '{name}' (choose from {', '.join(COMMAND_ARGS)})"
+            )
+        mix[name] = int(weight or 1)
+    return mix
+
+
+def find_command(group, name):
+    command = group.get_command(name)
+    if command is None:
+        raise ValueError(f"/{group.name} has no command '{name}'")
+    return command
+
+
+async def load_cog():
+    cog = AvctCog(SimpleNamespace(tree=SimpleNamespace(add_command=lambda c: None)))
+    await cog.cog_load()
+    return cog
+
+
+async def seed(cog, users):
+    """
+    Create one Vampire character per simulated user with the real add command.
+    Returns [(user_id, character name)].
+    """
+    add = find_command(cog.add_group, "character_vampire")
+    players = []
+    for i in range(users):
+        user_id, name = 100000 + i, f"Load {i}"
+        interaction = SyntheticInteraction(user_id)
+        await add.callback(interaction, name, 10, 5)
+        players.append((user_id, name))
+    return players
+
+
+async def run_load(cog, players, mix, concurrency, requests, seed_value=0):
+    """
+    Issue requests commands drawn from mix with concurrency workers.
+    Returns (recorder, sent bytes per command, errors per command, seconds).
+    """
+    rng = random.Random(seed_value)
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    plan = [
+        (rng.choices(names, weights)[0], rng.choice(players)) for _ in range(requests)
+    ]
+    callbacks = {
+        name: (
+            character_name_autocomplete
+            if name == "autocomplete"
+            else find_command(cog.avct_group, name).callback
+        )
+        for name in names
+    }
+    recorder = Recorder()
+    sent = dict.fromkeys(names, 0)
+    errors = dict.fromkeys(names, 0)
+    queue = iter(plan)
+
+    async def worker():
+        for name, (user_id, character) in queue:
+            interaction = SyntheticInteraction(user_id)
+            args = COMMAND_ARGS[name](rng, character)
+            start = time.perf_counter()
+            try:
+                result = await callbacks[name](interaction, *args)
+            except Exception as e:
+                errors[name] += 1
+                print(f"{name} failed: {e!r}")
+            else:
+                if name == "autocomplete":
+                    interaction.response.messages.extend(c.name for c in result)
+            recorder.add(name, time.perf_counter() - start)
+            sent[name] += interaction.sent_bytes()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return recorder, sent, errors, time.perf_counter() - start
+
+
+def report(recorder, sent, errors, elapsed):
+    summary = recorder.summary()
+    total = sum(s["count"] for s in summary.values())
+    lines = [format_table(summary, title="\n== command latency ==")]
+    lines.append(f"\n{'command':<32}{'req/s':>10}{'bytes/req':>12}{'errors':>8}")
+    for name, s in summary.items():
+        lines.append(
+            f"{name:<32}{s['count'] / elapsed:>10.1f}"
+            f"{sent[name] / s['count']:>12.0f}{errors[name]:>8}"
+        )
+    lines.append(f"\n{total} requests in {elapsed:.2f}s: {total / elapsed:.1f} req/s")
+    print("\n".join(lines))
+    return {
+        "elapsed_s": elapsed,
+        "throughput_rps": total / elapsed,
+        "commands": {
+            name: dict(
+                s,
+                throughput_rps=s["count"] / elapsed,
+                bytes_per_request=sent[name] / s["count"],
+                errors=errors[name],
+            )
+            for name, s in summary.items()
+        },
+    }
+
+
+async def drive(args, collections):
+    with (
+        patch("utils.characters_collection", collections["characters"]),
+        patch("utils.settings_collection", collections["settings"]),
+    ):
+        # The load generator is the only writer, so documents are cached as
+        # they are in the bot once its invalidation listener runs
+        caches.set_coherent()
+        cog = await load_cog()
+        players = await seed(cog, args.users)
+        result = await run_load(
+            cog,
+            players,
+            parse_mix(args.mix),
+            args.concurrency,
+            args.requests,
+            args.seed,
+        )
+        cog.pins.stop()
+    return report(*result)
+
+
+def memory_collections():
+    db = SqliteDatabase(":memory:")
+    return {"characters": db["characters"], "settings": db["settings"]}, db.close
+
+
+def mongo_collections(uri):
+    from pymongo import MongoClient
+
+    client = MongoClient(uri, serverSelectionTimeoutMS=2000)
+    client.admin.command("ping")
+    db_name = f"avct_load_{os.getpid()}"
+    db = client[db_name]
+    db["characters"].create_index([("user", 1), ("character", 1)])
+
+    def close():
+        client.drop_database(db_name)
+        client.close()
+
+    return {"characters": db["characters"], "settings": db["settings"]}, close
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument(
+        "--mix", default=DEFAULT_MIX, help="Comma-separated command=weight pairs"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mongo-uri", help="Run against this MongoDB server")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    if args.mongo_uri:
+        collections, close = mongo_collections(args.mongo_uri)
+    else:
+        collections, close = memory_collections()
+    try:
+        results = asyncio.run(drive(args, collections))
+    finally:
+        close()
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+Replay recorded interaction traces and compare latency between builds.
+
+    python -m benchmarks.replay run trace.jsonl --speed 1 --json base.json
+    python -m benchmarks.replay run trace.jsonl --speed 0 --json head.json
+    python -m benchmarks.replay compare base.json head.json
+
+run plays a trace written with TRACE_PATH (see traces.py) against a local
+backend: an in-memory SQLite database, or a throwaway MongoDB database with
+--mongo-uri. Each entry's command callback is awaited with a synthetic
+interaction (see loadgen.py) at the entry's original offset divided by
+--speed; --speed 0 replays back to back as fast as possible. Characters and
+counters the trace uses before creating them are seeded first, with
+perm_is_maximum counters at 5/10 and a normal health tracker.
+
+To compare two builds, run the same trace in a checkout of each (for example
+with git worktree) and pass both JSON results to compare. It prints each
+command's percentiles side by side and marks those that slowed down by more
+than --threshold.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from unittest.mock import patch
+
+from benchmarks.stats import (
+    Recorder,
+    compare_summaries,
+    format_table,
+    prepare_environment,
+)
+
+prepare_environment()
+
+import utils  # noqa: E402
+from benchmarks.loadgen import (  # noqa: E402
+    SyntheticInteraction,
+    load_cog,
+    memory_collections,
+    mongo_collections,
+)
+from health import Health, HealthTypeEnum  # noqa: E402
+from traces import read_trace  # noqa: E402
+
+SEED_PERM = 10
+SEED_TEMP = 5
+
+
+def resolve_command(cog, qualified_name):
+    """
+    Return the command called qualified_name ("configav add counter").
+    """
+    top, *rest = qualified_name.split()
+    groups = {g.name: g for g in (cog.avct_group, cog.configav_group)}
+    command = groups.get(top)
+    for part in rest:
+        command = command.get_command(part) if command is not None else None
+    if command is None or not hasattr(command, "callback"):
+        raise KeyError(qualified_name)
+    return command
+
+
+def _delta_names(text):
+    return [p.rpartition(":")[0].strip() for p in str(text).split(",") if ":" in p]
+
+
+def characters_to_seed(entries):
+    """
+    Return {(user, character): counter names} for the characters and counters
+    the trace uses without creating them first.
+    """
+    created, created_counters, needed = set(), set(), {}
+    for entry in entries:
+        options = entry["options"]
+        character = options.get("character")
+        if not character:
+            continue
+        key = (entry["user"], character)
+        command = entry["command"]
+        if command.startswith("configav add character"):
+            created.add(key)
+            continue
+        if command == "configav add counter":
+            created_counters.add((key, options.get("counter")))
+            continue
+        if key in created:
+            continue
+        counters = needed.setdefault(key, set())
+        names = [options.get("counter")] + _delta_names(options.get("counters", ""))
+        counters.update(n for n in names if n and (key, n) not in created_counters)
+    return needed
+
+
+def seed(needed):
+    for (user, character), counters in needed.items():
+        utils.add_user_character(str(user), character)
+        character_id = utils.get_character_id_by_user_and_name(str(user), character)
+        for name in sorted(counters):
+            utils.add_counter(
+                character_id, name, SEED_PERM, counter_type="perm_is_maximum"
+            )
+            utils.update_counter(character_id, name, "temp", SEED_TEMP - SEED_PERM)
+        utils.CharacterRepository.update_one(
+            {"_id": utils.ObjectId(character_id)},
+            {"$set": {"health": [Health(HealthTypeEnum.normal.value).to_dict()]}},
+        )
+
+
+async def replay(cog, entries, speed):
+    """
+    Play entries back. Returns (callback durations, lag behind schedule,
+    skipped commands, seconds).
+    """
+    recorder, lag = Recorder(), Recorder()
+    skipped = {}
+    origin = entries[0]["at"] if entries else 0.0
+    start = time.perf_counter()
+
+    async def play(entry, command):
+        interaction = SyntheticInteraction(entry["user"], entry["guild"])
+        began = time.perf_counter()
+        try:
+            await command.callback(interaction, **entry["options"])
+        except Exception as e:
+            print(f"{entry['command']} failed: {e!r}")
+        recorder.add(entry["command"], time.perf_counter() - began)
+
+    tasks = []
+    for entry in entries:
+        try:
+            command = resolve_command(cog, entry["command"])
+        except KeyError:
+            skipped[entry["command"]] = skipped.get(entry["command"], 0) + 1
+            continue
+        if speed > 0:
+            due = start + (entry["at"] - origin) / speed
+            await asyncio.sleep(max(0.0, due - time.perf_counter()))
+            lag.add("schedule lag", max(0.0, time.perf_counter() - due))
+            tasks.append(asyncio.create_task(play(entry, command)))
+        else:
+            await play(entry, command)
+    await asyncio.gather(*tasks)
+    return recorder, lag, skipped, time.perf_counter() - start
+
+
+async def run(args, collections):
+    entries = read_trace(args.trace)
+    with (
+        patch("utils.characters_collection", collections["characters"]),
+        patch("utils.settings_collection", collections["settings"]),
+    ):
+        seed(characters_to_seed(entries))
+        cog = await load_cog()
+        recorder, lag, skipped, elapsed = await replay(cog, entries, args.speed)
+        cog.pins.stop()
+    summary = recorder.summary()
+    print(format_table(summary, title=f"\n== replay of {args.trace} =="))
+    if args.speed > 0:
+        print(format_table(lag.summary()))
+    for name, count in skipped.items():
+        print(f"skipped {count} '{name}' (no such command in this build)")
+    print(f"\n{len(entries)} entries in {elapsed:.2f}s")
+    return {
+        "trace": args.trace,
+        "speed": args.speed,
+        "elapsed_s": elapsed,
+        "commands": summary,
+        "lag": lag.summary(),
+        "skipped": skipped,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    sub = parser.add_subparsers(dest="action", required=True)
+    run_parser = sub.add_parser("run", help="Replay a trace")
+    run_parser.add_argument("trace")
+    run_parser.add_argument(
+        "--speed", type=float, default=1.0, help="Time scale; 0 replays back to back"
+    )
+    run_parser.add_argument("--mongo-uri", help="Replay against this MongoDB server")
+    run_parser.add_argument("--json", help="Write results to this JSON file")
+    compare_parser = sub.add_parser("compare", help="Compare two run results")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("head")
+    compare_parser.add_argument(
+        "--threshold", type=float, default=0.1, help="p95 slowdown to flag (0.1 = 10%%)"
+    )
+    args = parser.parse_args(argv)
+
+    if args.action == "compare":
+        with open(args.base) as f:
+            base = json.load(f)
+        with open(args.head) as f:
+            head = json.load(f)
+        lines, regressions = compare_summaries(
+            base["commands"], head["commands"], args.threshold
+        )
+        print("\n".join(lines))
+        return 1 if regressions else 0
+
+    if args.mongo_uri:
+        collections, close = mongo_collections(args.mongo_uri)
+    else:
+        collections, close = memory_collections()
+    try:
+        results = asyncio.run(run(args, collections))
+    finally:
+        close()
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,134 @@
+"""
+Shared helpers for benchmark scripts: timing samples, percentiles and
+environment defaults so utils/config can be imported without a .env file.
+"""
+
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Limits required by config.py; a real .env still takes precedence
+BENCH_ENV_DEFAULTS = {
+    "MAX_USER_CHARACTERS": "1000000",
+    "MAX_COUNTERS_PER_CHARACTER": "100",
+    "MAX_FIELD_LENGTH": "100",
+    "MAX_COMMENT_LENGTH": "500",
+    "DISPLAY_MODE": "pretty",
+    # Import utils without a MongoDB server; each benchmark picks its own backend
+    "STORAGE_BACKEND": "sqlite",
+    "SQLITE_PATH": ":memory:",
+    "MONGO_DB_NAME": "avct_bench",
+    # Measure storage paths uncached unless a benchmark opts in
+    "CHARACTER_CACHE_SIZE": "0",
+    "AUTOCOMPLETE_CACHE_SIZE": "0",
+    "RENDER_CACHE_SIZE": "0",
+}
+
+
+def prepare_environment():
+    """
+    Make the repository importable and fill in config values the benchmarks need.
+    Call before importing config or utils.
+    """
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    from dotenv import load_dotenv
+
+    load_dotenv(os.path.join(REPO_ROOT, ".env"))
+    for key, value in BENCH_ENV_DEFAULTS.items():
+        os.environ.setdefault(key, value)
+
+
+def percentile(sorted_samples, pct):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_samples:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_samples))))
+    return sorted_samples[min(rank, len(sorted_samples)) - 1]
+
+
+def summarize(samples):
+    """
+    Summarize a list of durations in seconds as milliseconds.
+    """
+    ordered = sorted(samples)
+    total = sum(ordered)
+    return {
+        "count": len(ordered),
+        "mean_ms": (total / len(ordered) * 1000) if ordered else 0.0,
+        "p50_ms": percentile(ordered, 50) * 1000,
+        "p95_ms": percentile(ordered, 95) * 1000,
+        "p99_ms": percentile(ordered, 99) * 1000,
+        "max_ms": (ordered[-1] * 1000) if ordered else 0.0,
+    }
+
+
+class Recorder:
+    """
+    Collects named timing samples.
+    """
+
+    def __init__(self):
+        self.samples = {}
+
+    @contextmanager
+    def time(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        self.samples.setdefault(name, []).append(seconds)
+
+    def summary(self):
+        return {name: summarize(values) for name, values in self.samples.items()}
+
+
+def format_table(summary, title=None):
+    """
+    Render a summary dict as a fixed-width text table.
+    """
+    lines = []
+    if title:
+        lines.append(title)
+    lines.append(
+        f"{'operation':<32}{'count':>8}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    )
+    for name, s in summary.items():
+        lines.append(
+            f"{name:<32}{s['count']:>8}{s['mean_ms']:>10.3f}{s['p50_ms']:>10.3f}"
+            f"{s['p95_ms']:>10.3f}{s['p99_ms']:>10.3f}"
+        )
+    return "\n".join(lines)
+
+
+def compare_summaries(
+    base, head, threshold, percentiles=("p50_ms", "p95_ms", "p99_ms"), key="p95_ms"
+):
+    """
+    Compare two summary dicts (as returned by Recorder.summary). Returns table
+    lines showing each operation's percentiles before and after, and the
+    operations whose key percentile grew by more than threshold (0.1 = 10%).
+    """
+    header = "".join(f"{p.replace('_ms', ' ms'):>16}" for p in percentiles)
+    lines = [f"{'operation':<32}{header}"]
+    regressions = []
+    for name in sorted(set(base) | set(head)):
+        before, after = base.get(name), head.get(name)
+        if before is None or after is None:
+            only = "only in " + ("head" if before is None else "base")
+            lines.append(f"{name:<32}{only:>16}")
+            continue
+        cells = "".join(f"{before[p]:>7.3f}→{after[p]:<8.3f}" for p in percentiles)
+        slower = after[key] > before[key] * (1 + threshold)
+        if slower:
+            regressions.append(name)
+        lines.append(f"{name:<32}{cells}{'  slower' if slower else ''}")
+    return lines, regressions
@@ -0,0 +1,296 @@
+"""
+In-process caches for character data and the invalidation hub that keeps them
+consistent.
+
+Three caches share one invalidation path:
+- document_cache: character documents by id (used by CharacterRepository.find_one)
+- autocomplete_cache: autocomplete choice lists per user/character, and the
+  ids of prefetched characters by name
+- render_cache: rendered sheets keyed by (character id, version)
+
+Entries are tagged with the character id (and "user:<id>" where relevant).
+invalidate_character() drops every entry carrying those tags and notifies
+subscribers, whether the change came from this process or from another one
+(see invalidation.py).
+
+Documents are only cached once something keeps them coherent with writes
+from other processes (set_coherent), and a document read from the database
+is only stored if its character was not invalidated while it was being read
+(fill_token), so a read that raced a write cannot cache the older copy.
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from config import (
+    CHARACTER_CACHE_SIZE,
+    AUTOCOMPLETE_CACHE_SIZE,
+    AUTOCOMPLETE_CACHE_TTL,
+    RENDER_CACHE_SIZE,
+    SETTINGS_CACHE_TTL,
+)
+
+_MISSING = object()
+
+
+class TaggedLRUCache:
+    """
+    Thread-safe LRU cache whose entries can be dropped by tag.
+    A maxsize of 0 disables the cache.
+    """
+
+    def __init__(self, maxsize: int, ttl: float = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (value, tags, stored_at)
+        self._by_tag = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self):
+        return self.maxsize > 0
+
+    def get(self, key, default=None):
+        if not self.enabled:
+            return default
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING or self._expired(entry):
+                if entry is not _MISSING:
+                    self._remove(key)
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def peek(self, key, default=None):
+        """
+        Return an entry without counting it as a use: hits, misses and the
+        LRU order are left alone. Expired entries are returned as default.
+        """
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING or self._expired(entry):
+                return default
+            return entry[0]
+
+    def set(self, key, value, tags=()):
+        if not self.enabled:
+            return
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            tags = tuple(tags)
+            self._data[key] = (value, tags, time.monotonic())
+            for tag in tags:
+                self._by_tag.setdefault(tag, set()).add(key)
+            while len(self._data) > self.maxsize:
+                self._remove(next(iter(self._data)))
+
+    def invalidate_tag(self, tag):
+        with self._lock:
+            for key in list(self._by_tag.get(tag, ())):
+                self._remove(key)
+
+    def invalidate_key(self, key):
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+    def keys(self):
+        with self._lock:
+            return list(self._data)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._by_tag.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def _expired(self, entry):
+        return self.ttl is not None and time.monotonic() - entry[2] > self.ttl
+
+    def _remove(self, key):
+        _, tags, _ = self._data.pop(key)
+        for tag in tags:
+            keys = self._by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[tag]
+
+
+document_cache = TaggedLRUCache(CHARACTER_CACHE_SIZE)
+autocomplete_cache = TaggedLRUCache(AUTOCOMPLETE_CACHE_SIZE, ttl=AUTOCOMPLETE_CACHE_TTL)
+render_cache = TaggedLRUCache(RENDER_CACHE_SIZE)
+# User and server settings; another process's changes show up within the TTL
+settings_cache = TaggedLRUCache(AUTOCOMPLETE_CACHE_SIZE, ttl=SETTINGS_CACHE_TTL)
+
+_subscribers = []
+
+# Set by invalidation.start_invalidation once a listener runs, and for
+# storage no other process can write; without it documents are not cached,
+# since nothing would drop a copy that another process changed
+_coherent = False
+
+# Invalidations are numbered so a cache fill can tell whether its character
+# was invalidated after its read started
+INVALIDATION_HISTORY = 4096
+_fill_lock = threading.Lock()
+_clock = 0
+_invalidated = OrderedDict()  # character_id -> _clock at its last invalidation
+# Fills that started before this are refused for every character: set by
+# invalidate_all and when the oldest _invalidated entry is forgotten
+_invalidated_floor = 0
+
+
+def user_tag(user_id):
+    return f"user:{user_id}"
+
+
+def subscribe(callback):
+    """
+    Register callback(character_id, version) to run after every invalidation.
+    Callbacks may be invoked from a background thread.
+    """
+    _subscribers.append(callback)
+    return callback
+
+
+def unsubscribe(callback):
+    if callback in _subscribers:
+        _subscribers.remove(callback)
+
+
+def set_coherent(coherent=True):
+    """
+    Allow (or stop) caching documents: call once other processes' writes
+    are being invalidated, or when no other process can write.
+    """
+    global _coherent
+    _coherent = coherent
+
+
+def caching_documents():
+    return document_cache.enabled and _coherent
+
+
+def fill_token():
+    """
+    Return a token for a database read that is about to start; pass it to
+    store_document with the document that read returns.
+    """
+    with _fill_lock:
+        return _clock
+
+
+def _record_invalidation(character_id=None):
+    global _clock, _invalidated_floor
+    with _fill_lock:
+        _clock += 1
+        if character_id is None:
+            _invalidated.clear()
+            _invalidated_floor = _clock
+            return
+        _invalidated[character_id] = _clock
+        _invalidated.move_to_end(character_id)
+        if len(_invalidated) > INVALIDATION_HISTORY:
+            _, _invalidated_floor = _invalidated.popitem(last=False)
+
+
+def changed_since(character_id, token):
+    """
+    Return True if the character was invalidated after fill_token returned token.
+    """
+    with _fill_lock:
+        return _invalidated_since(str(character_id), token)
+
+
+def _invalidated_since(character_id, token):
+    return max(_invalidated_floor, _invalidated.get(character_id, 0)) > token
+
+
+def invalidate_character(character_id, version=None, user_id=None):
+    """
+    Drop cached data for a character and notify subscribers.
+    version is the new document version if known (None for deletes/unknown).
+    """
+    character_id = str(character_id)
+    # Recorded first, so a fill racing this invalidation is either refused
+    # or stored before the entries below are dropped
+    _record_invalidation(character_id)
+    cached = document_cache.peek(character_id)
+    if user_id is None and cached is not None:
+        user_id = cached.get("user")
+    for cache in (document_cache, autocomplete_cache, render_cache):
+        cache.invalidate_tag(character_id)
+    if user_id is not None:
+        autocomplete_cache.invalidate_tag(user_tag(user_id))
+    for callback in list(_subscribers):
+        try:
+            callback(character_id, version)
+        except Exception as e:
+            print(f"Cache subscriber failed for {character_id}: {e}")
+
+
+def invalidate_all():
+    _record_invalidation()
+    for cache in (document_cache, autocomplete_cache, render_cache):
+        cache.clear()
+
+
+def get_document(character_id):
+    """
+    Return a private copy of a cached character document, or None.
+    """
+    doc = document_cache.get(str(character_id))
+    return copy.deepcopy(doc) if doc is not None else None
+
+
+def store_document(doc, token):
+    """
+    Cache a document read from the database by a read that started at token
+    (see fill_token). It is not stored if its character was invalidated
+    since, as the read may have missed that change. Returns True if stored.
+    """
+    if doc is None or not caching_documents():
+        return False
+    character_id = str(doc["_id"])
+    tags = [character_id]
+    if doc.get("user") is not None:
+        tags.append(user_tag(doc["user"]))
+    doc = copy.deepcopy(doc)
+    with _fill_lock:
+        if _invalidated_since(character_id, token):
+            return False
+        document_cache.set(character_id, doc, tags=tags)
+    return True
+
+
+def remember_name(doc):
+    """
+    Let lookups by the document's user and character name find it in
+    document_cache (see utils.prefetch_character).
+    """
+    character_id = str(doc["_id"])
+    autocomplete_cache.set(
+        ("character_id", doc["user"], doc["character"]),
+        character_id,
+        tags=[character_id, user_tag(doc["user"])],
+    )
+
+
+def named_id(user_id, character):
+    return autocomplete_cache.get(("character_id", user_id, character))
+
+
+def cached_version(character_id):
+    doc = document_cache.peek(str(character_id))
+    return doc.get("version") if doc is not None else None
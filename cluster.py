@@ -0,0 +1,238 @@
+"""
+Sharded entry point.
+
+    python cluster.py                # one process, all shards (AutoShardedBot)
+    python cluster.py --workers 4    # four processes, each owning a shard range
+
+The launcher resolves the shard count once and hands every worker the same
+ClusterConfig, so workers never disagree about shard assignment. Only worker 0
+syncs the command tree, and only when the tree's fingerprint has changed since
+the last successful sync.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+from collections import namedtuple
+
+import discord
+from discord.ext import commands, tasks
+
+import metrics
+import utils
+from invalidation import start_invalidation
+from config import (
+    TOKEN,
+    SHARD_COUNT,
+    CLUSTER_WORKERS,
+    CLUSTER_STATE_DIR,
+    METRICS_INTERVAL,
+)
+
+ClusterConfig = namedtuple(
+    "ClusterConfig",
+    ["token", "shard_count", "workers", "state_dir", "metrics_interval"],
+)
+FINGERPRINT_FILE = "command_sync_fingerprint"
+
+
+def build_intents():
+    # Same intents as main.py
+    intents = discord.Intents.default()
+    intents.messages = True
+    intents.members = True
+    intents.message_content = True
+    return intents
+
+
+def shard_ranges(shard_count: int, workers: int):
+    """
+    Split shard ids 0..shard_count-1 into contiguous ranges, one per worker.
+    Workers beyond the shard count are dropped.
+    """
+    workers = max(1, min(workers, shard_count))
+    base, extra = divmod(shard_count, workers)
+    ranges = []
+    start = 0
+    for i in range(workers):
+        size = base + (1 if i < extra else 0)
+        ranges.append(list(range(start, start + size)))
+        start += size
+    return ranges
+
+
+def command_fingerprint(tree) -> str:
+    """
+    Stable hash of the application commands registered on a tree.
+    """
+    payload = sorted(
+        (cmd.to_dict(tree) for cmd in tree.get_commands()),
+        key=lambda d: d["name"],
+    )
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def read_fingerprint(state_dir):
+    try:
+        with open(os.path.join(state_dir, FINGERPRINT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def write_fingerprint(state_dir, fingerprint):
+    os.makedirs(state_dir, exist_ok=True)
+    path = os.path.join(state_dir, FINGERPRINT_FILE)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(fingerprint)
+    os.replace(tmp, path)
+
+
+class ClusterBot(commands.AutoShardedBot):
+    def __init__(self, cluster: ClusterConfig, worker_id=0, shard_ids=None, **kwargs):
+        super().__init__(
+            command_prefix="/avct",
+            intents=build_intents(),
+            shard_count=cluster.shard_count,
+            shard_ids=shard_ids,
+            **kwargs,
+        )
+        self.cluster = cluster
+        self.worker_id = worker_id
+
+    async def setup_hook(self):
+        utils.get_database()
+        await self.load_extension("avct_cog")
+        start_invalidation(utils.characters_collection)
+        await utils.warm_caches(self.warmup_path)
+        utils.start_activity_saver(self.warmup_path)
+        utils.start_event_compaction()
+        os.makedirs(self.cluster.state_dir, exist_ok=True)
+        utils.open_write_journal(self.journal_path)
+        utils.start_journal_flush()
+        await self.maybe_sync_commands()
+        if self.cluster.metrics_interval > 0:
+            self.report_metrics.change_interval(seconds=self.cluster.metrics_interval)
+            self.report_metrics.start()
+
+    @property
+    def warmup_path(self):
+        # Each worker serves its own shards, so it warms its own users
+        return os.path.join(
+            self.cluster.state_dir, f"warmup-worker-{self.worker_id}.json"
+        )
+
+    @property
+    def journal_path(self):
+        # Workers flush and read their own pending writes, so each keeps its own file
+        return os.path.join(
+            self.cluster.state_dir, f"journal-worker-{self.worker_id}.sqlite3"
+        )
+
+    async def close(self):
+        utils.save_recent_activity(self.warmup_path)
+        await super().close()
+
+    async def maybe_sync_commands(self):
+        """
+        Sync the command tree from worker 0 only, and only if it changed.
+        Returns True when a sync was performed.
+        """
+        if self.worker_id != 0:
+            return False
+        fingerprint = command_fingerprint(self.tree)
+        if fingerprint == read_fingerprint(self.cluster.state_dir):
+            return False
+        await self.tree.sync()
+        write_fingerprint(self.cluster.state_dir, fingerprint)
+        return True
+
+    @tasks.loop(seconds=60)
+    async def report_metrics(self):
+        for shard_id, latency in self.latencies:
+            metrics.gauge("gateway_latency_ms", latency * 1000, shard=shard_id)
+        for shard_id in self.shards:
+            guilds = sum(1 for g in self.guilds if g.shard_id == shard_id)
+            metrics.gauge("guilds", guilds, shard=shard_id)
+        os.makedirs(self.cluster.state_dir, exist_ok=True)
+        metrics.write_snapshot(
+            os.path.join(
+                self.cluster.state_dir, f"metrics-worker-{self.worker_id}.json"
+            )
+        )
+
+    async def on_ready(self):
+        print(
+            f"Worker {self.worker_id} logged in as {self.user} (shards {self.shard_ids})"
+        )
+
+
+async def fetch_recommended_shard_count(token):
+    http = discord.http.HTTPClient()
+    try:
+        await http.static_login(token)
+        shards, _, _ = await http.get_bot_gateway()
+        return shards
+    finally:
+        await http.close()
+
+
+def resolve_cluster_config(
+    token=TOKEN, shard_count=SHARD_COUNT, workers=CLUSTER_WORKERS
+):
+    if not shard_count:
+        shard_count = asyncio.run(fetch_recommended_shard_count(token))
+    return ClusterConfig(
+        token=token,
+        shard_count=shard_count,
+        workers=max(1, workers),
+        state_dir=CLUSTER_STATE_DIR,
+        metrics_interval=METRICS_INTERVAL,
+    )
+
+
+def run_worker(cluster: ClusterConfig, worker_id: int, shard_ids):
+    metrics.set_default_tags(worker=worker_id)
+    bot = ClusterBot(cluster, worker_id=worker_id, shard_ids=shard_ids)
+    bot.run(cluster.token)
+
+
+def launch(cluster: ClusterConfig):
+    ranges = shard_ranges(cluster.shard_count, cluster.workers)
+    if len(ranges) == 1:
+        # Single process: let AutoShardedBot manage every shard itself
+        run_worker(cluster, 0, None)
+        return
+
+    ctx = multiprocessing.get_context("spawn")
+    processes = [
+        ctx.Process(target=run_worker, args=(cluster, i, ids), name=f"avct-worker-{i}")
+        for i, ids in enumerate(ranges)
+    ]
+    for p in processes:
+        p.start()
+    try:
+        for p in processes:
+            p.join()
+    except KeyboardInterrupt:
+        for p in processes:
+            p.terminate()
+        for p in processes:
+            p.join()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the bot as a sharded cluster")
+    parser.add_argument("--workers", type=int, default=CLUSTER_WORKERS)
+    parser.add_argument("--shard-count", type=int, default=SHARD_COUNT)
+    args = parser.parse_args(argv)
+    launch(resolve_cluster_config(shard_count=args.shard_count, workers=args.workers))
+
+
+if __name__ == "__main__":
+    main()
@@ -38,7 +38,7 @@ def register_add_commands(cog):
         if char_doc:
             health_obj = Health(health_type=health_type)
             health_list = char_doc.get("health", [])
-            health_list.append(health_obj.__dict__)
+            health_list.append(health_obj.to_dict())
             CharacterRepository.update_one(
                 {"_id": ObjectId(character_id)}, {"$set": {"health": health_list}}
             )
@@ -52,7 +52,7 @@ def register_add_commands(cog):
             health_list = char_doc.get("health", [])
             for health_type in health_types:
                 health_obj = Health(health_type=health_type)
-                health_list.append(health_obj.__dict__)
+                health_list.append(health_obj.to_dict())
             CharacterRepository.update_one(
                 {"_id": ObjectId(character_id)}, {"$set": {"health": health_list}}
             )
@@ -468,7 +468,7 @@ def register_add_commands(cog):
 
         # Add the health tracker
         health_obj = Health(health_type=health_type)
-        health_list.append(health_obj.__dict__)
+        health_list.append(health_obj.to_dict())
         CharacterRepository.update_one(
             {"_id": ObjectId(character_id)}, {"$set": {"health": health_list}}
         )
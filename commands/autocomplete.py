@@ -1,9 +1,11 @@
 import discord
+import caches
 from utils import (
-    get_character_id_by_user_and_name,
-    get_counters_for_character,
+    get_character_id_by_user_and_name_async,
+    get_counters_for_character_async,
     PredefinedCounterEnum,
-    get_all_user_characters_for_user,
+    get_all_user_characters_for_user_async,
+    prefetch_character,
 )
 from counter import CategoryEnum, CounterTypeEnum
 
@@ -19,14 +21,19 @@ def enum_autocomplete(enum_cls, current: str, title_case=False):
     ][:25]
 
 
-def counter_name_autocomplete_helper(interaction, current, filter_func=None):
+async def counter_name_autocomplete_helper(interaction, current, filter_func=None):
     """Generalized autocomplete for counter names for a character."""
     user_id = str(interaction.user.id)
     character = interaction.namespace.character
-    character_id = get_character_id_by_user_and_name(user_id, character)
+    character_id = await get_character_id_by_user_and_name_async(user_id, character)
     if character_id is None:
         return []
-    counters = get_counters_for_character(character_id)
+    counters = caches.autocomplete_cache.get(("counters", character_id))
+    if counters is None:
+        counters = await get_counters_for_character_async(character_id)
+        caches.autocomplete_cache.set(
+            ("counters", character_id), counters, tags=[character_id]
+        )
 
     # Check if this is a remove command - include invalid_counter type for remove commands only
     command_name = getattr(interaction.command, "name", "")
@@ -52,13 +59,22 @@ def counter_name_autocomplete_helper(interaction, current, filter_func=None):
 
 async def character_name_autocomplete(interaction: discord.Interaction, current: str):
     user_id = str(interaction.user.id)
-    chars = get_all_user_characters_for_user(user_id)
+    all_names = caches.autocomplete_cache.get(("characters", user_id))
+    if all_names is None:
+        chars = await get_all_user_characters_for_user_async(user_id)
+        all_names = [c.character for c in chars]
+        caches.autocomplete_cache.set(
+            ("characters", user_id), all_names, tags=[caches.user_tag(user_id)]
+        )
     # Always show all characters if current is empty, otherwise filter
     if not current:
-        names = [c.character for c in chars]
+        names = all_names
     else:
-        names = [c.character for c in chars if current.lower() in c.character.lower()]
+        names = [n for n in all_names if current.lower() in n.lower()]
     unique_names = list(dict.fromkeys(names))[:25]
+    if len(unique_names) == 1:
+        # The next command is almost certainly for this character
+        prefetch_character(user_id, unique_names[0])
     return [discord.app_commands.Choice(name=name, value=name) for name in unique_names]
 
 
@@ -94,11 +110,11 @@ async def predefined_counter_type_autocomplete(
 async def counter_name_autocomplete_for_character(
     interaction: discord.Interaction, current: str
 ):
-    return counter_name_autocomplete_helper(interaction, current)
+    return await counter_name_autocomplete_helper(interaction, current)
 
 
 async def bedlam_counter_autocomplete(interaction: discord.Interaction, current: str):
-    return counter_name_autocomplete_helper(
+    return await counter_name_autocomplete_helper(
         interaction,
         current,
         filter_func=lambda c: c.counter_type == "perm_is_maximum_bedlam",
@@ -130,10 +146,10 @@ async def toggle_counter_autocomplete(interaction: discord.Interaction, current:
     user_id = str(interaction.user.id)
     character = interaction.namespace.character
     toggle = getattr(interaction.namespace, "toggle", None)
-    character_id = get_character_id_by_user_and_name(user_id, character)
+    character_id = await get_character_id_by_user_and_name_async(user_id, character)
     if character_id is None:
         return []
-    counters = get_counters_for_character(character_id)
+    counters = await get_counters_for_character_async(character_id)
     # Filter by toggle type and exclude invalid_counter type
     if toggle == "force_unpretty":
         filtered = [
@@ -5,39 +5,32 @@ from utils import (
     get_counters_for_character,
     fully_unescape,
     generate_counters_output,
+    character_sheet_sections,
+    LazyPages,
     handle_character_not_found,
     handle_counter_not_found,
     update_counter_in_db,  # Add import
+    set_counter_value,
+    counters_from_doc,
 )
 from utils import CharacterRepository
-from health import Health, HealthTypeEnum
 from bson import ObjectId
+from .paging import send_pages
 from .autocomplete import (
     character_name_autocomplete,
     counter_name_autocomplete_for_character,
 )
 from avct_cog import register_command
-from counter import CounterTypeEnum
+from counter import CounterTypeEnum, counter_key
 
 
 @register_command("character_group")
 def register_character_commands(cog):
     # Helper functions
     def _get_counter_by_name(counters, counter_name):
-        """Get a counter by its name from a list of counters."""
-        return next((c for c in counters if c.counter == counter_name), None)
-
-    def _get_bedlam_counter(counters, counter_name):
-        """Get a bedlam counter by its name from a list of counters."""
-        return next(
-            (
-                c
-                for c in counters
-                if c.counter == counter_name
-                and c.counter_type == CounterTypeEnum.perm_is_maximum_bedlam.value
-            ),
-            None,
-        )
+        """Get a counter by its name, in any case, from a list of counters."""
+        key = counter_key(counter_name)
+        return next((c for c in counters if counter_key(c.counter) == key), None)
 
     async def _validate_new_temp_value(target, new_value, interaction):
         """Validate and adjust a new temp value based on counter type."""
@@ -62,80 +55,46 @@ def register_character_commands(cog):
                 return None, False
             return new_value, True
 
-    async def _validate_new_perm_value(target, new_value, interaction):
-        """Validate a new perm value."""
-        if new_value < 0:
-            await interaction.response.send_message(
-                "Cannot set perm below zero.", ephemeral=True
-            )
-            return None, False
-
-        # Check if counter is perm_is_maximum_bedlam and new_value would be less than bedlam
-        if target.counter_type == CounterTypeEnum.perm_is_maximum_bedlam.value:
-            if new_value < target.bedlam:
-                await interaction.response.send_message(
-                    f"Perm cannot be set below bedlam ({target.bedlam}).",
-                    ephemeral=True,
-                )
-                return None, False
-
-        return new_value, True
-
-    async def _validate_new_bedlam_value(target, new_value, interaction):
-        """Validate a new bedlam value."""
-        if new_value < 0:
-            await interaction.response.send_message(
-                "Bedlam cannot be negative.", ephemeral=True
-            )
-            return None, False
-        if new_value > target.perm:
-            await interaction.response.send_message(
-                f"Bedlam cannot exceed perm ({target.perm}).", ephemeral=True
-            )
-            return None, False
-        return new_value, True
-
     def _update_counter_in_mongodb(
         character_id, counter_name, field, value, target=None
     ):
         # Deprecated: use update_counter_in_db from utils
         return update_counter_in_db(character_id, counter_name, field, value, target)
 
-    def _build_health_output(health_entries):
-        msg = "\n\n**Health Trackers:**"
-        # Get normal health
-        normal_health = next(
-            (
-                h
-                for h in health_entries
-                if h.get("health_type") == HealthTypeEnum.normal.value
-            ),
-            None,
-        )
-        if normal_health:
-            health_obj = Health(
-                health_type=normal_health.get("health_type"),
-                damage=normal_health.get("damage", []),
-                health_levels=normal_health.get("health_levels", None),
-            )
-            msg += f"\n{health_obj.display(health_entries)}"
-        # Display other health types
-        for h in health_entries:
-            if (
-                h.get("health_type") != HealthTypeEnum.normal.value
-                and h.get("health_type") != HealthTypeEnum.chimerical.value
-            ):
-                health_obj = Health(
-                    health_type=h.get("health_type"),
-                    damage=h.get("damage", []),
-                    health_levels=h.get("health_levels", None),
-                )
-                msg += f"\nHealth ({health_obj.health_type}):\n{health_obj.display()}"
-        return msg
+    def _health_section_or_error(render_health):
+        def render():
+            try:
+                return render_health()
+            except Exception:
+                return "**Health:**\nCould not display health, invalid values -- remove and re-add health tracker to resolve"
+
+        return render
 
-    async def _send_counter_response(interaction, character, msg, public=False):
+    async def _send_counter_set_response(
+        interaction, character, counter, field, value, counters
+    ):
+        msg = generate_counters_output(counters, fully_unescape)
         await interaction.response.send_message(
-            f"Counters for character '{character}':\n{msg}", ephemeral=not public
+            f"{field.capitalize()} for counter '{counter}' on character '{character}' set to {value}.\n"
+            f"Counters for character '{character}':\n{msg}",
+            ephemeral=True,
+        )
+
+    async def _set_counter_value(
+        interaction, character_id, character, counter, field, value
+    ):
+        # Validated against the stored counter; retried if another command wins the race
+        success, error, char_doc = set_counter_value(
+            character_id, counter, field, value
+        )
+        if not success:
+            if error == "Counter not found.":
+                await handle_counter_not_found(interaction)
+            else:
+                await interaction.response.send_message(error, ephemeral=True)
+            return
+        await _send_counter_set_response(
+            interaction, character, counter, field, value, counters_from_doc(char_doc)
         )
 
     async def _handle_counter_update(
@@ -157,38 +116,20 @@ def register_character_commands(cog):
                 character_id = get_character_id_by_user_and_name(
                     str(interaction.user.id), character
                 )
-                _update_counter_in_mongodb(
+                success, error, _ = _update_counter_in_mongodb(
                     character_id, counter, "perm", target.perm, target
                 )
-
-        elif field == "perm":
-            adjusted_value, is_valid = await _validate_new_perm_value(
-                target, value, interaction
-            )
-            if not is_valid:
-                return
-            target.perm = adjusted_value
-            if target.counter_type in [
-                CounterTypeEnum.perm_is_maximum.value,
-                CounterTypeEnum.perm_is_maximum_bedlam.value,
-            ]:
-                if target.temp > target.perm:
-                    target.temp = target.perm
-        elif field == "bedlam":
-            adjusted_value, is_valid = await _validate_new_bedlam_value(
-                target, value, interaction
-            )
-            if not is_valid:
-                return
-            target.bedlam = adjusted_value
+                if not success:
+                    await interaction.response.send_message(error, ephemeral=True)
+                    return
 
         # Update in MongoDB
-        updated_counters = update_func()
-        msg = generate_counters_output(updated_counters, fully_unescape)
-        await interaction.response.send_message(
-            f"{field.capitalize()} for counter '{counter}' on character '{character}' set to {value}.\n"
-            f"Counters for character '{character}':\n{msg}",
-            ephemeral=True,
+        success, error, updated_counters = update_func()
+        if not success:
+            await interaction.response.send_message(error, ephemeral=True)
+            return
+        await _send_counter_set_response(
+            interaction, character, counter, field, value, updated_counters
         )
 
     # Add show command directly to avct_group
@@ -208,25 +149,19 @@ def register_character_commands(cog):
             await handle_character_not_found(interaction)
             return
 
-        counters = get_counters_for_character(character_id)
-        if not counters:
+        char_doc = CharacterRepository.find_one({"_id": ObjectId(character_id)})
+        if not char_doc or not char_doc.get("counters"):
             await handle_counter_not_found(interaction)
             return
 
-        # Generate counters output
-        msg = generate_counters_output(counters, fully_unescape)
-
-        # Add health trackers to the bottom of the output
-        char_doc = CharacterRepository.find_one({"_id": ObjectId(character_id)})
-        health_entries = char_doc.get("health", []) if char_doc else []
-        if health_entries:
-            try:
-                msg += _build_health_output(health_entries)
-            except Exception:
-                msg += "\n**Health:**\nCould not display health, invalid values -- remove and re-add health tracker to resolve"
+        # Sections are rendered as the pages showing them are requested
+        sections = character_sheet_sections(char_doc, fully_unescape)
+        if char_doc.get("health"):
+            sections[-1] = _health_section_or_error(sections[-1])
+        pages = LazyPages(sections, header=f"Counters for character '{character}':")
 
         # Set ephemeral based on the public flag (ephemeral=True when public=False)
-        await _send_counter_response(interaction, character, msg, public)
+        await send_pages(interaction, pages, ephemeral=not public)
 
     # Other character commands moved to configav_group's character_group
     @cog.character_group.command(name="list", description="List your characters")
@@ -333,62 +268,8 @@ def register_character_commands(cog):
         if character_id is None:
             await handle_character_not_found(interaction)
             return
-        counters = get_counters_for_character(character_id)
-        target = _get_counter_by_name(counters, counter)
-        if not target:
-            await handle_counter_not_found(interaction)
-            return
-
-        # Check if the counter type is single_number
-        if target.counter_type == CounterTypeEnum.single_number.value:
-            await interaction.response.send_message(
-                "Perm cannot be set on counters of type 'single_number'.",
-                ephemeral=True,
-            )
-            return
-
-        # Check if the counter type is perm_is_maximum_bedlam and new_value < bedlam
-        if target.counter_type == CounterTypeEnum.perm_is_maximum_bedlam.value:
-            if new_value < target.bedlam:
-                await interaction.response.send_message(
-                    f"Perm cannot be set below bedlam ({target.bedlam}).",
-                    ephemeral=True,
-                )
-                return
-
-        # Remove single_number counter with is_exhaustible if value would be 0
-        if (
-            target.counter_type == CounterTypeEnum.single_number.value
-            and getattr(target, "is_exhaustible", False)
-            and new_value <= 0
-        ):
-            from utils import remove_counter
-
-            success, error, details = remove_counter(character_id, counter)
-            if success:
-                msg = details if details else "No remaining counters."
-                await interaction.response.send_message(
-                    f"Counter '{counter}' was removed from character '{character}' because its value reached 0.\nRemaining counters:\n{msg}",
-                    ephemeral=True,
-                )
-            else:
-                await handle_counter_not_found(
-                    interaction
-                ) if error == "Counter not found." else interaction.response.send_message(
-                    error or "Failed to remove counter.", ephemeral=True
-                )
-            return
-
-        await _handle_counter_update(
-            interaction,
-            character,
-            counter,
-            target,
-            "perm",
-            new_value,
-            lambda: _update_counter_in_mongodb(
-                character_id, counter, "perm", target.perm, target
-            ),
+        await _set_counter_value(
+            interaction, character_id, character, counter, "perm", new_value
         )
 
     @cog.character_group.command(
@@ -414,33 +295,8 @@ def register_character_commands(cog):
         if character_id is None:
             await handle_character_not_found(interaction)
             return
-        counters = get_counters_for_character(character_id)
-        target = _get_bedlam_counter(counters, counter)
-        if not target:
-            await interaction.response.send_message(
-                "No perm_is_maximum_bedlam counter found with that name.",
-                ephemeral=True,
-            )
-            return
-
-        # Check if bedlam would exceed perm
-        if new_value > target.perm:
-            await interaction.response.send_message(
-                "Bedlam cannot be greater than perm for this counter type.",
-                ephemeral=True,
-            )
-            return
-
-        await _handle_counter_update(
-            interaction,
-            character,
-            counter,
-            target,
-            "bedlam",
-            new_value,
-            lambda: _update_counter_in_mongodb(
-                character_id, counter, "bedlam", target.bedlam
-            ),
+        await _set_counter_value(
+            interaction, character_id, character, counter, "bedlam", new_value
         )
 
     @cog.avct_group.command(
@@ -455,15 +311,14 @@ def register_character_commands(cog):
             return
 
         from utils import (
-            reset_if_eligible,
-            get_counters_for_character,
+            reset_if_eligible_doc,
+            counters_from_doc,
             fully_unescape,
             generate_counters_output,
         )
 
-        reset_count = reset_if_eligible(character_id)
-        counters = get_counters_for_character(character_id)
-        msg = generate_counters_output(counters, fully_unescape)
+        reset_count, char_doc = reset_if_eligible_doc(character_id)
+        msg = generate_counters_output(counters_from_doc(char_doc), fully_unescape)
         if reset_count > 0:
             await interaction.response.send_message(
                 f"Reset {reset_count} eligible counters for character '{character}'.\n\n{msg}",
@@ -474,3 +329,47 @@ def register_character_commands(cog):
                 f"No eligible counters to reset for character '{character}'.\n\n{msg}",
                 ephemeral=True,
             )
+
+    @cog.avct_group.command(
+        name="reset_all",
+        description="Reset eligible counters on all your characters, or with server on all in this server's parties",
+    )
+    async def reset_all_cmd(interaction: discord.Interaction, server: bool = False):
+        from utils import (
+            get_guild_character_ids,
+            reset_if_eligible_many,
+            fully_unescape,
+        )
+
+        if server:
+            if interaction.guild_id is None:
+                await interaction.response.send_message(
+                    "Server-wide resets can only be run in a server.",
+                    ephemeral=True,
+                )
+                return
+            if not interaction.permissions.manage_guild:
+                await interaction.response.send_message(
+                    "Only members who can manage this server can reset its characters.",
+                    ephemeral=True,
+                )
+                return
+            ids = get_guild_character_ids(str(interaction.guild_id))
+            query = {"_id": {"$in": ids}}
+            target = "the characters in this server's parties"
+        else:
+            query, target = {"user": str(interaction.user.id)}, "your characters"
+        results = reset_if_eligible_many(query)
+        if not results:
+            await interaction.response.send_message(
+                f"No eligible counters to reset on any of {target}.",
+                ephemeral=True,
+            )
+            return
+        lines = [
+            f"{fully_unescape(name)}: {count} counter(s) reset"
+            for name, count in results.values()
+        ]
+        await interaction.response.send_message(
+            "Reset eligible counters:\n" + "\n".join(lines), ephemeral=True
+        )
@@ -1,3 +1,4 @@
+import copy
 import discord
 from utils import (
     get_character_id_by_user_and_name,
@@ -7,24 +8,34 @@ from utils import (
     fully_unescape,
     rename_counter,
     rename_character,
-    update_counter,
+    update_counter_doc,
     handle_character_not_found,
     handle_counter_not_found,
     update_counter_in_db,
     update_counter_comment,
     sanitize_string,
     remove_counter,
+    adjust_character,
+    parse_counter_deltas,
+    generate_character_output,
+    counters_from_doc,
+    get_response_mode,
+    render_counter_change,
+    character_sheet_pages,
+    character_sheet_sections,
+    LazyPages,
+    DELTA_RESPONSES,
 )
-from utils import CharacterRepository
-from bson import ObjectId
-from health import Health
+from health import HealthTypeEnum, DamageEnum
 from .autocomplete import (
     character_name_autocomplete,
     counter_name_autocomplete_for_character,
     category_autocomplete,
+    damage_type_autocomplete,
 )
+from .paging import send_change, send_pages
 from avct_cog import register_command
-from counter import CounterTypeEnum
+from counter import CounterTypeEnum, counter_key
 
 
 @register_command("edit_group")
@@ -91,8 +102,9 @@ def register_edit_commands(cog):
         return target
 
     def _get_counter_by_name(counters, counter_name):
-        """Get a counter by its name from a list of counters."""
-        return next((c for c in counters if c.counter == counter_name), None)
+        """Get a counter by its name, in any case, from a list of counters."""
+        key = counter_key(counter_name)
+        return next((c for c in counters if counter_key(c.counter) == key), None)
 
     def _get_bedlam_counter(counters, counter_name):
         """Get a bedlam counter by its name from a list of counters."""
@@ -100,7 +112,7 @@ def register_edit_commands(cog):
             (
                 c
                 for c in counters
-                if c.counter == counter_name
+                if counter_key(c.counter) == counter_key(counter_name)
                 and c.counter_type == CounterTypeEnum.perm_is_maximum_bedlam.value
             ),
             None,
@@ -111,45 +123,28 @@ def register_edit_commands(cog):
         # Only updates perm and temp fields
         return update_counter_in_db(character_id, counter, "perm", target.perm, target)
 
-    def _build_full_character_output(character_id):
-        from health import HealthTypeEnum
+    def _build_full_character_output(char_doc):
+        """Render a sheet from the document returned by a mutation."""
+        return generate_character_output(char_doc, fully_unescape) if char_doc else ""
 
-        counters = get_counters_for_character(character_id)
-        msg = generate_counters_output(counters, fully_unescape)
-        char_doc = CharacterRepository.find_one({"_id": ObjectId(character_id)})
-        health_entries = char_doc.get("health", []) if char_doc else []
-        if health_entries:
-            # Replicate _build_health_output logic from character_commands.py
-            msg += "\n\n**Health Trackers:**"
-            normal_health = next(
-                (
-                    h
-                    for h in health_entries
-                    if h.get("health_type") == HealthTypeEnum.normal.value
-                ),
-                None,
-            )
-            if normal_health:
-                health_obj = Health(
-                    health_type=normal_health.get("health_type"),
-                    damage=normal_health.get("damage", []),
-                    health_levels=normal_health.get("health_levels", None),
-                )
-                msg += f"\n{health_obj.display(health_entries)}"
-            for h in health_entries:
-                if (
-                    h.get("health_type") != HealthTypeEnum.normal.value
-                    and h.get("health_type") != HealthTypeEnum.chimerical.value
-                ):
-                    health_obj = Health(
-                        health_type=h.get("health_type"),
-                        damage=h.get("damage", []),
-                        health_levels=h.get("health_levels", None),
-                    )
-                    msg += (
-                        f"\nHealth ({health_obj.health_type}):\n{health_obj.display()}"
-                    )
-        return msg
+    async def _send_counter_change(
+        interaction, character, character_id, action_msg, before, counters, full_msg
+    ):
+        """
+        Answer a plus or minus. In delta response mode only the changed counter
+        is rendered, with a button for the sheet; otherwise full_msg() is sent.
+        """
+        mode = get_response_mode(str(interaction.user.id), interaction.guild_id)
+        if mode != DELTA_RESPONSES:
+            await interaction.response.send_message(full_msg(), ephemeral=True)
+            return
+        after = _get_counter_by_name(counters, before.counter)
+        change = render_counter_change(before, after, fully_unescape)
+        await send_change(
+            interaction,
+            f"{action_msg}\n{change}",
+            lambda: character_sheet_pages(character_id, character, fully_unescape),
+        )
 
     # These all stay in the configav edit group which was already defined in avct_cog.py
 
@@ -250,7 +245,12 @@ def register_edit_commands(cog):
                         target.temp = target.perm
 
         # Update in MongoDB
-        counters = _update_counter_in_mongodb(character_id, counter, target)
+        success, error, counters = _update_counter_in_mongodb(
+            character_id, counter, target
+        )
+        if not success:
+            await interaction.response.send_message(error, ephemeral=True)
+            return
 
         # Generate response
         msg = generate_counters_output(counters, fully_unescape)
@@ -402,42 +402,28 @@ def register_edit_commands(cog):
         if not target:
             await handle_counter_not_found(interaction)
             return
-
-        # If increment would result in temp < 0, set both temp and perm to zero
-        if (target.temp + points) < 0:
-            target.temp = 0
-            target.perm = 0
-            counters = _update_counter_in_mongodb(character_id, counter, target)
-            msg = _build_full_character_output(character_id)
-            await interaction.response.send_message(
-                f"Added {points} point(s) to counter '{counter}' on character '{character}'.\n\n"
-                f"{msg}",
-                ephemeral=True,
-            )
-            return
-
-        # For single_number counters, set perm to the same value as temp
-        if target.counter_type == CounterTypeEnum.single_number.value:
-            target.temp += points
-            target.perm = target.temp
-            update_counter_in_db(character_id, counter, "temp", target.temp, target)
-            msg = _build_full_character_output(character_id)
-            await interaction.response.send_message(
-                f"Added {points} point(s) to counter '{counter}' on character '{character}'.\n\n"
-                f"{msg}",
-                ephemeral=True,
+        before = copy.copy(target)
+        action_msg = f"Added {points} point(s) to counter '{counter}' on character '{character}'."
+
+        async def _send_added(char_doc):
+            await _send_counter_change(
+                interaction,
+                character,
+                character_id,
+                action_msg,
+                before,
+                counters_from_doc(char_doc),
+                lambda: f"{action_msg}\n\n{_build_full_character_output(char_doc)}",
             )
-            return
 
-        success, error = update_counter(character_id, counter, "temp", points)
+        # Applied as a delta to the stored counter, so a concurrent change is
+        # not overwritten; single_number counters keep perm equal to temp
+        success, error, char_doc = update_counter_doc(
+            character_id, counter, "temp", points
+        )
 
         if success:
-            msg = _build_full_character_output(character_id)
-            await interaction.response.send_message(
-                f"Added {points} point(s) to counter '{counter}' on character '{character}'.\n\n"
-                f"{msg}",
-                ephemeral=True,
-            )
+            await _send_added(char_doc)
         else:
             if error == "Counter not found.":
                 await handle_counter_not_found(interaction)
@@ -473,6 +459,20 @@ def register_edit_commands(cog):
         if not target:
             await handle_counter_not_found(interaction)
             return
+        before = copy.copy(target)
+        action_msg = f"Removed {points} point(s) from counter '{counter}' on character '{character}'."
+
+        async def _send_removed(counters):
+            await _send_counter_change(
+                interaction,
+                character,
+                character_id,
+                action_msg,
+                before,
+                counters,
+                lambda: f"{action_msg}\nCounters for character '{character}':\n"
+                f"{generate_counters_output(counters, fully_unescape)}",
+            )
 
         # Remove single_number counter with is_exhaustible if value would be 0 after decrement
         if (
@@ -482,10 +482,16 @@ def register_edit_commands(cog):
         ):
             success, error, details = remove_counter(character_id, counter)
             if success:
+                removed_msg = f"Counter '{counter}' was removed from character '{character}' because its value reached 0."
                 msg = details if details else "No remaining counters."
-                await interaction.response.send_message(
-                    f"Counter '{counter}' was removed from character '{character}' because its value reached 0.\nRemaining counters:\n{msg}",
-                    ephemeral=True,
+                await _send_counter_change(
+                    interaction,
+                    character,
+                    character_id,
+                    removed_msg,
+                    before,
+                    [],
+                    lambda: f"{removed_msg}\nRemaining counters:\n{msg}",
                 )
             else:
                 await handle_counter_not_found(
@@ -502,54 +508,99 @@ def register_edit_commands(cog):
                     "Cannot set temp below zero.", ephemeral=True
                 )
                 return
-            # Safe to proceed, update both temp and perm
-            target.temp -= points
-            target.perm = target.temp
-            counters = update_counter_in_db(
-                character_id, counter, "temp", target.temp, target
-            )
-            msg = generate_counters_output(counters, fully_unescape)
+
+        # Reset_Eligible counters (perm_is_maximum with is_resettable) stop at zero
+        clamp = target.counter_type == CounterTypeEnum.perm_is_maximum.value and (
+            getattr(target, "is_resettable", False)
+        )
+        success, error, char_doc = update_counter_doc(
+            character_id, counter, "temp", -points, clamp=clamp
+        )
+        if success:
+            await _send_removed(counters_from_doc(char_doc))
+        else:
+            if error == "Counter not found.":
+                await handle_counter_not_found(interaction)
+            else:
+                await interaction.response.send_message(
+                    error or "Failed to remove points from counter.", ephemeral=True
+                )
+
+    @cog.avct_group.command(
+        name="adjust",
+        description="Adjust several counters and apply damage or healing in one step",
+    )
+    @discord.app_commands.autocomplete(
+        character=character_name_autocomplete,
+        damage_type=damage_type_autocomplete,
+    )
+    async def adjust_cmd(
+        interaction: discord.Interaction,
+        character: str,
+        counters: str = None,  # e.g. "willpower:-1, blood pool:-2"
+        damage_type: str = None,
+        damage: int = 0,
+        heal: int = 0,
+        chimerical: bool = False,
+    ):
+        if damage < 0 or heal < 0:
             await interaction.response.send_message(
-                f"Removed {points} point(s) from counter '{counter}' on character '{character}'.\n"
-                f"Counters for character '{character}':\n{msg}",
-                ephemeral=True,
+                "Damage and heal levels must not be negative.", ephemeral=True
             )
             return
 
-        # --- FIX: Handle Reset_Eligible (perm_is_maximum with is_resettable) ---
-        if target.counter_type == CounterTypeEnum.perm_is_maximum.value and getattr(
-            target, "is_resettable", False
-        ):
-            # Decrement temp, but do not allow below zero
-            new_temp = max(target.temp - points, 0)
-            target.temp = new_temp
-            # Save to DB
-            counters = update_counter_in_db(
-                character_id, counter, "temp", target.temp, target
-            )
-            msg = generate_counters_output(counters, fully_unescape)
+        deltas = {}
+        if counters:
+            deltas, error = parse_counter_deltas(counters)
+            if error:
+                await interaction.response.send_message(error, ephemeral=True)
+                return
+        elif not damage and not heal:
             await interaction.response.send_message(
-                f"Removed {points} point(s) from counter '{counter}' on character '{character}'.\n"
-                f"Counters for character '{character}':\n{msg}",
-                ephemeral=True,
+                "Nothing to adjust.", ephemeral=True
             )
             return
 
-        # Default: update temp
-        success, error = update_counter(character_id, counter, "temp", -points)
-        if success:
-            msg = generate_counters_output(
-                get_counters_for_character(character_id), fully_unescape
-            )
-            await interaction.response.send_message(
-                f"Removed {points} point(s) from counter '{counter}' on character '{character}'.\n"
-                f"Counters for character '{character}':\n{msg}",
-                ephemeral=True,
-            )
-        else:
-            if error == "Counter not found.":
-                await handle_counter_not_found(interaction)
-            else:
+        dt_enum = None
+        if damage:
+            try:
+                dt_enum = DamageEnum(damage_type)
+            except ValueError:
                 await interaction.response.send_message(
-                    error or "Failed to remove points from counter.", ephemeral=True
+                    "Invalid health or damage type.", ephemeral=True
                 )
+                return
+
+        user_id = str(interaction.user.id)
+        character_id = get_character_id_by_user_and_name(user_id, character)
+        if character_id is None:
+            await handle_character_not_found(interaction)
+            return
+
+        health_type = (
+            HealthTypeEnum.chimerical.value
+            if chimerical
+            else HealthTypeEnum.normal.value
+        )
+        success, error, char_doc, notes = adjust_character(
+            character_id,
+            deltas,
+            damage_type=dt_enum,
+            damage_levels=damage,
+            heal_levels=heal,
+            health_type=health_type,
+        )
+        if not success:
+            await interaction.response.send_message(
+                f"No changes were saved. {error}", ephemeral=True
+            )
+            return
+
+        # Paged like /avct show, with what changed on the first page
+        summary = (
+            f"Adjusted character '{character}':\n"
+            + "\n".join(notes)
+            + f"\n\nCounters for character '{character}':"
+        )
+        sections = [summary] + character_sheet_sections(char_doc, fully_unescape)
+        await send_pages(interaction, LazyPages(sections))
@@ -1,100 +1,71 @@
 import discord
 from utils import (
     get_character_id_by_user_and_name,
-    get_counters_for_character,
-    generate_counters_output,
     fully_unescape,
     handle_character_not_found,
     handle_invalid_damage_type,
     handle_health_tracker_not_found,
-    update_health_in_db,  # Add import
+    adjust_character,
+    generate_character_output,
     add_health_level,  # Add import
+    get_response_mode,
+    render_health_change,
+    find_health_entry,
+    character_sheet_pages,
+    DELTA_RESPONSES,
 )
 from utils import CharacterRepository
-from health import Health, HealthTypeEnum, DamageEnum, HealthLevelEnum
+from health import HealthTypeEnum, DamageEnum, HealthLevelEnum
 from bson import ObjectId
 from .autocomplete import (
     character_name_autocomplete,
     damage_type_autocomplete,
 )
+from .paging import send_change
 from avct_cog import register_command
 
 
 @register_command("avct_group")
 def register_health_commands(cog):
     # Helper functions
-    def _get_character_document(character_id):
-        """Get the character document from the database."""
-        return CharacterRepository.find_one({"_id": ObjectId(character_id)})
-
-    def _get_health_tracker(health_list, health_type):
-        """Find and return a specific health tracker from the list."""
-        return next(
-            (h for h in health_list if h.get("health_type") == health_type), None
-        )
-
-    def _create_health_object(health_dict):
-        """Create a Health object from a dictionary."""
-        return Health(
-            health_type=health_dict.get("health_type"),
-            damage=health_dict.get("damage", []),
-            health_levels=health_dict.get("health_levels", None),
-        )
-
-    # Deprecated: use update_health_in_db from utils
-    def _update_health_in_database(character_id, health_list, health_type, damage):
-        """Update the health tracker in the database."""
-        update_health_in_db(character_id, health_type, damage)
-
     def _health_type_display(chimerical):
         return "chimerical" if chimerical else "normal"
 
-    async def _send_health_response(interaction, character, msg, action_msg):
-        await interaction.response.send_message(
-            f"{action_msg}\n\nCounters for character '{character}':\n{msg}",
-            ephemeral=True,
+    async def _send_adjust_error(interaction, error):
+        if error == "Health tracker not found for this character and type.":
+            await handle_health_tracker_not_found(interaction)
+        else:
+            await interaction.response.send_message(error, ephemeral=True)
+
+    def _tracker_before_change(interaction):
+        """
+        Return a dict for adjust_character to store the tracker it changes in,
+        as it read it, if the response shows only the change (delta response
+        mode), else None.
+        """
+        mode = get_response_mode(str(interaction.user.id), interaction.guild_id)
+        return {} if mode == DELTA_RESPONSES else None
+
+    async def _send_health_response(
+        interaction, character, character_id, char_doc, before, action_msg
+    ):
+        after = find_health_entry(char_doc, before["health_type"]) if before else None
+        if after is None:
+            msg = _build_full_character_output(char_doc)
+            await interaction.response.send_message(
+                f"{action_msg}\n\nCounters for character '{character}':\n{msg}",
+                ephemeral=True,
+            )
+            return
+        await send_change(
+            interaction,
+            f"{action_msg}\n{render_health_change(before, after)}",
+            lambda: character_sheet_pages(character_id, character, fully_unescape),
         )
 
-    def _build_full_character_output(character_id):
-        from utils import CharacterRepository
-        from bson import ObjectId
-        from health import Health, HealthTypeEnum
-
-        counters = get_counters_for_character(character_id)
-        msg = generate_counters_output(counters, fully_unescape)
-        char_doc = CharacterRepository.find_one({"_id": ObjectId(character_id)})
-        health_entries = char_doc.get("health", []) if char_doc else []
-        if health_entries:
-            msg += "\n\n**Health Trackers:**"
-            normal_health = next(
-                (
-                    h
-                    for h in health_entries
-                    if h.get("health_type") == HealthTypeEnum.normal.value
-                ),
-                None,
-            )
-            if normal_health:
-                health_obj = Health(
-                    health_type=normal_health.get("health_type"),
-                    damage=normal_health.get("damage", []),
-                    health_levels=normal_health.get("health_levels", None),
-                )
-                msg += f"\n{health_obj.display(health_entries)}"
-            for h in health_entries:
-                if (
-                    h.get("health_type") != HealthTypeEnum.normal.value
-                    and h.get("health_type") != HealthTypeEnum.chimerical.value
-                ):
-                    health_obj = Health(
-                        health_type=h.get("health_type"),
-                        damage=h.get("damage", []),
-                        health_levels=h.get("health_levels", None),
-                    )
-                    msg += (
-                        f"\nHealth ({health_obj.health_type}):\n{health_obj.display()}"
-                    )
-        return msg
+    def _build_full_character_output(char_doc):
+        """Render a sheet from the document returned by a mutation."""
+        return generate_character_output(char_doc, fully_unescape) if char_doc else ""
 
     # Modified damage command moved directly to avct_group
     @cog.avct_group.command(
@@ -130,34 +101,35 @@ def register_health_commands(cog):
             await handle_invalid_damage_type(interaction)
             return
 
-        char_doc = _get_character_document(character_id)
-        health_list = char_doc.get("health", [])
-
-        health_obj_dict = _get_health_tracker(health_list, health_type)
-        if not health_obj_dict:
-            await handle_health_tracker_not_found(interaction)
-            return
-
-        # Create health object and add damage
-        health_obj = _create_health_object(health_obj_dict)
-        damage_msg = health_obj.add_damage(levels, dt_enum)
-
-        # Update health in MongoDB
-        _update_health_in_database(
-            character_id, health_list, health_type, health_obj.damage
+        before = _tracker_before_change(interaction)
+        # Read-modify-write of the tracker, retried if another command wins the race
+        success, error, char_doc, notes = adjust_character(
+            character_id,
+            {},
+            damage_type=dt_enum,
+            damage_levels=levels,
+            health_type=health_type,
+            before=before,
         )
-
-        # Generate the same output as character counters
-        msg = _build_full_character_output(character_id)
+        if not success:
+            await _send_adjust_error(interaction, error)
+            return
 
         action_msg = (
-            damage_msg
-            if damage_msg
+            notes[-1]
+            if notes
             else (
                 f"Added {levels} levels of {damage_type} damage to {_health_type_display(chimerical)} health."
             )
         )
-        await _send_health_response(interaction, character, msg, action_msg)
+        await _send_health_response(
+            interaction,
+            character,
+            character_id,
+            char_doc,
+            (before or {}).get(health_type),
+            action_msg,
+        )
 
     # Modified heal command to default to normal health type
     @cog.avct_group.command(
@@ -184,28 +156,28 @@ def register_health_commands(cog):
             else HealthTypeEnum.normal.value
         )
 
-        char_doc = _get_character_document(character_id)
-        health_list = char_doc.get("health", [])
-
-        health_obj_dict = _get_health_tracker(health_list, health_type)
-        if not health_obj_dict:
-            await handle_health_tracker_not_found(interaction)
-            return
-
-        # Create health object and remove damage
-        health_obj = _create_health_object(health_obj_dict)
-        health_obj.remove_damage(levels)
-
-        # Update health in MongoDB
-        _update_health_in_database(
-            character_id, health_list, health_type, health_obj.damage
+        before = _tracker_before_change(interaction)
+        # Read-modify-write of the tracker, retried if another command wins the race
+        success, error, char_doc, _ = adjust_character(
+            character_id,
+            {},
+            heal_levels=levels,
+            health_type=health_type,
+            before=before,
         )
-
-        # Generate the same output as character counters
-        msg = _build_full_character_output(character_id)
+        if not success:
+            await _send_adjust_error(interaction, error)
+            return
 
         action_msg = f"Healed {levels} levels of damage from {_health_type_display(chimerical)} health."
-        await _send_health_response(interaction, character, msg, action_msg)
+        await _send_health_response(
+            interaction,
+            character,
+            character_id,
+            char_doc,
+            (before or {}).get(health_type),
+            action_msg,
+        )
 
 
 async def health_level_type_autocomplete(
@@ -263,18 +235,6 @@ def register_configav_health_commands(cog):
         success = False
         for tracker in health_list:
             tracker_type = tracker.get("health_type")
-            levels = tracker.get("health_levels", [])
-            levels.append(health_level_type)
-
-            # Sort the health levels based on the predefined order in HealthLevelEnum
-            enum_order = [e.value for e in HealthLevelEnum]
-            tracker["health_levels"] = sorted(
-                levels,
-                key=lambda x: enum_order.index(x)
-                if x in enum_order
-                else len(enum_order),
-            )
-
             tracker_success, error = add_health_level(
                 character_id, tracker_type, health_level_type
             )
@@ -0,0 +1,62 @@
+import discord
+from utils import (
+    LazyPages,
+    counter_display_names,
+    describe_character_history,
+    get_character_id_by_user_and_name,
+    get_counters_for_character,
+    undo_last_change,
+    handle_character_not_found,
+)
+from events import describe
+from .autocomplete import character_name_autocomplete
+from .paging import send_pages
+from avct_cog import register_command
+
+
+@register_command("avct_group")
+def register_history_commands(cog):
+    @cog.avct_group.command(
+        name="undo",
+        description="Revert the last counter or health change of a character",
+    )
+    @discord.app_commands.autocomplete(character=character_name_autocomplete)
+    async def undo(interaction: discord.Interaction, character: str):
+        character_id = get_character_id_by_user_and_name(
+            str(interaction.user.id), character
+        )
+        if character_id is None:
+            await handle_character_not_found(interaction)
+            return
+        success, error, event = undo_last_change(character_id)
+        if not success:
+            await interaction.response.send_message(error, ephemeral=True)
+            return
+        names = counter_display_names(get_counters_for_character(character_id))
+        await interaction.response.send_message(
+            f"Undid {describe(event, names)}", ephemeral=True
+        )
+
+    @cog.avct_group.command(
+        name="history",
+        description="Show the recent counter and health changes of a character",
+    )
+    @discord.app_commands.autocomplete(character=character_name_autocomplete)
+    async def history(interaction: discord.Interaction, character: str):
+        character_id = get_character_id_by_user_and_name(
+            str(interaction.user.id), character
+        )
+        if character_id is None:
+            await handle_character_not_found(interaction)
+            return
+        lines = describe_character_history(character_id)
+        if not lines:
+            await interaction.response.send_message(
+                f"No recorded changes for '{character}'.", ephemeral=True
+            )
+            return
+        # One section, so events stay one per line and pages break between them
+        pages = LazyPages(
+            ["\n".join(lines)], header=f"Recent changes for '{character}':"
+        )
+        await send_pages(interaction, pages)
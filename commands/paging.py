@@ -0,0 +1,104 @@
+import discord
+
+# Seconds after the last page turn before the buttons stop responding
+PAGE_VIEW_TIMEOUT = 600
+
+
+class PageView(discord.ui.View):
+    """
+    Previous/next buttons for a message showing LazyPages. Pages after the
+    first are rendered when their button is pressed.
+    """
+
+    def __init__(self, pages, owner_id, timeout=PAGE_VIEW_TIMEOUT):
+        super().__init__(timeout=timeout)
+        self.pages = pages
+        self.owner_id = owner_id
+        self.index = 0
+        self._sync_buttons()
+
+    def _sync_buttons(self):
+        self.previous_page.disabled = self.index == 0
+        self.next_page.disabled = not self.pages.has_next(self.index)
+        self.position.label = self.pages.label(self.index)
+
+    async def interaction_check(self, interaction: discord.Interaction):
+        if interaction.user.id != self.owner_id:
+            await interaction.response.send_message(
+                "Only the person who ran this command can turn its pages.",
+                ephemeral=True,
+            )
+            return False
+        return True
+
+    async def _show(self, interaction: discord.Interaction, index):
+        self.index = self.pages.last_index(max(0, index))
+        content = self.pages.page(self.index)
+        self._sync_buttons()
+        await interaction.response.edit_message(content=content, view=self)
+
+    @discord.ui.button(label="◀", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button):
+        await self._show(interaction, self.index - 1)
+
+    @discord.ui.button(label="1", style=discord.ButtonStyle.secondary, disabled=True)
+    async def position(self, interaction: discord.Interaction, button):
+        pass
+
+    @discord.ui.button(label="▶", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button):
+        await self._show(interaction, self.index + 1)
+
+
+async def send_pages(interaction: discord.Interaction, pages, ephemeral=True):
+    """
+    Send the first of pages as the response, with page buttons if there are more.
+    """
+    first = pages.page(0)
+    if not pages.has_next(0):
+        await interaction.response.send_message(first, ephemeral=ephemeral)
+        return
+    view = PageView(pages, interaction.user.id)
+    await interaction.response.send_message(first, view=view, ephemeral=ephemeral)
+
+
+class FullSheetView(discord.ui.View):
+    """
+    A "Show full sheet" button under a short response. The sheet is loaded and
+    rendered only when the button is pressed; load_pages returns LazyPages for
+    it, or None if the character is gone.
+    """
+
+    def __init__(self, load_pages, owner_id, timeout=PAGE_VIEW_TIMEOUT):
+        super().__init__(timeout=timeout)
+        self.load_pages = load_pages
+        self.owner_id = owner_id
+
+    async def interaction_check(self, interaction: discord.Interaction):
+        if interaction.user.id != self.owner_id:
+            await interaction.response.send_message(
+                "Only the person who ran this command can show the sheet.",
+                ephemeral=True,
+            )
+            return False
+        return True
+
+    @discord.ui.button(label="Show full sheet", style=discord.ButtonStyle.secondary)
+    async def show_full(self, interaction: discord.Interaction, button):
+        pages = self.load_pages()
+        if pages is None:
+            await interaction.response.edit_message(
+                content="Character not found.", view=None
+            )
+            return
+        view = PageView(pages, self.owner_id) if pages.has_next(0) else None
+        self.stop()
+        await interaction.response.edit_message(content=pages.page(0), view=view)
+
+
+async def send_change(interaction: discord.Interaction, content, load_pages):
+    """
+    Send a short ephemeral response with a button showing the full sheet.
+    """
+    view = FullSheetView(load_pages, interaction.user.id)
+    await interaction.response.send_message(content, view=view, ephemeral=True)
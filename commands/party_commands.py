@@ -0,0 +1,180 @@
+import asyncio
+import discord
+from utils import (
+    get_character_id_by_user_and_name,
+    get_parties_for_guild,
+    get_party,
+    create_party,
+    add_character_to_party,
+    remove_character_from_party,
+    get_party_character_docs,
+    generate_character_output,
+    paginate_sections,
+    reset_if_eligible_many,
+    fully_unescape,
+    handle_character_not_found,
+)
+from .autocomplete import character_name_autocomplete
+from avct_cog import register_command
+
+
+async def party_name_autocomplete(interaction: discord.Interaction, current: str):
+    if interaction.guild_id is None:
+        return []
+    parties = get_parties_for_guild(str(interaction.guild_id))
+    names = [
+        fully_unescape(p["name"])
+        for p in parties
+        if current.lower() in fully_unescape(p["name"]).lower()
+    ]
+    unique_names = list(dict.fromkeys(names))[:25]
+    return [discord.app_commands.Choice(name=name, value=name) for name in unique_names]
+
+
+@register_command("party_group")
+def register_party_commands(cog):
+    # Helper functions
+    async def _require_guild(interaction):
+        """Parties are scoped to a server; reject DMs."""
+        if interaction.guild_id is None:
+            await interaction.response.send_message(
+                "Parties can only be used in a server.", ephemeral=True
+            )
+            return None
+        return str(interaction.guild_id)
+
+    async def _send_pages(interaction, pages, public):
+        """Send the first page as the response and the rest as followups."""
+        for idx, page in enumerate(pages):
+            if idx == 0:
+                await interaction.response.send_message(page, ephemeral=not public)
+            else:
+                await interaction.followup.send(page, ephemeral=not public)
+
+    async def _render_member(doc):
+        sheet = await asyncio.to_thread(generate_character_output, doc, fully_unescape)
+        return f"__**{fully_unescape(doc.get('character'))}**__\n{sheet}"
+
+    @cog.party_group.command(name="create", description="Create a party in this server")
+    async def party_create(interaction: discord.Interaction, party: str):
+        guild_id = await _require_guild(interaction)
+        if guild_id is None:
+            return
+        success, error = create_party(guild_id, party, str(interaction.user.id))
+        if success:
+            await interaction.response.send_message(
+                f"Party '{party}' created.", ephemeral=True
+            )
+        else:
+            await interaction.response.send_message(
+                error or "Failed to create party.", ephemeral=True
+            )
+
+    @cog.party_group.command(
+        name="join", description="Add one of your characters to a party"
+    )
+    @discord.app_commands.autocomplete(
+        party=party_name_autocomplete, character=character_name_autocomplete
+    )
+    async def party_join(interaction: discord.Interaction, party: str, character: str):
+        guild_id = await _require_guild(interaction)
+        if guild_id is None:
+            return
+        character_id = get_character_id_by_user_and_name(
+            str(interaction.user.id), character
+        )
+        if character_id is None:
+            await handle_character_not_found(interaction)
+            return
+        success, error = add_character_to_party(guild_id, party, character_id)
+        if success:
+            await interaction.response.send_message(
+                f"Character '{character}' joined party '{party}'.", ephemeral=True
+            )
+        else:
+            await interaction.response.send_message(
+                error or "Failed to join party.", ephemeral=True
+            )
+
+    @cog.party_group.command(
+        name="leave", description="Remove one of your characters from a party"
+    )
+    @discord.app_commands.autocomplete(
+        party=party_name_autocomplete, character=character_name_autocomplete
+    )
+    async def party_leave(interaction: discord.Interaction, party: str, character: str):
+        guild_id = await _require_guild(interaction)
+        if guild_id is None:
+            return
+        character_id = get_character_id_by_user_and_name(
+            str(interaction.user.id), character
+        )
+        if character_id is None:
+            await handle_character_not_found(interaction)
+            return
+        success, error = remove_character_from_party(guild_id, party, character_id)
+        if success:
+            await interaction.response.send_message(
+                f"Character '{character}' left party '{party}'.", ephemeral=True
+            )
+        else:
+            await interaction.response.send_message(
+                error or "Failed to leave party.", ephemeral=True
+            )
+
+    @cog.party_group.command(name="show", description="Show every character in a party")
+    @discord.app_commands.autocomplete(party=party_name_autocomplete)
+    async def party_show(
+        interaction: discord.Interaction, party: str, public: bool = False
+    ):
+        guild_id = await _require_guild(interaction)
+        if guild_id is None:
+            return
+        party_doc = get_party(guild_id, party)
+        if not party_doc:
+            await interaction.response.send_message("Party not found.", ephemeral=True)
+            return
+        docs = get_party_character_docs(party_doc)
+        if not docs:
+            await interaction.response.send_message(
+                f"Party '{party}' has no characters.", ephemeral=True
+            )
+            return
+        sections = await asyncio.gather(*(_render_member(d) for d in docs))
+        pages = paginate_sections([f"**Party '{party}'**", *sections])
+        await _send_pages(interaction, pages, public)
+
+    @cog.party_group.command(
+        name="reset_eligible",
+        description="Reset eligible counters for every character in a party (party owner only)",
+    )
+    @discord.app_commands.autocomplete(party=party_name_autocomplete)
+    async def party_reset_eligible(interaction: discord.Interaction, party: str):
+        guild_id = await _require_guild(interaction)
+        if guild_id is None:
+            return
+        party_doc = get_party(guild_id, party)
+        if not party_doc:
+            await interaction.response.send_message("Party not found.", ephemeral=True)
+            return
+        if party_doc.get("owner") != str(interaction.user.id):
+            await interaction.response.send_message(
+                "Only the party owner can reset the whole party.", ephemeral=True
+            )
+            return
+        results = reset_if_eligible_many(
+            {"_id": {"$in": party_doc.get("characters", [])}}
+        )
+        if not results:
+            await interaction.response.send_message(
+                f"No eligible counters to reset in party '{party}'.", ephemeral=True
+            )
+            return
+        lines = [
+            f"{fully_unescape(name)}: {count} counter(s) reset"
+            for name, count in results.values()
+        ]
+        await interaction.response.send_message(
+            f"Reset eligible counters in party '{party}':\n" + "\n".join(lines),
+            ephemeral=True,
+        )
@@ -0,0 +1,78 @@
+import asyncio
+import discord
+from bson import ObjectId
+from utils import (
+    CharacterRepository,
+    get_character_id_by_user_and_name,
+    add_pin,
+    remove_pins,
+    handle_character_not_found,
+)
+from pins import render_pinned_sheet
+from .autocomplete import character_name_autocomplete
+from avct_cog import register_command
+
+
+@register_command("avct_group")
+def register_pin_commands(cog):
+    @cog.avct_group.command(
+        name="pin",
+        description="Post a character sheet in this channel that updates itself",
+    )
+    @discord.app_commands.autocomplete(character=character_name_autocomplete)
+    async def pin_character(interaction: discord.Interaction, character: str):
+        if interaction.guild_id is None:
+            await interaction.response.send_message(
+                "Sheets can only be pinned in a server channel.", ephemeral=True
+            )
+            return
+        character_id = get_character_id_by_user_and_name(
+            str(interaction.user.id), character
+        )
+        if character_id is None:
+            await handle_character_not_found(interaction)
+            return
+        char_doc = CharacterRepository.find_one({"_id": ObjectId(character_id)})
+        content = await asyncio.to_thread(render_pinned_sheet, char_doc)
+        await interaction.response.send_message(content)
+        message = await interaction.original_response()
+
+        pin = {
+            "character_id": character_id,
+            "guild_id": str(interaction.guild_id),
+            "channel_id": str(interaction.channel_id),
+            "message_id": str(message.id),
+        }
+        previous = add_pin(**pin)
+        if previous:
+            # Only one live sheet per character per channel
+            cog.pins.untrack(previous)
+        cog.pins.track(pin)
+        cog.pins.remember(pin["message_id"], content)
+
+    @cog.avct_group.command(
+        name="unpin",
+        description="Stop updating a character's pinned sheet in this channel",
+    )
+    @discord.app_commands.autocomplete(character=character_name_autocomplete)
+    async def unpin_character(interaction: discord.Interaction, character: str):
+        character_id = get_character_id_by_user_and_name(
+            str(interaction.user.id), character
+        )
+        if character_id is None:
+            await handle_character_not_found(interaction)
+            return
+        removed = remove_pins(
+            {"character_id": character_id, "channel_id": str(interaction.channel_id)}
+        )
+        for pin in removed:
+            cog.pins.untrack(pin)
+        if removed:
+            await interaction.response.send_message(
+                f"Character '{character}' is no longer pinned here.", ephemeral=True
+            )
+        else:
+            await interaction.response.send_message(
+                f"Character '{character}' has no pinned sheet in this channel.",
+                ephemeral=True,
+            )
@@ -0,0 +1,55 @@
+import discord
+from discord import app_commands
+from utils import RESPONSE_MODES, set_response_mode
+from avct_cog import register_command
+
+# Clears a setting so the server's (or the bot's) default applies again
+DEFAULT_MODE = "default"
+
+
+async def response_mode_autocomplete(interaction: discord.Interaction, current: str):
+    return [
+        app_commands.Choice(name=mode, value=mode)
+        for mode in (*RESPONSE_MODES, DEFAULT_MODE)
+        if current.lower() in mode
+    ]
+
+
+@register_command("avct_group")
+def register_response_commands(cog):
+    @cog.avct_group.command(
+        name="responses",
+        description="Choose whether plus/minus/damage/heal show the whole sheet or only the change",
+    )
+    @app_commands.autocomplete(mode=response_mode_autocomplete)
+    async def responses(
+        interaction: discord.Interaction, mode: str, server: bool = False
+    ):
+        if server:
+            if interaction.guild_id is None:
+                await interaction.response.send_message(
+                    "Server response modes can only be set in a server.",
+                    ephemeral=True,
+                )
+                return
+            if not interaction.permissions.manage_guild:
+                await interaction.response.send_message(
+                    "Only members who can manage this server can set its response mode.",
+                    ephemeral=True,
+                )
+                return
+            scope, scope_id, target = "guild", interaction.guild_id, "this server"
+        else:
+            scope, scope_id, target = "user", interaction.user.id, "you"
+
+        success, error = set_response_mode(
+            scope, str(scope_id), None if mode == DEFAULT_MODE else mode
+        )
+        if not success:
+            await interaction.response.send_message(error, ephemeral=True)
+            return
+        if mode == DEFAULT_MODE:
+            message = f"Response mode for {target} reset to the default."
+        else:
+            message = f"Response mode for {target} set to '{mode}'."
+        await interaction.response.send_message(message, ephemeral=True)
@@ -8,3 +8,64 @@ MAX_COUNTERS_PER_CHARACTER = int(os.getenv("MAX_COUNTERS_PER_CHARACTER"))
 MAX_FIELD_LENGTH = int(os.getenv("MAX_FIELD_LENGTH"))
 MAX_COMMENT_LENGTH = int(os.getenv("MAX_COMMENT_LENGTH"))
 DISPLAY_MODE = os.getenv("DISPLAY_MODE") == "pretty"
+# Emoji in pretty displays: "shortcode" (:stop_button:) or "unicode", which
+# is several times shorter (see symbols.py)
+EMOJI_STYLE = os.getenv("EMOJI_STYLE", "shortcode").lower()
+# Storage backend: "mongo" (default) or "sqlite" for small deployments
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "mongo").lower()
+SQLITE_PATH = os.getenv("SQLITE_PATH", "avct.sqlite3")
+# Layout for new characters' counters: "list" (array) or "map" (keyed by
+# canonical name, for single-counter updates by path). Ignored by SQLite.
+COUNTER_LAYOUT = os.getenv("COUNTER_LAYOUT", "list").lower()
+
+# Sharding: SHARD_COUNT=0 asks Discord for the recommended count
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "0"))
+CLUSTER_WORKERS = int(os.getenv("CLUSTER_WORKERS", "1"))
+CLUSTER_STATE_DIR = os.getenv("CLUSTER_STATE_DIR", ".cluster")
+METRICS_INTERVAL = int(os.getenv("METRICS_INTERVAL", "60"))
+# Where python main.py writes its metrics every METRICS_INTERVAL seconds; off unless set
+METRICS_PATH = os.getenv("METRICS_PATH", "")
+
+# In-process caches; a size of 0 disables the cache
+CHARACTER_CACHE_SIZE = int(os.getenv("CHARACTER_CACHE_SIZE", "1024"))
+AUTOCOMPLETE_CACHE_SIZE = int(os.getenv("AUTOCOMPLETE_CACHE_SIZE", "1024"))
+AUTOCOMPLETE_CACHE_TTL = float(os.getenv("AUTOCOMPLETE_CACHE_TTL", "30"))
+RENDER_CACHE_SIZE = int(os.getenv("RENDER_CACHE_SIZE", "512"))
+SETTINGS_CACHE_TTL = float(os.getenv("SETTINGS_CACHE_TTL", "30"))
+# Seconds between version checks when change streams are unavailable
+CACHE_POLL_INTERVAL = float(os.getenv("CACHE_POLL_INTERVAL", "5"))
+# Seconds to coalesce character changes before editing a pinned sheet
+PIN_EDIT_DEBOUNCE = float(os.getenv("PIN_EDIT_DEBOUNCE", "2"))
+# Optimistic concurrency: retries of a read-modify-write that lost a race
+OCC_MAX_RETRIES = int(os.getenv("OCC_MAX_RETRIES", "5"))
+# Base backoff in seconds, doubled on every retry (with full jitter)
+OCC_BACKOFF = float(os.getenv("OCC_BACKOFF", "0.01"))
+# Event-sourced counters (see events.py): changes are appended to an event
+# log that is compacted into the character every EVENT_COMPACT_INTERVAL seconds
+EVENT_LOG = os.getenv("EVENT_LOG", "false").lower() == "true"
+EVENT_COMPACT_INTERVAL = float(os.getenv("EVENT_COMPACT_INTERVAL", "60"))
+# Events a character may accumulate before a change compacts it immediately
+EVENT_TAIL_LIMIT = int(os.getenv("EVENT_TAIL_LIMIT", "32"))
+# Local write-ahead journal for character writes while MongoDB is slow or down
+# (see journal.py); writes taking longer than WRITE_JOURNAL_TIMEOUT are journaled
+WRITE_JOURNAL = os.getenv("WRITE_JOURNAL", "false").lower() == "true"
+WRITE_JOURNAL_PATH = os.getenv("WRITE_JOURNAL_PATH", "write_journal.sqlite3")
+WRITE_JOURNAL_TIMEOUT = float(os.getenv("WRITE_JOURNAL_TIMEOUT", "0.5"))
+WRITE_JOURNAL_FLUSH_INTERVAL = float(os.getenv("WRITE_JOURNAL_FLUSH_INTERVAL", "1"))
+# How plus/minus/damage/heal answer: "full" sends the whole sheet, "delta" only
+# the changed line with a button for the sheet. Users and servers can override
+# it with /avct responses.
+RESPONSE_MODE = os.getenv("RESPONSE_MODE", "full").lower()
+# Anonymized command traces for benchmarks/replay.py (see traces.py); empty disables
+TRACE_PATH = os.getenv("TRACE_PATH", "")
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1"))
+TRACE_SALT = os.getenv("TRACE_SALT", "")
+# Cache warmup after restarts (see warmup.py): up to WARMUP_SIZE recently active
+# characters and users are saved to WARMUP_PATH and prefetched on startup for at
+# most WARMUP_BUDGET seconds. python main.py only does so when WARMUP_PATH is
+# set; clustered workers keep their files in CLUSTER_STATE_DIR. A size of 0
+# disables it everywhere.
+WARMUP_PATH = os.getenv("WARMUP_PATH", "")
+WARMUP_SIZE = int(os.getenv("WARMUP_SIZE", "200"))
+WARMUP_BUDGET = float(os.getenv("WARMUP_BUDGET", "5"))
+WARMUP_SAVE_INTERVAL = float(os.getenv("WARMUP_SAVE_INTERVAL", "300"))
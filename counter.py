@@ -1,5 +1,8 @@
 import enum
 
+from names import canonical_name
+from symbols import SHORTCODE, emoji
+
 
 class UserCharacter:
     def __init__(self, user, character, counters=None, health=None, id=None):
@@ -142,10 +145,19 @@ class Counter:
             is_exhaustible=d.get("is_exhaustible", None),
         )
 
-    def generate_display(self, fully_unescape_func, display_pretty):
+    def to_dict(self):
+        """
+        Return the fields stored for this counter (bedlam_error is not stored).
+        """
+        return {k: v for k, v in self.__dict__.items() if k != "bedlam_error"}
+
+    def generate_display(
+        self, fully_unescape_func, display_pretty, emoji_style=SHORTCODE
+    ):
         """
         Generate a text representation for a counter.
-        If pretty is True, format according to counter_type.
+        If pretty is True, format according to counter_type, drawing emoji in
+        emoji_style (see symbols.py).
         """
         counter_name = (
             self.counter
@@ -168,7 +180,7 @@ class Counter:
         if getattr(self, "force_unpretty", False):
             return self.generate_display_basic(fully_unescape_func)
         if display_pretty:
-            return self.generate_display_pretty(fully_unescape_func)
+            return self.generate_display_pretty(fully_unescape_func, emoji_style)
         return self.generate_display_basic(fully_unescape_func)
 
     def generate_display_basic(self, fully_unescape_func):
@@ -186,23 +198,26 @@ class Counter:
             base = f"{base}\n-# {fully_unescape_func(self.comment)}"
         return base
 
-    def generate_display_pretty(self, fully_unescape_func):
+    def generate_display_pretty(self, fully_unescape_func, emoji_style=SHORTCODE):
         """
         Generate a prettier display for counters with visual representations using emoji.
+        emoji_style selects shortcodes or Unicode emoji (see symbols.py).
 
         Returns:
             str: A multi-line string with counter name and visual representation.
         """
         # Get the unescaped counter name for display
         counter_name = fully_unescape_func(self.counter)
+        filled_mark = emoji("asterisk", emoji_style)
+        empty_mark = emoji("stop_button", emoji_style)
 
         # Only handle counters with perm <= 15
         if self.perm > 15:
             return self.generate_display_basic(fully_unescape_func)
         # Handle perm_not_maximum type counters
         elif self.counter_type == CounterTypeEnum.perm_not_maximum.value:
-            stop_buttons = " ".join([":stop_button:"] * self.perm)
-            negative_marks = " ".join([":asterisk:"] * self.temp)
+            stop_buttons = " ".join([empty_mark] * self.perm)
+            negative_marks = " ".join([filled_mark] * self.temp)
             pretty = f"{counter_name}\n{stop_buttons}\n{negative_marks}"
         # Handle perm_is_maximum type counters
         elif self.counter_type == CounterTypeEnum.perm_is_maximum.value:
@@ -210,8 +225,8 @@ class Counter:
             filled = min(self.temp, self.perm)  # Ensure we don't exceed perm
             unfilled = self.perm - filled
 
-            filled_squares = " ".join([":asterisk:"] * filled)
-            unfilled_squares = " ".join([":stop_button:"] * unfilled)
+            filled_squares = " ".join([filled_mark] * filled)
+            unfilled_squares = " ".join([empty_mark] * unfilled)
 
             squares = f"{filled_squares}{' ' if filled > 0 and unfilled > 0 else ''}{unfilled_squares}"
             pretty = f"{counter_name}\n{squares}"
@@ -232,18 +247,20 @@ class Counter:
             squares = []
             for status in status_list:
                 if not status["spent"] and not status["bedlam"]:
-                    squares.append(":asterisk:")
+                    squares.append(filled_mark)
                 elif status["spent"] and not status["bedlam"]:
-                    squares.append(":stop_button:")
+                    squares.append(empty_mark)
                 elif not status["spent"] and status["bedlam"]:
-                    squares.append(":b:")
+                    squares.append(emoji("b", emoji_style))
                 else:  # spent and bedlam
-                    squares.append(":red_square:")
+                    squares.append(emoji("red_square", emoji_style))
 
             pretty = f"{counter_name}\n{' '.join(squares)}"
         # Default case for other counter types
         elif self.counter_type == CounterTypeEnum.single_number.value:
-            negative_marks = " ".join([":large_blue_diamond:"] * self.temp)
+            negative_marks = " ".join(
+                [emoji("large_blue_diamond", emoji_style)] * self.temp
+            )
             pretty = f"{counter_name}\n{negative_marks}"
         else:
             return self.generate_display(fully_unescape_func, False)
@@ -282,6 +299,42 @@ class Counter:
             return True, None
 
 
+# Map layout: counters stored as {counter_key: counter}, each with its display order
+COUNTER_ORDER_FIELD = "order"
+
+
+def counter_key(name):
+    """
+    Return the key a counter is stored under in the map layout: its canonical
+    name lower-cased (counter names are unique regardless of case), with the
+    characters MongoDB does not allow in field names percent-encoded.
+    """
+    key = canonical_name(name).lower()
+    return key.replace("%", "%25").replace(".", "%2E").replace("$", "%24")
+
+
+def counters_to_map(counters):
+    """
+    Return a dict of counter dicts keyed by counter_key, each numbered with its
+    position in the list.
+    Raises ValueError if two counters share a key.
+    """
+    counter_map = {}
+    for position, c in enumerate(counters):
+        key = counter_key(c["counter"])
+        if key in counter_map:
+            raise ValueError(f"Duplicate counter name: {c['counter']}")
+        counter_map[key] = dict(c, **{COUNTER_ORDER_FIELD: position})
+    return counter_map
+
+
+def counters_from_map(counter_map):
+    """
+    Return the counters of a map-layout document as a list in display order.
+    """
+    return sorted(counter_map.values(), key=lambda c: c.get(COUNTER_ORDER_FIELD, 0))
+
+
 class CounterFactory:
     @staticmethod
     def from_dict(data):
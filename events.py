@@ -0,0 +1,149 @@
+"""
+Event-sourced counter and health changes (EVENT_LOG=true).
+
+Plus/minus, perm, bedlam, damage and heal append a small event to the
+character document's event_tail instead of rewriting its counters:
+
+    {"seq": 7, "op": "temp", "at": 1700000000.0,
+     "set": {"counters": {"willpower": {"temp": 3}}},
+     "prev": {"counters": {"willpower": {"temp": 4}}}}
+
+"set" holds the values the change wrote and "prev" the values it replaced,
+keyed by counter_key (counters) or health_type (health). The counters and
+health stored on the document are a snapshot; readers apply the tail on top
+of it. Compaction folds the tail into the snapshot and moves the events to
+the counter_events collection, which keeps the full history for audit and
+undo. Compaction runs on a schedule, before any other write to the counters
+or health, and whenever a tail reaches EVENT_TAIL_LIMIT events, so
+reconstructing a character never replays more than that.
+
+The tail lives in the document rather than going straight to counter_events
+so that an append is one atomic, version-conditional update like every
+other write (see utils.retry_on_conflict).
+"""
+
+import threading
+
+from counter import counter_key
+from health import DAMAGE_ORDER, to_counts
+
+
+def apply_changes(doc, changes):
+    """
+    Write the values in changes ({"counters": {key: fields}, "health":
+    {health_type: fields}}) onto a character document with list-layout
+    counters. Counters or trackers that no longer exist are skipped.
+    """
+    counter_changes = changes.get("counters") or {}
+    if counter_changes:
+        for c in doc.get("counters", []):
+            fields = counter_changes.get(counter_key(c["counter"]))
+            if fields:
+                c.update(fields)
+    health_changes = changes.get("health") or {}
+    for tracker in doc.get("health", []):
+        fields = health_changes.get(tracker.get("health_type"))
+        if fields:
+            tracker.update(fields)
+    return doc
+
+
+def values_of(doc, changes):
+    """
+    Return the values doc currently holds for the fields named in changes,
+    in the same shape.
+    """
+    by_key = {counter_key(c["counter"]): c for c in doc.get("counters", [])}
+    trackers = {t.get("health_type"): t for t in doc.get("health", [])}
+    values = {"counters": {}, "health": {}}
+    for key, fields in (changes.get("counters") or {}).items():
+        if key in by_key:
+            values["counters"][key] = {f: by_key[key].get(f) for f in fields}
+    for health_type, fields in (changes.get("health") or {}).items():
+        if health_type not in trackers:
+            continue
+        values["health"][health_type] = {}
+        for field in fields:
+            value = trackers[health_type].get(field)
+            # Trackers stored by older versions still hold a damage list
+            if isinstance(value, list):
+                value = to_counts(value, DAMAGE_ORDER)
+            values["health"][health_type][field] = value
+    return values
+
+
+def replay(doc, events):
+    """
+    Apply events, oldest first, to a snapshot document.
+    """
+    for event in events:
+        apply_changes(doc, event["set"])
+    return doc
+
+
+def undo_target(events):
+    """
+    Return the newest event, among events listed newest first, that is
+    neither an undo nor already undone; None if there is none.
+    """
+    undone = set()
+    for event in events:
+        if event.get("undoes") is not None:
+            undone.add(event["undoes"])
+        elif event["seq"] not in undone:
+            return event
+    return None
+
+
+def describe(event, names=None):
+    """
+    One-line summary of an event for the history command. names maps counter
+    keys to the names counters are shown with; other keys are shown as stored.
+    """
+    names = names or {}
+    parts = []
+    for key, fields in (event["set"].get("counters") or {}).items():
+        prev = (event["prev"].get("counters") or {}).get(key, {})
+        parts.extend(
+            f"{names.get(key, key)} {field} {prev.get(field)} -> {value}"
+            for field, value in fields.items()
+        )
+    for health_type, fields in (event["set"].get("health") or {}).items():
+        prev = (event["prev"].get("health") or {}).get(health_type, {})
+        damage = {k: v for k, v in fields.get("damage", {}).items() if v}
+        before = {k: v for k, v in prev.get("damage", {}).items() if v}
+        parts.append(f"{health_type} damage {before or 'none'} -> {damage or 'none'}")
+    label = f"undo #{event['undoes']}" if event.get("undoes") else event["op"]
+    return f"#{event['seq']} {label}: " + "; ".join(parts)
+
+
+class Compactor(threading.Thread):
+    """
+    Background thread folding event tails into their snapshots every
+    interval seconds.
+    """
+
+    def __init__(self, compact, interval):
+        super().__init__(name="avct-event-compactor", daemon=True)
+        self.compact = compact
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.compact()
+            except Exception as e:
+                print(f"Event compaction failed: {e}")
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def start_compaction(compact, interval):
+    """
+    Run compact every interval seconds in the background. Returns the thread.
+    """
+    worker = Compactor(compact, interval)
+    worker.start()
+    return worker
@@ -1,5 +1,7 @@
 import enum
 
+from symbols import SHORTCODE, emoji
+
 
 class HealthTypeEnum(enum.Enum):
     normal = "normal"
@@ -32,10 +34,38 @@ HEALTH_LEVELS = {
     "Incapacitated": -999,
 }
 
+# Trackers are stored as counts per damage type and per health level; the
+# lists the display works with are rebuilt from them in these orders
+DAMAGE_ORDER = [e.value for e in DamageEnum]  # most severe first
+LEVEL_ORDER = [e.value for e in HealthLevelEnum]
+
+
+def to_counts(names, order):
+    """
+    Return {name: count} for a list of names, with every name in order present.
+    """
+    counts = dict.fromkeys(order, 0)
+    for name in names:
+        counts[name] = counts.get(name, 0) + 1
+    return counts
+
+
+def from_counts(counts, order):
+    """
+    Return the list of names counts stands for, in order (unknown names last).
+    """
+    names = list(order) + [n for n in counts if n not in order]
+    return [n for n in names for _ in range(counts.get(n, 0))]
+
 
 class Health:
     def __init__(self, health_type, damage=None, health_levels=None):
         self.health_type = health_type
+        # Stored trackers hold counts; older documents hold the lists themselves
+        if isinstance(damage, dict):
+            damage = from_counts(damage, DAMAGE_ORDER)
+        if isinstance(health_levels, dict):
+            health_levels = from_counts(health_levels, LEVEL_ORDER)
         self.damage = damage if damage is not None else []
         # Add all health level names in definition order
         if health_levels is None:
@@ -51,6 +81,17 @@ class Health:
             health_levels=d.get("health_levels", None),
         )
 
+    def to_dict(self):
+        """
+        Return the stored form of this tracker, with damage and health levels
+        as counts.
+        """
+        return {
+            "health_type": self.health_type,
+            "damage": to_counts(self.damage, DAMAGE_ORDER),
+            "health_levels": to_counts(self.health_levels, LEVEL_ORDER),
+        }
+
     def set_health_levels(self, levels):
         self.health_levels = [hl for hl in levels]
 
@@ -158,9 +199,10 @@ class Health:
             )
         return result
 
-    def display(self, all_health_entries=None):
+    def display(self, all_health_entries=None, emoji_style=SHORTCODE):
         """
         Display this health tracker, pairing with chimerical health if available.
+        emoji_style selects shortcodes or Unicode emoji (see symbols.py).
         """
         if self.health_type == "normal" and all_health_entries:
             chimerical_health = next(
@@ -168,44 +210,42 @@ class Health:
                 None,
             )
             if chimerical_health:
-                chimerical_obj = Health(
-                    health_type=chimerical_health.get("health_type"),
-                    damage=chimerical_health.get("damage", []),
-                    health_levels=chimerical_health.get("health_levels", None),
-                )
-                return self._display_paired(chimerical_obj)
-        return self._display_single()
+                chimerical_obj = Health.from_dict(chimerical_health)
+                return self._display_paired(chimerical_obj, emoji_style)
+        return self._display_single(emoji_style)
 
-    def _display_single(self):
-        return display_health(self)
+    def _display_single(self, emoji_style=SHORTCODE):
+        return display_health(self, emoji_style=emoji_style)
 
-    def _display_paired(self, chimerical_obj):
-        return display_health(self, chimerical_obj)
+    def _display_paired(self, chimerical_obj, emoji_style=SHORTCODE):
+        return display_health(self, chimerical_obj, emoji_style)
 
 
-def display_health(normal_health, chimerical_health=None):
+def display_health(normal_health, chimerical_health=None, emoji_style=SHORTCODE):
     """
     Display health levels with symbols for normal and optional chimerical health.
 
     Args:
         normal_health: A Health object of normal type
         chimerical_health: An optional Health object of chimerical type
+        emoji_style: Shortcodes or Unicode emoji (see symbols.py)
 
     Returns:
         str: A formatted string displaying the health levels
     """
     symbol_map = {
-        None: ":stop_button:",
-        DamageEnum.Bashing.value: ":regional_indicator_b:",
-        DamageEnum.Lethal.value: ":regional_indicator_l:",
-        DamageEnum.Aggravated.value: ":regional_indicator_a:",
+        None: emoji("stop_button", emoji_style),
+        DamageEnum.Bashing.value: emoji("regional_indicator_b", emoji_style),
+        DamageEnum.Lethal.value: emoji("regional_indicator_l", emoji_style),
+        DamageEnum.Aggravated.value: emoji("regional_indicator_a", emoji_style),
     }
 
     lines = []
 
     # If we have both normal and chimerical health, add a header row
     if chimerical_health:
-        lines.append(":blue_square: :regional_indicator_c:")
+        blue_square = emoji("blue_square", emoji_style)
+        lines.append(f"{blue_square} {emoji('regional_indicator_c', emoji_style)}")
 
     # Map both health objects to their entries
     normal_entries = normal_health.map_damage_to_health()
@@ -0,0 +1,173 @@
+"""
+Keep in-process caches consistent with writes made by other processes.
+
+On a replica set (or Atlas) a change stream on the characters collection
+publishes (character id, new version) for every write. A standalone mongod
+does not support change streams, so the fallback polls the version field of
+the documents currently cached and invalidates the ones that moved.
+"""
+
+import threading
+
+from bson import ObjectId
+from pymongo.errors import PyMongoError
+
+import caches
+from config import CACHE_POLL_INTERVAL
+
+# Only the fields needed to publish an invalidation
+WATCH_PIPELINE = [
+    {
+        "$project": {
+            "operationType": 1,
+            "documentKey": 1,
+            "fullDocument.user": 1,
+            "fullDocument.version": 1,
+            "updateDescription.updatedFields.version": 1,
+        }
+    }
+]
+
+
+def handle_change(change, publish=caches.invalidate_character):
+    """
+    Translate one change stream event into an invalidation.
+    """
+    op = change.get("operationType")
+    if op in ("drop", "rename", "dropDatabase", "invalidate"):
+        caches.invalidate_all()
+        return
+    key = change.get("documentKey", {}).get("_id")
+    if key is None:
+        return
+    if op == "update":
+        fields = change.get("updateDescription", {}).get("updatedFields", {})
+        publish(key, fields.get("version"))
+    elif op in ("insert", "replace"):
+        doc = change.get("fullDocument") or {}
+        publish(key, doc.get("version"), doc.get("user"))
+    else:
+        publish(key, None)
+
+
+class ChangeStreamListener(threading.Thread):
+    """
+    Background thread tailing the collection's change stream. Resumes from the
+    last seen event after transient errors.
+    """
+
+    def __init__(self, collection, publish=caches.invalidate_character):
+        super().__init__(name="avct-change-stream", daemon=True)
+        self.collection = collection
+        self.publish = publish
+        self.resume_token = None
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                with self.collection.watch(
+                    WATCH_PIPELINE,
+                    resume_after=self.resume_token,
+                    max_await_time_ms=1000,
+                ) as stream:
+                    while stream.alive and not self._stop_event.is_set():
+                        change = stream.try_next()
+                        if change is None:
+                            continue
+                        self.resume_token = stream.resume_token
+                        handle_change(change, self.publish)
+            except PyMongoError as e:
+                print(f"Change stream interrupted, resuming: {e}")
+                # Events may have been missed while disconnected
+                caches.invalidate_all()
+                self._stop_event.wait(1)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class VersionPoller(threading.Thread):
+    """
+    Fallback for deployments without change streams: periodically compare the
+    version of each cached character with the stored one.
+    """
+
+    BATCH_SIZE = 500
+
+    def __init__(
+        self,
+        collection,
+        interval=CACHE_POLL_INTERVAL,
+        publish=caches.invalidate_character,
+    ):
+        super().__init__(name="avct-version-poller", daemon=True)
+        self.collection = collection
+        self.interval = interval
+        self.publish = publish
+        self._stop_event = threading.Event()
+
+    def poll_once(self):
+        """
+        Check every cached character once. Returns the number invalidated.
+        """
+        ids = caches.document_cache.keys()
+        invalidated = 0
+        for start in range(0, len(ids), self.BATCH_SIZE):
+            chunk = ids[start : start + self.BATCH_SIZE]
+            stored = {
+                str(d["_id"]): d.get("version")
+                for d in self.collection.find(
+                    {"_id": {"$in": [ObjectId(i) for i in chunk]}}, {"version": 1}
+                )
+            }
+            for character_id in chunk:
+                if character_id not in stored:
+                    self.publish(character_id, None)
+                    invalidated += 1
+                elif stored[character_id] != caches.cached_version(character_id):
+                    self.publish(character_id, stored[character_id])
+                    invalidated += 1
+        return invalidated
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.poll_once()
+            except Exception as e:
+                print(f"Cache version poll failed: {e}")
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def supports_change_streams(collection):
+    """
+    Standalone mongod and the SQLite backend cannot open change streams.
+    """
+    try:
+        with collection.watch(max_await_time_ms=1):
+            return True
+    except (PyMongoError, AttributeError, NotImplementedError):
+        return False
+
+
+def start_invalidation(collection, poll_interval=CACHE_POLL_INTERVAL):
+    """
+    Start the best available invalidation source for this deployment; from
+    then on documents may be cached (caches.set_coherent).
+    Returns the running thread, or None when caching is disabled.
+    """
+    if not any(
+        c.enabled
+        for c in (caches.document_cache, caches.autocomplete_cache, caches.render_cache)
+    ):
+        return None
+    if supports_change_streams(collection):
+        worker = ChangeStreamListener(collection)
+    else:
+        print("Change streams unavailable; polling character versions instead.")
+        worker = VersionPoller(collection, interval=poll_interval)
+    worker.start()
+    caches.set_coherent()
+    return worker
@@ -0,0 +1,246 @@
+"""
+Local write-ahead journal for character updates (WRITE_JOURNAL=true).
+
+CharacterRepository.update_one normally writes straight to the database. With
+the journal on, a write to a single character that fails with a connection
+error or takes longer than WRITE_JOURNAL_TIMEOUT is instead appended to a
+local SQLite file and acknowledged, so the command answers at once. Later
+writes to a character with pending entries are journaled behind them to
+keep their order. A background flusher replays entries oldest first.
+
+Every journaled update carries an idempotency key: it sets journal_key on
+the document and only matches documents that do not hold that key yet. An
+entry whose replay matches nothing was either applied already (its key is
+on the document, for example a timed-out write that did land) or lost a race
+with another process; the latter is dropped and counted as a conflict.
+
+Reads apply pending entries on top of the stored document (see merge), so a
+process sees its own journaled writes. The journal only covers writes; reads
+still need the database. Since a journaled write may still be dropped, a
+command whose write was journaled tells the user it was queued (see queued).
+"""
+
+import contextvars
+import sqlite3
+import threading
+import time
+import uuid
+from collections import Counter, namedtuple
+
+import pymongo
+from bson import json_util
+from pymongo.errors import ConnectionFailure, ExecutionTimeout, WTimeoutError
+
+import metrics
+from sqlite_storage import apply_update, matches
+
+# Errors after which a write may succeed if retried later
+TRANSIENT_ERRORS = (ConnectionFailure, ExecutionTimeout, WTimeoutError)
+
+KEY_FIELD = "journal_key"
+
+JournaledResult = namedtuple("JournaledResult", ["matched_count", "modified_count"])
+
+# What update_one returns for a write that was journaled instead of applied
+JOURNALED = JournaledResult(matched_count=1, modified_count=1)
+
+# Set by update_one when it journals a write, in the context of the command
+# (its task) that made it
+queued = contextvars.ContextVar("journal_queued", default=False)
+
+QUEUED_MESSAGE = (
+    "The database is slow to respond, so this change was queued. It will be "
+    "saved shortly unless another change to the character gets there first."
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS journal (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL UNIQUE,
+    character_id TEXT NOT NULL,
+    query TEXT NOT NULL,
+    update_doc TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_journal_character ON journal (character_id, seq);
+"""
+
+Entry = namedtuple("Entry", ["seq", "key", "character_id", "query", "update"])
+
+
+class Journal:
+    """
+    Durable, ordered queue of character updates waiting to be written.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # An acknowledged write must survive a crash
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        # Pending entries per character, so unaffected reads skip the file
+        self._pending = Counter(
+            row[0] for row in self._conn.execute("SELECT character_id FROM journal")
+        )
+
+    def __len__(self):
+        with self._lock:
+            return sum(self._pending.values())
+
+    def has_pending(self, character_id):
+        with self._lock:
+            return self._pending[str(character_id)] > 0
+
+    def append(self, character_id, key, query, update):
+        character_id = str(character_id)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO journal (key, character_id, query, update_doc, created)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (
+                    key,
+                    character_id,
+                    json_util.dumps(query),
+                    json_util.dumps(update),
+                    time.time(),
+                ),
+            )
+            self._pending[character_id] += 1
+
+    def entries(self, character_id=None):
+        """
+        Return pending entries oldest first, optionally for one character.
+        """
+        sql = "SELECT seq, key, character_id, query, update_doc FROM journal"
+        args = ()
+        if character_id is not None:
+            sql += " WHERE character_id = ?"
+            args = (str(character_id),)
+        with self._lock:
+            rows = self._conn.execute(sql + " ORDER BY seq", args).fetchall()
+        return [
+            Entry(seq, key, cid, json_util.loads(query), json_util.loads(update))
+            for seq, key, cid, query, update in rows
+        ]
+
+    def remove(self, entry):
+        with self._lock:
+            self._conn.execute("DELETE FROM journal WHERE seq = ?", (entry.seq,))
+            self._pending[entry.character_id] -= 1
+            if self._pending[entry.character_id] <= 0:
+                del self._pending[entry.character_id]
+
+    def merge(self, doc):
+        """
+        Return doc with the pending entries it does not reflect yet applied.
+        """
+        if not doc or "_id" not in doc or not self.has_pending(doc["_id"]):
+            return doc
+        for entry in self.entries(doc["_id"]):
+            # Entries already applied, or superseded, no longer match
+            if matches(doc, entry.query):
+                apply_update(doc, entry.update)
+        return doc
+
+    def close(self):
+        self._conn.close()
+
+
+def keyed(query, update, key):
+    """
+    Return query and update made idempotent with key (see the module docstring).
+    """
+    query = dict(query)
+    query[KEY_FIELD] = {"$ne": key}
+    update = dict(update)
+    update["$set"] = dict(update.get("$set", {}), **{KEY_FIELD: key})
+    return query, update
+
+
+def update_one(journal, collection, character_id, query, update, timeout):
+    """
+    Write update to collection, or journal it when the database is failing or
+    the character already has pending entries. Returns the update result, or
+    JOURNALED.
+    """
+    key = uuid.uuid4().hex
+    query, update = keyed(query, update, key)
+    if not journal.has_pending(character_id):
+        try:
+            with pymongo.timeout(timeout):
+                return collection.update_one(query, update)
+        except TRANSIENT_ERRORS as e:
+            print(f"Journaling write to {character_id}: {e}")
+    journal.append(character_id, key, query, update)
+    metrics.increment("journal_appends")
+    queued.set(True)
+    return JOURNALED
+
+
+def flush(journal, collection, log=print):
+    """
+    Replay pending entries in order until the journal is empty or the
+    database fails again. Returns (written, conflicts): the entries now in the
+    database (including ones found applied already) and those dropped.
+    """
+    written = conflicts = 0
+    for entry in journal.entries():
+        try:
+            result = collection.update_one(entry.query, entry.update)
+            conflict = result.matched_count == 0 and not _applied(collection, entry)
+        except TRANSIENT_ERRORS as e:
+            log(f"Journal flush stopped with {len(journal)} pending: {e}")
+            break
+        if conflict:
+            conflicts += 1
+            metrics.increment("journal_conflicts")
+            log(
+                f"Dropped journaled write to {entry.character_id}: conflict,"
+                f" update {json_util.dumps(entry.update)}"
+            )
+        else:
+            written += 1
+        journal.remove(entry)
+    metrics.gauge("journal_pending", len(journal))
+    return written, conflicts
+
+
+def _applied(collection, entry):
+    stored = collection.find_one({"_id": entry.query["_id"]}, {KEY_FIELD: 1})
+    return stored is not None and stored.get(KEY_FIELD) == entry.key
+
+
+class Flusher(threading.Thread):
+    """
+    Background thread flushing the journal every interval seconds.
+    """
+
+    def __init__(self, flush_once, interval):
+        super().__init__(name="avct-journal-flusher", daemon=True)
+        self.flush_once = flush_once
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.flush_once()
+            except Exception as e:
+                print(f"Journal flush failed: {e}")
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def start_flusher(flush_once, interval):
+    """
+    Run flush_once every interval seconds in the background. Returns the thread.
+    """
+    worker = Flusher(flush_once, interval)
+    worker.start()
+    return worker
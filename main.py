@@ -15,12 +15,5 @@ async def on_ready():
     print(f"Logged in as {bot.user}")
 
 
-async def setup_cogs():
-    await bot.load_extension("avct_cog")
-
-
 if __name__ == "__main__":
-    import asyncio
-
-    asyncio.run(setup_cogs())
     bot.run(TOKEN)
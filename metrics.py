@@ -0,0 +1,106 @@
+"""
+Lightweight per-process metrics.
+
+Every sample carries tags; process-wide default tags (worker id, shard range)
+are set once at startup so metrics from cluster workers can be told apart.
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+_lock = threading.Lock()
+_default_tags = {}
+_counters = {}
+_gauges = {}
+_timings = {}
+
+
+def _key(name, tags):
+    merged = dict(_default_tags)
+    merged.update({k: v for k, v in tags.items() if v is not None})
+    return name, tuple(sorted((k, str(v)) for k, v in merged.items()))
+
+
+def set_default_tags(**tags):
+    """
+    Set tags added to every metric recorded by this process.
+    """
+    with _lock:
+        _default_tags.clear()
+        _default_tags.update({k: v for k, v in tags.items() if v is not None})
+
+
+def increment(name, value=1, **tags):
+    key = _key(name, tags)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def gauge(name, value, **tags):
+    key = _key(name, tags)
+    with _lock:
+        _gauges[key] = value
+
+
+def observe(name, seconds, **tags):
+    """
+    Record a duration. Only count/total/max are kept to bound memory.
+    """
+    key = _key(name, tags)
+    with _lock:
+        count, total, peak = _timings.get(key, (0, 0.0, 0.0))
+        _timings[key] = (count + 1, total + seconds, max(peak, seconds))
+
+
+@contextmanager
+def timed(name, **tags):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **tags)
+
+
+def snapshot():
+    """
+    Return all metrics as a list of dicts suitable for JSON output.
+    """
+    with _lock:
+        out = []
+        for (name, tags), value in _counters.items():
+            out.append(
+                {"type": "counter", "name": name, "tags": dict(tags), "value": value}
+            )
+        for (name, tags), value in _gauges.items():
+            out.append(
+                {"type": "gauge", "name": name, "tags": dict(tags), "value": value}
+            )
+        for (name, tags), (count, total, peak) in _timings.items():
+            out.append(
+                {
+                    "type": "timing",
+                    "name": name,
+                    "tags": dict(tags),
+                    "count": count,
+                    "mean_ms": total / count * 1000 if count else 0.0,
+                    "max_ms": peak * 1000,
+                }
+            )
+        return out
+
+
+def write_snapshot(path):
+    with open(path, "w") as f:
+        json.dump(snapshot(), f, indent=2)
+
+
+def reset():
+    """
+    Clear all recorded metrics (default tags are kept).
+    """
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _timings.clear()
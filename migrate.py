@@ -0,0 +1,348 @@
+"""
+One-shot migration that normalizes legacy character documents.
+
+    python migrate.py                   # migrate, resuming an interrupted run
+    python migrate.py --dry-run         # count what would change
+    python migrate.py --restart         # ignore saved progress
+    python migrate.py --counter-layout map   # also convert counters to a map
+
+Older documents may store character and counter names raw or HTML-escaped,
+carry the transient bedlam_error field dumped from Counter.__dict__, lack
+fields added later, or hold health damage and levels as lists rather than
+counts. Every document is rewritten into the form the bot writes today (see
+names.canonical_name and Health.to_dict), so name lookups need a single query.
+
+The collection is streamed in _id order and written in batches with
+bulk_write. Progress is checkpointed after each batch, so an interrupted run
+resumes where it stopped. Writes are conditional on the document version, so
+the bot can keep running; documents changed mid-migration are re-read.
+
+With --counter-layout, counters are also converted between the list layout
+and the map layout (see utils._save_counters). Characters with two counters
+that share a key cannot be converted to a map and are left as lists.
+
+Events still on a document's event_tail refer to counters by key, so the
+tail is folded into the counters and health before they are rewritten, and
+its events are copied to counter_events first, as compaction does.
+"""
+
+import argparse
+import copy
+import json
+import os
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+import utils
+from counter import COUNTER_ORDER_FIELD, counters_from_map, counters_to_map
+from events import replay
+from health import Health
+from names import canonical_name
+
+# Defaults used by Counter.from_dict for fields missing from older documents
+COUNTER_DEFAULTS = {
+    "temp": 0,
+    "perm": 0,
+    "category": "general",
+    "comment": "",
+    "bedlam": 0,
+    "counter_type": "single_number",
+    "force_unpretty": False,
+    "is_resettable": None,
+    "is_exhaustible": None,
+}
+# Fields that only exist on Counter objects and should never have been stored;
+# the map layout's order field is recomputed from the counter's position
+TRANSIENT_COUNTER_FIELDS = ("bedlam_error", COUNTER_ORDER_FIELD)
+INTEGER_COUNTER_FIELDS = ("temp", "perm", "bedlam")
+DEFAULT_STATE_PATH = "migrate_state.json"
+CONFLICT_ATTEMPTS = 3
+
+
+def normalize_counter(counter):
+    counter = {k: v for k, v in counter.items() if k not in TRANSIENT_COUNTER_FIELDS}
+    counter["counter"] = canonical_name(counter.get("counter"))
+    for field, default in COUNTER_DEFAULTS.items():
+        counter.setdefault(field, default)
+    for field in INTEGER_COUNTER_FIELDS:
+        value = counter[field]
+        # Numbers stored as strings; anything else is left for the
+        # invalid_counter display to flag
+        if isinstance(value, str) and value.strip().isdigit():
+            counter[field] = int(value)
+    return counter
+
+
+def normalize_health(tracker):
+    # Missing damage and levels get the defaults; both are stored as counts
+    return dict(tracker, **Health.from_dict(tracker).to_dict())
+
+
+def fold_event_tail(doc):
+    """
+    Return a copy of a character document with its event tail applied to its
+    counters and health, which are returned as a list.
+    """
+    doc = copy.deepcopy(doc)
+    if isinstance(doc.get("counters"), dict):
+        doc["counters"] = counters_from_map(doc["counters"])
+    return replay(doc, doc.get("event_tail") or [])
+
+
+def normalize_document(doc, counter_layout=None):
+    """
+    Return the fields of a character document that differ from their
+    normalized form, as a dict suitable for $set (empty if none do).
+    An event tail is folded in and cleared.
+    counter_layout ("list" or "map") converts the counters to that layout;
+    by default the document keeps its own. Raises ValueError if the counters
+    cannot be stored as a map.
+    """
+    folded = fold_event_tail(doc)
+    current = doc.get("counter_layout", "list")
+    layout = counter_layout or current
+    normalized = {
+        "character": canonical_name(doc.get("character")),
+        "counters": [normalize_counter(c) for c in folded.get("counters") or []],
+        "health": [normalize_health(h) for h in folded.get("health") or []],
+    }
+    if layout == "map":
+        normalized["counters"] = counters_to_map(normalized["counters"])
+    if layout != current or "counter_layout" in doc:
+        normalized["counter_layout"] = layout
+    if doc.get("event_tail"):
+        normalized["event_tail"] = []
+    return {k: v for k, v in normalized.items() if k not in doc or doc[k] != v}
+
+
+def _version_filter(doc):
+    version = doc.get("version")
+    return {
+        "_id": doc["_id"],
+        "version": version if version is not None else {"$exists": False},
+    }
+
+
+def _update(fields):
+    return {"$set": fields, "$inc": {"version": 1}}
+
+
+def _archive_tail(doc):
+    # Copied before the write that clears the tail, so a conflict loses
+    # nothing; events copied already are skipped
+    utils.EventRepository.insert_missing(
+        [
+            {"character_id": str(doc["_id"]), "user": doc.get("user"), **e}
+            for e in doc.get("event_tail") or []
+        ]
+    )
+
+
+def stream_by_id(collection, after, batch_size):
+    """
+    Iterate over a collection in _id order, starting after the given _id,
+    through a cursor fetching batch_size documents at a time.
+    """
+    query = {"_id": {"$gt": after}} if after is not None else {}
+    cursor = collection.find(query)
+    if hasattr(cursor, "batch_size"):
+        return cursor.sort("_id", 1).batch_size(batch_size)
+    # Collections without server-side cursors (SQLite) return a list
+    return iter(sorted(cursor, key=lambda d: d["_id"]))
+
+
+def _apply(collection, ops):
+    """Write (filter, update) pairs and return how many matched."""
+    if hasattr(collection, "bulk_write"):
+        result = collection.bulk_write([UpdateOne(f, u) for f, u in ops], ordered=False)
+        return result.matched_count
+    return sum(collection.update_one(f, u).matched_count for f, u in ops)
+
+
+class Migration:
+    """
+    Normalize every character document in a collection, batch by batch.
+    """
+
+    def __init__(
+        self,
+        collection,
+        batch_size=500,
+        state_path=DEFAULT_STATE_PATH,
+        dry_run=False,
+        log=print,
+        counter_layout=None,
+    ):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.state_path = state_path
+        self.dry_run = dry_run
+        self.log = log or (lambda message: None)
+        self.counter_layout = counter_layout
+        self.last_id = None
+        self.stats = {"scanned": 0, "updated": 0, "duplicates": 0, "conflicts": 0}
+
+    def load_state(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        with open(self.state_path) as f:
+            state = json.load(f)
+        self.last_id = ObjectId(state["last_id"]) if state.get("last_id") else None
+        self.stats.update(state.get("stats", {}))
+
+    def save_state(self):
+        if not self.state_path or self.dry_run:
+            return
+        with open(self.state_path, "w") as f:
+            json.dump(
+                {
+                    "last_id": str(self.last_id) if self.last_id else None,
+                    "stats": self.stats,
+                },
+                f,
+            )
+
+    def _name_taken(self, doc, name, claimed):
+        if claimed.get((doc.get("user"), name), doc["_id"]) != doc["_id"]:
+            return True
+        return (
+            self.collection.find_one(
+                {"user": doc.get("user"), "character": name, "_id": {"$ne": doc["_id"]}}
+            )
+            is not None
+        )
+
+    def _duplicate(self, doc, reason, counted):
+        # A document planned again after a conflict is only counted once
+        if (doc["_id"], reason) not in counted:
+            counted.add((doc["_id"], reason))
+            self.stats["duplicates"] += 1
+
+    def _plan(self, doc, claimed, counted):
+        """
+        Return the $set fields for doc, or None if it is already normalized.
+        claimed maps the (user, name) pairs documents of the batch are renamed
+        to onto their ids; counted holds the duplicates already counted.
+        """
+        try:
+            fields = normalize_document(doc, self.counter_layout)
+        except ValueError as e:
+            self._duplicate(doc, "counters", counted)
+            self.log(f"Keeping the counters of {doc['_id']} as a list: {e}")
+            fields = normalize_document(doc, "list")
+        name = fields.get("character")
+        if name is not None and self._name_taken(doc, name, claimed):
+            # Both spellings exist for this user; keep the name so neither is lost
+            self._duplicate(doc, "character", counted)
+            self.log(
+                f"Skipping rename of {doc['_id']}: '{name}' already exists "
+                f"for user {doc.get('user')}"
+            )
+            del fields["character"]
+        elif name is not None:
+            claimed[(doc.get("user"), name)] = doc["_id"]
+        return fields or None
+
+    def _unwritten(self, planned):
+        """
+        Return the ids of the (doc, fields) pairs in planned whose conditional
+        write did not match: the stored document is not the version the write
+        would have produced, or does not hold its fields.
+        """
+        ids = [doc["_id"] for doc, _ in planned]
+        stored = {d["_id"]: d for d in self.collection.find({"_id": {"$in": ids}})}
+        unwritten = []
+        for doc, fields in planned:
+            current = stored.get(doc["_id"])
+            if current is None:
+                continue
+            written = current.get("version") == (doc.get("version") or 0) + 1
+            if not written or any(current.get(k) != v for k, v in fields.items()):
+                unwritten.append(doc["_id"])
+        return unwritten
+
+    def _retry_conflicts(self, ids, claimed, counted):
+        """Re-read documents whose conditional write lost to a concurrent edit."""
+        for _ in range(CONFLICT_ATTEMPTS):
+            pending = []
+            for _id in ids:
+                doc = self.collection.find_one({"_id": _id})
+                fields = self._plan(doc, claimed, counted) if doc else None
+                if fields is None:
+                    continue
+                _archive_tail(doc)
+                if _apply(self.collection, [(_version_filter(doc), _update(fields))]):
+                    self.stats["updated"] += 1
+                else:
+                    pending.append(_id)
+            ids = pending
+            if not ids:
+                return
+        self.stats["conflicts"] += len(ids)
+        for _id in ids:
+            self.log(f"Gave up on {_id}: it kept changing during the migration")
+
+    def _flush(self, batch):
+        claimed, counted = {}, set()
+        ops, planned = [], []
+        for doc in batch:
+            fields = self._plan(doc, claimed, counted)
+            if fields is not None:
+                ops.append((_version_filter(doc), _update(fields)))
+                planned.append((doc, fields))
+        if ops and not self.dry_run:
+            for doc, _ in planned:
+                _archive_tail(doc)
+            matched = _apply(self.collection, ops)
+            self.stats["updated"] += matched
+            if matched < len(ops):
+                self._retry_conflicts(self._unwritten(planned), claimed, counted)
+        elif self.dry_run:
+            self.stats["updated"] += len(ops)
+        self.stats["scanned"] += len(batch)
+        self.last_id = batch[-1]["_id"]
+        self.save_state()
+        self.log(
+            f"Scanned {self.stats['scanned']}, updated {self.stats['updated']} "
+            f"(last _id {self.last_id})"
+        )
+
+    def run(self, resume=True):
+        if resume:
+            self.load_state()
+        batch = []
+        for doc in stream_by_id(self.collection, self.last_id, self.batch_size):
+            batch.append(copy.deepcopy(doc))
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+        if batch:
+            self._flush(batch)
+        # A finished run starts from the beginning next time
+        if self.state_path and os.path.exists(self.state_path):
+            os.remove(self.state_path)
+        return self.stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Normalize legacy character documents")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--state", default=DEFAULT_STATE_PATH)
+    parser.add_argument("--restart", action="store_true")
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--counter-layout", choices=("list", "map"))
+    args = parser.parse_args(argv)
+    migration = Migration(
+        utils.characters_collection,
+        batch_size=args.batch_size,
+        state_path=args.state,
+        dry_run=args.dry_run,
+        counter_layout=args.counter_layout,
+    )
+    stats = migration.run(resume=not args.restart)
+    print(json.dumps(stats))
+
+
+if __name__ == "__main__":
+    main()
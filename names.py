@@ -0,0 +1,27 @@
+"""
+Normalization of user-supplied character and counter names, shared by the
+model (counter.counter_key) and utils without either importing the other.
+"""
+
+import html
+import re
+
+
+def sanitize_string(s: str) -> str:
+    if s is None:
+        return None
+    s = s.strip()
+    s = re.sub(r"[\x00-\x1f\x7f-\x9f]", "", s)
+    s = html.escape(s)
+    return s
+
+
+def canonical_name(name: str) -> str:
+    """
+    Return the form character and counter names are stored in (sanitized and
+    escaped once), whether name arrives raw or already escaped. Lookups by
+    name query this form only; migrate.py rewrites older documents into it.
+    """
+    if name is None:
+        return None
+    return sanitize_string(html.unescape(name))
@@ -0,0 +1,141 @@
+"""
+Live pinned character sheets.
+
+A pin is a public message showing a character sheet that the bot edits in
+place whenever the character changes. Changes arrive through the cache
+invalidation hook (caches.subscribe), which covers writes from this process
+and, via invalidation.py, from other processes. Bursts of changes are
+coalesced so a run of plus/minus commands produces a single edit.
+"""
+
+import asyncio
+
+import discord
+from bson import ObjectId
+
+import caches
+from config import PIN_EDIT_DEBOUNCE
+from utils import (
+    CharacterRepository,
+    generate_character_output,
+    fully_unescape,
+    paginate_sections,
+    get_pins,
+    remove_pins,
+)
+
+
+def render_pinned_sheet(char_doc):
+    """
+    Render a sheet for a pinned message, trimmed to a single Discord message.
+    """
+    sheet = generate_character_output(char_doc, fully_unescape)
+    header = f"Counters for character '{fully_unescape(char_doc.get('character'))}':"
+    return paginate_sections([f"{header}\n{sheet}"])[0]
+
+
+class PinManager:
+    def __init__(self, bot, debounce: float = PIN_EDIT_DEBOUNCE):
+        self.bot = bot
+        self.debounce = debounce
+        self._pins = {}  # character_id -> {message_id: pin doc}
+        self._pending = {}  # character_id -> scheduled refresh task
+        self._last_content = {}  # message_id -> content last written
+        self._loop = None
+
+    def start(self):
+        """
+        Subscribe to character invalidations. Must be called from the bot's loop.
+        """
+        self._loop = asyncio.get_running_loop()
+        caches.subscribe(self.notify)
+
+    def stop(self):
+        caches.unsubscribe(self.notify)
+        for task in self._pending.values():
+            task.cancel()
+        self._pending.clear()
+
+    async def load(self):
+        """
+        Load pins for the guilds this process serves (its shards, when clustered).
+        """
+        pins = await asyncio.to_thread(get_pins, {})
+        self._pins.clear()
+        for pin in pins:
+            if self.bot.get_guild(int(pin["guild_id"])) is not None:
+                self.track(pin)
+
+    def track(self, pin):
+        self._pins.setdefault(pin["character_id"], {})[pin["message_id"]] = pin
+
+    def untrack(self, pin):
+        by_message = self._pins.get(pin["character_id"], {})
+        by_message.pop(pin["message_id"], None)
+        self._last_content.pop(pin["message_id"], None)
+        if not by_message:
+            self._pins.pop(pin["character_id"], None)
+
+    def remember(self, message_id, content):
+        self._last_content[message_id] = content
+
+    def notify(self, character_id, version=None):
+        """
+        Invalidation callback; may run on any thread.
+        """
+        if character_id not in self._pins or self._loop is None:
+            return
+        self._loop.call_soon_threadsafe(self._schedule, character_id)
+
+    def _schedule(self, character_id):
+        # Trailing debounce: the first change opens a window, later changes
+        # inside it are picked up by the single refresh at its end
+        if character_id in self._pending:
+            return
+        self._pending[character_id] = self._loop.create_task(
+            self._refresh_later(character_id)
+        )
+
+    async def _refresh_later(self, character_id):
+        try:
+            await asyncio.sleep(self.debounce)
+        finally:
+            self._pending.pop(character_id, None)
+        await self.refresh(character_id)
+
+    async def refresh(self, character_id):
+        """
+        Re-render a character and edit every pinned message that changed.
+        Returns the number of messages edited.
+        """
+        pins = list(self._pins.get(character_id, {}).values())
+        if not pins:
+            return 0
+        doc = await asyncio.to_thread(
+            CharacterRepository.find_one, {"_id": ObjectId(character_id)}
+        )
+        if doc is None:
+            # Character was deleted; its pins can no longer be updated
+            await asyncio.to_thread(remove_pins, {"character_id": character_id})
+            for pin in pins:
+                self.untrack(pin)
+            return 0
+        content = await asyncio.to_thread(render_pinned_sheet, doc)
+        edited = 0
+        for pin in pins:
+            if self._last_content.get(pin["message_id"]) == content:
+                continue
+            channel = self.bot.get_partial_messageable(int(pin["channel_id"]))
+            message = channel.get_partial_message(int(pin["message_id"]))
+            try:
+                await message.edit(content=content)
+            except discord.NotFound:
+                await asyncio.to_thread(remove_pins, {"message_id": pin["message_id"]})
+                self.untrack(pin)
+                continue
+            except discord.HTTPException as e:
+                print(f"Failed to update pinned sheet {pin['message_id']}: {e}")
+                continue
+            self.remember(pin["message_id"], content)
+            edited += 1
+        return edited
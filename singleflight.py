@@ -0,0 +1,138 @@
+"""
+Coalesce concurrent identical reads.
+
+While a read for a key is in flight, further callers asking for the same key
+wait for that read instead of issuing their own. Callers always receive their
+own copy of the result, so sharing never leaks mutations between them.
+After a write, forget() makes later callers start a new read rather than
+join one that may have missed the write.
+"""
+
+import asyncio
+import copy
+import threading
+
+import metrics
+
+
+class _Call:
+    __slots__ = ("event", "result", "error", "waiters", "snapshot")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+        self.snapshot = None
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._tasks = {}
+        self.executed = 0
+        self.shared = 0
+
+    def _count(self, leader: bool):
+        # Called with self._lock held (or on the event loop thread)
+        if leader:
+            self.executed += 1
+        else:
+            self.shared += 1
+        metrics.increment(
+            "singleflight_calls",
+            flight=self.name,
+            outcome="executed" if leader else "shared",
+        )
+
+    def do(self, key, fn):
+        """
+        Run fn() for key, or wait for the identical call already running in
+        another thread and return a copy of its result.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+            self._count(leader)
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.snapshot)
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+                waiters = call.waiters
+            if waiters and call.error is None:
+                # Followers copy from a snapshot the leader's caller can't mutate
+                call.snapshot = copy.deepcopy(call.result)
+            call.event.set()
+        return call.result
+
+    async def do_async(self, key, fn):
+        """
+        Await fn() (run in a worker thread) for key, sharing one in-flight
+        call between concurrent awaiters on this event loop.
+        """
+        task = self._tasks.get(key)
+        leader = task is None
+        if leader:
+            task = asyncio.get_running_loop().create_task(self._run(key, fn))
+            self._tasks[key] = task
+        with self._lock:
+            self._count(leader)
+        # Shield so a cancelled caller doesn't cancel the read for the others
+        result = await asyncio.shield(task)
+        return copy.deepcopy(result)
+
+    async def _run(self, key, fn):
+        try:
+            return await asyncio.to_thread(fn)
+        finally:
+            if self._tasks.get(key) is asyncio.current_task():
+                del self._tasks[key]
+
+    def forget(self, key=None):
+        """
+        Stop sharing the call in flight for key (every key when None): it
+        still completes for the callers already waiting on it, but later
+        callers start a new one. May be called from any thread.
+        """
+        with self._lock:
+            if key is None:
+                self._calls.clear()
+                self._tasks.clear()
+            else:
+                self._calls.pop(key, None)
+                self._tasks.pop(key, None)
+
+    def stats(self):
+        total = self.executed + self.shared
+        return {
+            "name": self.name,
+            "executed": self.executed,
+            "shared": self.shared,
+            "shared_ratio": self.shared / total if total else 0.0,
+        }
+
+
+def query_key(*parts):
+    """
+    Hashable key for a query. repr() keeps ObjectIds and nested operators
+    distinct and is stable for the dicts this code builds.
+    """
+    return repr(parts)
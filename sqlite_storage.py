@@ -0,0 +1,688 @@
+"""
+SQLite storage backend.
+
+Implements the subset of the pymongo Collection API that CharacterRepository and
+PartyRepository use, so the rest of the bot runs unchanged on a local SQLite file.
+Characters and their counters are stored in separate indexed tables; changing one
+counter rewrites only that counter's row.
+"""
+
+import copy
+import json
+import sqlite3
+import threading
+from collections import namedtuple
+
+from bson import ObjectId
+
+InsertOneResult = namedtuple("InsertOneResult", ["inserted_id"])
+UpdateResult = namedtuple("UpdateResult", ["matched_count", "modified_count"])
+DeleteResult = namedtuple("DeleteResult", ["deleted_count"])
+
+# Counter fields that have their own column, with the Python type stored there
+COUNTER_COLUMNS = {
+    "counter": str,
+    "temp": int,
+    "perm": int,
+    "bedlam": int,
+    "category": str,
+    "comment": str,
+    "counter_type": str,
+    "force_unpretty": bool,
+    "is_resettable": bool,
+    "is_exhaustible": bool,
+}
+
+# Top-level character fields that have their own column
+CHARACTER_COLUMNS = ("user", "character", "version")
+
+# Document fields filtered in SQL rather than after decoding every document,
+# in the order of the index on them (counter_events are read per character)
+INDEXED_DOCUMENT_FIELDS = ("character_id", "seq")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS characters (
+    id TEXT PRIMARY KEY,
+    user TEXT,
+    character TEXT,
+    version INTEGER,
+    health TEXT NOT NULL DEFAULT '[]',
+    extra TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS idx_characters_user_character
+    ON characters (user, character);
+CREATE TABLE IF NOT EXISTS counters (
+    character_id TEXT NOT NULL REFERENCES characters (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    counter TEXT,
+    temp INTEGER,
+    perm INTEGER,
+    bedlam INTEGER,
+    category TEXT,
+    comment TEXT,
+    counter_type TEXT,
+    force_unpretty INTEGER,
+    is_resettable INTEGER,
+    is_exhaustible INTEGER,
+    extra TEXT NOT NULL DEFAULT '{}',
+    PRIMARY KEY (character_id, position)
+);
+CREATE INDEX IF NOT EXISTS idx_counters_type ON counters (counter_type, is_resettable);
+CREATE TABLE IF NOT EXISTS documents (
+    collection TEXT NOT NULL,
+    id TEXT NOT NULL,
+    body TEXT NOT NULL,
+    PRIMARY KEY (collection, id)
+);
+CREATE INDEX IF NOT EXISTS idx_documents_character_seq ON documents (
+    collection,
+    json_extract(body, '$.character_id'),
+    json_extract(body, '$.seq')
+);
+"""
+
+
+def connect(path: str):
+    """
+    Open a SQLite connection in WAL mode with the bot's schema.
+    """
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.executescript(SCHEMA)
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(characters)")}
+    if "version" not in columns:
+        # Files created before the version column existed
+        conn.execute("ALTER TABLE characters ADD COLUMN version INTEGER")
+    return conn
+
+
+# --- Query matching and update operators ---
+
+
+def _get_path(doc, path):
+    value = doc
+    for part in path.split("."):
+        if isinstance(value, list) and part.isdigit():
+            idx = int(part)
+            value = value[idx] if idx < len(value) else None
+        elif isinstance(value, dict):
+            value = value.get(part)
+        else:
+            return None
+    return value
+
+
+def _set_path(doc, path, value):
+    parts = path.split(".")
+    target = doc
+    for part in parts[:-1]:
+        target = target[int(part)] if isinstance(target, list) else target[part]
+    last = parts[-1]
+    if isinstance(target, list):
+        target[int(last)] = value
+    else:
+        target[last] = value
+
+
+def _unset_path(doc, path):
+    parts = path.split(".")
+    target = doc
+    for part in parts[:-1]:
+        target = target[int(part)] if isinstance(target, list) else target.get(part)
+        if target is None:
+            return
+    if isinstance(target, dict):
+        target.pop(parts[-1], None)
+
+
+def _same(a, b):
+    if isinstance(a, ObjectId) or isinstance(b, ObjectId):
+        return str(a) == str(b)
+    return a == b
+
+
+def _match_condition(value, condition):
+    if isinstance(condition, dict) and any(k.startswith("$") for k in condition):
+        for op, arg in condition.items():
+            if op == "$in":
+                if not any(_same(value, a) for a in arg):
+                    return False
+            elif op == "$ne":
+                if _same(value, arg):
+                    return False
+            elif op == "$gt":
+                if value is None or not value > arg:
+                    return False
+            elif op == "$exists":
+                if (value is not None) != bool(arg):
+                    return False
+            elif op == "$elemMatch":
+                if not isinstance(value, list) or not any(
+                    isinstance(v, dict) and matches(v, arg) for v in value
+                ):
+                    return False
+            else:
+                raise NotImplementedError(f"Query operator {op} is not supported")
+        return True
+    if isinstance(value, list) and not isinstance(condition, list):
+        return any(_same(v, condition) for v in value)
+    return _same(value, condition)
+
+
+def matches(doc, query):
+    """
+    Return True if doc matches a MongoDB-style query (equality, $in, $ne, $gt,
+    $exists and $elemMatch).
+    """
+    return all(_match_condition(_get_path(doc, k), v) for k, v in query.items())
+
+
+def _evaluate(expr, doc, variables):
+    """Evaluate the aggregation-expression subset used in update pipelines."""
+    if isinstance(expr, str) and expr.startswith("$$"):
+        name, _, path = expr[2:].partition(".")
+        value = variables[name]
+        return _get_path(value, path) if path else value
+    if isinstance(expr, str) and expr.startswith("$"):
+        return _get_path(doc, expr[1:])
+    if isinstance(expr, list):
+        return [_evaluate(e, doc, variables) for e in expr]
+    if not isinstance(expr, dict):
+        return expr
+    if len(expr) == 1:
+        op, arg = next(iter(expr.items()))
+        if op == "$map":
+            items = _evaluate(arg["input"], doc, variables) or []
+            name = arg.get("as", "this")
+            return [
+                _evaluate(arg["in"], doc, {**variables, name: item}) for item in items
+            ]
+        if op == "$cond":
+            if isinstance(arg, dict):
+                arg = [arg["if"], arg["then"], arg["else"]]
+            branch = arg[1] if _evaluate(arg[0], doc, variables) else arg[2]
+            return _evaluate(branch, doc, variables)
+        if op == "$and":
+            return all(_evaluate(a, doc, variables) for a in arg)
+        if op == "$or":
+            return any(_evaluate(a, doc, variables) for a in arg)
+        if op == "$eq":
+            left, right = (_evaluate(a, doc, variables) for a in arg)
+            return _same(left, right)
+        if op == "$mergeObjects":
+            merged = {}
+            for part in arg:
+                merged.update(_evaluate(part, doc, variables) or {})
+            return merged
+        if op == "$add":
+            return sum(_evaluate(a, doc, variables) for a in arg)
+        if op == "$ifNull":
+            value = _evaluate(arg[0], doc, variables)
+            return _evaluate(arg[1], doc, variables) if value is None else value
+        if op == "$literal":
+            return arg
+        if op.startswith("$"):
+            raise NotImplementedError(f"Expression operator {op} is not supported")
+    return {k: _evaluate(v, doc, variables) for k, v in expr.items()}
+
+
+def apply_update(doc, update):
+    """
+    Apply a MongoDB-style update (operators or a pipeline of $set stages) to doc in place.
+    """
+    if isinstance(update, list):
+        for stage in update:
+            for op, fields in stage.items():
+                if op not in ("$set", "$addFields"):
+                    raise NotImplementedError(f"Pipeline stage {op} is not supported")
+                values = {k: _evaluate(v, doc, {}) for k, v in fields.items()}
+                for path, value in values.items():
+                    _set_path(doc, path, value)
+        return
+    for op, fields in update.items():
+        for path, value in fields.items():
+            if op == "$set":
+                _set_path(doc, path, copy.deepcopy(value))
+            elif op == "$unset":
+                _unset_path(doc, path)
+            elif op == "$inc":
+                _set_path(doc, path, (_get_path(doc, path) or 0) + value)
+            elif op == "$addToSet":
+                current = _get_path(doc, path) or []
+                if not any(_same(v, value) for v in current):
+                    current = current + [value]
+                _set_path(doc, path, current)
+            elif op == "$push":
+                _set_path(doc, path, (_get_path(doc, path) or []) + [value])
+            elif op == "$pull":
+                current = _get_path(doc, path) or []
+                _set_path(
+                    doc,
+                    path,
+                    [
+                        v
+                        for v in current
+                        if not (
+                            matches(v, value)
+                            if isinstance(value, dict) and isinstance(v, dict)
+                            else _same(v, value)
+                        )
+                    ],
+                )
+            else:
+                raise NotImplementedError(f"Update operator {op} is not supported")
+
+
+def apply_projection(doc, projection):
+    """
+    Apply an inclusion projection ({"field": 1, "counters.counter": 1}) to doc.
+    """
+    if not projection:
+        return doc
+    result = {"_id": doc["_id"]} if projection.get("_id", 1) else {}
+    nested = {}
+    for key, include in projection.items():
+        if not include or key == "_id":
+            continue
+        head, _, rest = key.partition(".")
+        if rest:
+            nested.setdefault(head, {})[rest] = 1
+        elif head in doc:
+            result[head] = doc[head]
+    for head, sub in nested.items():
+        if head in result or head not in doc:
+            continue
+        value = doc[head]
+        if isinstance(value, list):
+            result[head] = [
+                (
+                    apply_projection({"_id": None, **v}, {"_id": 0, **sub})
+                    if isinstance(v, dict)
+                    else v
+                )
+                for v in value
+            ]
+        elif isinstance(value, dict):
+            result[head] = apply_projection({"_id": None, **value}, {"_id": 0, **sub})
+    return result
+
+
+# --- Collections ---
+
+
+class _SqliteCollection:
+    """Shared cursor-less find/count behaviour for SQLite-backed collections."""
+
+    def __init__(self, conn, lock=None):
+        self._conn = conn
+        self._lock = lock or threading.RLock()
+
+    def _load(self, query, fields=None):
+        raise NotImplementedError
+
+    def find(self, query=None, projection=None):
+        query = query or {}
+        with self._lock:
+            docs = [d for d in self._load(query, projection) if matches(d, query)]
+        return [apply_projection(d, projection) for d in docs]
+
+    def find_one(self, query=None, projection=None):
+        docs = self.find(query, projection)
+        return docs[0] if docs else None
+
+    def count_documents(self, query):
+        with self._lock:
+            return sum(1 for d in self._load(query, {"_id": 1}) if matches(d, query))
+
+    def update_one(self, query, update, upsert=False):
+        return self._update(query, update, many=False)
+
+    def update_many(self, query, update, upsert=False):
+        return self._update(query, update, many=True)
+
+    def _update(self, query, update, many):
+        with self._lock:
+            docs = [d for d in self._load(query) if matches(d, query)]
+            if not many:
+                docs = docs[:1]
+            modified = 0
+            self._conn.execute("BEGIN")
+            try:
+                for doc in docs:
+                    before = copy.deepcopy(doc)
+                    apply_update(doc, update)
+                    if self._write(before, doc):
+                        modified += 1
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return UpdateResult(len(docs), modified)
+
+
+class SqliteCharacterCollection(_SqliteCollection):
+    """
+    Character documents stored as a characters row plus one counters row per counter.
+    """
+
+    # Top-level keys that are pushed down into SQL when queried by equality or $in
+    _INDEXED = {"_id": "id", "user": "user", "character": "character"}
+
+    def _where(self, query):
+        clauses, params = [], []
+        for key, column in self._INDEXED.items():
+            if key not in query:
+                continue
+            condition = query[key]
+            if isinstance(condition, dict) and set(condition) == {"$in"}:
+                values = [str(v) for v in condition["$in"]]
+                if not values:
+                    return "0", []
+                clauses.append(f"{column} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+            elif not isinstance(condition, dict):
+                clauses.append(f"{column} = ?")
+                params.append(str(condition))
+        return (" AND ".join(clauses) or "1"), params
+
+    def _load(self, query, fields=None):
+        where, params = self._where(query)
+        rows = self._conn.execute(
+            f"SELECT * FROM characters WHERE {where} ORDER BY rowid", params
+        ).fetchall()
+        if not rows:
+            return []
+        docs = {}
+        for row in rows:
+            doc = {"_id": ObjectId(row["id"])}
+            doc["user"] = row["user"]
+            doc["character"] = row["character"]
+            if row["version"] is not None:
+                doc["version"] = row["version"]
+            doc["counters"] = []
+            doc["health"] = json.loads(row["health"])
+            doc.update(json.loads(row["extra"]))
+            docs[row["id"]] = doc
+        needs_counters = fields is None or any(
+            k == "counters" or k.startswith("counters.") for k in fields
+        )
+        needs_counters = needs_counters or any(
+            k == "counters" or k.startswith("counters.") for k in query
+        )
+        if needs_counters:
+            ids = list(docs)
+            for start in range(0, len(ids), 500):
+                chunk = ids[start : start + 500]
+                counter_rows = self._conn.execute(
+                    "SELECT * FROM counters WHERE character_id IN "
+                    f"({', '.join('?' * len(chunk))}) ORDER BY character_id, position",
+                    chunk,
+                ).fetchall()
+                for row in counter_rows:
+                    docs[row["character_id"]]["counters"].append(
+                        self._counter_from_row(row)
+                    )
+        return list(docs.values())
+
+    @staticmethod
+    def _counter_from_row(row):
+        counter = {}
+        for column, kind in COUNTER_COLUMNS.items():
+            value = row[column]
+            if kind is bool and value is not None:
+                value = bool(value)
+            counter[column] = value
+        extra = json.loads(row["extra"])
+        for column in extra.pop("__missing__", []):
+            counter.pop(column, None)
+        counter.update(extra)
+        return counter
+
+    @staticmethod
+    def _counter_to_row(counter):
+        values, extra = {}, {}
+        for column, kind in COUNTER_COLUMNS.items():
+            if column not in counter:
+                extra.setdefault("__missing__", []).append(column)
+                values[column] = None
+                continue
+            value = counter[column]
+            if value is None or (
+                isinstance(value, kind)
+                and not (kind is int and isinstance(value, bool))
+            ):
+                values[column] = value
+            else:
+                # Keep malformed values exactly as stored, outside the typed column
+                values[column] = None
+                extra[column] = value
+        for key, value in counter.items():
+            if key not in COUNTER_COLUMNS:
+                extra[key] = value
+        values["extra"] = json.dumps(extra, default=str)
+        return values
+
+    def _character_row(self, doc):
+        extra = {
+            k: v
+            for k, v in doc.items()
+            if k not in ("_id", "counters", "health", *CHARACTER_COLUMNS)
+        }
+        return {
+            "user": doc.get("user"),
+            "character": doc.get("character"),
+            "version": doc.get("version"),
+            "health": json.dumps(doc.get("health", []), default=str),
+            "extra": json.dumps(extra, default=str),
+        }
+
+    def _insert_counter(self, character_id, position, counter):
+        values = self._counter_to_row(counter)
+        columns = ["character_id", "position", *values]
+        self._conn.execute(
+            f"INSERT INTO counters ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' * len(columns))})",
+            [character_id, position, *values.values()],
+        )
+
+    def _write(self, before, after):
+        """Persist the difference between two versions of a document."""
+        character_id = str(after["_id"])
+        changed = False
+        old_row, new_row = self._character_row(before), self._character_row(after)
+        columns = {k: v for k, v in new_row.items() if old_row[k] != v}
+        if columns:
+            assignments = ", ".join(f"{k} = ?" for k in columns)
+            self._conn.execute(
+                f"UPDATE characters SET {assignments} WHERE id = ?",
+                [*columns.values(), character_id],
+            )
+            changed = True
+        old_counters = before.get("counters", [])
+        new_counters = after.get("counters", [])
+        for position, counter in enumerate(new_counters):
+            if position >= len(old_counters):
+                self._insert_counter(character_id, position, counter)
+                changed = True
+            elif old_counters[position] != counter:
+                values = self._counter_to_row(counter)
+                assignments = ", ".join(f"{k} = ?" for k in values)
+                self._conn.execute(
+                    f"UPDATE counters SET {assignments} "
+                    "WHERE character_id = ? AND position = ?",
+                    [*values.values(), character_id, position],
+                )
+                changed = True
+        if len(old_counters) > len(new_counters):
+            self._conn.execute(
+                "DELETE FROM counters WHERE character_id = ? AND position >= ?",
+                [character_id, len(new_counters)],
+            )
+            changed = True
+        return changed
+
+    def insert_one(self, doc):
+        if "_id" not in doc:
+            doc["_id"] = ObjectId()
+        character_id = str(doc["_id"])
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                row = self._character_row(doc)
+                self._conn.execute(
+                    f"INSERT INTO characters (id, {', '.join(row)}) "
+                    f"VALUES ({', '.join('?' * (len(row) + 1))})",
+                    [character_id, *row.values()],
+                )
+                for position, counter in enumerate(doc.get("counters", [])):
+                    self._insert_counter(character_id, position, counter)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return InsertOneResult(doc["_id"])
+
+    def delete_one(self, query):
+        with self._lock:
+            docs = [d for d in self._load(query, {"_id": 1}) if matches(d, query)]
+            if not docs:
+                return DeleteResult(0)
+            self._conn.execute(
+                "DELETE FROM characters WHERE id = ?", [str(docs[0]["_id"])]
+            )
+        return DeleteResult(1)
+
+
+class SqliteDocumentCollection(_SqliteCollection):
+    """
+    Small schemaless collections (such as parties) stored as JSON documents.
+    """
+
+    def __init__(self, conn, name, lock=None):
+        super().__init__(conn, lock)
+        self._name = name
+
+    @staticmethod
+    def _encode(doc):
+        return json.dumps(
+            doc,
+            default=lambda v: {"$oid": str(v)} if isinstance(v, ObjectId) else str(v),
+        )
+
+    @staticmethod
+    def _decode(body):
+        return json.loads(
+            body,
+            object_hook=lambda d: ObjectId(d["$oid"]) if set(d) == {"$oid"} else d,
+        )
+
+    @staticmethod
+    def _where(query):
+        """
+        Return SQL conditions and parameters for the equality and $in
+        conditions of query on INDEXED_DOCUMENT_FIELDS. The query is still
+        matched in full afterwards.
+        """
+        clauses, params = [], []
+        for field in INDEXED_DOCUMENT_FIELDS:
+            condition = query.get(field)
+            if isinstance(condition, dict) and set(condition) == {"$in"}:
+                values = list(condition["$in"])
+            else:
+                values = [condition]
+            if not values or not all(
+                isinstance(v, (str, int)) and not isinstance(v, bool) for v in values
+            ):
+                continue
+            column = f"json_extract(body, '$.{field}')"
+            if len(values) == 1:
+                clauses.append(f"{column} = ?")
+            else:
+                clauses.append(f"{column} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+        return clauses, params
+
+    def _load(self, query, fields=None):
+        if "_id" in query and not isinstance(query["_id"], dict):
+            rows = self._conn.execute(
+                "SELECT body FROM documents WHERE collection = ? AND id = ?",
+                [self._name, str(query["_id"])],
+            ).fetchall()
+        else:
+            clauses, params = self._where(query)
+            rows = self._conn.execute(
+                "SELECT body FROM documents WHERE "
+                + " AND ".join(["collection = ?"] + clauses)
+                + " ORDER BY rowid",
+                [self._name] + params,
+            ).fetchall()
+        return [self._decode(row["body"]) for row in rows]
+
+    def _write(self, before, after):
+        if before == after:
+            return False
+        self._conn.execute(
+            "UPDATE documents SET body = ? WHERE collection = ? AND id = ?",
+            [self._encode(after), self._name, str(after["_id"])],
+        )
+        return True
+
+    def insert_one(self, doc):
+        if "_id" not in doc:
+            doc["_id"] = ObjectId()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO documents (collection, id, body) VALUES (?, ?, ?)",
+                [self._name, str(doc["_id"]), self._encode(doc)],
+            )
+        return InsertOneResult(doc["_id"])
+
+    def delete_one(self, query):
+        with self._lock:
+            docs = [d for d in self._load(query) if matches(d, query)]
+            if not docs:
+                return DeleteResult(0)
+            self._conn.execute(
+                "DELETE FROM documents WHERE collection = ? AND id = ?",
+                [self._name, str(docs[0]["_id"])],
+            )
+        return DeleteResult(1)
+
+    def delete_many(self, query):
+        with self._lock:
+            ids = [str(d["_id"]) for d in self._load(query) if matches(d, query)]
+            self._conn.executemany(
+                "DELETE FROM documents WHERE collection = ? AND id = ?",
+                [(self._name, i) for i in ids],
+            )
+        return DeleteResult(len(ids))
+
+
+class SqliteDatabase:
+    """
+    Minimal stand-in for a pymongo Database: db["characters"] returns the
+    normalized character collection, any other name a JSON document collection.
+    """
+
+    def __init__(self, path: str):
+        self._conn = connect(path)
+        self._lock = threading.RLock()
+        self._collections = {}
+
+    def __getitem__(self, name):
+        if name not in self._collections:
+            if name == "characters":
+                self._collections[name] = SqliteCharacterCollection(
+                    self._conn, self._lock
+                )
+            else:
+                self._collections[name] = SqliteDocumentCollection(
+                    self._conn, name, self._lock
+                )
+        return self._collections[name]
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,33 @@
+"""
+Emoji used by the pretty counter and health displays.
+
+Each symbol can be written as a Discord shortcode (":stop_button:") or as the
+Unicode emoji it stands for. Shortcodes cost 10-23 characters per pip,
+Unicode 1-3, so the Unicode style fits several times more counters into one
+message. EMOJI_STYLE in config.py picks the style.
+"""
+
+SHORTCODE = "shortcode"
+UNICODE = "unicode"
+
+UNICODE_EMOJI = {
+    "asterisk": "*\ufe0f\u20e3",
+    "stop_button": "\u23f9\ufe0f",
+    "b": "\U0001f171\ufe0f",
+    "red_square": "\U0001f7e5",
+    "blue_square": "\U0001f7e6",
+    "large_blue_diamond": "\U0001f537",
+    "regional_indicator_a": "\U0001f1e6",
+    "regional_indicator_b": "\U0001f1e7",
+    "regional_indicator_c": "\U0001f1e8",
+    "regional_indicator_l": "\U0001f1f1",
+}
+
+
+def emoji(name, style=SHORTCODE):
+    """
+    Return the emoji called name (its shortcode without colons) in style.
+    """
+    if style == UNICODE:
+        return UNICODE_EMOJI[name]
+    return f":{name}:"
@@ -17,6 +17,57 @@ load_dotenv(os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env.test"
 # Add the parent directory to sys.path to allow importing modules
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+import caches  # noqa: E402
+import metrics  # noqa: E402
+from caches import TaggedLRUCache  # noqa: E402
+from sqlite_storage import SqliteDatabase  # noqa: E402
+from utils import (  # noqa: E402
+    add_counter,
+    add_user_character,
+    get_character_id_by_user_and_name,
+)
+
+# Cache size used for every test, unless run with --no-caches
+TEST_CACHE_SIZE = 16
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--no-caches",
+        action="store_true",
+        help="Run every test with the document, autocomplete and render caches off",
+    )
+
+
+def _test_caches(size=TEST_CACHE_SIZE):
+    return (
+        patch("caches.document_cache", TaggedLRUCache(size)),
+        patch("caches.autocomplete_cache", TaggedLRUCache(size)),
+        patch("caches.render_cache", TaggedLRUCache(size)),
+    )
+
+
+@pytest.fixture(autouse=True)
+def caches_option(request):
+    """
+    Give each test fresh caches, on as in production; with --no-caches they
+    are off instead, so the suite also runs against uncached reads.
+    Documents are only cached once a test's storage keeps them coherent.
+    """
+    size = 0 if request.config.getoption("--no-caches") else TEST_CACHE_SIZE
+    document, autocomplete, render = _test_caches(size)
+    with (
+        document,
+        autocomplete,
+        render,
+        patch(
+            "caches.settings_cache",
+            TaggedLRUCache(size, ttl=caches.SETTINGS_CACHE_TTL),
+        ),
+        patch("caches._coherent", False),
+    ):
+        yield
+
 
 # Mock MongoDB for all tests
 @pytest.fixture(autouse=True)
@@ -69,6 +120,10 @@ def test_characters_collection():
                 if key == "_id" and str(value) != str(doc_id):
                     match = False
                     break
+                elif isinstance(value, dict) and "$exists" in value:
+                    if (key in doc) != value["$exists"]:
+                        match = False
+                        break
                 elif key != "_id" and (key not in doc or doc[key] != value):
                     match = False
                     break
@@ -142,8 +197,14 @@ def test_characters_collection():
                         # Simple implementation - just matches exact dicts
                         doc[key] = [item for item in doc[key] if item != pull_criteria]
 
+            # Handle $inc operator
+            if "$inc" in update_dict:
+                for key, value in update_dict["$inc"].items():
+                    doc[key] = doc.get(key, 0) + value
+
             # Mock UpdateResult
             result = MagicMock()
+            result.matched_count = 1
             result.modified_count = 1
             return result
         elif upsert:
@@ -160,6 +221,7 @@ def test_characters_collection():
         else:
             # No match, no update
             result = MagicMock()
+            result.matched_count = 0
             result.modified_count = 0
             return result
 
@@ -215,3 +277,108 @@ def mock_interaction():
     interaction.user.id = ObjectId("123456789012345678901234")  # Use a valid ObjectId
     interaction.namespace = MagicMock()
     return interaction
+
+
+def _sqlite_storage(characters):
+    """
+    Back every repository collection with a fresh in-memory SQLite database,
+    characters in the collection named characters. Nothing else writes to it,
+    so documents may be cached. Metrics are reset and conflict retries don't
+    back off.
+    """
+    db = SqliteDatabase(":memory:")
+    metrics.reset()
+    with (
+        patch("caches._coherent", True),
+        patch("utils.characters_collection", db[characters]),
+        patch("utils.parties_collection", db["parties"]),
+        patch("utils.pins_collection", db["pins"]),
+        patch("utils.settings_collection", db["settings"]),
+        patch("utils.events_collection", db["counter_events"]),
+        patch("utils.OCC_BACKOFF", 0),
+    ):
+        yield db
+    metrics.reset()
+    db.close()
+
+
+@pytest.fixture
+def sqlite_db():
+    """SQLite storage, characters in its relational "characters" table."""
+    yield from _sqlite_storage("characters")
+
+
+@pytest.fixture
+def characters(sqlite_db):
+    return sqlite_db["characters"]
+
+
+@pytest.fixture
+def document_db():
+    """
+    SQLite storage with characters kept as whole documents in its
+    "character_documents" collection, so dotted paths into counter maps and
+    event tails are stored the way MongoDB stores them.
+    """
+    yield from _sqlite_storage("character_documents")
+
+
+@pytest.fixture
+def document_characters(document_db):
+    return document_db["character_documents"]
+
+
+@pytest.fixture
+def cached_sqlite(sqlite_db):
+    """SQLite storage with the document, autocomplete and render caches on."""
+    document, autocomplete, render = _test_caches()
+    with document, autocomplete, render:
+        yield sqlite_db
+
+
+@pytest.fixture
+def make_character():
+    """
+    Return a function that creates a character and returns its id. Every
+    name in counters gets a perm_is_maximum counter at 5.
+    """
+
+    def make(user="u", name="c", counters=()):
+        add_user_character(user, name)
+        character_id = get_character_id_by_user_and_name(user, name)
+        for counter in counters:
+            add_counter(character_id, counter, 5, counter_type="perm_is_maximum")
+        return character_id
+
+    return make
+
+
+@pytest.fixture
+def stored():
+    """Return a function that reads a character's document straight from storage."""
+
+    def find(collection, character_id):
+        return collection.find_one({"_id": ObjectId(character_id)})
+
+    return find
+
+
+@pytest.fixture
+def record_updates():
+    """
+    Return a function that starts recording the update documents passed to a
+    collection's update_one and returns the list they are appended to.
+    """
+
+    def record(collection):
+        updates = []
+        original = collection.update_one
+
+        def recording_update(query, update, upsert=False):
+            updates.append(update)
+            return original(query, update, upsert)
+
+        collection.update_one = recording_update
+        return updates
+
+    return record
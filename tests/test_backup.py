@@ -0,0 +1,103 @@
+import gzip
+
+import pytest
+from bson import ObjectId
+
+from backup import Importer, export_collection
+from sqlite_storage import SqliteDatabase
+
+
+@pytest.fixture
+def databases():
+    source, target = SqliteDatabase(":memory:"), SqliteDatabase(":memory:")
+    yield source["characters"], target["characters"]
+    source.close()
+    target.close()
+
+
+def _character(collection, name, counters=None):
+    doc = {
+        "user": "u",
+        "character": name,
+        "counters": counters or [],
+        "health": [{"health_type": "normal", "damage": {"Lethal": 1}}],
+        "version": 3,
+    }
+    collection.insert_one(doc)
+    return doc["_id"]
+
+
+def _all(collection):
+    return sorted(collection.find({}), key=lambda d: d["_id"])
+
+
+def test_export_and_import_round_trip(databases, tmp_path):
+    source, target = databases
+    for i in range(5):
+        _character(source, f"C{i}", [{"counter": "WP", "temp": i, "perm": 5}])
+    path = str(tmp_path / "characters.ndjson.gz")
+
+    assert export_collection(source, path, batch_size=2, log=None) == 5
+    with gzip.open(path, "rt") as f:
+        assert '{"$oid": ' in f.readline()
+    assert not (tmp_path / "characters.ndjson.gz.part").exists()
+
+    imported = Importer(target, path, batch_size=2, state_path=None, log=None).run()
+
+    assert imported == 5
+    assert _all(target) == _all(source)
+    assert isinstance(_all(target)[0]["_id"], ObjectId)
+
+
+def test_import_is_resumable(databases, tmp_path):
+    source, target = databases
+    ids = [_character(source, f"C{i}") for i in range(5)]
+    path = str(tmp_path / "characters.ndjson")
+    export_collection(source, path, log=None)
+    state = str(tmp_path / "state.json")
+
+    def stop_after_first_batch(message):
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        Importer(
+            target, path, batch_size=2, state_path=state, log=stop_after_first_batch
+        ).run()
+    assert [d["_id"] for d in _all(target)] == ids[:2]
+
+    inserted = []
+    original = target.insert_one
+    target.insert_one = lambda doc: inserted.append(doc["_id"]) or original(doc)
+    progress = []
+    imported = Importer(
+        target, path, batch_size=2, state_path=state, log=progress.append
+    ).run()
+
+    assert inserted == ids[2:]
+    assert imported == 5
+    assert progress[-1] == "Imported 5 documents (5 lines)"
+    assert not (tmp_path / "state.json").exists()
+
+
+def test_import_uses_unordered_upserting_bulk_writes(tmp_path):
+    path = str(tmp_path / "characters.ndjson")
+    with open(path, "w") as f:
+        f.write('{"_id": {"$oid": "507f1f77bcf86cd799439011"}, "character": "A"}\n\n')
+
+    class BulkCollection:
+        def __init__(self):
+            self.calls = []
+
+        def bulk_write(self, requests, ordered=True):
+            self.calls.append((requests, ordered))
+
+    collection = BulkCollection()
+    Importer(collection, path, state_path=None, log=None).run()
+
+    ((requests, ordered),) = collection.calls
+    assert ordered is False
+    assert requests[0]._doc == {
+        "_id": ObjectId("507f1f77bcf86cd799439011"),
+        "character": "A",
+    }
+    assert requests[0]._upsert is True
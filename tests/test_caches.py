@@ -0,0 +1,204 @@
+from unittest.mock import MagicMock, patch
+
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+
+import caches
+import utils
+from caches import TaggedLRUCache
+from invalidation import (
+    ChangeStreamListener,
+    VersionPoller,
+    handle_change,
+    start_invalidation,
+)
+from utils import (
+    generate_character_output,
+    update_counter,
+)
+
+
+def test_tagged_lru_evicts_and_invalidates_by_tag():
+    cache = TaggedLRUCache(2)
+    cache.set("a", 1, tags=["x"])
+    cache.set("b", 2, tags=["x", "y"])
+    cache.get("a")
+    cache.set("c", 3, tags=["y"])
+    assert cache.keys() == ["a", "c"]
+
+    cache.invalidate_tag("y")
+    assert cache.keys() == ["a"]
+    assert TaggedLRUCache(0).get("a", "default") == "default"
+
+
+def test_version_checks_and_invalidation_do_not_count_as_uses():
+    with patch("caches.document_cache", TaggedLRUCache(4)):
+        caches.document_cache.set("a", {"user": "u", "version": 3}, tags=["a"])
+        caches.document_cache.set("b", {"user": "u", "version": 1}, tags=["b"])
+
+        assert caches.cached_version("a") == 3
+        assert caches.cached_version("missing") is None
+        caches.invalidate_character("b")
+
+        assert caches.document_cache.keys() == ["a"]
+        assert (caches.document_cache.hits, caches.document_cache.misses) == (0, 0)
+
+
+def test_find_one_by_id_is_cached_and_writes_invalidate(cached_sqlite, make_character):
+    character_id = make_character(counters=["WP"])
+    query = {"_id": ObjectId(character_id)}
+
+    first = utils.CharacterRepository.find_one(query)
+    first["counters"].clear()  # callers get private copies
+    with patch.object(cached_sqlite["characters"], "find_one") as find_one:
+        assert utils.CharacterRepository.find_one(query)["counters"][0]["temp"] == 5
+        find_one.assert_not_called()
+
+    update_counter(character_id, "WP", "temp", -1)
+    doc = utils.CharacterRepository.find_one(query)
+    assert doc["counters"][0]["temp"] == 4
+    assert doc["version"] == 2
+
+
+def test_read_racing_a_write_is_not_cached(cached_sqlite, make_character):
+    character_id = make_character(counters=["WP"])
+    query = {"_id": ObjectId(character_id)}
+    collection = cached_sqlite["characters"]
+    original = collection.find_one
+
+    def racing_find_one(*args, **kwargs):
+        doc = original(*args, **kwargs)
+        # Another process writes before this read reaches the cache
+        collection.update_one(
+            query, {"$set": {"character": "d"}, "$inc": {"version": 1}}
+        )
+        caches.invalidate_character(character_id)
+        return doc
+
+    with patch.object(collection, "find_one", racing_find_one):
+        assert utils.CharacterRepository.find_one(query)["character"] == "c"
+    assert utils.CharacterRepository.find_one(query)["character"] == "d"
+
+
+def test_fills_need_coherent_caches_and_no_later_invalidation():
+    doc = {"_id": "a", "user": "u", "character": "c"}
+    with patch("caches.document_cache", TaggedLRUCache(4)):
+        assert not caches.store_document(doc, caches.fill_token())
+
+        with patch("caches._coherent", True):
+            token = caches.fill_token()
+            caches.invalidate_character("a")
+            assert not caches.store_document(doc, token)
+            caches.invalidate_character("b")
+            assert caches.store_document(doc, caches.fill_token())
+
+            token = caches.fill_token()
+            caches.invalidate_all()
+            assert not caches.store_document(doc, token)
+
+
+def test_render_cache_is_keyed_by_version(cached_sqlite, make_character):
+    character_id = make_character(counters=["WP"])
+    doc = utils.CharacterRepository.find_one({"_id": ObjectId(character_id)})
+    sheet = generate_character_output(doc)
+    with patch("utils.generate_counters_output") as render:
+        assert generate_character_output(doc) == sheet
+        render.assert_not_called()
+
+    update_counter(character_id, "WP", "temp", -2)
+    doc = utils.CharacterRepository.find_one({"_id": ObjectId(character_id)})
+    assert generate_character_output(doc) != sheet
+
+
+def test_invalidation_notifies_subscribers_and_drops_user_autocomplete(
+    cached_sqlite, make_character
+):
+    seen = []
+    callback = caches.subscribe(lambda cid, version: seen.append((cid, version)))
+    try:
+        caches.autocomplete_cache.set(
+            ("characters", "u"), ["c"], tags=[caches.user_tag("u")]
+        )
+        make_character(counters=["WP"])
+        assert caches.autocomplete_cache.get(("characters", "u")) is None
+        assert seen
+    finally:
+        caches.unsubscribe(callback)
+
+
+def test_handle_change_publishes_id_and_version():
+    publish = MagicMock()
+    oid = ObjectId()
+    handle_change(
+        {
+            "operationType": "update",
+            "documentKey": {"_id": oid},
+            "updateDescription": {"updatedFields": {"version": 7}},
+        },
+        publish,
+    )
+    handle_change(
+        {
+            "operationType": "insert",
+            "documentKey": {"_id": oid},
+            "fullDocument": {"user": "u", "version": 1},
+        },
+        publish,
+    )
+    handle_change({"operationType": "delete", "documentKey": {"_id": oid}}, publish)
+    assert [c.args for c in publish.call_args_list] == [
+        (oid, 7),
+        (oid, 1, "u"),
+        (oid, None),
+    ]
+
+
+def test_version_poller_invalidates_changed_and_deleted(cached_sqlite, make_character):
+    changed = make_character(name="changed", counters=["WP"])
+    same = make_character(name="same", counters=["WP"])
+    gone = make_character(name="gone", counters=["WP"])
+    for character_id in (changed, same, gone):
+        utils.CharacterRepository.find_one({"_id": ObjectId(character_id)})
+
+    # Simulate writes from another process, bypassing this process' caches
+    collection = cached_sqlite["characters"]
+    collection.update_one({"_id": ObjectId(changed)}, {"$inc": {"version": 1}})
+    collection.delete_one({"_id": ObjectId(gone)})
+
+    publish = MagicMock()
+    poller = VersionPoller(collection, interval=60, publish=publish)
+    assert poller.poll_once() == 2
+    assert sorted(c.args for c in publish.call_args_list) == sorted(
+        [(changed, 2), (gone, None)]
+    )
+
+
+def test_start_invalidation_falls_back_to_polling_without_change_streams():
+    collection = MagicMock()
+    collection.watch.side_effect = OperationFailure(
+        "The $changeStream stage is only supported on replica sets", code=40573
+    )
+    with patch("caches.document_cache", TaggedLRUCache(4)):
+        worker = start_invalidation(collection, poll_interval=60)
+    try:
+        assert isinstance(worker, VersionPoller)
+    finally:
+        worker.stop()
+
+    with (
+        patch("caches.document_cache", TaggedLRUCache(0)),
+        patch("caches.autocomplete_cache", TaggedLRUCache(0)),
+        patch("caches.render_cache", TaggedLRUCache(0)),
+    ):
+        assert start_invalidation(collection) is None
+
+
+def test_start_invalidation_prefers_change_streams():
+    collection = MagicMock()
+    with (
+        patch("caches.document_cache", TaggedLRUCache(4)),
+        patch.object(ChangeStreamListener, "start") as start,
+    ):
+        worker = start_invalidation(collection)
+    assert isinstance(worker, ChangeStreamListener)
+    start.assert_called_once()
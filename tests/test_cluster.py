@@ -0,0 +1,131 @@
+import json
+
+import discord
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import metrics
+import utils
+from avct_cog import AvctCog
+from cluster import (
+    ClusterBot,
+    ClusterConfig,
+    command_fingerprint,
+    read_fingerprint,
+    shard_ranges,
+)
+
+
+def make_config(tmp_path, shard_count=4, workers=2):
+    return ClusterConfig(
+        token="t",
+        shard_count=shard_count,
+        workers=workers,
+        state_dir=str(tmp_path),
+        metrics_interval=0,
+    )
+
+
+def test_shard_ranges_cover_all_shards_contiguously():
+    ranges = shard_ranges(10, 3)
+    assert ranges == [[0, 1, 2, 3], [4, 5, 6], [7, 8, 9]]
+    assert shard_ranges(2, 5) == [[0], [1]]
+    assert shard_ranges(3, 0) == [[0, 1, 2]]
+
+
+async def make_bot(tmp_path, worker_id=0):
+    bot = ClusterBot(make_config(tmp_path), worker_id=worker_id, shard_ids=[0, 1])
+    await bot.add_cog(AvctCog(bot))
+    bot.tree.sync = AsyncMock()
+    return bot
+
+
+@pytest.mark.asyncio
+async def test_fingerprint_is_stable_and_covers_commands(tmp_path):
+    bot = await make_bot(tmp_path)
+    first = command_fingerprint(bot.tree)
+    assert first == command_fingerprint(bot.tree)
+
+    bot.tree.remove_command("configav")
+    assert command_fingerprint(bot.tree) != first
+
+
+@pytest.mark.asyncio
+async def test_only_worker_zero_syncs_and_only_on_change(tmp_path):
+    other = await make_bot(tmp_path, worker_id=1)
+    assert await other.maybe_sync_commands() is False
+    other.tree.sync.assert_not_called()
+
+    bot = await make_bot(tmp_path, worker_id=0)
+    assert await bot.maybe_sync_commands() is True
+    bot.tree.sync.assert_awaited_once()
+    assert read_fingerprint(str(tmp_path)) == command_fingerprint(bot.tree)
+
+    # Unchanged tree: a restart does not sync again
+    restarted = await make_bot(tmp_path, worker_id=0)
+    assert await restarted.maybe_sync_commands() is False
+    restarted.tree.sync.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_command_completion_metric_is_tagged_by_shard():
+    metrics.reset()
+    metrics.set_default_tags(worker=3)
+    try:
+        cog = AvctCog(MagicMock())
+        interaction = MagicMock()
+        interaction.guild.shard_id = 5
+        command = MagicMock(qualified_name="avct show")
+        await cog.on_app_command_completion(interaction, command)
+        await cog.on_app_command_completion(interaction, command)
+
+        (entry,) = [m for m in metrics.snapshot() if m["name"] == "app_commands"]
+        assert entry["value"] == 2
+        assert entry["tags"] == {"worker": "3", "shard": "5", "command": "avct show"}
+    finally:
+        metrics.set_default_tags()
+        metrics.reset()
+
+
+@pytest.mark.asyncio
+async def test_single_process_bot_writes_metrics(tmp_path):
+    path = tmp_path / "metrics.json"
+    metrics.reset()
+    try:
+        metrics.increment("occ_conflicts", operation="update_counter_doc")
+        bot = utils.MyBot(command_prefix="/avct", intents=discord.Intents.default())
+        with patch("utils.METRICS_PATH", str(path)):
+            await bot.report_metrics.coro(bot)
+
+        (entry,) = json.loads(path.read_text())
+        assert entry["name"] == "occ_conflicts" and entry["value"] == 1
+    finally:
+        metrics.reset()
+
+
+@pytest.mark.asyncio
+async def test_each_worker_journals_to_its_own_file(tmp_path):
+    state_dir = tmp_path / "state"
+    paths = []
+    for worker_id in (0, 1):
+        bot = ClusterBot(make_config(state_dir), worker_id=worker_id, shard_ids=[0])
+        with (
+            patch.object(bot, "load_extension", AsyncMock()),
+            patch.object(bot, "maybe_sync_commands", AsyncMock()),
+            patch("cluster.start_invalidation"),
+            patch("utils.get_database"),
+            patch("utils.warm_caches", AsyncMock()),
+            patch("utils.start_activity_saver"),
+            patch("utils.start_journal_flush"),
+            patch("utils.WRITE_JOURNAL", True),
+            patch("utils.STORAGE_BACKEND", "mongodb"),
+            patch("utils.write_journal", None),
+        ):
+            await bot.setup_hook()
+            paths.append(utils.write_journal.path)
+            utils.write_journal.close()
+
+    assert paths == [
+        str(state_dir / "journal-worker-0.sqlite3"),
+        str(state_dir / "journal-worker-1.sqlite3"),
+    ]
@@ -7,6 +7,10 @@ import commands.edit_commands as edit_commands
 import commands.health_commands as health_commands
 import commands.remove_commands as remove_commands
 import commands.debug_commands as debug_commands
+import commands.party_commands as party_commands
+import commands.pin_commands as pin_commands
+import commands.history_commands as history_commands
+import commands.response_commands as response_commands
 
 import pytest
 import discord
@@ -35,6 +39,18 @@ EXPECTED_COMMAND_REGISTRATION_SIGNATURES = {
     "commands.debug_commands": {
         "register_debug_commands": ["cog"],
     },
+    "commands.party_commands": {
+        "register_party_commands": ["cog"],
+    },
+    "commands.pin_commands": {
+        "register_pin_commands": ["cog"],
+    },
+    "commands.history_commands": {
+        "register_history_commands": ["cog"],
+    },
+    "commands.response_commands": {
+        "register_response_commands": ["cog"],
+    },
 }
 
 # Expected commands and their argument names (and which ones have autocomplete)
@@ -220,6 +236,98 @@ EXPECTED_COMMANDS = [
             {"name": "character", "autocomplete": True},
         ],
     },
+    {
+        "group": "avct",
+        "subgroup": None,
+        "command": "reset_all",
+        "params": [
+            {"name": "server", "autocomplete": False},
+        ],
+    },
+    {
+        "group": "avct",
+        "subgroup": None,
+        "command": "pin",
+        "params": [
+            {"name": "character", "autocomplete": True},
+        ],
+    },
+    {
+        "group": "avct",
+        "subgroup": None,
+        "command": "unpin",
+        "params": [
+            {"name": "character", "autocomplete": True},
+        ],
+    },
+    {
+        "group": "avct",
+        "subgroup": None,
+        "command": "undo",
+        "params": [
+            {"name": "character", "autocomplete": True},
+        ],
+    },
+    {
+        "group": "avct",
+        "subgroup": None,
+        "command": "history",
+        "params": [
+            {"name": "character", "autocomplete": True},
+        ],
+    },
+    {
+        "group": "avct",
+        "subgroup": None,
+        "command": "responses",
+        "params": [
+            {"name": "mode", "autocomplete": True},
+            {"name": "server", "autocomplete": False},
+        ],
+    },
+    {
+        "group": "avct",
+        "subgroup": "party",
+        "command": "create",
+        "params": [
+            {"name": "party", "autocomplete": False},
+        ],
+    },
+    {
+        "group": "avct",
+        "subgroup": "party",
+        "command": "join",
+        "params": [
+            {"name": "party", "autocomplete": True},
+            {"name": "character", "autocomplete": True},
+        ],
+    },
+    {
+        "group": "avct",
+        "subgroup": "party",
+        "command": "leave",
+        "params": [
+            {"name": "party", "autocomplete": True},
+            {"name": "character", "autocomplete": True},
+        ],
+    },
+    {
+        "group": "avct",
+        "subgroup": "party",
+        "command": "show",
+        "params": [
+            {"name": "party", "autocomplete": True},
+            {"name": "public", "autocomplete": False},
+        ],
+    },
+    {
+        "group": "avct",
+        "subgroup": "party",
+        "command": "reset_eligible",
+        "params": [
+            {"name": "party", "autocomplete": True},
+        ],
+    },
     {
         "group": "avct",
         "subgroup": None,
@@ -261,6 +369,19 @@ EXPECTED_COMMANDS = [
             {"name": "points", "autocomplete": False},
         ],
     },
+    {
+        "group": "avct",
+        "subgroup": None,
+        "command": "adjust",
+        "params": [
+            {"name": "character", "autocomplete": True},
+            {"name": "counters", "autocomplete": False},
+            {"name": "damage_type", "autocomplete": True},
+            {"name": "damage", "autocomplete": False},
+            {"name": "heal", "autocomplete": False},
+            {"name": "chimerical", "autocomplete": False},
+        ],
+    },
 ]
 
 
@@ -272,6 +393,10 @@ EXPECTED_COMMANDS = [
     (health_commands, "commands.health_commands"),
     (remove_commands, "commands.remove_commands"),
     (debug_commands, "commands.debug_commands"),
+    (party_commands, "commands.party_commands"),
+    (pin_commands, "commands.pin_commands"),
+    (history_commands, "commands.history_commands"),
+    (response_commands, "commands.response_commands"),
 ])
 def test_command_registration_signatures(module, module_name):
     expected_funcs = EXPECTED_COMMAND_REGISTRATION_SIGNATURES[module_name]
@@ -5,6 +5,7 @@ from counter import (
     PredefinedCounterEnum,
     CounterTypeEnum,
 )
+from symbols import UNICODE
 
 
 class TestCounter:
@@ -425,6 +426,40 @@ class TestCounter:
         assert html_name in display
         assert html_comment in display
 
+    def test_generate_display_pretty_unicode(self):
+        counter = Counter(
+            "Willpower",
+            3,
+            5,
+            "tempers",
+            counter_type=CounterTypeEnum.perm_is_maximum_bedlam.value,
+            bedlam=2,
+        )
+        display = counter.generate_display_pretty(lambda x: x, UNICODE)
+        filled, bedlam_spent = "*\ufe0f\u20e3", "\U0001f7e5"
+        expected = (
+            f"Willpower\n{filled} {filled} {filled} {bedlam_spent} {bedlam_spent}"
+        )
+        assert display == expected
+
+    @pytest.mark.parametrize(
+        "counter_type",
+        [
+            CounterTypeEnum.perm_is_maximum.value,
+            CounterTypeEnum.perm_not_maximum.value,
+            CounterTypeEnum.single_number.value,
+        ],
+    )
+    def test_unicode_display_is_a_fraction_of_the_size(self, counter_type):
+        # A 10-dot willpower line, half spent
+        counter = Counter("Willpower", 5, 10, "tempers", counter_type=counter_type)
+        shortcodes = counter.generate_display(lambda x: x, True).split("\n", 1)[1]
+        unicode = counter.generate_display(lambda x: x, True, UNICODE).split("\n", 1)[1]
+
+        # Discord's message limit counts characters
+        assert len(unicode) * 3 <= len(shortcodes)
+        assert len(unicode.encode()) * 3 <= len(shortcodes.encode()) * 2
+
 
 class TestCounterFactory:
     def test_create_factory_method(self):
@@ -0,0 +1,181 @@
+import os
+import subprocess
+import sys
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from avct_cog import AvctCog
+from counter import counter_key, counters_from_map, counters_to_map
+from migrate import Migration
+from utils import (
+    add_counter,
+    get_counters_for_character,
+    remove_counter,
+    rename_counter,
+    reset_if_eligible_many,
+    set_counter_category,
+    update_counter,
+)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def characters(document_characters):
+    with patch("utils.COUNTER_MAP_LAYOUT", True):
+        yield document_characters
+
+
+def test_counter_key_is_case_insensitive_and_field_safe():
+    assert counter_key("Willpower") == counter_key("willpower")
+    assert counter_key("Tom's Gift") == counter_key("Tom&#x27;s Gift")
+    assert counter_key("a.b$c%") == "a%2Eb%24c%25"
+
+
+def test_counter_model_does_not_import_utils():
+    code = (
+        "import sys, counter; counter.counter_key('WP');"
+        " sys.exit('utils' in sys.modules)"
+    )
+    assert subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT).returncode == 0
+
+
+def test_map_round_trip_keeps_order_and_rejects_duplicates():
+    counters = [{"counter": "Zeta"}, {"counter": "alpha"}]
+    assert [c["counter"] for c in counters_from_map(counters_to_map(counters))] == [
+        "Zeta",
+        "alpha",
+    ]
+    with pytest.raises(ValueError):
+        counters_to_map([{"counter": "WP"}, {"counter": "wp"}])
+
+
+def test_new_character_stores_counters_as_a_map(characters, make_character, stored):
+    character_id = make_character()
+    add_counter(character_id, "Willpower", 5, counter_type="perm_is_maximum")
+    add_counter(character_id, "Blood", 10, counter_type="perm_is_maximum")
+
+    doc = stored(characters, character_id)
+    assert doc["counter_layout"] == "map"
+    assert sorted(doc["counters"]) == ["blood", "willpower"]
+    assert "bedlam_error" not in doc["counters"]["blood"]
+    assert [c.counter for c in get_counters_for_character(character_id)] == [
+        "Willpower",
+        "Blood",
+    ]
+
+
+def test_updates_write_only_the_changed_fields(
+    characters, make_character, record_updates
+):
+    character_id = make_character()
+    add_counter(character_id, "Willpower", 5, counter_type="perm_is_maximum")
+    updates = record_updates(characters)
+
+    assert update_counter(character_id, "willpower", "temp", -2) == (True, None)
+    assert set_counter_category(character_id, "Willpower", "tempers") == (True, None)
+
+    assert [set(u["$set"]) for u in updates] == [
+        {"counters.willpower.temp", "counters.willpower.perm"},
+        {"counters.willpower.category"},
+    ]
+    (counter,) = get_counters_for_character(character_id)
+    assert (counter.temp, counter.category) == (3, "tempers")
+
+
+def test_duplicate_check_is_a_key_lookup(characters, make_character):
+    character_id = make_character()
+    add_counter(character_id, "Willpower", 5)
+    success, error = add_counter(character_id, "WILLPOWER", 3)
+    assert not success and "exists" in error
+
+
+def test_rename_moves_the_counter_and_keeps_its_place(
+    characters, make_character, stored
+):
+    character_id = make_character()
+    for name in ("Willpower", "Blood", "Glamour"):
+        add_counter(character_id, name, 5)
+
+    assert rename_counter(character_id, "Blood", "Vitae") == (True, None)
+    assert rename_counter(character_id, "Glamour", "GLAMOUR") == (True, None)
+    assert rename_counter(character_id, "Vitae", "willpower")[0] is False
+
+    doc = stored(characters, character_id)
+    assert sorted(doc["counters"]) == ["glamour", "vitae", "willpower"]
+    assert [c.counter for c in get_counters_for_character(character_id)] == [
+        "Willpower",
+        "Vitae",
+        "GLAMOUR",
+    ]
+
+
+def test_remove_unsets_the_counter(characters, make_character, stored, record_updates):
+    character_id = make_character()
+    add_counter(character_id, "Willpower", 5)
+    add_counter(character_id, "Blood", 5)
+    updates = record_updates(characters)
+
+    success, _, details = remove_counter(character_id, "willpower")
+
+    assert success and "Blood" in details
+    assert updates[0]["$unset"] == {"counters.willpower": ""}
+    assert list(stored(characters, character_id)["counters"]) == ["blood"]
+
+
+def test_reset_many_resets_map_layout_counters(characters, make_character):
+    character_id = make_character()
+    add_counter(
+        character_id, "Willpower", 5, counter_type="perm_is_maximum", is_resettable=True
+    )
+    update_counter(character_id, "Willpower", "temp", -3)
+
+    results = reset_if_eligible_many({"user": "u"})
+
+    assert results == {character_id: ("c", 1)}
+    assert get_counters_for_character(character_id)[0].temp == 5
+
+
+def test_migration_converts_between_layouts(characters, make_character, stored):
+    with patch("utils.COUNTER_MAP_LAYOUT", False):
+        character_id = make_character()
+        add_counter(character_id, "Willpower", 5)
+        add_counter(character_id, "Blood", 3)
+    characters.insert_one(
+        {
+            "user": "u",
+            "character": "dupes",
+            "counters": [{"counter": "WP"}, {"counter": "wp"}],
+        }
+    )
+
+    stats = Migration(characters, state_path=None, log=None, counter_layout="map").run()
+
+    assert stats["duplicates"] == 1
+    doc = stored(characters, character_id)
+    assert doc["counter_layout"] == "map"
+    assert doc["counters"]["blood"]["order"] == 1
+    assert isinstance(characters.find_one({"character": "dupes"})["counters"], list)
+
+    Migration(characters, state_path=None, log=None, counter_layout="list").run()
+    doc = stored(characters, character_id)
+    assert doc["counter_layout"] == "list"
+    assert [c["counter"] for c in doc["counters"]] == ["Willpower", "Blood"]
+    assert "order" not in doc["counters"][0]
+
+
+@pytest.mark.asyncio
+async def test_debug_lists_map_layout_counters(characters, make_character):
+    character_id = make_character()
+    add_counter(character_id, "Willpower", 5)
+    cog = AvctCog(MagicMock())
+    await cog.cog_load()
+    interaction = MagicMock()
+    interaction.user.id = "u"
+    interaction.response.send_message = AsyncMock()
+
+    await cog.configav_group.get_command("debug").callback(interaction)
+
+    content = interaction.response.send_message.await_args.args[0]
+    assert "Counter: Willpower | temp: 5 | perm: 5" in content
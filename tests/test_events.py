@@ -0,0 +1,243 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from bson import ObjectId
+
+from avct_cog import AvctCog
+from caches import TaggedLRUCache
+from commands.paging import PageView
+from events import describe
+from health import Health, HealthTypeEnum, DamageEnum
+from utils import (
+    CharacterRepository,
+    EventRepository,
+    adjust_character,
+    compact_pending,
+    generate_character_output,
+    get_character_history,
+    get_counters_for_character,
+    get_party_character_docs,
+    get_user_character_health,
+    set_counter_category,
+    undo_last_change,
+    update_counter,
+)
+
+
+@pytest.fixture
+def db(document_db):
+    with patch("utils.EVENT_LOG", True):
+        yield document_db
+
+
+def _temp(character_id, name="Willpower"):
+    (counter,) = [
+        c for c in get_counters_for_character(character_id) if c.counter == name
+    ]
+    return counter.temp
+
+
+def test_changes_are_appended_not_rewritten(db, make_character, stored, record_updates):
+    character_id = make_character(counters=["Willpower"])
+    updates = record_updates(db["character_documents"])
+
+    update_counter(character_id, "Willpower", "temp", -2)
+    update_counter(character_id, "Willpower", "temp", 1)
+
+    assert [set(u) for u in updates] == [{"$push", "$set", "$inc"}] * 2
+    doc = stored(db["character_documents"], character_id)
+    assert doc["counters"][0]["temp"] == 5
+    assert [e["set"] for e in doc["event_tail"]] == [
+        {"counters": {"willpower": {"temp": 3}}, "health": {}},
+        {"counters": {"willpower": {"temp": 4}}, "health": {}},
+    ]
+    assert _temp(character_id) == 4
+
+
+def test_compaction_folds_the_tail_and_keeps_the_events(db, make_character, stored):
+    character_id = make_character(counters=["Willpower"])
+    update_counter(character_id, "Willpower", "temp", -2)
+
+    assert compact_pending() == 1
+    assert compact_pending() == 0
+
+    doc = stored(db["character_documents"], character_id)
+    assert doc["event_tail"] == []
+    assert doc["counters"][0]["temp"] == 3
+    (event,) = db["counter_events"].find({"character_id": character_id})
+    assert (event["seq"], event["op"]) == (1, "temp")
+    assert _temp(character_id) == 3
+
+
+def test_tail_is_folded_at_the_limit(db, make_character, stored):
+    character_id = make_character(counters=["Willpower"])
+    with patch("utils.EVENT_TAIL_LIMIT", 3):
+        for _ in range(4):
+            update_counter(character_id, "Willpower", "temp", -1)
+
+    doc = stored(db["character_documents"], character_id)
+    assert [e["seq"] for e in doc["event_tail"]] == [4]
+    assert doc["counters"][0]["temp"] == 2
+    assert len(db["counter_events"].find({})) == 3
+    assert _temp(character_id) == 1
+
+
+def test_other_counter_writes_fold_the_tail_first(db, make_character, stored):
+    character_id = make_character(counters=["Willpower"])
+    update_counter(character_id, "Willpower", "temp", -2)
+
+    assert set_counter_category(character_id, "Willpower", "tempers") == (True, None)
+
+    doc = stored(db["character_documents"], character_id)
+    assert doc["event_tail"] == []
+    assert doc["counters"][0]["temp"] == 3
+    assert doc["counters"][0]["category"] == "tempers"
+
+
+def test_damage_and_heal_are_events(db, make_character, stored, record_updates):
+    character_id = make_character(counters=["Willpower"])
+    db["character_documents"].update_one(
+        {"_id": ObjectId(character_id)},
+        {"$set": {"health": [Health(HealthTypeEnum.normal.value).to_dict()]}},
+    )
+    updates = record_updates(db["character_documents"])
+
+    adjust_character(
+        character_id,
+        {"Willpower": -1},
+        damage_type=DamageEnum.Lethal,
+        damage_levels=2,
+    )
+    adjust_character(character_id, {}, heal_levels=1)
+
+    # The events hold the resulting counts; no $inc touches the snapshot
+    assert [u["$inc"] for u in updates] == [{"version": 1}] * 2
+    doc = stored(db["character_documents"], character_id)
+    assert [e["op"] for e in doc["event_tail"]] == ["damage", "heal"]
+    assert [
+        e["set"]["health"]["normal"]["damage"]["Lethal"] for e in doc["event_tail"]
+    ] == [2, 1]
+    assert [
+        e["prev"]["health"]["normal"]["damage"]["Lethal"] for e in doc["event_tail"]
+    ] == [0, 2]
+    assert doc["health"][0]["damage"]["Lethal"] == 0
+    (tracker,) = get_user_character_health(character_id)
+    assert Health.from_dict(tracker).damage == ["Lethal"]
+    assert _temp(character_id) == 4
+
+    compact_pending()
+    health = stored(db["character_documents"], character_id)["health"][0]
+    assert health["damage"] == {"Aggravated": 0, "Lethal": 1, "Bashing": 0}
+
+
+def test_undo_reverts_changes_newest_first(db, make_character):
+    character_id = make_character(counters=("Willpower", "Blood"))
+    update_counter(character_id, "Willpower", "temp", -2)
+    update_counter(character_id, "Blood", "temp", -1)
+    compact_pending()
+
+    success, error, undone = undo_last_change(character_id)
+    assert (success, error, undone["seq"]) == (True, None, 2)
+    assert _temp(character_id, "Blood") == 5
+
+    # The undo itself is skipped, so the change before it is reverted next
+    assert undo_last_change(character_id)[2]["seq"] == 1
+    assert _temp(character_id) == 5
+    assert undo_last_change(character_id) == (False, "Nothing to undo.", None)
+
+    history = get_character_history(character_id)
+    assert [(e["seq"], e.get("undoes")) for e in history] == [
+        (4, 1),
+        (3, 2),
+        (2, None),
+        (1, None),
+    ]
+    assert describe(history[-1]) == "#1 temp: willpower temp 5 -> 3"
+
+
+def test_undo_requires_the_event_log(db, make_character, stored):
+    character_id = make_character(counters=["Willpower"])
+    with patch("utils.EVENT_LOG", False):
+        update_counter(character_id, "Willpower", "temp", -2)
+        assert undo_last_change(character_id) == (
+            False,
+            "Change history is not enabled.",
+            None,
+        )
+    assert "event_tail" not in stored(db["character_documents"], character_id)
+
+
+def test_party_sheets_include_pending_events(db, make_character):
+    character_id = make_character(counters=["Willpower"])
+    update_counter(character_id, "Willpower", "temp", -3)
+
+    full = CharacterRepository.find_one({"_id": ObjectId(character_id)})
+    expected = generate_character_output(full)
+
+    with patch("caches.render_cache", TaggedLRUCache(16)):
+        (doc,) = get_party_character_docs({"characters": [ObjectId(character_id)]})
+        assert doc["counters"][0]["temp"] == 2
+        assert generate_character_output(doc) == expected
+        # The party render is cached under the key full renders use
+        assert generate_character_output(full) == expected
+
+
+def test_events_of_a_conflicting_fold_are_not_archived(db, make_character, stored):
+    character_id = make_character(counters=["Willpower"])
+    collection = db["character_documents"]
+    original = collection.update_one
+    interfered = []
+
+    def racing_update(query, change, upsert=False):
+        # Another command changes the character between our read and write
+        if "version" in query and not interfered:
+            interfered.append(True)
+            assert set_counter_category(character_id, "Willpower", "tempers")[0]
+        return original(query, change, upsert)
+
+    with patch("utils.EVENT_TAIL_LIMIT", 3):
+        update_counter(character_id, "Willpower", "temp", -1)
+        update_counter(character_id, "Willpower", "temp", -1)
+        collection.update_one = racing_update
+        update_counter(character_id, "Willpower", "temp", -3)
+        collection.update_one = original
+
+    archived = sorted(e["seq"] for e in db["counter_events"].find({}))
+    assert archived == [1, 2]
+    (pending,) = stored(db["character_documents"], character_id)["event_tail"]
+    assert pending["seq"] == 3
+
+    compact_pending()
+    (event,) = db["counter_events"].find({"seq": 3})
+    assert event["set"] == pending["set"]
+    assert _temp(character_id) == 0
+
+
+def test_empty_event_batch_is_not_written():
+    collection = MagicMock()
+    with patch("utils.events_collection", collection):
+        EventRepository.insert_missing([])
+    collection.bulk_write.assert_not_called()
+    collection.insert_one.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_history_is_paged_and_uses_display_names(db, make_character):
+    names = [f"Discipline Pool {i}" for i in range(16)]
+    character_id = make_character(counters=names)
+    for _ in range(5):
+        adjust_character(character_id, {name: -1 for name in names})
+    cog = AvctCog(MagicMock())
+    await cog.cog_load()
+    interaction = MagicMock()
+    interaction.user.id = "u"
+    interaction.response.send_message = AsyncMock()
+
+    await cog.avct_group.get_command("history").callback(interaction, "c")
+
+    args, kwargs = interaction.response.send_message.await_args
+    assert args[0].startswith(
+        "Recent changes for 'c':\n#5 adjust: Discipline Pool 0 temp 1 -> 0;"
+    )
+    assert len(args[0]) <= 2000
+    assert isinstance(kwargs["view"], PageView)
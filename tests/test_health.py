@@ -42,7 +42,7 @@ def test_add_health_level_sorting(fake_character_repository):
     assert success, f"Failed to add health level: {error}"
 
     updated_health = fake_character_repository.data[str(character_id)]["health"][0]
-    assert updated_health["health_levels"] == [
+    assert Health.from_dict(updated_health).health_levels == [
         "Bruised",
         "Hurt",
         "Injured",
@@ -68,7 +68,7 @@ def test_add_health_level_with_duplicates(fake_character_repository):
     assert success, f"Failed to add health level: {error}"
 
     updated_health = fake_character_repository.data[str(character_id)]["health"][0]
-    assert updated_health["health_levels"] == [
+    assert Health.from_dict(updated_health).health_levels == [
         "Bruised",
         "Hurt",
         "Hurt",
@@ -1,5 +1,6 @@
 # Import health-related functionality
 from health import Health, HealthTypeEnum, DamageEnum, display_health, HEALTH_LEVELS
+from symbols import UNICODE
 from utils import add_health_level
 from bson import ObjectId
 
@@ -226,6 +227,20 @@ class TestHealthSystem:
         assert ":regional_indicator_l:" in combined_display  # Normal lethal
         assert ":regional_indicator_a:" in combined_display  # Chimerical aggravated
 
+    def test_display_health_unicode(self):
+        normal_health = Health(health_type=HealthTypeEnum.normal.value)
+        normal_health.damage = [DamageEnum.Lethal.value, DamageEnum.Bashing.value]
+        chimerical_health = Health(health_type=HealthTypeEnum.chimerical.value)
+
+        shortcodes = display_health(normal_health, chimerical_health)
+        display = display_health(normal_health, chimerical_health, UNICODE)
+
+        lines = display.split("\n")
+        assert lines[0] == "\U0001f7e6 \U0001f1e8"
+        assert lines[1] == "\U0001f1f1 \u23f9\ufe0f Bruised"
+        assert lines[2] == "\U0001f1e7 \u23f9\ufe0f Hurt (-1)"
+        assert len(display.encode()) * 3 < len(shortcodes.encode()) * 2
+
     def test_add_damage_sorts_correctly(self):
         health = Health(health_type=HealthTypeEnum.normal.value)
         # Add damage in a random order
@@ -268,7 +283,8 @@ def test_add_health_level_success(monkeypatch):
     success, error = add_health_level(char_id, "normal", "Hurt")
     assert success
     assert error is None
-    assert doc["health"][0]["health_levels"].count("Hurt") == initial_count + 1
+    levels = Health.from_dict(doc["health"][0]).health_levels
+    assert levels.count("Hurt") == initial_count + 1
 
 
 def test_add_health_level_duplicate(monkeypatch):
@@ -282,7 +298,8 @@ def test_add_health_level_duplicate(monkeypatch):
     success, error = add_health_level(char_id, "normal", health_level_type="Hurt")
     assert success
     assert error is None
-    assert doc["health"][0]["health_levels"].count("Hurt") == initial_count + 1
+    levels = Health.from_dict(doc["health"][0]).health_levels
+    assert levels.count("Hurt") == initial_count + 1
 
 
 def test_add_health_level_no_tracker(monkeypatch):
@@ -328,3 +345,23 @@ def test_health_add_damage_with_extra_level():
     assert (
         health.damage.count(DamageEnum.Bashing.value) >= 1
     )  # Should contain some Bashing
+
+
+def test_count_form_renders_like_the_list_form():
+    normal = Health(health_type=HealthTypeEnum.normal.value)
+    chimerical = Health(health_type=HealthTypeEnum.chimerical.value)
+    normal.health_levels.insert(1, "Hurt")
+    for levels, damage_type in [
+        (2, DamageEnum.Bashing),
+        (1, DamageEnum.Aggravated),
+        (3, DamageEnum.Lethal),
+    ]:
+        normal.add_damage(levels, damage_type)
+        chimerical.add_damage(levels, damage_type)
+    normal.remove_damage(1)
+
+    stored = [normal.to_dict(), chimerical.to_dict()]
+    assert stored[0]["damage"] == {"Aggravated": 1, "Lethal": 3, "Bashing": 1}
+    assert stored[0]["health_levels"]["Hurt"] == 2
+    legacy = [normal.__dict__, chimerical.__dict__]
+    assert Health.from_dict(stored[0]).display(stored) == normal.display(legacy)
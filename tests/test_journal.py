@@ -0,0 +1,152 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import AutoReconnect
+
+import journal
+from avct_cog import AvctCog
+from utils import (
+    flush_journal,
+    get_counters_for_character,
+    update_counter,
+)
+
+
+class FlakyCollection:
+    """A collection whose writes fail while down is set."""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.down = False
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    def update_one(self, query, update, upsert=False):
+        if self.down:
+            raise AutoReconnect("connection refused")
+        return self.collection.update_one(query, update, upsert)
+
+
+@pytest.fixture
+def setup(document_characters, make_character, tmp_path):
+    characters = FlakyCollection(document_characters)
+    write_journal = journal.Journal(str(tmp_path / "journal.sqlite3"))
+    # Synchronous tests journal in the context every test shares
+    queued = journal.queued.set(False)
+    with (
+        patch("utils.characters_collection", characters),
+        patch("utils.write_journal", write_journal),
+    ):
+        character_id = make_character(counters=["Willpower"])
+        yield characters, write_journal, character_id
+    journal.queued.reset(queued)
+    write_journal.close()
+
+
+def _stored_temp(characters, character_id):
+    doc = characters.find_one({"_id": ObjectId(character_id)})
+    return doc["counters"][0]["temp"]
+
+
+def _temp(character_id):
+    return get_counters_for_character(character_id)[0].temp
+
+
+def test_writes_during_an_outage_are_journaled_and_flushed(setup):
+    characters, write_journal, character_id = setup
+    characters.down = True
+
+    assert update_counter(character_id, "Willpower", "temp", -2) == (True, None)
+    characters.down = False
+    # Queued behind the pending entry even though the database is back
+    assert update_counter(character_id, "Willpower", "temp", -1) == (True, None)
+
+    assert len(write_journal) == 2
+    assert _stored_temp(characters, character_id) == 5
+    assert _temp(character_id) == 2
+
+    assert flush_journal() == (2, 0)
+    assert len(write_journal) == 0
+    assert _stored_temp(characters, character_id) == 2
+    assert _temp(character_id) == 2
+
+
+def test_flush_stops_while_the_database_is_down(setup):
+    characters, write_journal, character_id = setup
+    characters.down = True
+    update_counter(character_id, "Willpower", "temp", -2)
+
+    assert flush_journal() == (0, 0)
+    assert len(write_journal) == 1
+
+
+def test_replaying_an_applied_entry_is_harmless(setup):
+    characters, write_journal, character_id = setup
+    characters.down = True
+    update_counter(character_id, "Willpower", "temp", -2)
+    # The write reached the database after all, e.g. after a timeout
+    (entry,) = write_journal.entries()
+    characters.collection.update_one(entry.query, entry.update)
+    characters.down = False
+
+    assert _temp(character_id) == 3
+    assert flush_journal() == (1, 0)
+    assert _stored_temp(characters, character_id) == 3
+
+
+def test_conflicting_entries_are_dropped(setup, capsys):
+    characters, write_journal, character_id = setup
+    characters.down = True
+    update_counter(character_id, "Willpower", "temp", -2)
+    # Another process writes the character first
+    characters.collection.update_one(
+        {"_id": ObjectId(character_id)},
+        {"$set": {"counters.0.temp": 1}, "$inc": {"version": 1}},
+    )
+    characters.down = False
+
+    assert flush_journal() == (0, 1)
+    assert _stored_temp(characters, character_id) == 1
+    assert f"Dropped journaled write to {character_id}" in capsys.readouterr().out
+
+
+@pytest.mark.asyncio
+async def test_command_with_a_journaled_write_says_it_was_queued(setup):
+    characters, _, character_id = setup
+    cog = AvctCog(MagicMock())
+    command = MagicMock(qualified_name="avct plus")
+
+    async def run_command(journaled):
+        characters.down = journaled
+        update_counter(character_id, "Willpower", "temp", -1)
+        interaction = MagicMock()
+        interaction.response.is_done.return_value = True
+        interaction.followup.send = AsyncMock()
+        # Completion listeners run in a task of their own, like bot.dispatch
+        await asyncio.create_task(cog.on_app_command_completion(interaction, command))
+        return interaction.followup.send
+
+    # Each command runs in its own task, as discord.py invokes them
+    send = await asyncio.create_task(run_command(journaled=True))
+    send.assert_awaited_once_with(journal.QUEUED_MESSAGE, ephemeral=True)
+    characters.down = False
+    assert flush_journal() == (1, 0)
+    send = await asyncio.create_task(run_command(journaled=False))
+    send.assert_not_awaited()
+
+
+def test_journal_survives_a_restart(tmp_path):
+    path = str(tmp_path / "journal.sqlite3")
+    first = journal.Journal(path)
+    query, update = journal.keyed({"_id": ObjectId()}, {"$set": {"a": 1}}, "k1")
+    first.append(query["_id"], "k1", query, update)
+    first.close()
+
+    reopened = journal.Journal(path)
+    assert reopened.has_pending(query["_id"])
+    (entry,) = reopened.entries()
+    assert (entry.key, entry.query, entry.update) == ("k1", query, update)
+    reopened.close()
@@ -0,0 +1,196 @@
+import pytest
+from bson import ObjectId
+
+import utils
+from migrate import Migration, normalize_document
+from utils import get_character_id_by_user_and_name, get_counters_for_character
+
+
+def _legacy(collection, name, counters=None, user="u"):
+    doc = {"user": user, "character": name, "counters": counters or []}
+    collection.insert_one(doc)
+    return doc["_id"]
+
+
+LEGACY_COUNTER = {
+    "counter": "Tom's Gift",
+    "temp": "3",
+    "perm": 5,
+    "counter_type": "perm_is_maximum_bedlam",
+    "bedlam_error": None,
+}
+
+
+def test_normalize_document():
+    fields = normalize_document(
+        {"character": "Tom & Jerry", "counters": [LEGACY_COUNTER], "health": []}
+    )
+    assert fields["character"] == "Tom &amp; Jerry"
+    (counter,) = fields["counters"]
+    assert counter["counter"] == "Tom&#x27;s Gift"
+    assert counter["temp"] == 3
+    assert "bedlam_error" not in counter
+    assert counter["category"] == "general" and counter["bedlam"] == 0
+    assert "health" not in fields
+    # Already normalized documents are left alone
+    assert normalize_document({"character": "Tom &amp; Jerry", "health": []}) == {
+        "counters": []
+    }
+
+
+def test_normalize_document_stores_health_as_counts():
+    (tracker,) = normalize_document(
+        {"character": "A", "health": [{"health_type": "normal", "damage": ["Lethal"]}]}
+    )["health"]
+    assert tracker["damage"] == {"Aggravated": 0, "Lethal": 1, "Bashing": 0}
+    assert set(tracker["health_levels"].values()) == {1}
+
+
+def test_migration_normalizes_and_enables_single_lookup(characters, tmp_path):
+    raw_id = _legacy(characters, "Tom & Jerry", [LEGACY_COUNTER])
+    clean_id = _legacy(characters, "Plain")
+    assert get_character_id_by_user_and_name("u", "Tom & Jerry") is None
+
+    stats = Migration(
+        characters, batch_size=1, state_path=str(tmp_path / "state.json"), log=None
+    ).run()
+
+    assert stats == {"scanned": 2, "updated": 1, "duplicates": 0, "conflicts": 0}
+    assert get_character_id_by_user_and_name("u", "Tom & Jerry") == str(raw_id)
+    assert get_character_id_by_user_and_name("u", "Tom &amp; Jerry") == str(raw_id)
+    (counter,) = get_counters_for_character(str(raw_id))
+    assert (counter.counter, counter.temp) == ("Tom&#x27;s Gift", 3)
+    assert characters.find_one({"_id": raw_id})["version"] == 1
+    # Documents already in canonical form are not rewritten
+    assert "version" not in characters.find_one({"_id": clean_id})
+    assert not (tmp_path / "state.json").exists()
+
+
+def test_migration_keeps_both_spellings_of_a_duplicate(characters):
+    _legacy(characters, "A &amp; B")
+    raw_id = _legacy(characters, "A & B")
+    logged = []
+
+    stats = Migration(characters, state_path=None, log=logged.append).run()
+
+    assert stats["duplicates"] == 1
+    assert characters.find_one({"_id": raw_id})["character"] == "A & B"
+    assert "already exists" in logged[0]
+
+
+def test_migration_resumes_after_interruption(characters, tmp_path):
+    ids = [_legacy(characters, f"C{i} & co") for i in range(3)]
+    state = str(tmp_path / "state.json")
+    progress = []
+
+    def stop_after_first_batch(message):
+        progress.append(message)
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        Migration(
+            characters, batch_size=2, state_path=state, log=stop_after_first_batch
+        ).run()
+    assert [characters.find_one({"_id": i})["character"] for i in ids] == [
+        "C0 &amp; co",
+        "C1 &amp; co",
+        "C2 & co",
+    ]
+
+    writes = []
+    original = characters.update_one
+    characters.update_one = lambda q, u: writes.append(q["_id"]) or original(q, u)
+    stats = Migration(characters, batch_size=2, state_path=state, log=None).run()
+
+    assert writes == [ids[2]]
+    assert stats["scanned"] == 3 and stats["updated"] == 3
+
+
+def test_migration_rereads_documents_changed_concurrently(characters):
+    character_id = _legacy(characters, "Tom & Jerry")
+    original = characters.update_one
+    raced = []
+
+    def racing_update(query, update):
+        if not raced:
+            raced.append(True)
+            utils.CharacterRepository.update_one(
+                {"_id": ObjectId(character_id)}, {"$set": {"health": []}}
+            )
+        return original(query, update)
+
+    characters.update_one = racing_update
+    stats = Migration(characters, state_path=None, log=None).run()
+
+    assert stats["updated"] == 1 and stats["conflicts"] == 0
+    doc = characters.find_one({"_id": character_id})
+    assert doc["character"] == "Tom &amp; Jerry" and doc["version"] == 2
+
+
+def test_dry_run_writes_nothing(characters):
+    character_id = _legacy(characters, "Tom & Jerry")
+    stats = Migration(characters, state_path=None, dry_run=True, log=None).run()
+    assert stats["updated"] == 1
+    assert characters.find_one({"_id": character_id})["character"] == "Tom & Jerry"
+
+
+def test_migration_folds_the_event_tail_first(document_db):
+    characters = document_db["character_documents"]
+    event = {
+        "seq": 1,
+        "op": "temp",
+        "at": 0.0,
+        "set": {"counters": {"tom&#x27;s gift": {"temp": 1}}, "health": {}},
+        "prev": {"counters": {"tom&#x27;s gift": {"temp": 3}}, "health": {}},
+    }
+    doc = {
+        "user": "u",
+        "character": "Tom",
+        "counters": [LEGACY_COUNTER],
+        "event_seq": 1,
+        "event_tail": [event],
+    }
+    characters.insert_one(doc)
+
+    Migration(characters, state_path=None, log=None).run()
+
+    stored = characters.find_one({"_id": doc["_id"]})
+    assert stored["event_tail"] == []
+    (counter,) = stored["counters"]
+    assert (counter["counter"], counter["temp"]) == ("Tom&#x27;s Gift", 1)
+    (archived,) = document_db["counter_events"].find({"character_id": str(doc["_id"])})
+    assert archived["seq"] == 1 and archived["set"] == event["set"]
+
+
+def test_conflict_retry_rereads_only_lost_writes_and_keeps_claims(characters):
+    first = _legacy(characters, "X & Y")
+    # Canonicalizes to the name the first document is renamed to
+    second = _legacy(characters, "X &#38; Y", [LEGACY_COUNTER])
+    original_update, original_find_one = characters.update_one, characters.find_one
+    raced, reread = [], []
+
+    def racing_update(query, update):
+        if query["_id"] == second and not raced:
+            raced.append(True)
+            legacy = {"health_type": "normal", "damage": ["Lethal"]}
+            utils.CharacterRepository.update_one(
+                {"_id": ObjectId(second)}, {"$set": {"health": [legacy]}}
+            )
+        return original_update(query, update)
+
+    def find_one(query, *args, **kwargs):
+        if set(query) == {"_id"}:
+            reread.append(query["_id"])
+        return original_find_one(query, *args, **kwargs)
+
+    characters.update_one = racing_update
+    characters.find_one = find_one
+    stats = Migration(characters, state_path=None, log=None).run()
+
+    assert reread == [second]
+    assert stats == {"scanned": 2, "updated": 2, "duplicates": 1, "conflicts": 0}
+    assert original_find_one({"_id": first})["character"] == "X &amp; Y"
+    doc = original_find_one({"_id": second})
+    assert doc["character"] == "X &#38; Y"
+    assert doc["health"][0]["damage"]["Lethal"] == 1
+    assert doc["counters"][0]["temp"] == 3
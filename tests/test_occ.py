@@ -0,0 +1,269 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from bson import ObjectId
+
+import metrics
+import utils
+from avct_cog import AvctCog
+from health import DamageEnum, Health
+from utils import (
+    CONFLICT_ERROR,
+    VersionConflict,
+    _save_character_fields,
+    add_counter,
+    adjust_character,
+    get_counters_for_character,
+    set_counter_value,
+    toggle_counter_option,
+    update_counter,
+    update_counter_in_db,
+    update_health_in_db,
+)
+
+
+def _occ_counts(operation):
+    return {
+        m["name"]: m["value"]
+        for m in metrics.snapshot()
+        if m["name"].startswith("occ_") and m["tags"].get("operation") == operation
+    }
+
+
+def _interfere(collection, character_id, update, times=1):
+    """
+    Make the next `times` writes to the character lose a race against `update`,
+    applied directly to the collection as another process would.
+    """
+    original = collection.update_one
+    remaining = [times]
+
+    def racing_update(query, change, upsert=False):
+        if remaining[0] and "version" in query:
+            remaining[0] -= 1
+            original({"_id": ObjectId(character_id)}, update)
+        return original(query, change, upsert)
+
+    collection.update_one = racing_update
+
+
+def test_stale_write_raises_version_conflict(characters, make_character):
+    character_id = make_character(counters=["WP"])
+    stale = utils.CharacterRepository.find_one({"_id": ObjectId(character_id)})
+    update_counter(character_id, "WP", "temp", -1)
+
+    with pytest.raises(VersionConflict):
+        _save_character_fields(character_id, stale, {"counters": []})
+    assert get_counters_for_character(character_id)[0].temp == 4
+
+
+def test_legacy_document_without_version_is_written_once(characters, make_character):
+    character_id = make_character()
+    doc = characters.find_one({"_id": ObjectId(character_id)})
+    assert "version" not in doc
+
+    _save_character_fields(character_id, doc, {"health": []})
+    assert doc["version"] == 1
+    with pytest.raises(VersionConflict):
+        _save_character_fields(
+            character_id, {"_id": ObjectId(character_id)}, {"health": []}
+        )
+
+
+def test_conflicting_update_is_retried_without_losing_either_write(
+    characters, make_character
+):
+    character_id = make_character(counters=["WP"])
+    add_counter(character_id, "Blood", 10, counter_type="perm_is_maximum")
+    doc = characters.find_one({"_id": ObjectId(character_id)})
+    doc["counters"][1]["temp"] = 7
+    _interfere(
+        characters,
+        character_id,
+        {"$set": {"counters": doc["counters"]}, "$inc": {"version": 1}},
+    )
+
+    success, error = update_counter(character_id, "WP", "temp", -2)
+
+    assert success and error is None
+    temps = {c.counter: c.temp for c in get_counters_for_character(character_id)}
+    assert temps == {"WP": 3, "Blood": 7}
+    assert _occ_counts("update_counter_doc") == {"occ_conflicts": 1, "occ_retries": 1}
+
+
+def test_damage_is_not_lost_to_a_concurrent_write(characters, make_character):
+    character_id = make_character()
+    utils.CharacterRepository.update_one(
+        {"_id": ObjectId(character_id)},
+        {"$set": {"health": [Health(health_type="normal").__dict__]}},
+    )
+    tracker = Health(health_type="normal")
+    tracker.add_damage(1, DamageEnum.Bashing)
+    _interfere(
+        characters,
+        character_id,
+        {"$set": {"health": [tracker.__dict__]}, "$inc": {"version": 1}},
+    )
+
+    success, _, char_doc, _ = adjust_character(
+        character_id, {}, damage_type=DamageEnum.Lethal, damage_levels=1
+    )
+
+    assert success
+    assert Health.from_dict(char_doc["health"][0]).damage == ["Lethal", "Bashing"]
+    stored = characters.find_one({"_id": ObjectId(character_id)})
+    assert Health.from_dict(stored["health"][0]).damage == ["Lethal", "Bashing"]
+
+
+def test_bedlam_is_validated_against_the_perm_it_is_written_with(
+    characters, make_character
+):
+    character_id = make_character()
+    add_counter(character_id, "Glamour", 5, counter_type="perm_is_maximum_bedlam")
+    doc = characters.find_one({"_id": ObjectId(character_id)})
+    doc["counters"][0]["perm"] = 2
+    doc["counters"][0]["temp"] = 2
+    _interfere(
+        characters,
+        character_id,
+        {"$set": {"counters": doc["counters"]}, "$inc": {"version": 1}},
+    )
+
+    success, error, _ = set_counter_value(character_id, "Glamour", "bedlam", 4)
+
+    assert not success
+    assert error == "Bedlam cannot be greater than perm for this counter type."
+    counter = get_counters_for_character(character_id)[0]
+    assert (counter.perm, counter.bedlam) == (2, 0)
+
+
+def test_set_perm_caps_temp_and_respects_bedlam(characters, make_character):
+    character_id = make_character()
+    add_counter(
+        character_id, "Glamour", 5, counter_type="perm_is_maximum_bedlam", bedlam=2
+    )
+    assert set_counter_value(character_id, "Glamour", "perm", 1)[1] == (
+        "Perm cannot be set below bedlam (2)."
+    )
+    success, _, char_doc = set_counter_value(character_id, "Glamour", "perm", 3)
+    assert success
+    assert (char_doc["counters"][0]["perm"], char_doc["counters"][0]["temp"]) == (3, 3)
+
+
+def test_retries_are_bounded(characters, make_character):
+    character_id = make_character(counters=["WP"])
+    _interfere(characters, character_id, {"$inc": {"version": 1}}, times=100)
+
+    with patch("utils.OCC_MAX_RETRIES", 2):
+        result = update_counter(character_id, "WP", "temp", -1)
+
+    assert result == (False, CONFLICT_ERROR)
+    assert get_counters_for_character(character_id)[0].temp == 5
+    assert _occ_counts("update_counter_doc") == {
+        "occ_conflicts": 3,
+        "occ_retries": 2,
+        "occ_failures": 1,
+    }
+
+
+def test_exhausted_retries_are_reported(characters, make_character):
+    character_id = make_character(counters=["WP"])
+    utils.CharacterRepository.update_one(
+        {"_id": ObjectId(character_id)},
+        {"$set": {"health": [Health(health_type="normal").__dict__]}},
+    )
+    _interfere(characters, character_id, {"$inc": {"version": 1}}, times=100)
+
+    with patch("utils.OCC_MAX_RETRIES", 0):
+        assert update_counter_in_db(character_id, "WP", "perm", 6) == (
+            False,
+            CONFLICT_ERROR,
+            [],
+        )
+        assert update_health_in_db(
+            character_id, "normal", [DamageEnum.Lethal.value]
+        ) == (False, CONFLICT_ERROR, [])
+
+
+def test_backoff_sleeps_off_the_event_loop(characters, make_character):
+    character_id = make_character(counters=["WP"])
+    _interfere(characters, character_id, {"$inc": {"version": 1}}, times=2)
+
+    with patch("utils.OCC_BACKOFF", 1), patch("utils.time.sleep") as sleep:
+        assert update_counter(character_id, "WP", "temp", -1) == (True, None)
+    assert sleep.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_backoff_never_blocks_the_event_loop(characters, make_character):
+    character_id = make_character(counters=["WP"])
+    _interfere(characters, character_id, {"$inc": {"version": 1}}, times=2)
+
+    with patch("utils.OCC_BACKOFF", 1), patch("utils.time.sleep") as sleep:
+        assert update_counter(character_id, "WP", "temp", -1) == (True, None)
+    sleep.assert_not_called()
+    assert get_counters_for_character(character_id)[0].temp == 4
+
+
+@pytest.mark.asyncio
+async def test_edit_counter_reports_a_lost_race(characters, make_character):
+    character_id = make_character(counters=["WP"])
+    _interfere(characters, character_id, {"$inc": {"version": 1}}, times=100)
+    cog = AvctCog(MagicMock())
+    await cog.cog_load()
+    interaction = MagicMock()
+    interaction.user.id = "u"
+    interaction.response.send_message = AsyncMock()
+
+    with patch("utils.OCC_MAX_RETRIES", 0):
+        callback = cog.edit_group.get_command("counter").callback
+        await callback(interaction, "c", "WP", "perm", 6)
+
+    interaction.response.send_message.assert_awaited_once_with(
+        CONFLICT_ERROR, ephemeral=True
+    )
+    assert get_counters_for_character(character_id)[0].perm == 5
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "command, points, counter_type, resettable, raced_temp, expected",
+    [
+        ("plus", 1, "single_number", False, 8, (9, 9)),
+        ("minus", 1, "single_number", False, 8, (7, 7)),
+        ("minus", 3, "perm_is_maximum", True, 2, (0, 5)),
+    ],
+)
+async def test_plus_and_minus_apply_to_the_stored_value(
+    characters,
+    command,
+    points,
+    counter_type,
+    resettable,
+    raced_temp,
+    expected,
+    make_character,
+):
+    character_id = make_character()
+    add_counter(character_id, "WP", 5, counter_type=counter_type)
+    if resettable:
+        toggle_counter_option(character_id, "WP", "is_resettable", True)
+    doc = characters.find_one({"_id": ObjectId(character_id)})
+    perm = raced_temp if counter_type == "single_number" else 5
+    doc["counters"][0].update(temp=raced_temp, perm=perm)
+    cog = AvctCog(MagicMock())
+    await cog.cog_load()
+    interaction = MagicMock()
+    interaction.user.id = "u"
+    interaction.response.send_message = AsyncMock()
+    # Another command changes the counter after this one read it
+    _interfere(
+        characters,
+        character_id,
+        {"$set": {"counters": doc["counters"]}, "$inc": {"version": 1}},
+    )
+    callback = cog.avct_group.get_command(command).callback
+    await callback(interaction, "c", "WP", points)
+
+    counter = get_counters_for_character(character_id)[0]
+    assert (counter.temp, counter.perm) == expected
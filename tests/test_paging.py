@@ -0,0 +1,103 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from commands.paging import PageView, send_pages
+from utils import (
+    LazyPages,
+    character_sheet_sections,
+    generate_character_output,
+    paginate_sections,
+)
+
+
+def _counter(name, category):
+    return {
+        "counter": name,
+        "temp": 3,
+        "perm": 5,
+        "counter_type": "perm_is_maximum",
+        "category": category,
+    }
+
+
+def _recording_sections(count, size):
+    rendered = []
+
+    def section(i):
+        def render():
+            rendered.append(i)
+            return f"{i}:" + "x" * size
+
+        return render
+
+    return [section(i) for i in range(count)], rendered
+
+
+def _interaction(user_id=1):
+    interaction = MagicMock()
+    interaction.user.id = user_id
+    interaction.response.send_message = AsyncMock()
+    interaction.response.edit_message = AsyncMock()
+    return interaction
+
+
+def test_sheet_sections_render_the_full_sheet():
+    doc = {
+        "counters": [_counter("WP", "general"), _counter("Glamour", "tempers")],
+        "health": [{"health_type": "normal", "damage": {"Lethal": 1}}],
+    }
+    sections = [render() for render in character_sheet_sections(doc)]
+    assert len(sections) == 3
+    assert "\n\n".join(sections) == generate_character_output(doc).strip()
+
+
+def test_lazy_pages_render_only_what_a_page_needs():
+    sections, rendered = _recording_sections(10, 500)
+    pages = LazyPages(sections, limit=1200, header="Sheet:")
+
+    first = pages.page(0)
+
+    assert first.startswith("Sheet:\n0:") and len(first) <= 1200
+    # Page one is closed by the first section that does not fit on it
+    assert rendered == [0, 1, 2]
+    assert pages.has_next(0) and pages.label(0) == "1/…"
+    assert pages.page(1).startswith("Sheet:\n2:")
+    assert rendered == [0, 1, 2, 3, 4]
+
+
+def test_lazy_pages_match_paginate_sections():
+    texts = [f"{i}:" + "y" * (i * 97 % 700) for i in range(12)]
+    pages = LazyPages(texts, limit=1000)
+    expected = paginate_sections(texts, limit=1000)
+
+    assert [pages.page(i) for i in range(len(expected))] == expected
+    assert not pages.has_next(len(expected) - 1)
+    assert pages.label(0) == f"1/{len(expected)}"
+    assert pages.last_index(len(expected) + 3) == len(expected) - 1
+
+
+@pytest.mark.asyncio
+async def test_single_page_is_sent_without_buttons():
+    interaction = _interaction()
+    await send_pages(interaction, LazyPages(["short"]), ephemeral=True)
+    interaction.response.send_message.assert_awaited_once_with("short", ephemeral=True)
+
+
+@pytest.mark.asyncio
+async def test_page_buttons_turn_pages_for_their_owner_only():
+    sections, rendered = _recording_sections(6, 900)
+    interaction = _interaction()
+    await send_pages(interaction, LazyPages(sections, limit=1000), ephemeral=False)
+    view = interaction.response.send_message.await_args.kwargs["view"]
+    assert isinstance(view, PageView)
+    assert view.previous_page.disabled and not view.next_page.disabled
+    assert rendered == [0, 1]
+
+    press = _interaction()
+    await view.next_page.callback(press)
+    assert press.response.edit_message.await_args.kwargs["content"].startswith("1:")
+    assert view.index == 1 and not view.previous_page.disabled
+    assert rendered == [0, 1, 2]
+
+    assert await view.interaction_check(_interaction(user_id=2)) is False
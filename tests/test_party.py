@@ -0,0 +1,144 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from bson import ObjectId
+
+from avct_cog import AvctCog
+from utils import (
+    CHARACTER_SHEET_PROJECTION,
+    add_character_to_party,
+    add_counter,
+    create_party,
+    get_counters_for_character,
+    get_guild_character_ids,
+    get_party_character_docs,
+    paginate_sections,
+    remove_character_from_party,
+    update_counter,
+)
+
+
+@pytest.fixture
+def parties():
+    collection = MagicMock()
+    collection.find_one.return_value = None
+    with patch("utils.parties_collection", collection):
+        yield collection
+
+
+def test_create_party(parties):
+    success, error = create_party("guild", "Night Crew", "gm")
+    assert success and error is None
+    parties.insert_one.assert_called_once_with(
+        {"guild": "guild", "name": "Night Crew", "owner": "gm", "characters": []}
+    )
+
+
+def test_create_party_rejects_duplicates_and_bad_names(parties):
+    parties.find_one.return_value = {"name": "Night Crew"}
+    success, error = create_party("guild", "Night Crew", "gm")
+    assert not success and "already exists" in error
+
+    success, error = create_party("guild", "<b>", "gm")
+    assert not success and "alphanumeric" in error
+
+
+def test_add_and_remove_party_members(parties):
+    member = ObjectId()
+    party_id = ObjectId()
+    parties.find_one.return_value = {"_id": party_id, "characters": []}
+    success, _ = add_character_to_party("guild", "Night Crew", str(member))
+    assert success
+    parties.update_one.assert_called_with(
+        {"_id": party_id}, {"$addToSet": {"characters": member}}
+    )
+
+    parties.find_one.return_value = {"_id": party_id, "characters": [member]}
+    success, error = add_character_to_party("guild", "Night Crew", str(member))
+    assert not success and "already" in error
+
+    success, _ = remove_character_from_party("guild", "Night Crew", str(member))
+    assert success
+    parties.update_one.assert_called_with(
+        {"_id": party_id}, {"$pull": {"characters": member}}
+    )
+
+
+def test_get_party_character_docs_uses_one_query_in_party_order():
+    first, second, gone = ObjectId(), ObjectId(), ObjectId()
+    collection = MagicMock()
+    collection.find.return_value = [
+        {"_id": second, "character": "B"},
+        {"_id": first, "character": "A"},
+    ]
+    with patch("utils.characters_collection", collection):
+        docs = get_party_character_docs({"characters": [first, gone, second]})
+
+    collection.find.assert_called_once_with(
+        {"_id": {"$in": [first, gone, second]}}, CHARACTER_SHEET_PROJECTION
+    )
+    assert [d["character"] for d in docs] == ["A", "B"]
+
+
+def test_paginate_sections_keeps_sections_whole():
+    sections = ["a" * 900, "b" * 900, "c" * 900]
+    pages = paginate_sections(sections, limit=2000)
+    assert pages == ["a" * 900 + "\n\n" + "b" * 900, "c" * 900]
+
+
+def test_paginate_sections_splits_oversized_sections_on_lines():
+    section = "\n".join(["x" * 40] * 10)
+    pages = paginate_sections(["head", section], limit=100)
+    assert all(len(p) <= 100 for p in pages)
+    assert "".join(pages).count("x") == 400
+    assert pages[0] == "head"
+
+
+def test_paginate_sections_wraps_single_long_line():
+    pages = paginate_sections(["y" * 250], limit=100)
+    assert pages == ["y" * 100, "y" * 100, "y" * 50]
+
+
+@pytest.mark.asyncio
+async def test_server_reset_all_covers_party_characters_for_managers(
+    sqlite_db, make_character
+):
+    ids = [
+        make_character(user, name)
+        for user, name in [("a", "A"), ("b", "B"), ("c", "C")]
+    ]
+    for character_id in ids:
+        add_counter(
+            character_id, "Daily", 3, counter_type="perm_is_maximum", is_resettable=True
+        )
+        update_counter(character_id, "Daily", "temp", -3)
+    create_party("10", "Night Crew", "a")
+    create_party("10", "Day Crew", "b")
+    create_party("20", "Elsewhere", "c")
+    add_character_to_party("10", "Night Crew", ids[0])
+    add_character_to_party("10", "Day Crew", ids[0])
+    add_character_to_party("10", "Day Crew", ids[1])
+    add_character_to_party("20", "Elsewhere", ids[2])
+    assert get_guild_character_ids("10") == [ObjectId(ids[0]), ObjectId(ids[1])]
+
+    cog = AvctCog(MagicMock())
+    await cog.cog_load()
+    reset_all = cog.avct_group.get_command("reset_all")
+    interaction = MagicMock()
+    interaction.guild_id = 10
+    interaction.response.send_message = AsyncMock()
+
+    interaction.permissions.manage_guild = False
+    await reset_all.callback(interaction, server=True)
+    args, _ = interaction.response.send_message.await_args
+    assert args[0].startswith("Only members who can manage this server")
+
+    interaction.permissions.manage_guild = True
+    await reset_all.callback(interaction, server=True)
+    args, _ = interaction.response.send_message.await_args
+    assert (
+        args[0]
+        == "Reset eligible counters:\nA: 1 counter(s) reset\nB: 1 counter(s) reset"
+    )
+    temps = [get_counters_for_character(i)[0].temp for i in ids]
+    assert temps == [3, 3, 0]
@@ -0,0 +1,158 @@
+import asyncio
+import os
+import runpy
+import sys
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import discord
+import pytest
+from bson import ObjectId
+
+import avct_cog
+import pins
+from pins import PinManager
+from utils import (
+    add_pin,
+    get_pins,
+    update_counter,
+)
+
+
+def make_bot():
+    bot = MagicMock()
+    message = MagicMock()
+    message.edit = AsyncMock()
+    bot.get_partial_messageable.return_value.get_partial_message.return_value = message
+    return bot, message
+
+
+def _pin(character_id, channel_id="10", message_id="100"):
+    pin = {
+        "character_id": character_id,
+        "guild_id": "1",
+        "channel_id": channel_id,
+        "message_id": message_id,
+    }
+    add_pin(**pin)
+    return pin
+
+
+@pytest.mark.asyncio
+async def test_burst_of_changes_produces_one_edit(sqlite_db, make_character):
+    character_id = make_character(counters=["WP"])
+    bot, message = make_bot()
+    manager = PinManager(bot, debounce=0.05)
+    manager.start()
+    try:
+        manager.track(_pin(character_id))
+        for _ in range(5):
+            update_counter(character_id, "WP", "temp", -1)
+        await asyncio.sleep(0.15)
+    finally:
+        manager.stop()
+
+    message.edit.assert_awaited_once()
+    content = message.edit.await_args.kwargs["content"]
+    assert content.startswith("Counters for character 'c':")
+    assert "WP" in content
+
+
+@pytest.mark.asyncio
+async def test_unchanged_sheet_is_not_edited(sqlite_db, make_character):
+    character_id = make_character(counters=["WP"])
+    bot, message = make_bot()
+    manager = PinManager(bot, debounce=0)
+    pin = _pin(character_id)
+    manager.track(pin)
+    assert await manager.refresh(character_id) == 1
+    assert await manager.refresh(character_id) == 0
+    message.edit.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_deleted_message_drops_the_pin(sqlite_db, make_character):
+    character_id = make_character(counters=["WP"])
+    bot, message = make_bot()
+    message.edit.side_effect = discord.NotFound(MagicMock(status=404), "gone")
+    manager = PinManager(bot, debounce=0)
+    manager.track(_pin(character_id))
+
+    assert await manager.refresh(character_id) == 0
+    assert get_pins({"character_id": character_id}) == []
+    manager.notify(character_id)  # no longer tracked, nothing scheduled
+    assert not manager._pending
+
+
+@pytest.mark.asyncio
+async def test_load_keeps_pins_for_served_guilds(sqlite_db, make_character):
+    character_id = make_character(counters=["WP"])
+    _pin(character_id, channel_id="10", message_id="100")
+    other = _pin(character_id, channel_id="20", message_id="200")
+    sqlite_db["pins"].update_one(
+        {"message_id": other["message_id"]}, {"$set": {"guild_id": "2"}}
+    )
+    bot, _ = make_bot()
+    bot.get_guild.side_effect = lambda guild_id: object() if guild_id == 1 else None
+    manager = PinManager(bot)
+    await manager.load()
+    assert list(manager._pins[character_id]) == ["100"]
+
+
+def test_pins_follow_changes_when_started_by_main(
+    sqlite_db, make_character, monkeypatch, tmp_path
+):
+    # python main.py, with only the Discord connection itself faked
+    character_id = make_character(counters=["WP"])
+    refreshed = []
+
+    async def connect(bot, *, reconnect=True):
+        manager = bot.get_cog("AvctCog").pins
+        manager.debounce = 0
+        manager.refresh = AsyncMock(return_value=1)
+        manager.track(_pin(character_id))
+        await asyncio.to_thread(update_counter, character_id, "WP", "temp", -1)
+        for _ in range(50):
+            if manager.refresh.await_count:
+                break
+            await asyncio.sleep(0.01)
+        refreshed.extend(call.args for call in manager.refresh.await_args_list)
+
+    user = {"id": "1", "username": "avct", "discriminator": "0", "avatar": None}
+    application = SimpleNamespace(
+        id=1, interactions_endpoint_url=None, flags=discord.ApplicationFlags()
+    )
+    monkeypatch.chdir(tmp_path)
+    # load_extension re-imports avct_cog and unloading drops it again
+    monkeypatch.setitem(sys.modules, "avct_cog", avct_cog)
+    monkeypatch.setattr("utils.get_database", lambda: sqlite_db)
+    monkeypatch.setattr("utils.start_invalidation", lambda collection: None)
+    with (
+        patch("discord.http.HTTPClient.static_login", AsyncMock(return_value=user)),
+        patch("discord.Client.application_info", AsyncMock(return_value=application)),
+        patch("discord.app_commands.CommandTree.sync", AsyncMock()),
+        patch("discord.Client.connect", connect),
+    ):
+        runpy.run_path(
+            os.path.join(os.path.dirname(__file__), "..", "main.py"),
+            run_name="__main__",
+        )
+
+    assert refreshed == [(character_id,)]
+    # Metrics and warmup files are only written when their paths are set
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_add_pin_replaces_pin_in_same_channel(sqlite_db):
+    character_id = str(ObjectId())
+    first = _pin(character_id, message_id="100")
+    _pin(character_id, channel_id="20", message_id="200")
+    previous = add_pin(character_id, "1", "10", "300")
+    assert previous["message_id"] == first["message_id"]
+    assert sorted(p["message_id"] for p in get_pins({})) == ["200", "300"]
+
+
+def test_render_pinned_sheet_fits_one_message():
+    doc = {"character": "c", "counters": [], "health": []}
+    with patch("pins.generate_character_output", return_value="x\n" * 3000):
+        assert len(pins.render_pinned_sheet(doc)) <= 2000
@@ -0,0 +1,63 @@
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+import metrics
+import utils
+from commands.autocomplete import character_name_autocomplete
+from utils import (
+    get_character_id_by_user_and_name,
+    get_counters_for_character,
+    rename_character,
+)
+
+
+async def _autocomplete(user, current):
+    interaction = SimpleNamespace(user=SimpleNamespace(id=user))
+    choices = await character_name_autocomplete(interaction, current)
+    # The prefetch thread runs one job at a time, so this waits for it
+    utils._prefetch_executor.submit(lambda: None).result()
+    return [c.name for c in choices]
+
+
+def _counts(name):
+    return {
+        m["tags"].get("result", "hit"): m["value"]
+        for m in metrics.snapshot()
+        if m["name"] == name
+    }
+
+
+@pytest.mark.asyncio
+async def test_single_match_is_prefetched(cached_sqlite, make_character):
+    rook = make_character("u", "Rook", counters=["WP"])
+    make_character("u", "Raven", counters=["WP"])
+
+    assert await _autocomplete("u", "Roo") == ["Rook"]
+    assert _counts("prefetches") == {"loaded": 1}
+
+    with patch.object(cached_sqlite["characters"], "find_one") as find_one:
+        assert get_character_id_by_user_and_name("u", "Rook") == rook
+        assert [c.counter for c in get_counters_for_character(rook)] == ["WP"]
+    find_one.assert_not_called()
+    assert _counts("prefetch_hits") == {"hit": 1}
+
+
+@pytest.mark.asyncio
+async def test_ambiguous_prefix_is_not_prefetched(cached_sqlite, make_character):
+    make_character("u", "Rook", counters=["WP"])
+    make_character("u", "Raven", counters=["WP"])
+
+    assert await _autocomplete("u", "R") == ["Rook", "Raven"]
+    assert _counts("prefetches") == {}
+
+
+@pytest.mark.asyncio
+async def test_rename_drops_prefetched_name(cached_sqlite, make_character):
+    make_character("u", "Rook", counters=["WP"])
+    await _autocomplete("u", "Rook")
+
+    rename_character("u", "Rook", "Crow")
+    assert get_character_id_by_user_and_name("u", "Rook") is None
+    assert get_character_id_by_user_and_name("u", "Crow") is not None
@@ -0,0 +1,181 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from bson import ObjectId
+
+from avct_cog import AvctCog
+from commands.paging import FullSheetView, PageView, send_change
+from counter import CounterFactory
+from health import Health, HealthTypeEnum, DamageEnum
+from utils import (
+    LazyPages,
+    get_counters_for_character,
+    get_response_mode,
+    render_counter_change,
+    render_health_change,
+    set_response_mode,
+    update_counter_comment,
+)
+
+
+def _interaction(user_id=1, guild_id=10):
+    interaction = MagicMock()
+    interaction.user.id = user_id
+    interaction.guild_id = guild_id
+    interaction.response.send_message = AsyncMock()
+    interaction.response.edit_message = AsyncMock()
+    return interaction
+
+
+async def _commands():
+    cog = AvctCog(MagicMock())
+    await cog.cog_load()
+    return {c.name: c for c in cog.avct_group.commands}
+
+
+def _counter(name, temp, perm, counter_type="perm_is_maximum"):
+    return CounterFactory.from_dict(
+        {"counter": name, "temp": temp, "perm": perm, "counter_type": counter_type}
+    )
+
+
+def test_render_counter_change():
+    before, after = _counter("Willpower", 5, 5), _counter("Willpower", 3, 5)
+    assert render_counter_change(before, after) == "Willpower: 5/5 → 3/5"
+    assert render_counter_change(before, None) == "Willpower: 5/5 → removed"
+
+    points = _counter("XP", 2, 2, "single_number")
+    assert render_counter_change(points, _counter("XP", 4, 4)) == "XP: 2 → 4/4"
+
+
+def test_render_health_change():
+    before = Health(HealthTypeEnum.normal.value)
+    after = Health(HealthTypeEnum.normal.value)
+    after.add_damage(2, DamageEnum.Lethal)
+    after.add_damage(1, DamageEnum.Bashing)
+    assert render_health_change(before.to_dict(), after.to_dict()) == (
+        "Health (normal): no damage → 2 Lethal, 1 Bashing (Injured, -1)"
+    )
+
+
+def test_user_mode_overrides_server_mode(document_db):
+    with patch("utils.RESPONSE_MODE", "full"):
+        assert get_response_mode("1", 10) == "full"
+
+        assert set_response_mode("guild", "10", "delta") == (True, None)
+        assert get_response_mode("1", 10) == "delta"
+        assert get_response_mode("1", None) == "full"
+
+        assert set_response_mode("user", "1", "full") == (True, None)
+        assert get_response_mode("1", 10) == "full"
+
+        assert set_response_mode("user", "1", None) == (True, None)
+        assert get_response_mode("1", 10) == "delta"
+
+    assert set_response_mode("user", "1", "terse")[0] is False
+    assert len(document_db["settings"].find({})) == 2
+
+
+@pytest.mark.asyncio
+async def test_full_sheet_is_rendered_only_when_asked_for():
+    loads = []
+
+    def load_pages():
+        loads.append(1)
+        return LazyPages(["a" * 900, "b" * 900], limit=1000, header="Sheet:")
+
+    interaction = _interaction()
+    await send_change(interaction, "Willpower: 5/5 → 4/5", load_pages)
+
+    view = interaction.response.send_message.await_args.kwargs["view"]
+    assert isinstance(view, FullSheetView) and loads == []
+
+    press = _interaction()
+    await view.show_full.callback(press)
+    kwargs = press.response.edit_message.await_args.kwargs
+    assert kwargs["content"] == "Sheet:\n" + "a" * 900
+    assert isinstance(kwargs["view"], PageView)
+    assert loads == [1]
+
+    assert await view.interaction_check(_interaction(user_id=2)) is False
+
+
+@pytest.mark.asyncio
+async def test_plus_and_damage_answer_with_the_change_in_delta_mode(
+    document_db, make_character
+):
+    character_id = make_character("1", "Rook", counters=["Willpower"])
+    document_db["character_documents"].update_one(
+        {"_id": ObjectId(character_id)},
+        {"$set": {"health": [Health(HealthTypeEnum.normal.value).to_dict()]}},
+    )
+    set_response_mode("user", "1", "delta")
+    commands = await _commands()
+
+    interaction = _interaction()
+    await commands["minus"].callback(interaction, "Rook", "Willpower", 2)
+    args, kwargs = interaction.response.send_message.await_args
+    assert args[0] == (
+        "Removed 2 point(s) from counter 'Willpower' on character 'Rook'.\n"
+        "Willpower: 5/5 → 3/5"
+    )
+    assert isinstance(kwargs["view"], FullSheetView)
+
+    interaction = _interaction()
+    collection = document_db["character_documents"]
+    with patch.object(collection, "find_one", wraps=collection.find_one) as find_one:
+        await commands["damage"].callback(interaction, "Rook", "Lethal", 1)
+    args, _ = interaction.response.send_message.await_args
+    assert args[0].endswith("Health (normal): no damage → 1 Lethal (Bruised, 0)")
+    # The tracker before the change comes from the read the write is based on
+    by_id = [c for c in find_one.call_args_list if "_id" in c.args[0]]
+    assert len(by_id) == 1
+
+    set_response_mode("user", "1", "full")
+    interaction = _interaction()
+    await commands["plus"].callback(interaction, "Rook", "Willpower", 1)
+    args, kwargs = interaction.response.send_message.await_args
+    assert "Health Trackers" in args[0] and "view" not in kwargs
+
+
+@pytest.mark.asyncio
+async def test_adjust_pages_a_long_sheet(document_db, make_character):
+    names = [f"Discipline {i}" for i in range(6)]
+    character_id = make_character("1", "Rook", counters=names)
+    for name in names:
+        update_counter_comment(character_id, name, "x" * 400)
+    commands = await _commands()
+
+    interaction = _interaction()
+    await commands["adjust"].callback(interaction, "Rook", "discipline 0:-1")
+    args, kwargs = interaction.response.send_message.await_args
+    assert args[0].startswith(
+        "Adjusted character 'Rook':\ndiscipline 0 -1\n\n"
+        "Counters for character 'Rook':"
+    )
+    assert len(args[0]) <= 2000
+    assert isinstance(kwargs["view"], PageView)
+
+
+@pytest.mark.asyncio
+async def test_counter_commands_match_names_in_any_case(document_db, make_character):
+    character_id = make_character("1", "Rook", counters=["Willpower"])
+    cog = AvctCog(MagicMock())
+    await cog.cog_load()
+
+    interaction = _interaction()
+    temp = cog.character_group.get_command("temp")
+    await temp.callback(interaction, "Rook", "willpower", 2)
+    args, _ = interaction.response.send_message.await_args
+    assert "not found" not in args[0]
+
+    interaction = _interaction()
+    edit = cog.edit_group.get_command("counter")
+    await edit.callback(interaction, "Rook", "WILLPOWER", "perm", 4)
+    args, _ = interaction.response.send_message.await_args
+    assert "not found" not in args[0]
+
+    counters = {
+        c.counter: (c.temp, c.perm) for c in get_counters_for_character(character_id)
+    }
+    assert counters == {"Willpower": (2, 4)}
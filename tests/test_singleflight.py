@@ -0,0 +1,190 @@
+import asyncio
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+from bson import ObjectId
+
+import utils
+from singleflight import SingleFlight, query_key
+
+
+def test_concurrent_threads_share_one_call():
+    flight = SingleFlight("test")
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(1)
+        return {"value": [1]}
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(flight.do("k", fn)))
+        for _ in range(5)
+    ]
+    for t in threads:
+        t.start()
+    while flight.executed + flight.shared < 5:
+        time.sleep(0.001)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert flight.stats()["executed"] == 1 and flight.stats()["shared"] == 4
+    assert all(r == {"value": [1]} for r in results)
+    assert len({id(r) for r in results}) == 5  # every caller gets its own copy
+
+
+def test_followers_see_the_leaders_error():
+    flight = SingleFlight("test")
+    started, release = threading.Event(), threading.Event()
+
+    def fn():
+        started.set()
+        release.wait(1)
+        raise RuntimeError("boom")
+
+    errors = []
+
+    def call():
+        try:
+            flight.do("k", fn)
+        except RuntimeError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(1)
+    follower = threading.Thread(target=call)
+    follower.start()
+    while flight.shared < 1:
+        time.sleep(0.001)
+    release.set()
+    leader.join()
+    follower.join()
+    assert len(errors) == 2
+    # Keys are released after an error
+    assert flight.do("k", lambda: 1) == 1
+
+
+@pytest.mark.asyncio
+async def test_async_awaiters_share_one_call_and_survive_cancellation():
+    flight = SingleFlight("test")
+    calls = []
+
+    def fn():
+        calls.append(1)
+        time.sleep(0.05)
+        return ["doc"]
+
+    cancelled = asyncio.ensure_future(flight.do_async("k", fn))
+    await asyncio.sleep(0)
+    others = [asyncio.ensure_future(flight.do_async("k", fn)) for _ in range(3)]
+    await asyncio.sleep(0)
+    cancelled.cancel()
+    results = await asyncio.gather(*others)
+
+    assert len(calls) == 1
+    assert results == [["doc"]] * 3
+    assert flight.stats() == {
+        "name": "test",
+        "executed": 1,
+        "shared": 3,
+        "shared_ratio": 0.75,
+    }
+
+
+@pytest.mark.asyncio
+async def test_concurrent_autocomplete_lookups_hit_mongo_once():
+    oid = ObjectId()
+
+    def slow_find_one(query):
+        time.sleep(0.05)
+        return {"_id": oid, "user": "u", "character": "c", "counters": []}
+
+    collection = MagicMock()
+    collection.find_one.side_effect = slow_find_one
+    with (
+        patch("utils.characters_collection", collection),
+        patch("utils.character_reads", SingleFlight("characters")),
+    ):
+        ids = await asyncio.gather(
+            *(utils.get_character_id_by_user_and_name_async("u", "c") for _ in range(5))
+        )
+        assert utils.character_reads.stats()["shared"] == 4
+
+    assert ids == [str(oid)] * 5
+    collection.find_one.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_forgotten_async_call_is_not_joined():
+    flight = SingleFlight("test")
+    calls = []
+
+    def fn():
+        calls.append(1)
+        n = len(calls)
+        time.sleep(0.05)
+        return n
+
+    earlier = asyncio.ensure_future(flight.do_async("k", fn))
+    await asyncio.sleep(0.01)
+    flight.forget("k")
+    later = asyncio.ensure_future(flight.do_async("k", fn))
+    also_later = asyncio.ensure_future(flight.do_async("k", fn))
+
+    assert await asyncio.gather(earlier, later, also_later) == [1, 2, 2]
+    assert flight.stats()["shared"] == 1
+
+
+def test_read_after_a_write_does_not_join_an_earlier_read(sqlite_db, make_character):
+    character_id = make_character()
+    query = {"_id": ObjectId(character_id)}
+    collection = sqlite_db["characters"]
+    original = collection.find_one
+    started, release = threading.Event(), threading.Event()
+
+    def find_one(*args, **kwargs):
+        doc = original(*args, **kwargs)
+        if not started.is_set():
+            started.set()
+            release.wait(2)
+        return doc
+
+    results = {}
+
+    def read(name):
+        results[name] = utils.CharacterRepository.find_one(query)["character"]
+
+    flight = SingleFlight("characters")
+    with (
+        patch.object(collection, "find_one", find_one),
+        patch("utils.character_reads", flight),
+    ):
+        earlier = threading.Thread(target=read, args=("earlier",))
+        earlier.start()
+        started.wait(1)
+        utils.CharacterRepository.update_one(query, {"$set": {"character": "d"}})
+        later = threading.Thread(target=read, args=("later",))
+        later.start()
+        later.join(1)
+        release.set()
+        earlier.join()
+        later.join()
+
+    assert results == {"earlier": "c", "later": "d"}
+    assert flight.stats()["shared"] == 0
+
+
+def test_query_key_distinguishes_queries():
+    oid = ObjectId()
+    assert query_key("find_one", {"_id": oid}) == query_key("find_one", {"_id": oid})
+    assert query_key("find_one", {"_id": oid}) != query_key("find", {"_id": oid})
+    assert query_key("find", {"user": "a"}, None) != query_key(
+        "find", {"user": "b"}, None
+    )
@@ -0,0 +1,177 @@
+from unittest.mock import patch
+
+from bson import ObjectId
+
+import utils
+from health import DamageEnum, Health, HealthTypeEnum
+from sqlite_storage import SqliteDocumentCollection, apply_projection, matches
+from utils import (
+    add_counter,
+    add_health_level,
+    adjust_character,
+    get_character_id_by_user_and_name,
+    get_counters_for_character,
+    remove_counter,
+    rename_character,
+    reset_if_eligible_many,
+    update_counter,
+)
+
+
+def test_character_round_trip(sqlite_db, make_character):
+    character_id = make_character()
+    add_counter(character_id, "WP", 5, counter_type="perm_is_maximum")
+    add_counter(character_id, "Charges", 2, is_exhaustible=True)
+
+    doc = utils.CharacterRepository.find_one({"user": "u", "character": "c"})
+    assert str(doc["_id"]) == character_id
+    assert [c["counter"] for c in doc["counters"]] == ["WP", "Charges"]
+    assert doc["counters"][1]["is_exhaustible"] is True
+    assert doc["counters"][0]["is_resettable"] is None
+    assert doc["health"] == []
+
+
+def test_counter_update_touches_a_single_row(sqlite_db, make_character):
+    character_id = make_character()
+    for name in ("A", "B", "C"):
+        add_counter(character_id, name, 5, counter_type="perm_is_maximum")
+
+    statements = []
+    sqlite_db._conn.set_trace_callback(statements.append)
+    success, _ = update_counter(character_id, "B", "temp", -2)
+    sqlite_db._conn.set_trace_callback(None)
+
+    assert success
+    writes = [s for s in statements if s.startswith(("UPDATE", "INSERT", "DELETE"))]
+    counter_writes = [s for s in writes if s.startswith("UPDATE counters")]
+    assert len(counter_writes) == 1 and "position = 1" in counter_writes[0]
+    # The only other write is the version bump on the character row
+    assert [s for s in writes if s not in counter_writes] == [
+        f"UPDATE characters SET version = 4 WHERE id = '{character_id}'"
+    ]
+    temps = {c.counter: c.temp for c in get_counters_for_character(character_id)}
+    assert temps == {"A": 5, "B": 3, "C": 5}
+
+
+def test_remove_counter_and_rename(sqlite_db, make_character):
+    character_id = make_character()
+    add_counter(character_id, "A", 1)
+    add_counter(character_id, "B", 2)
+    success, _, _ = remove_counter(character_id, "A")
+    assert success
+    assert [c.counter for c in get_counters_for_character(character_id)] == ["B"]
+
+    success, _ = rename_character("u", "c", "d")
+    assert success
+    assert get_character_id_by_user_and_name("u", "d") == character_id
+
+
+def test_reset_if_eligible_many_pipeline(sqlite_db, make_character):
+    first = make_character("gm", "npc1")
+    second = make_character("gm", "npc2")
+    add_counter(first, "Daily", 3, counter_type="perm_is_maximum", is_resettable=True)
+    add_counter(second, "Plain", 3, counter_type="perm_is_maximum")
+    update_counter(first, "Daily", "temp", -3)
+    update_counter(second, "Plain", "temp", -3)
+
+    results = reset_if_eligible_many({"user": "gm"})
+
+    assert results == {first: ("npc1", 1)}
+    assert get_counters_for_character(first)[0].temp == 3
+    assert get_counters_for_character(second)[0].temp == 0
+
+
+def test_delete_cascades_counters(sqlite_db, make_character):
+    character_id = make_character()
+    add_counter(character_id, "A", 1)
+    utils.delete_user_character(character_id)
+    rows = sqlite_db._conn.execute("SELECT COUNT(*) FROM counters").fetchone()[0]
+    assert rows == 0
+    assert utils.CharacterRepository.count_documents({"user": "u"}) == 0
+
+
+def test_parties_use_document_collection(sqlite_db, make_character):
+    character_id = make_character()
+    assert utils.create_party("g", "Crew", "u") == (True, None)
+    assert utils.add_character_to_party("g", "Crew", character_id) == (True, None)
+    party = utils.get_party("g", "Crew")
+    docs = utils.get_party_character_docs(party)
+    assert [d["character"] for d in docs] == ["c"]
+    assert set(docs[0]) == {"_id", "user", "character", "counters", "health"}
+
+
+def test_events_are_filtered_by_character_in_sql(sqlite_db):
+    events = sqlite_db["counter_events"]
+    for character_id in ("a", "b", "c"):
+        for seq in (1, 2, 3):
+            events.insert_one({"character_id": character_id, "seq": seq})
+
+    with patch.object(
+        SqliteDocumentCollection, "_decode", wraps=SqliteDocumentCollection._decode
+    ) as decode:
+        found = list(events.find({"character_id": "b", "seq": {"$in": [2, 3]}}))
+    assert [(e["character_id"], e["seq"]) for e in found] == [("b", 2), ("b", 3)]
+    assert decode.call_count == 2
+
+    plan = sqlite_db._conn.execute(
+        "EXPLAIN QUERY PLAN SELECT body FROM documents WHERE collection = ?"
+        " AND json_extract(body, '$.character_id') = ?",
+        ["counter_events", "b"],
+    ).fetchall()
+    assert "idx_documents_character_seq" in " ".join(str(tuple(r)) for r in plan)
+
+
+def test_damage_and_heal_are_inc_updates(
+    characters, make_character, stored, record_updates
+):
+    character_id = make_character()
+    characters.update_one(
+        {"_id": ObjectId(character_id)},
+        {"$set": {"health": [Health(HealthTypeEnum.normal.value).to_dict()]}},
+    )
+    updates = record_updates(characters)
+
+    adjust_character(character_id, {}, damage_type=DamageEnum.Bashing, damage_levels=6)
+    _, _, char_doc, notes = adjust_character(
+        character_id, {}, damage_type=DamageEnum.Lethal, damage_levels=8
+    )
+    adjust_character(character_id, {}, heal_levels=2)
+
+    assert [u["$inc"] for u in updates] == [
+        {"health.0.damage.Bashing": 6, "version": 1},
+        {"health.0.damage.Lethal": 7, "health.0.damage.Bashing": -6, "version": 1},
+        {"health.0.damage.Lethal": -2, "version": 1},
+    ]
+    assert "1 additional levels of Lethal" in notes[0]
+    assert Health.from_dict(char_doc["health"][0]).damage == ["Lethal"] * 7
+    health = stored(characters, character_id)["health"][0]
+    assert health["damage"] == {"Aggravated": 0, "Lethal": 5, "Bashing": 0}
+
+
+def test_legacy_tracker_is_rewritten_in_count_form(characters, make_character, stored):
+    character_id = make_character()
+    legacy = {
+        "health_type": "normal",
+        "damage": ["Lethal"],
+        "health_levels": ["Bruised", "Hurt"],
+    }
+    characters.update_one(
+        {"_id": ObjectId(character_id)}, {"$set": {"health": [legacy]}}
+    )
+
+    assert add_health_level(character_id, "normal", "Bruised") == (True, None)
+
+    health = stored(characters, character_id)["health"][0]
+    assert health["damage"]["Lethal"] == 1
+    assert Health.from_dict(health).health_levels == ["Bruised", "Bruised", "Hurt"]
+
+
+def test_matches_and_projection_helpers():
+    doc = {"_id": 1, "a": 2, "items": [{"k": "x", "v": 1}, {"k": "y", "v": 2}]}
+    assert matches(doc, {"a": {"$in": [1, 2]}})
+    assert matches(doc, {"items": {"$elemMatch": {"k": "y", "v": 2}}})
+    assert not matches(doc, {"items": {"$elemMatch": {"k": "y", "v": 1}}})
+    assert apply_projection(doc, {"items.k": 1}) == {
+        "_id": 1,
+        "items": [{"k": "x"}, {"k": "y"}],
+    }
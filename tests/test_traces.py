@@ -0,0 +1,87 @@
+import json
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import discord
+import pytest
+
+from avct_cog import AvctCog
+from traces import TraceWriter, anonymize_options, read_trace
+
+
+def test_options_are_anonymized_consistently():
+    options = {
+        "character": "Rook Vantas",
+        "counter": "Willpower",
+        "damage_type": "Lethal",
+        "points": 2,
+        "chimerical": False,
+        "counters": "Willpower:-1, Blood Pool:+2",
+        "comment": "owes the Prince a favour",
+    }
+    first = anonymize_options("salt", options)
+    assert first == anonymize_options("salt", options)
+    assert first != anonymize_options("other", options)
+
+    assert first["character"].startswith("c") and first["character"].isalnum()
+    assert first["counter"].startswith("n") and first["counter"].isalnum()
+    assert (first["damage_type"], first["points"], first["chimerical"]) == (
+        "Lethal",
+        2,
+        False,
+    )
+    assert first["counters"] == f"{first['counter']}:-1, " + (
+        anonymize_options("salt", {"counter": "Blood Pool"})["counter"] + ":+2"
+    )
+    assert "Prince" not in json.dumps(first)
+
+
+def test_writer_appends_ordered_jsonl(tmp_path):
+    path = tmp_path / "trace.jsonl"
+    writer = TraceWriter(str(path), salt="salt")
+    writer.record("avct plus", 42, 7, {"character": "Rook"}, 20.0, 0.25)
+    writer.record("avct show", 42, None, {"character": "Rook"}, 10.0, 0.1)
+    writer.close()
+
+    plus, show = read_trace(str(path))[::-1]
+    assert [show["command"], plus["command"]] == ["avct show", "avct plus"]
+    assert plus["user"] == show["user"] != 42
+    assert plus["options"] == show["options"]
+    assert (show["guild"], plus["latency_ms"]) == (None, 250.0)
+
+
+def test_sample_rate_zero_records_nothing(tmp_path):
+    path = tmp_path / "trace.jsonl"
+    writer = TraceWriter(str(path), sample_rate=0.0)
+    writer.record("avct plus", 42, 7, {}, 1.0, 0.1)
+    writer.close()
+    assert read_trace(str(path)) == []
+
+
+@pytest.mark.asyncio
+async def test_cog_records_completed_commands(tmp_path):
+    path = tmp_path / "trace.jsonl"
+    with (
+        patch("avct_cog.TRACE_PATH", str(path)),
+        patch("avct_cog.TRACE_SALT", "salt"),
+    ):
+        cog = AvctCog(SimpleNamespace())
+    created = discord.utils.utcnow() - timedelta(milliseconds=300)
+    interaction = SimpleNamespace(
+        guild=None,
+        guild_id=None,
+        created_at=created,
+        user=SimpleNamespace(id=42),
+        namespace={"character": "Rook", "points": 1}.items(),
+    )
+    command = SimpleNamespace(qualified_name="avct plus")
+
+    await cog.on_app_command_completion(interaction, command)
+    cog.traces.close()
+
+    (entry,) = read_trace(str(path))
+    assert entry["command"] == "avct plus"
+    assert entry["options"]["points"] == 1
+    assert entry["at"] == pytest.approx(created.timestamp(), abs=0.001)
+    assert entry["latency_ms"] >= 300
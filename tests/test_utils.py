@@ -431,3 +431,223 @@ def test_add_remove_when_exhausted_and_reset_eligible(fake_characters_collection
     assert c is not None, "ResetEligible counter was not found after adding"
     assert c.counter_type == "perm_is_maximum"
     assert c.is_resettable is True
+
+
+def test_parse_counter_deltas():
+    from utils import parse_counter_deltas
+
+    deltas, error = parse_counter_deltas("willpower:-1, blood pool : -2, mana:+3")
+    assert error is None
+    assert deltas == {"willpower": -1, "blood pool": -2, "mana": 3}
+
+    deltas, error = parse_counter_deltas("willpower -1")
+    assert deltas is None and "Invalid adjustment" in error
+
+    deltas, error = parse_counter_deltas("  ")
+    assert deltas is None and error
+
+
+def test_adjust_character_applies_everything_in_one_write(fake_characters_collection):
+    from utils import adjust_character
+    from health import Health, DamageEnum
+
+    add_user_character("u", "c")
+    character_id = get_character_id_by_user_and_name("u", "c")
+    add_counter(character_id, "WP", 5, counter_type="perm_is_maximum")
+    add_counter(character_id, "Blood", 10, counter_type="perm_is_maximum")
+    doc = fake_characters_collection.find_one({"user": "u", "character": "c"})
+    doc["health"] = [Health(health_type="normal").__dict__]
+
+    writes = []
+    original_update = fake_characters_collection.update_one
+
+    def counting_update(query, update):
+        writes.append(update)
+        return original_update(query, update)
+
+    fake_characters_collection.update_one = counting_update
+    success, error, char_doc, notes = adjust_character(
+        character_id,
+        {"WP": -1, "Blood": -2},
+        damage_type=DamageEnum.Lethal,
+        damage_levels=2,
+    )
+    assert success and error is None
+    assert len(writes) == 1
+    counters = {c.counter: c for c in get_counters_for_character(character_id)}
+    assert counters["WP"].temp == 4
+    assert counters["Blood"].temp == 8
+    assert Health.from_dict(char_doc["health"][0]).damage == ["Lethal", "Lethal"]
+    assert len(notes) == 3
+
+
+def test_adjust_character_is_all_or_nothing(fake_characters_collection):
+    from utils import adjust_character
+
+    add_user_character("u", "c")
+    character_id = get_character_id_by_user_and_name("u", "c")
+    add_counter(character_id, "WP", 1, counter_type="perm_is_maximum")
+    add_counter(character_id, "Blood", 1, counter_type="perm_is_maximum")
+
+    success, error, char_doc, _ = adjust_character(
+        character_id, {"WP": -1, "Blood": -5}
+    )
+    assert not success and "below zero" in error
+    assert char_doc is None
+    counters = {c.counter: c for c in get_counters_for_character(character_id)}
+    assert counters["WP"].temp == 1
+
+
+def test_reset_if_eligible_skips_write_when_nothing_eligible(
+    fake_characters_collection,
+):
+    add_user_character("u", "c")
+    character_id = get_character_id_by_user_and_name("u", "c")
+    add_counter(character_id, "Plain", 3, counter_type="perm_is_maximum")
+
+    writes = []
+    fake_characters_collection.update_one = lambda q, u: writes.append(u)
+    assert reset_if_eligible(character_id) == 0
+    assert writes == []
+
+
+def test_reset_if_eligible_many_uses_one_update_many():
+    from unittest.mock import MagicMock, patch
+    from bson import ObjectId
+    from utils import (
+        reset_if_eligible_many,
+        RESET_ELIGIBLE_PIPELINE,
+        VERSION_BUMP_STAGE,
+    )
+
+    first, second, third = ObjectId(), ObjectId(), ObjectId()
+    collection = MagicMock()
+    collection.find.return_value = [
+        {
+            "_id": first,
+            "character": "A",
+            "counters": [
+                {"counter_type": "perm_is_maximum", "is_resettable": True},
+                {"counter_type": "perm_is_maximum", "is_resettable": True},
+            ],
+        },
+        {
+            "_id": second,
+            "character": "B",
+            "counters": [
+                {"counter_type": "perm_is_maximum", "is_resettable": True},
+                {"counter_type": "single_number"},
+            ],
+        },
+    ]
+    with patch("utils.characters_collection", collection):
+        results = reset_if_eligible_many({"user": "gm"})
+
+    assert results == {str(first): ("A", 2), str(second): ("B", 1)}
+    query = collection.find.call_args[0][0]
+    assert query["user"] == "gm"
+    assert query["counters"]["$elemMatch"]["is_resettable"] is True
+    collection.update_many.assert_called_once_with(
+        {"_id": {"$in": [first, second]}},
+        RESET_ELIGIBLE_PIPELINE + [VERSION_BUMP_STAGE],
+    )
+    assert third not in collection.update_many.call_args[0][0]["_id"]["$in"]
+
+
+def test_reset_if_eligible_many_skips_write_without_matches():
+    from unittest.mock import MagicMock, patch
+    from utils import reset_if_eligible_many
+
+    collection = MagicMock()
+    collection.find.return_value = []
+    with patch("utils.characters_collection", collection):
+        assert reset_if_eligible_many({"user": "gm"}) == {}
+    collection.update_many.assert_not_called()
+
+
+def test_mutations_return_the_post_update_document(characters, stored):
+    import bson
+    from health import DamageEnum
+    from utils import (
+        update_counter_doc,
+        update_counter_in_db_doc,
+        update_health_in_db_doc,
+        reset_if_eligible_doc,
+        CharacterRepository,
+    )
+
+    add_user_character("u", "c")
+    character_id = get_character_id_by_user_and_name("u", "c")
+    add_counter(character_id, "WP", 5, counter_type="perm_is_maximum")
+    toggle_counter_option(character_id, "WP", "is_resettable", True)
+    CharacterRepository.update_one(
+        {"_id": bson.ObjectId(character_id)},
+        {"$set": {"health": [{"health_type": "normal", "damage": []}]}},
+    )
+
+    success, _, doc = update_counter_doc(character_id, "WP", "temp", -2)
+    assert success and doc["counters"][0]["temp"] == 3
+    assert doc == stored(characters, character_id)
+
+    success, _, doc = update_counter_in_db_doc(character_id, "WP", "perm", 6)
+    assert success and doc["counters"][0]["perm"] == 6
+    assert doc == stored(characters, character_id)
+
+    success, _, doc = update_health_in_db_doc(
+        character_id, "normal", [DamageEnum.Lethal.value]
+    )
+    assert success and doc["health"][0]["damage"][DamageEnum.Lethal.value] == 1
+    assert doc == stored(characters, character_id)
+
+    count, doc = reset_if_eligible_doc(character_id)
+    assert count == 1 and doc["counters"][0]["temp"] == 6
+    assert doc == stored(characters, character_id)
+
+
+def test_update_counter_doc_reads_once(characters):
+    from unittest.mock import patch
+    from utils import update_counter_doc
+
+    add_user_character("u", "c")
+    character_id = get_character_id_by_user_and_name("u", "c")
+    add_counter(character_id, "WP", 5, counter_type="perm_is_maximum")
+
+    with patch.object(characters, "find_one", wraps=characters.find_one) as find_one:
+        success, _, doc = update_counter_doc(character_id, "WP", "temp", -1)
+    assert success and doc["counters"][0]["temp"] == 4
+    find_one.assert_called_once()
+
+    assert update_counter_doc(character_id, "Nope", "temp", 1) == (
+        False,
+        "Counter not found.",
+        None,
+    )
+
+
+def test_importing_utils_does_not_connect():
+    import os
+    import subprocess
+    import sys
+
+    code = "import utils; print(utils.db is None, utils.client is None)"
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.split() == ["True", "True"]
+
+
+def test_lazy_collection_connects_on_first_use():
+    from unittest.mock import MagicMock, patch
+    from utils import LazyCollection
+
+    db = {"characters": MagicMock()}
+    collection = LazyCollection("characters")
+    with patch("utils.get_database", return_value=db) as get_database:
+        collection.find_one({"user": "u"})
+        collection.find_one({"user": "v"})
+    db["characters"].find_one.assert_called_with({"user": "v"})
+    get_database.assert_called_once()
@@ -0,0 +1,75 @@
+import asyncio
+import time
+from unittest.mock import patch
+
+import pytest
+
+import caches
+import utils
+import warmup
+from utils import (
+    CharacterRepository,
+)
+
+
+def _touch(character_id):
+    CharacterRepository.find_one({"_id": utils.ObjectId(character_id)})
+
+
+def test_recent_activity_is_most_recent_first(cached_sqlite, make_character):
+    rook = make_character("u1", "Rook", counters=["WP"])
+    vex = make_character("u2", "Vex", counters=["WP"])
+    _touch(rook)
+    _touch(vex)
+    caches.autocomplete_cache.set(("characters", "u3"), ["Ash"])
+
+    assert warmup.recent_activity(10) == {
+        "characters": [vex, rook],
+        "users": ["u2", "u1", "u3"],
+    }
+    assert warmup.recent_activity(1) == {"characters": [vex], "users": ["u2"]}
+
+
+@pytest.mark.asyncio
+async def test_saved_activity_warms_caches_after_restart(
+    cached_sqlite, tmp_path, make_character
+):
+    path = str(tmp_path / "warmup.json")
+    rook = make_character("u1", "Rook", counters=["WP"])
+    make_character("u1", "Pale", counters=["WP"])
+    _touch(rook)
+    warmup.save(path, 10)
+    caches.document_cache.clear()
+    caches.autocomplete_cache.clear()
+
+    assert await utils.warm_caches(path) == (1, 1)
+
+    assert caches.get_document(rook)["character"] == "Rook"
+    assert caches.autocomplete_cache.get(("characters", "u1")) == ["Rook", "Pale"]
+    (counter,) = caches.autocomplete_cache.get(("counters", rook))
+    assert counter.counter == "WP"
+
+
+@pytest.mark.asyncio
+async def test_prefetch_stops_at_budget():
+    def slow(ids):
+        time.sleep(0.5)
+        return [{"_id": "a", "user": "u", "character": "Rook", "counters": []}]
+
+    activity = {"characters": ["a"], "users": ["u"]}
+    with patch("caches._coherent", True):
+        start = time.perf_counter()
+        result = await warmup.prefetch(activity, slow, slow, budget=0.05)
+        assert result == (0, 0)
+        assert time.perf_counter() - start < 0.4
+        # The abandoned threads finish their reads but store nothing
+        await asyncio.sleep(0.7)
+    assert caches.document_cache.keys() == []
+    assert caches.autocomplete_cache.keys() == []
+
+
+def test_load_missing_or_corrupt_file(tmp_path):
+    empty = {"characters": [], "users": []}
+    assert warmup.load(str(tmp_path / "missing.json")) == empty
+    (tmp_path / "bad.json").write_text("{not json")
+    assert warmup.load(str(tmp_path / "bad.json")) == empty
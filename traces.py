@@ -0,0 +1,138 @@
+"""
+Anonymized interaction traces for replay benchmarks (TRACE_PATH).
+
+With TRACE_PATH set, every completed slash command (or a TRACE_SAMPLE_RATE
+fraction of them) is appended to that file as one JSON line:
+
+    {"at": 1700000000.123, "command": "avct plus", "user": 81723..., "guild": 5521...,
+     "options": {"character": "c3f9a01b2c4", "counter": "n0b1e6a77d1", "points": 1},
+     "latency_ms": 212.4}
+
+at is when Discord created the interaction and latency_ms how long the bot
+took to complete it. User and guild ids are replaced by salted hashes, and
+free-text options (character, counter and party names, comments) by salted
+pseudonyms, so a trace can leave production without naming anyone. The same
+salt maps a name to the same pseudonym every time, which keeps a trace
+replayable; set TRACE_SALT to the same secret on every worker so their traces
+agree. Options whose values come from a fixed set (damage types, fields,
+categories) are kept as they are.
+
+benchmarks/replay.py plays traces back against a local backend.
+"""
+
+import hashlib
+import json
+import os
+import random
+import threading
+
+# Options chosen from fixed lists, which identify no one
+PLAIN_OPTIONS = {
+    "damage_type",
+    "field",
+    "category",
+    "toggle",
+    "mode",
+    "counter_type",
+    "health_type",
+    "health_level_type",
+}
+
+# Options holding "name:delta" pairs (see utils.parse_counter_deltas)
+DELTA_OPTIONS = {"counters"}
+
+
+def _digest(salt, value):
+    return hashlib.sha256(f"{salt}:{value}".encode("utf-8")).hexdigest()
+
+
+def anonymize_id(salt, value):
+    """
+    Return a stable integer standing in for a Discord id.
+    """
+    if value is None:
+        return None
+    return int(_digest(salt, value)[:15], 16)
+
+
+def pseudonym(salt, value, prefix="x"):
+    """
+    Return a stable name standing in for value. Pseudonyms only contain
+    letters and digits, so they are valid character and counter names.
+    """
+    return prefix + _digest(salt, value)[:10]
+
+
+def _anonymize_deltas(salt, text):
+    parts = []
+    for part in str(text).split(","):
+        name, sep, delta = part.rpartition(":")
+        if not sep:
+            parts.append(pseudonym(salt, part.strip(), "n"))
+            continue
+        parts.append(f"{pseudonym(salt, name.strip(), 'n')}:{delta.strip()}")
+    return ", ".join(parts)
+
+
+def anonymize_options(salt, options):
+    """
+    Return options with identifying values replaced (see the module docstring).
+    """
+    result = {}
+    for name, value in options.items():
+        if isinstance(value, (bool, int, float)) or value is None:
+            result[name] = value
+        elif name in PLAIN_OPTIONS:
+            result[name] = str(value)
+        elif name in DELTA_OPTIONS:
+            result[name] = _anonymize_deltas(salt, value)
+        elif name == "character":
+            result[name] = pseudonym(salt, value, "c")
+        elif name in ("counter", "new_name"):
+            result[name] = pseudonym(salt, value, "n")
+        else:
+            result[name] = pseudonym(salt, getattr(value, "id", value))
+    return result
+
+
+class TraceWriter:
+    """
+    Appends anonymized command traces to a JSONL file.
+    """
+
+    def __init__(self, path, sample_rate=1.0, salt=None):
+        self.path = path
+        self.sample_rate = sample_rate
+        # Without a configured salt pseudonyms only agree within this process
+        self.salt = salt or os.urandom(16).hex()
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def record(self, command_name, user_id, guild_id, options, at, latency):
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        entry = {
+            "at": round(at, 3),
+            "command": command_name,
+            "user": anonymize_id(self.salt, user_id),
+            "guild": anonymize_id(self.salt, guild_id),
+            "options": anonymize_options(self.salt, options),
+            "latency_ms": round(latency * 1000, 1),
+        }
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        with self._lock:
+            # One write per line so workers appending to one file do not interleave
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def read_trace(path):
+    """
+    Return the entries of a trace file ordered by time.
+    """
+    with open(path, encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    return sorted(entries, key=lambda e: e["at"])
@@ -1,7 +1,14 @@
-from discord.ext import commands
+from discord.ext import commands, tasks
+import asyncio
+import copy
+import functools
 import html
+import random
 import re
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from config import (
     MAX_USER_CHARACTERS,
@@ -9,8 +16,28 @@ from config import (
     MAX_FIELD_LENGTH,
     MAX_COMMENT_LENGTH,
     DISPLAY_MODE,  # <-- Ensure DISPLAY_MODE is imported
+    EMOJI_STYLE,
+    STORAGE_BACKEND,
+    SQLITE_PATH,
+    OCC_MAX_RETRIES,
+    OCC_BACKOFF,
+    COUNTER_LAYOUT,
+    EVENT_LOG,
+    EVENT_COMPACT_INTERVAL,
+    EVENT_TAIL_LIMIT,
+    WRITE_JOURNAL,
+    WRITE_JOURNAL_PATH,
+    WRITE_JOURNAL_TIMEOUT,
+    WRITE_JOURNAL_FLUSH_INTERVAL,
+    RESPONSE_MODE,
+    WARMUP_PATH,
+    WARMUP_SIZE,
+    WARMUP_BUDGET,
+    WARMUP_SAVE_INTERVAL,
+    METRICS_INTERVAL,
+    METRICS_PATH,
 )
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
 from counter import (
     PredefinedCounterEnum,
     CategoryEnum,
@@ -18,17 +45,39 @@ from counter import (
     CounterFactory,
     UserCharacter,
     CounterTypeEnum,
+    COUNTER_ORDER_FIELD,
+    counter_key,
+    counters_from_map,
+    counters_to_map,
 )
 from bson import ObjectId
+from names import canonical_name, sanitize_string
 from utils_helpers import (
     _character_exists,
     _find_character_doc_by_user_and_name,
+    _find_character_doc_by_user_and_name_async,
     _get_character_by_id,
+    _get_character_by_id_async,
     _character_at_counter_limit,
     _user_at_character_limit,
     _create_character_entry,
 )
-from health import HealthLevelEnum  # Add this import
+from health import Health, HealthLevelEnum, DAMAGE_ORDER, to_counts
+from events import (
+    apply_changes,
+    describe,
+    replay,
+    start_compaction,
+    undo_target,
+    values_of,
+)
+import caches
+import journal
+from sqlite_storage import apply_update
+import metrics
+import warmup
+from invalidation import start_invalidation
+from singleflight import SingleFlight, query_key
 
 # Load environment variables
 load_dotenv()
@@ -48,16 +97,107 @@ def get_bot_token():
 mongo_connection_string = os.getenv("MONGO_CONNECTION_STRING")
 mongo_db_name = os.getenv("MONGO_DB_NAME")
 
-# Connect to MongoDB
-client = MongoClient(mongo_connection_string)
-db = client[mongo_db_name]
-characters_collection = db["characters"]
+# The configured storage backend, connected on first use (see get_database)
+client = None
+db = None
+_connect_lock = threading.Lock()
+
+
+def get_database():
+    """
+    Return the configured database, connecting on first use.
+    Constructing a MongoClient resolves the hosts and starts its monitor
+    threads, so importing utils does not; the bot connects in setup_hook.
+    """
+    global client, db
+    if db is None:
+        with _connect_lock:
+            if db is None:
+                if STORAGE_BACKEND == "sqlite":
+                    from sqlite_storage import SqliteDatabase
+
+                    db = SqliteDatabase(SQLITE_PATH)
+                    if SQLITE_PATH == ":memory:":
+                        # Nothing else can write to it, so cached documents stay current
+                        caches.set_coherent()
+                else:
+                    client = MongoClient(mongo_connection_string)
+                    db = client[mongo_db_name]
+    return db
+
+
+class LazyCollection:
+    """
+    Stands in for get_database()[name] and connects when first used.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._collection = None
+
+    def resolve(self):
+        if self._collection is None:
+            self._collection = get_database()[self._name]
+        return self._collection
+
+    def __getattr__(self, attr):
+        return getattr(self.resolve(), attr)
+
+
+characters_collection = LazyCollection("characters")
+parties_collection = LazyCollection("parties")
+pins_collection = LazyCollection("pins")
+events_collection = LazyCollection("counter_events")
+settings_collection = LazyCollection("settings")
+# Store new characters' counters keyed by name (see counter.counters_to_map).
+# The SQLite character table already keeps one row per counter, so it ignores this.
+COUNTER_MAP_LAYOUT = COUNTER_LAYOUT == "map" and STORAGE_BACKEND != "sqlite"
+# Journal character writes while MongoDB is slow or unreachable (see journal.py);
+# opened by open_write_journal in setup_hook
+write_journal = None
+
+
+def open_write_journal(path=WRITE_JOURNAL_PATH):
+    """
+    Open the write journal at path when WRITE_JOURNAL is on. Each process
+    needs a file of its own: a flusher replays every entry in its file, and
+    the reads of the process that wrote an entry are the only ones that see it.
+    Returns the journal, or None.
+    """
+    global write_journal
+    if WRITE_JOURNAL and STORAGE_BACKEND != "sqlite" and write_journal is None:
+        write_journal = journal.Journal(path)
+    return write_journal
 
 
 class MyBot(commands.Bot):
     async def setup_hook(self):
+        get_database()
+        # Loaded here rather than before bot.run so the cog starts on the
+        # bot's own event loop (PinManager keeps it for invalidation callbacks)
+        await self.load_extension("avct_cog")
+        start_invalidation(characters_collection)
+        await warm_caches()
+        start_activity_saver()
+        start_event_compaction()
+        open_write_journal()
+        start_journal_flush()
+        if METRICS_PATH and METRICS_INTERVAL > 0:
+            self.report_metrics.change_interval(seconds=METRICS_INTERVAL)
+            self.report_metrics.start()
         await self.tree.sync()
 
+    async def close(self):
+        save_recent_activity()
+        if METRICS_PATH:
+            metrics.write_snapshot(METRICS_PATH)
+        await super().close()
+
+    @tasks.loop(seconds=60)
+    async def report_metrics(self):
+        # OCC, cache, single-flight and prefetch counters, as cluster workers report them
+        metrics.write_snapshot(METRICS_PATH)
+
 
 def validate_length(field: str, value: str, max_len: int) -> bool:
     return value is not None and len(value) <= max_len
@@ -83,15 +223,6 @@ def sanitize_and_validate_fields(field_map: dict) -> dict:
     return result
 
 
-def sanitize_string(s: str) -> str:
-    if s is None:
-        return None
-    s = s.strip()
-    s = re.sub(r"[\x00-\x1f\x7f-\x9f]", "", s)
-    s = html.escape(s)
-    return s
-
-
 def sanitize_for_lookup(character: str) -> str:
     """
     Sanitize and escape a character name for lookup (used for autocomplete input).
@@ -105,32 +236,327 @@ def sanitize_for_lookup(character: str) -> str:
     return character
 
 
+# Every character write bumps "version" so other processes can detect changes
+VERSION_BUMP_STAGE = {"$set": {"version": {"$add": [{"$ifNull": ["$version", 0]}, 1]}}}
+
+
+def _with_version_bump(update):
+    if isinstance(update, list):
+        return update + [VERSION_BUMP_STAGE]
+    update = dict(update)
+    inc = dict(update.get("$inc", {}))
+    inc["version"] = inc.get("version", 0) + 1
+    update["$inc"] = inc
+    return update
+
+
+def _query_character_ids(query):
+    """
+    Return the character ids a query is limited to, or None if it is not
+    limited by _id (e.g. a query by user).
+    """
+    selector = query.get("_id") if isinstance(query, dict) else None
+    if isinstance(selector, ObjectId):
+        return [str(selector)]
+    if isinstance(selector, dict) and "$in" in selector:
+        return [str(i) for i in selector["$in"]]
+    return None
+
+
+def _invalidate_all():
+    character_reads.forget()
+    caches.invalidate_all()
+
+
+def _invalidate_for_query(query):
+    ids = _query_character_ids(query)
+    if ids is None:
+        _invalidate_all()
+        return
+    for character_id in ids:
+        caches.invalidate_character(character_id)
+
+
+def _journaled(query, update):
+    """Return True if an update_one goes through the write journal."""
+    return (
+        write_journal is not None
+        and isinstance(query.get("_id"), ObjectId)
+        and isinstance(update, dict)
+    )
+
+
+def _merge_journal(doc):
+    return write_journal.merge(doc) if write_journal is not None else doc
+
+
+# Concurrent identical reads share one database call. A read still in flight
+# may predate a write, so every invalidation (from this process's writes or,
+# through invalidation.py, from other processes) makes later reads start anew.
+character_reads = SingleFlight("characters")
+caches.subscribe(lambda character_id, version: character_reads.forget())
+
+
+def _cached_id(query):
+    """Return the character id if query is a lookup served by the document cache."""
+    if not caches.caching_documents():
+        return None
+    if set(query) == {"user", "character"}:
+        # Lookups by name are served once the character was prefetched
+        return caches.named_id(query["user"], query["character"])
+    ids = _query_character_ids(query) if len(query) == 1 else None
+    if ids is None or len(ids) != 1:
+        return None
+    return ids[0]
+
+
+def _cached_document(query):
+    character_id = _cached_id(query)
+    if character_id is None:
+        return None
+    doc = caches.get_document(character_id)
+    if doc is None or "character" not in query:
+        return doc
+    if (doc.get("user"), doc.get("character")) != (query["user"], query["character"]):
+        return None
+    metrics.increment("prefetch_hits")
+    return doc
+
+
+def _from_storage(doc):
+    """
+    Return doc with map-layout counters turned into the ordered list the
+    rest of the code works with. The counter_layout field is kept so writes
+    know which layout to target.
+    """
+    if isinstance(doc, dict) and isinstance(doc.get("counters"), dict):
+        doc = dict(doc, counters=counters_from_map(doc["counters"]))
+    if isinstance(doc, dict) and doc.get("event_tail"):
+        # Events not compacted yet apply on top of the stored snapshot
+        replay(doc, doc["event_tail"])
+    return doc
+
+
+def _storage_projection(projection):
+    # Counter keys differ per document in the map layout, so project whole counters
+    if projection is None or not COUNTER_MAP_LAYOUT:
+        return projection
+    return {
+        ("counters" if k.startswith("counters.") else k): v
+        for k, v in projection.items()
+    }
+
+
 class CharacterRepository:
+    @staticmethod
+    def _load_one(query):
+        cached_id = _cached_id(query)
+        token = caches.fill_token()
+        doc = _from_storage(_merge_journal(characters_collection.find_one(query)))
+        if cached_id is not None:
+            caches.store_document(doc, token)
+        return doc
+
+    @staticmethod
+    def _load_many(query, projection):
+        if projection is None:
+            docs = characters_collection.find(query)
+        else:
+            docs = characters_collection.find(query, _storage_projection(projection))
+        return [_from_storage(_merge_journal(d)) for d in docs]
+
     @staticmethod
     def find_one(query):
-        return characters_collection.find_one(query)
+        # Lookups by id are served from the document cache
+        doc = _cached_document(query)
+        if doc is not None:
+            return doc
+        return character_reads.do(
+            query_key("find_one", query),
+            lambda: CharacterRepository._load_one(query),
+        )
 
     @staticmethod
-    def find(query):
-        return list(characters_collection.find(query))
+    def find(query, projection=None):
+        return character_reads.do(
+            query_key("find", query, projection),
+            lambda: CharacterRepository._load_many(query, projection),
+        )
+
+    @staticmethod
+    async def find_one_async(query):
+        doc = _cached_document(query)
+        if doc is not None:
+            return doc
+        return await character_reads.do_async(
+            query_key("find_one", query),
+            lambda: CharacterRepository._load_one(query),
+        )
+
+    @staticmethod
+    async def find_async(query, projection=None):
+        return await character_reads.do_async(
+            query_key("find", query, projection),
+            lambda: CharacterRepository._load_many(query, projection),
+        )
 
     @staticmethod
     def insert_one(doc):
-        return characters_collection.insert_one(doc)
+        result = characters_collection.insert_one(doc)
+        if doc.get("_id") is not None:
+            caches.invalidate_character(doc["_id"], doc.get("version"), doc.get("user"))
+        return result
 
     @staticmethod
     def update_one(query, update):
-        return characters_collection.update_one(query, update)
+        update = _with_version_bump(update)
+        if _journaled(query, update):
+            result = journal.update_one(
+                write_journal,
+                characters_collection,
+                str(query["_id"]),
+                query,
+                update,
+                WRITE_JOURNAL_TIMEOUT,
+            )
+        else:
+            result = characters_collection.update_one(query, update)
+        _invalidate_for_query(query)
+        return result
+
+    @staticmethod
+    def update_many(query, update):
+        result = characters_collection.update_many(query, _with_version_bump(update))
+        _invalidate_for_query(query)
+        return result
 
     @staticmethod
     def delete_one(query):
-        return characters_collection.delete_one(query)
+        result = characters_collection.delete_one(query)
+        _invalidate_for_query(query)
+        return result
 
     @staticmethod
     def count_documents(query):
         return characters_collection.count_documents(query)
 
 
+class PartyRepository:
+    @staticmethod
+    def find_one(query):
+        return parties_collection.find_one(query)
+
+    @staticmethod
+    def find(query):
+        return list(parties_collection.find(query))
+
+    @staticmethod
+    def insert_one(doc):
+        return parties_collection.insert_one(doc)
+
+    @staticmethod
+    def update_one(query, update):
+        return parties_collection.update_one(query, update)
+
+    @staticmethod
+    def delete_one(query):
+        return parties_collection.delete_one(query)
+
+
+class EventRepository:
+    @staticmethod
+    def find(query, limit=0):
+        """
+        Return compacted events matching query, newest first.
+        """
+        cursor = events_collection.find(query)
+        if hasattr(cursor, "batch_size"):
+            return list(cursor.sort("seq", -1).limit(limit))
+        # Collections without server-side cursors (SQLite) return a list
+        events = sorted(cursor, key=lambda e: e["seq"], reverse=True)
+        return events[:limit] if limit else events
+
+    @staticmethod
+    def insert_missing(events):
+        """
+        Store events not stored yet; (character_id, seq) identifies an event,
+        so events copied again after an interrupted compaction are skipped.
+        """
+        if not events:
+            # bulk_write rejects an empty batch
+            return
+        if hasattr(events_collection, "bulk_write"):
+            events_collection.bulk_write(
+                [
+                    UpdateOne(
+                        {"character_id": e["character_id"], "seq": e["seq"]},
+                        {"$setOnInsert": e},
+                        upsert=True,
+                    )
+                    for e in events
+                ],
+                ordered=False,
+            )
+            return
+        # SQLite collections have neither bulk_write nor upserts
+        stored = {
+            (e["character_id"], e["seq"])
+            for e in events_collection.find(
+                {
+                    "character_id": {"$in": list({e["character_id"] for e in events})},
+                    "seq": {"$in": [e["seq"] for e in events]},
+                },
+                {"character_id": 1, "seq": 1},
+            )
+        }
+        for e in events:
+            if (e["character_id"], e["seq"]) not in stored:
+                events_collection.insert_one(dict(e))
+
+    @staticmethod
+    def create_indexes():
+        if hasattr(events_collection, "create_index"):
+            events_collection.create_index(
+                [("character_id", 1), ("seq", -1)], unique=True
+            )
+
+
+class SettingsRepository:
+    @staticmethod
+    def find_one(query):
+        return settings_collection.find_one(query)
+
+    @staticmethod
+    def upsert(query, update):
+        """
+        Apply update to the document matching query, creating it from the
+        query's fields if there is none.
+        """
+        if hasattr(settings_collection, "bulk_write"):
+            return settings_collection.update_one(query, update, upsert=True)
+        # SQLite collections have neither bulk_write nor upserts
+        result = settings_collection.update_one(query, update)
+        if result.matched_count == 0:
+            doc = dict(query)
+            apply_update(doc, update)
+            settings_collection.insert_one(doc)
+        return result
+
+
+class PinRepository:
+    @staticmethod
+    def find(query):
+        return list(pins_collection.find(query))
+
+    @staticmethod
+    def insert_one(doc):
+        return pins_collection.insert_one(doc)
+
+    @staticmethod
+    def delete_many(query):
+        return pins_collection.delete_many(query)
+
+
 def add_user_character(user_id: str, character: str):
     # Prevent empty or whitespace-only character names
     if character is None or character.strip() == "":
@@ -168,6 +594,8 @@ def add_user_character(user_id: str, character: str):
 
     # Create and insert the new character
     new_entry = _create_character_entry(user_id, character)
+    if COUNTER_MAP_LAYOUT:
+        new_entry.update(counters={}, counter_layout="map")
     CharacterRepository.insert_one(new_entry)
     return True, None
 
@@ -183,15 +611,387 @@ def get_character_id_by_user_and_name(user_id: str, character: str):
     return None
 
 
+# One thread, so prefetches queue behind each other instead of competing
+# with commands for the default executor
+_prefetch_executor = ThreadPoolExecutor(
+    max_workers=1, thread_name_prefix="avct-prefetch"
+)
+_prefetching = set()
+_prefetching_lock = threading.Lock()
+
+
+def prefetch_character(user_id: str, character: str):
+    """
+    Load a user's character into the document cache in the background, so
+    the command an autocomplete choice is for reads it without a database
+    call. Returns the future, or None if it is cached or already loading.
+    """
+    if not (caches.caching_documents() and caches.autocomplete_cache.enabled):
+        return None
+    query = {"user": user_id, "character": canonical_name(character)}
+    key = (user_id, query["character"])
+    with _prefetching_lock:
+        if key in _prefetching or _cached_document(query) is not None:
+            return None
+        _prefetching.add(key)
+    return _prefetch_executor.submit(_prefetch_character, query, key)
+
+
+def _prefetch_character(query, key):
+    try:
+        token = caches.fill_token()
+        doc = CharacterRepository.find_one(query)
+        if doc is None:
+            metrics.increment("prefetches", result="missing")
+            return None
+        if not caches.store_document(doc, token):
+            # Changed while it was being read; the command will read it fresh
+            metrics.increment("prefetches", result="stale")
+            return None
+        caches.remember_name(doc)
+        metrics.increment("prefetches", result="loaded")
+        return doc
+    finally:
+        with _prefetching_lock:
+            _prefetching.discard(key)
+
+
 def get_counters_for_character(character_id: str):
     """
     Return a list of Counter objects for the given character ID.
     """
-    char_doc = _get_character_by_id(character_id)
+    return counters_from_doc(_get_character_by_id(character_id))
+
+
+def counters_from_doc(char_doc):
+    """
+    Return Counter objects for a character document (or [] for None).
+    """
+    counters = char_doc.get("counters", []) if char_doc else []
+    return [CounterFactory.from_dict(c) for c in counters]
+
+
+class VersionConflict(Exception):
+    """A character was changed between being read and being written."""
+
+    def __init__(self, character_id):
+        super().__init__(f"Character {character_id} changed during update.")
+        self.character_id = character_id
+
+
+CONFLICT_ERROR = (
+    "The character was changed by another command at the same time. Please try again."
+)
+
+
+def _on_event_loop():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def retry_on_conflict(on_failure):
+    """
+    Re-run a read-modify-write of a character when its conditional write loses
+    a race, sleeping with exponential backoff and full jitter between attempts.
+    Called from a command on the event loop it retries at once instead, since
+    sleeping there would stall every other command; the re-read already picks
+    up the write it lost to. Once OCC_MAX_RETRIES retries are used up the
+    wrapped function returns on_failure instead. Conflicts, retries and
+    failures are counted in metrics.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            for attempt in range(OCC_MAX_RETRIES + 1):
+                try:
+                    return func(*args, **kwargs)
+                except VersionConflict as conflict:
+                    metrics.increment("occ_conflicts", operation=func.__name__)
+                    # A cached copy may predate the write we lost to
+                    caches.invalidate_character(conflict.character_id)
+                if attempt < OCC_MAX_RETRIES:
+                    metrics.increment("occ_retries", operation=func.__name__)
+                    if not _on_event_loop():
+                        time.sleep(random.uniform(0, OCC_BACKOFF * 2**attempt))
+            metrics.increment("occ_failures", operation=func.__name__)
+            return copy.deepcopy(on_failure)
+
+        return wrapper
+
+    return decorator
+
+
+# Fields held in the snapshot that event tails apply on top of
+SNAPSHOT_FIELDS = ("counters", "health")
+
+
+def _archive_events(char_doc: dict, events):
+    EventRepository.insert_missing(
+        [
+            {"character_id": str(char_doc["_id"]), "user": char_doc.get("user"), **e}
+            for e in events
+        ]
+    )
+
+
+def _fold_event_tail(char_doc: dict, update: dict, force=False):
+    """
+    Rewrite an update to the counters or health of a document with an event
+    tail (or of any document, with force) so it also folds the tail into the
+    snapshot: the materialized counters and health (which already include the
+    update) are written whole and the tail is cleared, once its events are
+    copied to counter_events. Other updates are returned unchanged.
+    """
+    tail = char_doc.get("event_tail")
+    paths = [(op, path) for op, fields in update.items() for path in fields]
+    if not (tail or force) or not any(
+        p.split(".")[0] in SNAPSHOT_FIELDS for _, p in paths
+    ):
+        return update
+    if tail:
+        # These events are already stored in the tail, so copying them first
+        # loses nothing if this write then conflicts
+        _archive_events(char_doc, tail)
+    counters = char_doc.get("counters", [])
+    snapshot = {
+        "counters": (
+            counters_to_map(counters) if _is_map_layout(char_doc) else counters
+        ),
+        "health": char_doc.get("health", []),
+    }
+    folded = {}
+    for op, path in paths:
+        value = update[op][path]
+        if path.split(".")[0] not in SNAPSHOT_FIELDS:
+            folded.setdefault(op, {})[path] = value
+        elif op == "$set" and path in SNAPSHOT_FIELDS:
+            snapshot[path] = value
+    folded.setdefault("$set", {}).update(snapshot, event_tail=[])
+    return folded
+
+
+def _write_character(character_id: str, char_doc: dict, update: dict, events=()):
+    """
+    Apply update to a character, conditional on the stored version still being
+    the one char_doc was read at; otherwise raise VersionConflict.
+    events are new events the update folds into the snapshot; they are copied
+    to counter_events only once the write has gone through.
+    """
+    update = _fold_event_tail(char_doc, update, force=bool(events))
+    version = char_doc.get("version")
+    query = {
+        "_id": char_doc.get("_id") or ObjectId(character_id),
+        # Documents written before versioning have no version field yet
+        "version": version if version is not None else {"$exists": False},
+    }
+    result = CharacterRepository.update_one(query, update)
+    if result is not None and result.matched_count == 0:
+        raise VersionConflict(character_id)
+    if events:
+        _archive_events(char_doc, events)
+    # Keep the returned document in step with the stored version
+    char_doc["version"] = (version or 0) + 1
+    if "event_tail" in update.get("$set", {}):
+        char_doc["event_tail"] = []
+
+
+def _is_map_layout(char_doc):
+    return char_doc.get("counter_layout") == "map"
+
+
+def _save_character_fields(character_id: str, char_doc: dict, fields: dict, inc=None):
+    """
+    $set fields on a character and apply them to char_doc, returning the
+    post-update document without reading it back (the in-memory equivalent
+    of find_one_and_update with ReturnDocument.AFTER).
+    inc holds $inc paths whose result is already reflected in char_doc.
+    The write only applies if the stored version is still the one char_doc
+    was read at; otherwise VersionConflict is raised and nothing is written.
+    """
+    stored = dict(fields)
+    if "counters" in fields and _is_map_layout(char_doc):
+        stored["counters"] = counters_to_map(fields["counters"])
+        fields = dict(fields, counters=counters_from_map(stored["counters"]))
+    update = {"$set": stored} if stored else {}
+    if inc:
+        update["$inc"] = inc
+    _write_character(character_id, char_doc, update)
+    char_doc.update(fields)
+    return char_doc
+
+
+def _next_counter_order(counters, new_counter):
+    orders = [c.get(COUNTER_ORDER_FIELD, -1) for c in counters if c is not new_counter]
+    return max(orders, default=-1) + 1
+
+
+def _save_counters(
+    character_id: str, char_doc: dict, changed=(), removed=(), fields=None, inc=None
+):
+    """
+    Persist changes to individual counters of char_doc, plus any other fields
+    and $inc paths (see _save_character_fields).
+    changed lists (counter, field names) pairs for counters already updated in
+    char_doc["counters"], with None as the field names for a new counter;
+    removed lists the names of counters already taken out of it.
+    Map-layout documents write only those counters, as counters.<key>.<field>
+    paths; list-layout documents rewrite the whole array.
+    Returns char_doc.
+    """
+    fields = dict(fields or {})
+    if not _is_map_layout(char_doc):
+        fields["counters"] = char_doc.get("counters", [])
+        return _save_character_fields(character_id, char_doc, fields, inc)
+    sets = dict(fields)
+    for c, names in changed:
+        path = f"counters.{counter_key(c['counter'])}"
+        if names is None:
+            # New counters go last; a renamed counter keeps its place
+            if COUNTER_ORDER_FIELD not in c:
+                c[COUNTER_ORDER_FIELD] = _next_counter_order(char_doc["counters"], c)
+            sets[path] = c
+        else:
+            sets.update({f"{path}.{name}": c.get(name) for name in names})
+    update = {"$set": sets} if sets else {}
+    if removed:
+        update["$unset"] = {f"counters.{counter_key(name)}": "" for name in removed}
+    if inc:
+        update["$inc"] = inc
+    if update:
+        _write_character(character_id, char_doc, update)
+        char_doc.update(fields)
+    return char_doc
+
+
+def _append_event(character_id: str, char_doc: dict, op: str, changes, prev, **extra):
+    """
+    Record a change already applied to char_doc as an event on its tail (see
+    events.py): changes and prev hold the values written and replaced.
+    A tail that reaches EVENT_TAIL_LIMIT is folded into the snapshot by this
+    write instead. Returns char_doc.
+    """
+    seq = char_doc.get("event_seq", 0) + 1
+    event = {"seq": seq, "op": op, "at": time.time(), "set": changes, "prev": prev}
+    event.update(extra)
+    tail = char_doc.setdefault("event_tail", [])
+    if len(tail) + 1 >= EVENT_TAIL_LIMIT:
+        # Writing the snapshot folds the whole tail, this event included
+        update = {"$set": {"event_seq": seq, "health": char_doc.get("health", [])}}
+        _write_character(character_id, char_doc, update, events=[event])
+    else:
+        update = {"$push": {"event_tail": event}, "$set": {"event_seq": seq}}
+        _write_character(character_id, char_doc, update)
+        tail.append(event)
+    char_doc["event_seq"] = seq
+    return char_doc
+
+
+def _counter_values(c: dict, names):
+    return {name: c.get(name) for name in names}
+
+
+def _record_changes(
+    character_id: str,
+    char_doc: dict,
+    op: str,
+    counters=(),
+    health=(),
+    fields=None,
+    inc=None,
+):
+    """
+    Persist changes already applied to char_doc. counters lists (counter,
+    {field: previous value}) pairs and health lists (tracker, previous damage
+    counts) pairs. With EVENT_LOG they are appended as one event; otherwise
+    the changed counter fields are written directly, along with fields and
+    inc (see _save_counters). The event holds each tracker's new damage
+    counts rather than fields and inc, so replaying it sets the counts
+    instead of adding to them. Returns char_doc.
+    """
+    if not EVENT_LOG:
+        return _save_counters(
+            character_id,
+            char_doc,
+            changed=[(c, tuple(prev)) for c, prev in counters],
+            fields=fields,
+            inc=inc,
+        )
+    changes = {"counters": {}, "health": {}}
+    prev = {"counters": {}, "health": {}}
+    for c, before in counters:
+        # Only fields whose value changed go into the event
+        before = {k: v for k, v in before.items() if c.get(k) != v}
+        if before:
+            key = counter_key(c["counter"])
+            changes["counters"][key] = _counter_values(c, before)
+            prev["counters"][key] = before
+    for tracker, before in health:
+        changes["health"][tracker["health_type"]] = {"damage": tracker["damage"]}
+        prev["health"][tracker["health_type"]] = {"damage": before}
+    return _append_event(character_id, char_doc, op, changes, prev)
+
+
+def _tracker_write(health_list, i, health_obj):
+    """
+    Apply health_obj to the stored tracker health_list[i] and return the
+    (fields, inc) that persist it. Trackers stored as counts are updated with
+    $inc on the counts that changed; trackers stored as lists by older
+    versions are rewritten whole in the count form.
+    With EVENT_LOG, damage and heal don't use these: _record_changes stores
+    the tracker's new counts in the event, which is as safe as $inc because
+    the append is conditional on the version the counts were computed from.
+    """
+    tracker = health_list[i]
+    stored = health_obj.to_dict()
+    if not all(isinstance(tracker.get(f), dict) for f in ("damage", "health_levels")):
+        tracker.update(stored)
+        return {"health": health_list}, {}
+    inc = {}
+    for field in ("damage", "health_levels"):
+        for name, count in stored[field].items():
+            delta = count - tracker[field].get(name, 0)
+            if delta:
+                inc[f"health.{i}.{field}.{name}"] = delta
+    tracker.update(stored)
+    return {}, inc
+
+
+def counter_index(counters):
+    """
+    Return {counter_key: position} for a list of counters. Names that share a
+    key are the same counter as far as lookups and duplicate checks go.
+    """
+    index = {}
+    for i, c in enumerate(counters):
+        index.setdefault(counter_key(c["counter"]), i)
+    return index
+
+
+# Async lookups for autocomplete handlers; concurrent identical requests
+# share a single database call
+async def get_character_id_by_user_and_name_async(user_id: str, character: str):
+    doc = await _find_character_doc_by_user_and_name_async(user_id, character)
+    if doc:
+        return str(doc["_id"])
+    return None
+
+
+async def get_counters_for_character_async(character_id: str):
+    char_doc = await _get_character_by_id_async(character_id)
     counters = char_doc.get("counters", []) if char_doc else []
     return [CounterFactory.from_dict(c) for c in counters]
 
 
+async def get_all_user_characters_for_user_async(user_id: str):
+    docs = await CharacterRepository.find_async({"user": user_id})
+    return [UserCharacter.from_dict(d) for d in docs]
+
+
+@retry_on_conflict((False, CONFLICT_ERROR))
 def add_counter(
     character_id: str,
     counter_name: str,
@@ -240,18 +1040,16 @@ def add_counter(
     except ValueError as ve:
         return False, str(ve)
 
-    # --- Robust character lookup: match by both escaped and unescaped name ---
     char_doc = None
     try:
         char_doc = _get_character_by_id(character_id)
     except Exception:
         pass
     if not char_doc:
-        character_raw = str(character_id).strip()
-        character_escaped = html.escape(character_raw)
-        char_doc = CharacterRepository.find_one({"character": character_escaped})
-        if not char_doc:
-            char_doc = CharacterRepository.find_one({"character": character_raw})
+        # Callers may pass a character name; stored names are canonical
+        char_doc = CharacterRepository.find_one(
+            {"character": canonical_name(str(character_id))}
+        )
         if not char_doc:
             return False, "Character not found."
 
@@ -269,11 +1067,7 @@ def add_counter(
             f"This character has reached the maximum number of counters ({max_counters}).",
         )
 
-    sanitized_name = sanitize_string(counter_name_sanitized)
-    if any(
-        sanitize_string(c["counter"]).lower() == sanitized_name.lower()
-        for c in counters
-    ):
+    if counter_key(counter_name_sanitized) in counter_index(counters):
         return False, "A counter with that name exists for this character."
 
     # Set temp/perm/bedlam according to type and value
@@ -321,15 +1115,66 @@ def add_counter(
         if hasattr(new_counter, "bedlam_error") and new_counter.bedlam_error:
             return False, new_counter.bedlam_error
 
-        counters.append(new_counter.__dict__)
-        CharacterRepository.update_one(
-            {"_id": char_doc["_id"]}, {"$set": {"counters": counters}}
-        )
+        counters.append(new_counter.to_dict())
+        _save_counters(char_doc["_id"], char_doc, changed=[(counters[-1], None)])
         return True, None
     except ValueError as e:
         return False, str(e)
 
 
+def _apply_counter_delta(c: dict, field: str, delta: int):
+    """
+    Apply a delta to a counter dict in place, using the same rules as update_counter.
+    Returns (removed, error): removed is True if an exhaustible counter ran out.
+    """
+    counter_type = c.get("counter_type", "single_number")
+    is_exhaustible = c.get("is_exhaustible", False)
+    # Handle single_number exhaustible removal
+    if counter_type == "single_number" and is_exhaustible:
+        new_value = c[field] + delta
+        if new_value <= 0:
+            return True, None
+    # Normal update logic
+    if field not in ("temp", "perm"):
+        return False, "Invalid field."
+    if field == "temp":
+        new_temp = c["temp"] + delta
+        if new_temp < 0:
+            return False, "Temp cannot be below zero."
+        if counter_type == "perm_is_maximum":
+            c["temp"] = min(new_temp, c["perm"])
+        elif counter_type == "single_number":
+            c["temp"] = new_temp
+            c["perm"] = new_temp  # Always set perm to match temp for single_number
+        elif counter_type == "perm_is_maximum_bedlam":
+            c["temp"] = min(new_temp, c["perm"])
+        else:
+            c["temp"] = new_temp
+    elif field == "perm":
+        new_perm = c["perm"] + delta
+        if new_perm < 0:
+            return False, "Perm cannot be below zero."
+
+        # For perm_is_maximum_bedlam, ensure perm doesn't go below bedlam
+        if counter_type == "perm_is_maximum_bedlam":
+            if new_perm < c.get("bedlam", 0):
+                return (
+                    False,
+                    f"Perm cannot be set below bedlam ({c.get('bedlam', 0)}).",
+                )
+            c["perm"] = new_perm
+            c["temp"] = min(c["temp"], new_perm)
+        elif counter_type == "perm_is_maximum":
+            c["perm"] = new_perm
+            c["temp"] = min(c["temp"], new_perm)
+        elif counter_type == "single_number":
+            c["perm"] = new_perm
+            c["temp"] = new_perm  # Always set temp to match perm for single_number
+        else:
+            c["perm"] = new_perm
+    return False, None
+
+
 def update_counter(character_id: str, counter_name: str, field: str, delta: int):
     """
     Update a counter's temp or perm value by delta.
@@ -337,139 +1182,411 @@ def update_counter(character_id: str, counter_name: str, field: str, delta: int)
     For single_number counters, always set perm to the same value as temp.
     Returns (success, error).
     """
-    char_doc = _get_character_by_id(character_id)
-    if not char_doc:
-        return False, "Character not found."
-    counters = char_doc.get("counters", [])
-    for i, c in enumerate(counters):
-        if sanitize_string(c["counter"]) == sanitize_string(counter_name):
-            counter_type = c.get("counter_type", "single_number")
-            is_exhaustible = c.get("is_exhaustible", False)
-            # Handle single_number exhaustible removal
-            if counter_type == "single_number" and is_exhaustible:
-                new_value = c[field] + delta
-                if new_value <= 0:
-                    # Remove counter
-                    counters.pop(i)
-                    CharacterRepository.update_one(
-                        {"_id": ObjectId(character_id)},
-                        {"$set": {"counters": counters}},
-                    )
-                    return True, None
-            # Normal update logic
-            if field not in ("temp", "perm"):
-                return False, "Invalid field."
-            if field == "temp":
-                new_temp = c["temp"] + delta
-                if new_temp < 0:
-                    return False, "Temp cannot be below zero."
-                if counter_type == "perm_is_maximum":
-                    c["temp"] = min(new_temp, c["perm"])
-                elif counter_type == "single_number":
-                    c["temp"] = new_temp
-                    c["perm"] = (
-                        new_temp  # Always set perm to match temp for single_number
-                    )
-                elif counter_type == "perm_is_maximum_bedlam":
-                    c["temp"] = min(new_temp, c["perm"])
-                else:
-                    c["temp"] = new_temp
-            elif field == "perm":
-                new_perm = c["perm"] + delta
-                if new_perm < 0:
-                    return False, "Perm cannot be below zero."
-
-                # For perm_is_maximum_bedlam, ensure perm doesn't go below bedlam
-                if counter_type == "perm_is_maximum_bedlam":
-                    if new_perm < c.get("bedlam", 0):
-                        return (
-                            False,
-                            f"Perm cannot be set below bedlam ({c.get('bedlam', 0)}).",
-                        )
-                    c["perm"] = new_perm
-                    c["temp"] = min(c["temp"], new_perm)
-                elif counter_type == "perm_is_maximum":
-                    c["perm"] = new_perm
-                    c["temp"] = min(c["temp"], new_perm)
-                elif counter_type == "single_number":
-                    c["perm"] = new_perm
-                    c["temp"] = (
-                        new_perm  # Always set temp to match perm for single_number
-                    )
-                else:
-                    c["perm"] = new_perm
-            CharacterRepository.update_one(
-                {"_id": ObjectId(character_id)}, {"$set": {"counters": counters}}
-            )
-            return True, None
-    return False, "Counter not found."
+    success, error, _ = update_counter_doc(character_id, counter_name, field, delta)
+    return success, error
 
 
-def reset_if_eligible(character_id: str):
+@retry_on_conflict((False, CONFLICT_ERROR, None))
+def update_counter_doc(
+    character_id: str, counter_name: str, field: str, delta: int, clamp=False
+):
     """
-    Reset all perm_is_maximum counters with is_resettable True: set temp to perm.
-    Returns count of counters reset.
+    Like update_counter, but also returns the updated character document.
+    With clamp, a temp that would drop below zero is set to zero instead.
+    Returns (success, error, char_doc).
     """
     char_doc = _get_character_by_id(character_id)
     if not char_doc:
-        return 0
+        return False, "Character not found.", None
     counters = char_doc.get("counters", [])
-    reset_count = 0
-    for c in counters:
-        if c.get("counter_type") == "perm_is_maximum" and c.get("is_resettable", False):
-            c["temp"] = c["perm"]
-            reset_count += 1
-    CharacterRepository.update_one(
-        {"_id": ObjectId(character_id)}, {"$set": {"counters": counters}}
-    )
-    return reset_count
+    i = counter_index(counters).get(counter_key(counter_name))
+    if i is None:
+        return False, "Counter not found.", None
+    c = counters[i]
+    prev = _counter_values(c, ("temp", "perm"))
+    if clamp and field == "temp":
+        delta = max(delta, -c["temp"])
+    removed, error = _apply_counter_delta(c, field, delta)
+    if error:
+        return False, error, None
+    if removed:
+        # Remove counter
+        counters.pop(i)
+        _save_counters(character_id, char_doc, removed=[c["counter"]])
+    else:
+        _record_changes(character_id, char_doc, field, counters=[(c, prev)])
+    return True, None, char_doc
 
 
-def display_character_counters(character_id: str, unescape_func=None):
+def parse_counter_deltas(text: str):
     """
-    Return a formatted string of all counters for a character.
+    Parse a list of counter adjustments such as "willpower:-1, blood pool:-2".
+    Returns (deltas, error) where deltas is a dict of counter name -> delta.
     """
-    counters = get_counters_for_character(character_id)
-    return generate_counters_output(counters, unescape_func)
+    if text is None or text.strip() == "":
+        return None, "No counter adjustments given."
+    deltas = {}
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        match = re.fullmatch(r"(.+?)\s*:\s*([+-]?\d+)", part)
+        if not match:
+            return (
+                None,
+                f"Invalid adjustment '{part}'. Use counter:delta, e.g. willpower:-1.",
+            )
+        name, delta = match.group(1).strip(), int(match.group(2))
+        deltas[name] = deltas.get(name, 0) + delta
+    if not deltas:
+        return None, "No counter adjustments given."
+    return deltas, None
 
 
-def generate_counters_output(counters, unescape_func=None):
+@retry_on_conflict((False, CONFLICT_ERROR, None, []))
+def adjust_character(
+    character_id: str,
+    deltas: dict,
+    *,
+    damage_type=None,
+    damage_levels: int = 0,
+    heal_levels: int = 0,
+    health_type: str = "normal",
+    before: dict = None,
+):
     """
-    Generate a pretty formatted string for displaying counters grouped by category,
-    with each category name in bold above its section, in the order defined by CategoryEnum.
-    Uses DISPLAY_MODE from config.py for display_pretty.
+    Apply several counter deltas plus an optional damage or heal to a character
+    and persist everything in a single update.
+    Counter deltas follow the same rules as update_counter on temp.
+    If any adjustment fails nothing is written.
+    If before is a dict, the health tracker as read by the write that went
+    through is stored in it under health_type.
+    Returns (success, error, char_doc, notes) where notes lists per-change messages.
     """
-    if not counters:
-        return "No counters found."
-    unescape_func = unescape_func if unescape_func is not None else fully_unescape
-
-    # Get category order from CategoryEnum definition
-    category_order = [e.value for e in CategoryEnum]
+    char_doc = _get_character_by_id(character_id)
+    if not char_doc:
+        return False, "Character not found.", None, []
+    # Work on a copy so a failed adjustment leaves the document untouched
+    char_doc = copy.deepcopy(char_doc)
+    counters = char_doc.get("counters", [])
+    by_key = {key: counters[i] for key, i in counter_index(counters).items()}
+    # Counters touched by the deltas, by identity, and names of removed ones
+    changed, removed_names = {}, []
+    notes = []
+    for counter_name, delta in (deltas or {}).items():
+        c = by_key.get(counter_key(counter_name))
+        if c is None:
+            return False, f"Counter '{counter_name}' not found.", None, []
+        prev = _counter_values(c, ("temp", "perm"))
+        removed, error = _apply_counter_delta(c, "temp", delta)
+        if error:
+            return False, f"{counter_name}: {error}", None, []
+        if removed:
+            counters.remove(c)
+            del by_key[counter_key(counter_name)]
+            changed.pop(id(c), None)
+            removed_names.append(c["counter"])
+            notes.append(f"Counter '{counter_name}' was removed because it reached 0.")
+        else:
+            changed.setdefault(id(c), (c, prev))
+            notes.append(f"{counter_name} {delta:+d}")
 
-    # Group counters by category
-    category_map = {}
-    for c in counters:
-        cat = c.category if c.category else "general"
-        category_map.setdefault(cat, []).append(c)
+    health_list = char_doc.get("health", [])
+    health_fields, health_inc, health_changes = {}, {}, []
+    if damage_levels or heal_levels:
+        i = next(
+            (
+                i
+                for i, h in enumerate(health_list)
+                if h.get("health_type") == health_type
+            ),
+            None,
+        )
+        if i is None:
+            return (
+                False,
+                "Health tracker not found for this character and type.",
+                None,
+                [],
+            )
+        if before is not None:
+            before[health_type] = copy.deepcopy(health_list[i])
+        health_obj = Health.from_dict(health_list[i])
+        prev_damage = to_counts(health_obj.damage, DAMAGE_ORDER)
+        if damage_levels:
+            if damage_type is None:
+                return False, "A damage type is required to apply damage.", None, []
+            damage_msg = health_obj.add_damage(damage_levels, damage_type)
+            notes.append(
+                damage_msg
+                or f"Added {damage_levels} levels of {damage_type.value} damage to {health_type} health."
+            )
+        if heal_levels:
+            health_obj.remove_damage(heal_levels)
+            notes.append(
+                f"Healed {heal_levels} levels of damage from {health_type} health."
+            )
+        # The counts changed are computed from the version this write is
+        # conditional on, so the $inc can never leave the track out of range
+        health_fields, health_inc = _tracker_write(health_list, i, health_obj)
+        health_changes.append((health_list[i], prev_damage))
+
+    if removed_names:
+        # Removing a counter changes the snapshot itself, so it is never an event
+        _save_counters(
+            str(char_doc["_id"]),
+            char_doc,
+            changed=[(c, tuple(prev)) for c, prev in changed.values()],
+            removed=removed_names,
+            fields=health_fields,
+            inc=health_inc,
+        )
+    else:
+        _record_changes(
+            str(char_doc["_id"]),
+            char_doc,
+            "damage" if damage_levels else "heal" if heal_levels else "adjust",
+            counters=list(changed.values()),
+            health=health_changes,
+            fields=health_fields,
+            inc=health_inc,
+        )
+    return True, None, char_doc, notes
+
+
+def _is_reset_eligible(c: dict) -> bool:
+    return c.get("counter_type") == "perm_is_maximum" and c.get("is_resettable", False)
+
+
+def reset_if_eligible(character_id: str):
+    """
+    Reset all perm_is_maximum counters with is_resettable True: set temp to perm.
+    Returns count of counters reset.
+    """
+    reset_count, _ = reset_if_eligible_doc(character_id)
+    return reset_count
+
+
+@retry_on_conflict((0, None))
+def reset_if_eligible_doc(character_id: str):
+    """
+    Like reset_if_eligible, but also returns the (possibly unchanged) character
+    document. Returns (reset_count, char_doc); char_doc is None if not found.
+    """
+    char_doc = _get_character_by_id(character_id)
+    if not char_doc:
+        return 0, None
+    counters = char_doc.get("counters", [])
+    changed = []
+    for c in counters:
+        if _is_reset_eligible(c):
+            c["temp"] = c["perm"]
+            changed.append((c, ("temp",)))
+    if not changed:
+        return 0, char_doc
+    _save_counters(character_id, char_doc, changed=changed)
+    return len(changed), char_doc
+
+
+# Matches counters that reset_eligible may reset
+RESET_ELIGIBLE_MATCH = {"counter_type": "perm_is_maximum", "is_resettable": True}
+
+# Update pipeline that sets temp to perm on every eligible counter of a document
+RESET_ELIGIBLE_PIPELINE = [
+    {
+        "$set": {
+            "counters": {
+                "$map": {
+                    "input": "$counters",
+                    "as": "c",
+                    "in": {
+                        "$cond": [
+                            {
+                                "$and": [
+                                    {"$eq": ["$$c.counter_type", "perm_is_maximum"]},
+                                    {"$eq": ["$$c.is_resettable", True]},
+                                ]
+                            },
+                            {"$mergeObjects": ["$$c", {"temp": "$$c.perm"}]},
+                            "$$c",
+                        ]
+                    },
+                }
+            }
+        }
+    }
+]
+
+
+def reset_if_eligible_many(query: dict):
+    """
+    Reset eligible counters on every character matching query with a single update_many.
+    Characters without eligible counters are never written.
+    Returns a dict of character_id -> (character name, count of counters reset).
+    """
+    if COUNTER_MAP_LAYOUT or EVENT_LOG:
+        return _reset_if_eligible_each(query)
+    eligible_query = dict(query)
+    eligible_query["counters"] = {"$elemMatch": RESET_ELIGIBLE_MATCH}
+    docs = CharacterRepository.find(
+        eligible_query,
+        {"character": 1, "counters.counter_type": 1, "counters.is_resettable": 1},
+    )
+    results = {}
+    ids = []
+    for d in docs:
+        count = sum(1 for c in d.get("counters", []) if _is_reset_eligible(c))
+        if count:
+            results[str(d["_id"])] = (d.get("character"), count)
+            ids.append(d["_id"])
+    if not ids:
+        return {}
+    CharacterRepository.update_many({"_id": {"$in": ids}}, RESET_ELIGIBLE_PIPELINE)
+    return results
+
+
+def _reset_if_eligible_each(query: dict):
+    """
+    reset_if_eligible_many for map-layout counters, which neither $elemMatch
+    nor the $map pipeline can address, and for event-sourced characters, whose
+    stored counters may be behind their event tail: one targeted write per
+    character that has eligible counters.
+    """
+    results = {}
+    for d in CharacterRepository.find(query, {"character": 1, "counters": 1}):
+        if any(_is_reset_eligible(c) for c in d.get("counters", [])):
+            count, _ = reset_if_eligible_doc(str(d["_id"]))
+            if count:
+                results[str(d["_id"])] = (d.get("character"), count)
+    return results
+
+
+def display_character_counters(character_id: str, unescape_func=None):
+    """
+    Return a formatted string of all counters for a character.
+    """
+    counters = get_counters_for_character(character_id)
+    return generate_counters_output(counters, unescape_func)
+
+
+def generate_counters_output(counters, unescape_func=None):
+    """
+    Generate a pretty formatted string for displaying counters grouped by category,
+    with each category name in bold above its section, in the order defined by CategoryEnum.
+    Uses DISPLAY_MODE and EMOJI_STYLE from config.py for display_pretty.
+    """
+    if not counters:
+        return "No counters found."
+    unescape_func = unescape_func if unescape_func is not None else fully_unescape
+    sections = [
+        render_category(category, members, unescape_func)
+        for category, members in group_counters_by_category(counters)
+    ]
+    return "\n\n".join(sections).strip()
+
+
+def group_counters_by_category(counters):
+    """
+    Return (category, counters) pairs: categories in CategoryEnum order first,
+    then any others in the order they first appear.
+    """
+    # Get category order from CategoryEnum definition
+    category_order = [e.value for e in CategoryEnum]
+
+    # Group counters by category
+    category_map = {}
+    for c in counters:
+        cat = c.category if c.category else "general"
+        category_map.setdefault(cat, []).append(c)
+
+    ordered = [cat for cat in category_order if cat in category_map]
+    ordered += [cat for cat in category_map if cat not in category_order]
+    return [(cat, category_map[cat]) for cat in ordered]
+
+
+def render_category(category, counters, unescape_func=None):
+    """
+    Render one category of a sheet: its name in bold above its counters.
+    """
+    unescape_func = unescape_func if unescape_func is not None else fully_unescape
+    lines = [f"**{category.title()}**"]
+    lines.extend(
+        c.generate_display(unescape_func, DISPLAY_MODE, EMOJI_STYLE) for c in counters
+    )
+    return "\n".join(lines)
 
-    lines = []
-    # Add categories in CategoryEnum order first
-    for cat in category_order:
-        if cat in category_map:
-            lines.append(f"**{cat.title()}**")
-            for c in category_map[cat]:
-                lines.append(c.generate_display(unescape_func, DISPLAY_MODE))
-            lines.append("")  # Add a blank line between categories
 
-    # Add any categories not in the CategoryEnum order
-    for cat in category_map:
-        if cat not in category_order:
-            lines.append(f"**{cat.title()}**")
-            for c in category_map[cat]:
-                lines.append(c.generate_display(unescape_func, DISPLAY_MODE))
-            lines.append("")
+def character_sheet_sections(char_doc, unescape_func=None):
+    """
+    Return the sections of a character sheet (one per counter category, then
+    the health trackers) as functions rendering them, so a pager can render
+    only the sections its current page needs.
+    """
+    counters = [CounterFactory.from_dict(c) for c in char_doc.get("counters", [])]
+    sections = [
+        functools.partial(render_category, category, members, unescape_func)
+        for category, members in group_counters_by_category(counters)
+    ]
+    health_entries = char_doc.get("health", [])
+    if health_entries:
+        sections.append(lambda: generate_health_output(health_entries).strip())
+    return sections
 
-    return "\n".join(lines).strip()
+
+def generate_health_output(health_entries):
+    """
+    Generate the health tracker section of a character sheet.
+    Normal health is paired with chimerical health when both exist.
+    """
+    from health import Health, HealthTypeEnum
+
+    msg = "\n\n**Health Trackers:**"
+    normal_health = next(
+        (
+            h
+            for h in health_entries
+            if h.get("health_type") == HealthTypeEnum.normal.value
+        ),
+        None,
+    )
+    if normal_health:
+        health_obj = Health.from_dict(normal_health)
+        msg += f"\n{health_obj.display(health_entries, EMOJI_STYLE)}"
+    # Display other health types
+    for h in health_entries:
+        if (
+            h.get("health_type") != HealthTypeEnum.normal.value
+            and h.get("health_type") != HealthTypeEnum.chimerical.value
+        ):
+            health_obj = Health.from_dict(h)
+            display = health_obj.display(emoji_style=EMOJI_STYLE)
+            msg += f"\nHealth ({health_obj.health_type}):\n{display}"
+    return msg
+
+
+def generate_character_output(char_doc, unescape_func=None):
+    """
+    Render the full sheet (counters followed by health trackers) for a character document.
+    Versioned documents are served from the render cache.
+    """
+    key = None
+    if char_doc.get("version") is not None and "_id" in char_doc:
+        key = (
+            str(char_doc["_id"]),
+            char_doc["version"],
+            getattr(unescape_func, "__name__", None),
+        )
+        cached = caches.render_cache.get(key)
+        if cached is not None:
+            return cached
+    counters = [CounterFactory.from_dict(c) for c in char_doc.get("counters", [])]
+    msg = generate_counters_output(counters, unescape_func)
+    health_entries = char_doc.get("health", [])
+    if health_entries:
+        msg += generate_health_output(health_entries)
+    if key is not None:
+        caches.render_cache.set(key, msg, tags=[key[0]])
+    return msg
 
 
 def fully_unescape(s):
@@ -482,7 +1599,6 @@ def fully_unescape(s):
 def rename_character(user_id: str, old_name: str, new_name: str):
     """
     Rename a character for a user.
-    Matches both escaped and unescaped forms for old_name.
     Disallows non-alphanumeric characters except spaces in new_name.
     """
     if old_name is None or new_name is None:
@@ -493,8 +1609,6 @@ def rename_character(user_id: str, old_name: str, new_name: str):
             False,
             "Character name must only contain alphanumeric characters, spaces, and underscores.",
         )
-    old_name_raw = old_name.strip()
-    old_name_escaped = html.escape(old_name_raw)
     new_name_sanitized = sanitize_string(new_name.strip())
 
     # Validate new name
@@ -509,14 +1623,7 @@ def rename_character(user_id: str, old_name: str, new_name: str):
     if _character_exists(user_id, new_name_sanitized):
         return False, "A character with that name already exists for you."
 
-    # Try both escaped and raw for lookup
-    char_doc = CharacterRepository.find_one(
-        {"user": user_id, "character": old_name_escaped}
-    )
-    if not char_doc:
-        char_doc = CharacterRepository.find_one(
-            {"user": user_id, "character": old_name_raw}
-        )
+    char_doc = _find_character_doc_by_user_and_name(user_id, old_name)
     if not char_doc:
         return False, "Character to rename not found."
     CharacterRepository.update_one(
@@ -525,6 +1632,7 @@ def rename_character(user_id: str, old_name: str, new_name: str):
     return True, None
 
 
+@retry_on_conflict((False, CONFLICT_ERROR))
 def rename_counter(character_id: str, old_name: str, new_name: str):
     """
     Rename a counter for a character.
@@ -541,7 +1649,6 @@ def rename_counter(character_id: str, old_name: str, new_name: str):
         )
     char_doc = _get_character_by_id(character_id)
     counters = char_doc.get("counters", []) if char_doc else []
-    old_name_sanitized = sanitize_string(old_name.strip())
     new_name_sanitized = sanitize_string(new_name.strip())
 
     # Validate new name
@@ -552,24 +1659,27 @@ def rename_counter(character_id: str, old_name: str, new_name: str):
     if len(new_name_sanitized) > MAX_FIELD_LENGTH:
         return False, f"Counter name must be at most {MAX_FIELD_LENGTH} characters."
 
-    # Check uniqueness (case-insensitive, sanitized)
-    if any(
-        sanitize_string(c["counter"]).lower() == new_name_sanitized.lower()
-        for c in counters
-        if sanitize_string(c["counter"]).lower() != old_name_sanitized.lower()
-    ):
+    # Check uniqueness (case-insensitive, sanitized); changing only the case is allowed
+    index = counter_index(counters)
+    old_key, new_key = counter_key(old_name), counter_key(new_name_sanitized)
+    if new_key != old_key and new_key in index:
         return False, "A counter with that name already exists for this character."
 
-    for c in counters:
-        if sanitize_string(c["counter"]) == old_name_sanitized:
-            c["counter"] = new_name_sanitized
-            CharacterRepository.update_one(
-                {"_id": ObjectId(character_id)}, {"$set": {"counters": counters}}
-            )
-            return True, None
-    return False, "Counter to rename not found."
+    if old_key not in index:
+        return False, "Counter to rename not found."
+    c = counters[index[old_key]]
+    old_stored_name = c["counter"]
+    c["counter"] = new_name_sanitized
+    if new_key == old_key:
+        _save_counters(character_id, char_doc, changed=[(c, ("counter",))])
+    else:
+        _save_counters(
+            character_id, char_doc, changed=[(c, None)], removed=[old_stored_name]
+        )
+    return True, None
 
 
+@retry_on_conflict((False, CONFLICT_ERROR))
 def add_health(character_id: str, level: int, damage: int):
     """
     Add a health entry to a character.
@@ -588,12 +1698,11 @@ def add_health(character_id: str, level: int, damage: int):
     if len(health_list) >= len(HEALTH_LEVELS):
         return False, "Reached maximum health level."
     health_list.append({"level": level, "damage": damage})
-    CharacterRepository.update_one(
-        {"_id": ObjectId(character_id)}, {"$set": {"health": health_list}}
-    )
+    _save_character_fields(character_id, char_doc, {"health": health_list})
     return True, None
 
 
+@retry_on_conflict((False, CONFLICT_ERROR))
 def delete_health(character_id: str, level: int):
     """
     Delete a health entry from a character.
@@ -606,9 +1715,7 @@ def delete_health(character_id: str, level: int):
     new_health_list = [h for h in health_list if h.get("level") != level]
     if len(new_health_list) == len(health_list):
         return False, "Health entry not found."
-    CharacterRepository.update_one(
-        {"_id": ObjectId(character_id)}, {"$set": {"health": new_health_list}}
-    )
+    _save_character_fields(character_id, char_doc, {"health": new_health_list})
     return True, None
 
 
@@ -644,6 +1751,190 @@ def get_user_character_health(character_id: str):
     return char_doc.get("health", [])
 
 
+# How many recent events undo looks through for one not yet undone
+UNDO_DEPTH = 50
+
+
+def _character_events(char_doc: dict, limit: int):
+    """
+    Return up to limit of a character's events, newest first: its uncompacted
+    tail followed by those already moved to counter_events.
+    """
+    events = list(reversed(char_doc.get("event_tail", [])))
+    if len(events) < limit:
+        seen = {e["seq"] for e in events}
+        stored = EventRepository.find(
+            {"character_id": str(char_doc["_id"])}, limit=limit
+        )
+        events.extend(e for e in stored if e["seq"] not in seen)
+    return events[:limit]
+
+
+def get_character_history(character_id: str, limit: int = 20):
+    """
+    Return the most recent counter and health events of a character, newest
+    first ([] if the character does not exist).
+    """
+    char_doc = _get_character_by_id(character_id)
+    if not char_doc:
+        return []
+    return _character_events(char_doc, limit)
+
+
+def counter_display_names(counters):
+    """
+    Map the counter_key of each counter (Counter objects or dicts) to the
+    name it is displayed with, for events.describe.
+    """
+    names = [c.counter if isinstance(c, Counter) else c["counter"] for c in counters]
+    return {counter_key(name): fully_unescape(name) for name in names}
+
+
+def describe_character_history(character_id: str, limit: int = 20):
+    """
+    Return get_character_history as one line per event, with counters shown
+    by their display names.
+    """
+    char_doc = _get_character_by_id(character_id)
+    if not char_doc:
+        return []
+    names = counter_display_names(char_doc.get("counters", []))
+    return [describe(e, names) for e in _character_events(char_doc, limit)]
+
+
+@retry_on_conflict((False, CONFLICT_ERROR, None))
+def undo_last_change(character_id: str):
+    """
+    Revert the most recent counter or health change not already undone, by
+    recording an event that writes back the values it replaced. Undoing
+    again reverts the change before it.
+    Returns (success, error, undone event).
+    """
+    if not EVENT_LOG:
+        return False, "Change history is not enabled.", None
+    char_doc = _get_character_by_id(character_id)
+    if not char_doc:
+        return False, "Character not found.", None
+    target = undo_target(_character_events(char_doc, UNDO_DEPTH))
+    if target is None:
+        return False, "Nothing to undo.", None
+    restore = target["prev"]
+    prev = values_of(char_doc, restore)
+    apply_changes(char_doc, restore)
+    _append_event(character_id, char_doc, "undo", restore, prev, undoes=target["seq"])
+    return True, None, target
+
+
+@retry_on_conflict(False)
+def compact_character(character_id: str):
+    """
+    Fold a character's event tail into its stored counters and health.
+    Returns True if there was a tail to fold.
+    """
+    char_doc = _get_character_by_id(character_id)
+    if not char_doc or not char_doc.get("event_tail"):
+        return False
+    _save_character_fields(
+        character_id, char_doc, {"health": char_doc.get("health", [])}
+    )
+    return True
+
+
+def compact_pending():
+    """
+    Compact every character with an event tail. Returns how many were compacted.
+    """
+    docs = characters_collection.find({"event_tail.0": {"$exists": True}}, {"_id": 1})
+    return sum(1 for d in docs if compact_character(str(d["_id"])))
+
+
+def start_event_compaction():
+    """
+    Start compacting event tails every EVENT_COMPACT_INTERVAL seconds when
+    EVENT_LOG is on. Returns the background thread, or None.
+    """
+    if not EVENT_LOG or EVENT_COMPACT_INTERVAL <= 0:
+        return None
+    EventRepository.create_indexes()
+    return start_compaction(compact_pending, EVENT_COMPACT_INTERVAL)
+
+
+def flush_journal():
+    """
+    Write journaled character updates to the database, oldest first.
+    Returns (written, conflicts), see journal.flush.
+    """
+    if write_journal is None:
+        return 0, 0
+    written, conflicts = journal.flush(write_journal, characters_collection)
+    if conflicts:
+        # Cached documents may still hold the dropped writes
+        _invalidate_all()
+    return written, conflicts
+
+
+def start_journal_flush():
+    """
+    Flush the write journal every WRITE_JOURNAL_FLUSH_INTERVAL seconds when
+    it is enabled. Returns the background thread, or None.
+    """
+    if write_journal is None:
+        return None
+    return journal.start_flusher(flush_journal, WRITE_JOURNAL_FLUSH_INTERVAL)
+
+
+def _load_warmup_characters(character_ids):
+    ids = [ObjectId(i) for i in character_ids if ObjectId.is_valid(i)]
+    return CharacterRepository.find({"_id": {"$in": ids}})
+
+
+def _load_warmup_names(user_ids):
+    return CharacterRepository.find(
+        {"user": {"$in": list(user_ids)}}, {"user": 1, "character": 1}
+    )
+
+
+async def warm_caches(path=WARMUP_PATH):
+    """
+    Prefetch the recently active characters and users saved at path into the
+    caches, for at most WARMUP_BUDGET seconds (see warmup.py).
+    Returns (characters, users) warmed.
+    """
+    if not path or WARMUP_SIZE <= 0:
+        return 0, 0
+    return await warmup.prefetch(
+        warmup.load(path),
+        _load_warmup_characters,
+        _load_warmup_names,
+        WARMUP_BUDGET,
+    )
+
+
+def save_recent_activity(path=WARMUP_PATH):
+    """
+    Save the recently active characters and users for the next warm_caches.
+    """
+    if not path or WARMUP_SIZE <= 0:
+        return None
+    try:
+        return warmup.save(path, WARMUP_SIZE)
+    except OSError as e:
+        print(f"Saving recent activity to {path} failed: {e}")
+        return None
+
+
+def start_activity_saver(path=WARMUP_PATH):
+    """
+    Save recent activity every WARMUP_SAVE_INTERVAL seconds, so a crash
+    still leaves a recent list. Returns the background thread, or None.
+    """
+    if not path or WARMUP_SIZE <= 0 or WARMUP_SAVE_INTERVAL <= 0:
+        return None
+    return warmup.start_saver(
+        functools.partial(save_recent_activity, path), WARMUP_SAVE_INTERVAL
+    )
+
+
 def get_all_user_characters_for_user(user_id: str):
     """
     Return a list of UserCharacter objects for a given user.
@@ -652,6 +1943,376 @@ def get_all_user_characters_for_user(user_id: str):
     return [UserCharacter.from_dict(d) for d in docs]
 
 
+# Fields needed to render a character sheet; event_tail holds changes not yet
+# folded into counters and health (see events.py)
+CHARACTER_SHEET_PROJECTION = {
+    "user": 1,
+    "character": 1,
+    "counters": 1,
+    "health": 1,
+    "version": 1,
+    "event_tail": 1,
+}
+
+# Discord rejects messages longer than this
+DISCORD_MESSAGE_LIMIT = 2000
+
+
+def create_party(guild_id: str, name: str, owner_id: str):
+    """
+    Create a named party in a guild. The creator owns the party.
+    Returns (success, error).
+    """
+    if name is None or name.strip() == "":
+        return False, "Party name cannot be empty or whitespace only."
+    if not re.fullmatch(r"[A-Za-z0-9_ ]+", name.strip()):
+        return (
+            False,
+            "Party name must only contain alphanumeric characters, spaces, and underscores.",
+        )
+    try:
+        name = sanitize_and_validate("party", name.strip(), MAX_FIELD_LENGTH)
+    except ValueError as ve:
+        return False, str(ve)
+    if PartyRepository.find_one({"guild": guild_id, "name": name}):
+        return False, "A party with that name already exists in this server."
+    PartyRepository.insert_one(
+        {"guild": guild_id, "name": name, "owner": owner_id, "characters": []}
+    )
+    return True, None
+
+
+def get_party(guild_id: str, name: str):
+    """
+    Return the party document for a guild and party name, or None.
+    """
+    if name is None:
+        return None
+    return PartyRepository.find_one({"guild": guild_id, "name": sanitize_string(name)})
+
+
+def get_parties_for_guild(guild_id: str):
+    """
+    Return all party documents for a guild.
+    """
+    return PartyRepository.find({"guild": guild_id})
+
+
+def get_guild_character_ids(guild_id: str):
+    """
+    Return the ids of the characters in any of a guild's parties. Characters
+    belong to users, so parties are what ties them to a guild.
+    """
+    ids = []
+    for party in get_parties_for_guild(guild_id):
+        ids.extend(c for c in party.get("characters", []) if c not in ids)
+    return ids
+
+
+def add_character_to_party(guild_id: str, party_name: str, character_id: str):
+    """
+    Add a character to a party.
+    Returns (success, error).
+    """
+    party = get_party(guild_id, party_name)
+    if not party:
+        return False, "Party not found."
+    oid = ObjectId(character_id)
+    if oid in party.get("characters", []):
+        return False, "That character is already in this party."
+    PartyRepository.update_one(
+        {"_id": party["_id"]}, {"$addToSet": {"characters": oid}}
+    )
+    return True, None
+
+
+def remove_character_from_party(guild_id: str, party_name: str, character_id: str):
+    """
+    Remove a character from a party.
+    Returns (success, error).
+    """
+    party = get_party(guild_id, party_name)
+    if not party:
+        return False, "Party not found."
+    oid = ObjectId(character_id)
+    if oid not in party.get("characters", []):
+        return False, "That character is not in this party."
+    PartyRepository.update_one({"_id": party["_id"]}, {"$pull": {"characters": oid}})
+    return True, None
+
+
+def get_party_character_docs(party: dict):
+    """
+    Fetch every member of a party with a single $in query, in party order.
+    Members that no longer exist are skipped.
+    """
+    ids = party.get("characters", [])
+    if not ids:
+        return []
+    docs = CharacterRepository.find({"_id": {"$in": ids}}, CHARACTER_SHEET_PROJECTION)
+    by_id = {str(d["_id"]): d for d in docs}
+    return [by_id[str(i)] for i in ids if str(i) in by_id]
+
+
+class PagePacker:
+    """
+    Incremental form of paginate_sections: sections are added one at a time and
+    pages are closed as soon as the next section no longer fits.
+    """
+
+    def __init__(self, limit: int = DISCORD_MESSAGE_LIMIT):
+        self.limit = limit
+        self.pages = []
+        self.current = ""
+
+    def add(self, section):
+        limit = self.limit
+        candidate = f"{self.current}\n\n{section}" if self.current else section
+        if len(candidate) <= limit:
+            self.current = candidate
+            return
+        if self.current:
+            self.pages.append(self.current)
+            self.current = ""
+        if len(section) <= limit:
+            self.current = section
+            return
+        for line in section.split("\n"):
+            while len(line) > limit:
+                if self.current:
+                    self.pages.append(self.current)
+                    self.current = ""
+                self.pages.append(line[:limit])
+                line = line[limit:]
+            candidate = f"{self.current}\n{line}" if self.current else line
+            if len(candidate) <= limit:
+                self.current = candidate
+            else:
+                self.pages.append(self.current)
+                self.current = line
+
+    def finish(self):
+        if self.current:
+            self.pages.append(self.current)
+            self.current = ""
+        return self.pages
+
+
+def paginate_sections(sections, limit: int = DISCORD_MESSAGE_LIMIT):
+    """
+    Pack text sections into as few messages as possible without exceeding limit.
+    Sections are kept whole where they fit; oversized sections are split on line
+    boundaries, and single lines longer than limit are hard-wrapped.
+    """
+    packer = PagePacker(limit)
+    for section in sections:
+        packer.add(section)
+    return packer.finish()
+
+
+class LazyPages:
+    """
+    Pages packed from sections (strings, or functions returning one) that are
+    rendered only when a page that needs them is requested. header starts
+    every page and counts towards limit.
+    """
+
+    def __init__(self, sections, limit: int = DISCORD_MESSAGE_LIMIT, header=""):
+        self.header = header
+        self._sections = iter(sections)
+        self._packer = PagePacker(limit - len(header) - 1 if header else limit)
+        self.complete = False
+
+    def _fill(self, index):
+        while len(self._packer.pages) <= index and not self.complete:
+            section = next(self._sections, None)
+            if section is None:
+                self._packer.finish()
+                self.complete = True
+                continue
+            text = section() if callable(section) else section
+            if text:
+                self._packer.add(text)
+
+    def page(self, index: int):
+        """
+        Return page index (0-based), rendering the sections it needs.
+        """
+        self._fill(index)
+        pages = self._packer.pages
+        body = pages[index] if index < len(pages) else ""
+        return f"{self.header}\n{body}" if self.header else body
+
+    def last_index(self, index: int):
+        """
+        Return index, or the last page if there are fewer pages than that.
+        """
+        self._fill(index)
+        return max(0, min(index, len(self._packer.pages) - 1))
+
+    def has_next(self, index: int):
+        """
+        Return True if a page follows page index, without rendering it.
+        """
+        self._fill(index)
+        return (
+            len(self._packer.pages) > index + 1
+            or bool(self._packer.current)
+            or not self.complete
+        )
+
+    def label(self, index: int):
+        if self.complete:
+            return f"{index + 1}/{len(self._packer.pages)}"
+        return f"{index + 1}/…"
+
+
+def add_pin(character_id: str, guild_id: str, channel_id: str, message_id: str):
+    """
+    Record a pinned sheet message. A character has at most one pin per channel;
+    returns the replaced pin document, if any.
+    """
+    query = {"character_id": character_id, "channel_id": channel_id}
+    previous = PinRepository.find(query)
+    if previous:
+        PinRepository.delete_many(query)
+    PinRepository.insert_one(
+        {
+            "character_id": character_id,
+            "guild_id": guild_id,
+            "channel_id": channel_id,
+            "message_id": message_id,
+        }
+    )
+    return previous[0] if previous else None
+
+
+def remove_pins(query: dict):
+    """
+    Forget pinned sheets matching query. Returns the removed pin documents.
+    """
+    pins = PinRepository.find(query)
+    if pins:
+        PinRepository.delete_many(query)
+    return pins
+
+
+def get_pins(query: dict):
+    return PinRepository.find(query)
+
+
+FULL_RESPONSES = "full"
+DELTA_RESPONSES = "delta"
+RESPONSE_MODES = (FULL_RESPONSES, DELTA_RESPONSES)
+
+
+def _settings(scope: str, scope_id: str):
+    """
+    Return the settings document of a user or guild ({} if it has none).
+    """
+    key = (scope, str(scope_id))
+    doc = caches.settings_cache.get(key)
+    if doc is None:
+        doc = SettingsRepository.find_one({"scope": scope, "scope_id": key[1]}) or {}
+        caches.settings_cache.set(key, doc)
+    return doc
+
+
+def set_response_mode(scope: str, scope_id: str, mode):
+    """
+    Set the response mode for a user or a guild (scope "user" or "guild").
+    A mode of None clears it, falling back to the guild's or RESPONSE_MODE.
+    Returns (success, error).
+    """
+    if mode is not None and mode not in RESPONSE_MODES:
+        return False, f"Response mode must be one of: {', '.join(RESPONSE_MODES)}."
+    update = (
+        {"$set": {"response_mode": mode}}
+        if mode is not None
+        else {"$unset": {"response_mode": ""}}
+    )
+    SettingsRepository.upsert({"scope": scope, "scope_id": str(scope_id)}, update)
+    caches.settings_cache.invalidate_key((scope, str(scope_id)))
+    return True, None
+
+
+def get_response_mode(user_id: str, guild_id=None):
+    """
+    Return how counter and health changes are answered for a user: their own
+    setting, else the guild's, else RESPONSE_MODE.
+    """
+    mode = _settings("user", user_id).get("response_mode")
+    if mode is None and guild_id is not None:
+        mode = _settings("guild", guild_id).get("response_mode")
+    return mode or RESPONSE_MODE
+
+
+def _counter_values_text(counter):
+    if counter.counter_type == CounterTypeEnum.single_number.value:
+        return str(counter.temp)
+    return f"{counter.temp}/{counter.perm}"
+
+
+def render_counter_change(before, after, unescape_func=None):
+    """
+    Render a counter's change as one line with its values before and after.
+    before and after are Counter objects; after is None if it was removed.
+    """
+    unescape_func = unescape_func if unescape_func is not None else fully_unescape
+    name = unescape_func(before.counter)
+    if after is None:
+        return f"{name}: {_counter_values_text(before)} → removed"
+    return f"{name}: {_counter_values_text(before)} → {_counter_values_text(after)}"
+
+
+def _health_summary(entry):
+    health_obj = Health.from_dict(entry)
+    if not health_obj.damage:
+        return "no damage"
+    counts = to_counts(health_obj.damage, DAMAGE_ORDER)
+    damage = ", ".join(f"{n} {name}" for name, n in counts.items() if n)
+    levels = health_obj.map_damage_to_health()
+    level = levels[min(len(health_obj.damage), len(levels)) - 1]
+    if level["health_level"] == HealthLevelEnum.Incapacitated.value:
+        return f"{damage} ({level['health_level']})"
+    return f"{damage} ({level['health_level']}, {level['penalty']})"
+
+
+def render_health_change(before, after):
+    """
+    Render a health tracker's change as one line with its damage before and
+    after. before and after are stored tracker dicts.
+    """
+    return (
+        f"Health ({after.get('health_type')}): "
+        f"{_health_summary(before)} → {_health_summary(after)}"
+    )
+
+
+def find_health_entry(char_doc, health_type: str):
+    return next(
+        (
+            h
+            for h in (char_doc or {}).get("health", [])
+            if h.get("health_type") == health_type
+        ),
+        None,
+    )
+
+
+def character_sheet_pages(character_id: str, character: str, unescape_func=None):
+    """
+    Return LazyPages for a character's full sheet, or None if it is gone.
+    """
+    char_doc = CharacterRepository.find_one({"_id": ObjectId(character_id)})
+    if not char_doc:
+        return None
+    return LazyPages(
+        character_sheet_sections(char_doc, unescape_func),
+        header=f"Counters for character '{character}':",
+    )
+
+
 # Shared async error handlers for commands
 async def handle_character_not_found(interaction):
     await interaction.response.send_message(
@@ -684,6 +2345,7 @@ async def handle_health_tracker_not_found(interaction):
     return False
 
 
+@retry_on_conflict((False, CONFLICT_ERROR))
 def add_predefined_counter(
     character_id: str,
     counter_type: str,
@@ -740,11 +2402,7 @@ def add_predefined_counter(
 
     # --- FIX: Check for duplicate counter name (case-insensitive, sanitized) ---
     # Always check against the actual name used in the counter object (counter_obj.counter)
-    sanitized_new_name = sanitize_string(counter_obj.counter)
-    if any(
-        sanitize_string(c["counter"]).lower() == sanitized_new_name.lower()
-        for c in counters
-    ):
+    if counter_key(counter_obj.counter) in counter_index(counters):
         return False, "A counter with that name exists for this character."
 
     # Check counter limit
@@ -755,13 +2413,12 @@ def add_predefined_counter(
         )
 
     # Add the counter
-    counters.append(counter_obj.__dict__)
-    CharacterRepository.update_one(
-        {"_id": ObjectId(character_id)}, {"$set": {"counters": counters}}
-    )
+    counters.append(counter_obj.to_dict())
+    _save_counters(character_id, char_doc, changed=[(counters[-1], None)])
     return True, None
 
 
+@retry_on_conflict((False, CONFLICT_ERROR))
 def toggle_counter_option(
     character_id: str, counter_name: str, option: str, value: bool
 ):
@@ -773,32 +2430,31 @@ def toggle_counter_option(
         return False, "Character not found."
     counters = char_doc.get("counters", [])
     found = False
-    for c in counters:
-        if sanitize_string(c["counter"]) == sanitize_string(counter_name):
-            if option == "force_unpretty":
-                c["force_unpretty"] = value
-                found = True
-            elif (
-                option == "is_resettable"
-                and c.get("counter_type") == CounterTypeEnum.perm_is_maximum.value
-            ):
-                c["is_resettable"] = value
-                found = True
-            elif (
-                option == "is_exhaustible"
-                and c.get("counter_type") == CounterTypeEnum.single_number.value
-            ):
-                c["is_exhaustible"] = value
-                found = True
-            break
+    i = counter_index(counters).get(counter_key(counter_name))
+    if i is not None:
+        c = counters[i]
+        if option == "force_unpretty":
+            c["force_unpretty"] = value
+            found = True
+        elif (
+            option == "is_resettable"
+            and c.get("counter_type") == CounterTypeEnum.perm_is_maximum.value
+        ):
+            c["is_resettable"] = value
+            found = True
+        elif (
+            option == "is_exhaustible"
+            and c.get("counter_type") == CounterTypeEnum.single_number.value
+        ):
+            c["is_exhaustible"] = value
+            found = True
     if not found:
         return False, "Counter not found or option not allowed for this type."
-    CharacterRepository.update_one(
-        {"_id": ObjectId(character_id)}, {"$set": {"counters": counters}}
-    )
+    _save_counters(character_id, char_doc, changed=[(c, (option,))])
     return True, None
 
 
+@retry_on_conflict((False, CONFLICT_ERROR))
 def update_counter_comment(character_id: str, counter_name: str, comment: str):
     """
     Update the comment for a counter.
@@ -808,20 +2464,16 @@ def update_counter_comment(character_id: str, counter_name: str, comment: str):
     if not char_doc:
         return False, "Character not found."
     counters = char_doc.get("counters", [])
-    found = False
-    for c in counters:
-        if sanitize_string(c["counter"]) == sanitize_string(counter_name):
-            c["comment"] = comment
-            found = True
-            break
-    if not found:
+    i = counter_index(counters).get(counter_key(counter_name))
+    if i is None:
         return False, "Counter not found."
-    CharacterRepository.update_one(
-        {"_id": ObjectId(character_id)}, {"$set": {"counters": counters}}
-    )
+    c = counters[i]
+    c["comment"] = comment
+    _save_counters(character_id, char_doc, changed=[(c, ("comment",))])
     return True, None
 
 
+@retry_on_conflict((False, CONFLICT_ERROR))
 def set_counter_category(character_id: str, counter_name: str, category: str):
     """
     Set the category for a counter.
@@ -831,33 +2483,44 @@ def set_counter_category(character_id: str, counter_name: str, category: str):
     if not char_doc:
         return False, "Character not found."
     counters = char_doc.get("counters", [])
-    found = False
-    for c in counters:
-        if sanitize_string(c["counter"]) == sanitize_string(counter_name):
-            c["category"] = category
-            found = True
-            break
-    if not found:
+    i = counter_index(counters).get(counter_key(counter_name))
+    if i is None:
         return False, "Counter not found."
-    CharacterRepository.update_one(
-        {"_id": ObjectId(character_id)}, {"$set": {"counters": counters}}
-    )
+    c = counters[i]
+    c["category"] = category
+    _save_counters(character_id, char_doc, changed=[(c, ("category",))])
     return True, None
 
 
 def update_health_in_db(character_id: str, health_type: str, damage):
     """
     Update the health tracker in the database for a given health_type.
+    Returns (success, error, health).
+    """
+    success, error, char_doc = update_health_in_db_doc(
+        character_id, health_type, damage
+    )
+    return success, error, char_doc.get("health", []) if success else []
+
+
+@retry_on_conflict((False, CONFLICT_ERROR, None))
+def update_health_in_db_doc(character_id: str, health_type: str, damage):
+    """
+    Like update_health_in_db, but returns the updated character document.
+    Returns (success, error, char_doc).
     """
     char_doc = _get_character_by_id(character_id)
+    if not char_doc:
+        return False, "Character not found.", None
     health_list = char_doc.get("health", [])
-    for h in health_list:
+    for i, h in enumerate(health_list):
         if h.get("health_type") == health_type:
-            h["damage"] = damage
-    CharacterRepository.update_one(
-        {"_id": ObjectId(character_id)}, {"$set": {"health": health_list}}
-    )
-    return health_list
+            health_obj = Health(health_type, damage, h.get("health_levels"))
+            fields, inc = _tracker_write(health_list, i, health_obj)
+            break
+    else:
+        fields, inc = {"health": health_list}, None
+    return True, None, _save_character_fields(character_id, char_doc, fields, inc)
 
 
 def remove_character(user_id: str, character: str):
@@ -890,34 +2553,108 @@ def update_counter_in_db(character_id, counter_name, field, value, target=None):
     """
     Update a counter's field (perm, temp, or bedlam) directly in the database.
     If target is provided, updates temp, perm, and bedlam from the target object.
+    Returns (success, error, counters).
+    """
+    success, error, char_doc = update_counter_in_db_doc(
+        character_id, counter_name, field, value, target
+    )
+    return success, error, counters_from_doc(char_doc) if success else []
+
+
+@retry_on_conflict((False, CONFLICT_ERROR, None))
+def update_counter_in_db_doc(character_id, counter_name, field, value, target=None):
+    """
+    Like update_counter_in_db, but returns the updated character document.
+    Returns (success, error, char_doc).
     """
     char_doc = _get_character_by_id(character_id)
     if not char_doc:
-        return []
+        return False, "Character not found.", None
     counters = char_doc.get("counters", [])
-    for idx, c in enumerate(counters):
-        if c["counter"] == counter_name:
-            if target:
-                c["perm"] = target.perm
-                c["temp"] = target.temp
-                c["bedlam"] = (
-                    target.bedlam
-                )  # Ensure bedlam is updated if target is provided
-            else:
-                c[field] = value
-            counters[idx] = c
-            break
-    CharacterRepository.update_one(
-        {"_id": ObjectId(character_id)}, {"$set": {"counters": counters}}
+    i = counter_index(counters).get(counter_key(counter_name))
+    if i is None:
+        return False, "Counter not found.", None
+    c = counters[i]
+    names = ("perm", "temp", "bedlam") if target else (field,)
+    prev = _counter_values(c, names)
+    if target:
+        c["perm"] = target.perm
+        c["temp"] = target.temp
+        c["bedlam"] = target.bedlam  # Ensure bedlam is updated if target is provided
+    else:
+        c[field] = value
+    return (
+        True,
+        None,
+        _record_changes(character_id, char_doc, field, counters=[(c, prev)]),
     )
-    return [CounterFactory.from_dict(c) for c in counters]
 
 
+@retry_on_conflict((False, CONFLICT_ERROR, None))
+def set_counter_value(character_id: str, counter_name: str, field: str, value: int):
+    """
+    Set perm or bedlam on a counter, validated against the values stored
+    alongside it (perm may not drop below bedlam, bedlam may not exceed perm),
+    so a concurrent change to the other field cannot slip past the check.
+    Lowering perm on a perm_is_maximum counter also caps temp.
+    Returns (success, error, char_doc).
+    """
+    char_doc = _get_character_by_id(character_id)
+    if not char_doc:
+        return False, "Character not found.", None
+    counters = char_doc.get("counters", [])
+    i = counter_index(counters).get(counter_key(counter_name))
+    if i is None:
+        return False, "Counter not found.", None
+    c = counters[i]
+    prev = _counter_values(c, ("perm", "temp", "bedlam"))
+    counter_type = c.get("counter_type")
+    is_bedlam = counter_type == CounterTypeEnum.perm_is_maximum_bedlam.value
+    error = None
+    if field == "bedlam":
+        if not is_bedlam:
+            error = "No perm_is_maximum_bedlam counter found with that name."
+        elif value < 0:
+            error = "Bedlam cannot be negative."
+        elif value > c["perm"]:
+            error = "Bedlam cannot be greater than perm for this counter type."
+        else:
+            c["bedlam"] = value
+    elif field == "perm":
+        if counter_type == CounterTypeEnum.single_number.value:
+            error = "Perm cannot be set on counters of type 'single_number'."
+        elif value < 0:
+            error = "Cannot set perm below zero."
+        elif is_bedlam and value < c.get("bedlam", 0):
+            error = f"Perm cannot be set below bedlam ({c.get('bedlam', 0)})."
+        else:
+            c["perm"] = value
+            if counter_type in (
+                CounterTypeEnum.perm_is_maximum.value,
+                CounterTypeEnum.perm_is_maximum_bedlam.value,
+            ):
+                c["temp"] = min(c["temp"], value)
+    else:
+        error = f"Cannot set {field} this way."
+    if error:
+        return False, error, None
+    names = ("bedlam",) if field == "bedlam" else ("perm", "temp")
+    _record_changes(
+        character_id,
+        char_doc,
+        field,
+        counters=[(c, {name: prev[name] for name in names})],
+    )
+    return True, None, char_doc
+
+
+@retry_on_conflict((False, CONFLICT_ERROR))
 def add_health_level(character_id: str, health_type: str, health_level_type: str):
     """
     Add a health level to a health tracker for a character.
     Returns (success, error).
     Allows adding more health levels of a type already in the list.
+    Levels are stored as counts, so they are always in HealthLevelEnum order.
     """
     # Validate health_level_type
     if health_level_type not in [e.value for e in HealthLevelEnum]:
@@ -927,28 +2664,18 @@ def add_health_level(character_id: str, health_type: str, health_level_type: str
     if not char_doc:
         return False, "Character not found."
     health_list = char_doc.get("health", [])
-    for h in health_list:
+    for i, h in enumerate(health_list):
         if h.get("health_type") == health_type:
-            levels = h.get("health_levels", [])
+            health_obj = Health.from_dict(h)
             # Allow duplicates, just append
-            levels.append(health_level_type)
-
-            # Sort the health levels based on the predefined order in HealthLevelEnum
-            enum_order = [e.value for e in HealthLevelEnum]
-            h["health_levels"] = sorted(
-                levels,
-                key=lambda x: (enum_order.index(x), levels.index(x))
-                if x in enum_order
-                else (len(enum_order), levels.index(x)),
-            )
-
-            CharacterRepository.update_one(
-                {"_id": ObjectId(character_id)}, {"$set": {"health": health_list}}
-            )
+            health_obj.health_levels.append(health_level_type)
+            fields, inc = _tracker_write(health_list, i, health_obj)
+            _save_character_fields(character_id, char_doc, fields, inc)
             return True, None
     return False, "Health tracker not found."
 
 
+@retry_on_conflict((False, CONFLICT_ERROR, None))
 def remove_counter(character_id: str, counter_name: str):
     """
     Remove a counter from a character.
@@ -958,16 +2685,13 @@ def remove_counter(character_id: str, counter_name: str):
     if not char_doc:
         return False, "Character not found.", None
     counters = char_doc.get("counters", [])
-    new_counters = [
-        c
-        for c in counters
-        if sanitize_string(c["counter"]) != sanitize_string(counter_name)
-    ]
-    if len(new_counters) == len(counters):
+    key = counter_key(counter_name)
+    removed = [c["counter"] for c in counters if counter_key(c["counter"]) == key]
+    if not removed:
         return False, "Counter not found.", None
-    CharacterRepository.update_one(
-        {"_id": ObjectId(character_id)}, {"$set": {"counters": new_counters}}
-    )
+    new_counters = [c for c in counters if counter_key(c["counter"]) != key]
+    char_doc["counters"] = new_counters
+    _save_counters(character_id, char_doc, removed=removed)
     details = (
         "\n".join(
             [
@@ -1,4 +1,3 @@
-import html
 from bson import ObjectId
 
 
@@ -13,20 +12,13 @@ def _character_exists(user_id: str, character: str) -> bool:
 
 
 def _find_character_doc_by_user_and_name(user_id: str, character: str):
-    from utils import CharacterRepository
+    from utils import CharacterRepository, canonical_name
 
     if character is None:
         return None
-    character_raw = character.strip()
-    character_escaped = html.escape(character_raw)
-    doc = CharacterRepository.find_one(
-        {"user": user_id, "character": character_escaped}
+    return CharacterRepository.find_one(
+        {"user": user_id, "character": canonical_name(character)}
     )
-    if not doc:
-        doc = CharacterRepository.find_one(
-            {"user": user_id, "character": character_raw}
-        )
-    return doc
 
 
 def _get_character_by_id(character_id: str):
@@ -35,6 +27,22 @@ def _get_character_by_id(character_id: str):
     return CharacterRepository.find_one({"_id": ObjectId(character_id)})
 
 
+async def _find_character_doc_by_user_and_name_async(user_id: str, character: str):
+    from utils import CharacterRepository, canonical_name
+
+    if character is None:
+        return None
+    return await CharacterRepository.find_one_async(
+        {"user": user_id, "character": canonical_name(character)}
+    )
+
+
+async def _get_character_by_id_async(character_id: str):
+    from utils import CharacterRepository
+
+    return await CharacterRepository.find_one_async({"_id": ObjectId(character_id)})
+
+
 def _counter_exists(counters: list, counter_name: str) -> bool:
     return any(c["counter"] == counter_name for c in counters)
 
@@ -0,0 +1,185 @@
+"""
+Cache warmup for recently active users after a restart (WARMUP_PATH).
+
+The document and autocomplete caches already order their entries by use, so
+the characters and users at their recent end are the ones players are
+working with. Every WARMUP_SAVE_INTERVAL seconds, and when the bot shuts
+down, their ids are written to a small JSON file:
+
+    {"characters": ["6650f0c2...", ...], "users": ["81723...", ...]}
+
+Most recent first, at most WARMUP_SIZE of each. On startup setup_hook reads
+the file back and loads those characters into the document cache, their
+counters into the counter autocomplete, and each user's character names into
+the character autocomplete, in concurrent batches. The gateway only connects
+once setup_hook returns, so warmup gives up after WARMUP_BUDGET seconds and
+whatever did not load by then is read on first use as usual. Batches still
+loading at that point store nothing when their reads return.
+"""
+
+import asyncio
+import json
+import os
+import threading
+
+import caches
+from counter import CounterFactory
+
+BATCH_SIZE = 50
+
+
+def recent_activity(limit):
+    """
+    Return {"characters": [...], "users": [...]} for the most recently used
+    cache entries, most recent first.
+    """
+    characters, users = [], []
+    for character_id in reversed(caches.document_cache.keys()):
+        doc = caches.document_cache.peek(character_id)
+        if doc is None:
+            continue
+        if len(characters) < limit:
+            characters.append(character_id)
+        if doc.get("user") is not None and doc["user"] not in users:
+            users.append(doc["user"])
+    for key in reversed(caches.autocomplete_cache.keys()):
+        if key[0] == "characters" and key[1] not in users:
+            users.append(key[1])
+    return {"characters": characters, "users": users[:limit]}
+
+
+def save(path, limit):
+    """
+    Write recent_activity(limit) to path, replacing it atomically.
+    """
+    activity = recent_activity(limit)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(activity, f)
+    os.replace(tmp, path)
+    return activity
+
+
+def load(path):
+    """
+    Return the activity saved at path, or an empty one.
+    """
+    try:
+        with open(path) as f:
+            activity = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {"characters": [], "users": []}
+    return {
+        "characters": [str(i) for i in activity.get("characters", [])],
+        "users": [str(u) for u in activity.get("users", [])],
+    }
+
+
+def _batches(items):
+    return [items[i : i + BATCH_SIZE] for i in range(0, len(items), BATCH_SIZE)]
+
+
+def _warm_characters(load_characters, character_ids, stopped):
+    token = caches.fill_token()
+    docs = load_characters(character_ids)
+    if stopped.is_set():
+        return 0
+    for doc in docs:
+        character_id = str(doc["_id"])
+        if caches.changed_since(character_id, token):
+            # Written while loading; the next read picks up the change
+            continue
+        caches.store_document(doc, token)
+        caches.autocomplete_cache.set(
+            ("counters", character_id),
+            [CounterFactory.from_dict(c) for c in doc.get("counters", [])],
+            tags=[character_id],
+        )
+    return len(docs)
+
+
+def _warm_users(load_names, user_ids, stopped):
+    names = {user_id: [] for user_id in user_ids}
+    for doc in load_names(user_ids):
+        names.setdefault(doc["user"], []).append(doc["character"])
+    if stopped.is_set():
+        return 0
+    for user_id, user_names in names.items():
+        caches.autocomplete_cache.set(
+            ("characters", user_id), user_names, tags=[caches.user_tag(user_id)]
+        )
+    return len(names)
+
+
+async def prefetch(activity, load_characters, load_names, budget):
+    """
+    Load the characters and users in activity into the caches, giving up
+    after budget seconds. load_characters(ids) returns character documents
+    and load_names(user_ids) documents with user and character fields.
+    Returns (characters, users) warmed before the budget ran out.
+    """
+    if not caches.document_cache.enabled and not caches.autocomplete_cache.enabled:
+        return 0, 0
+    stopped = threading.Event()
+    jobs = [
+        asyncio.to_thread(_warm_characters, load_characters, batch, stopped)
+        for batch in _batches(activity["characters"])
+    ]
+    user_jobs = [
+        asyncio.to_thread(_warm_users, load_names, batch, stopped)
+        for batch in _batches(activity["users"])
+    ]
+    tasks = [asyncio.ensure_future(job) for job in jobs + user_jobs]
+    if not tasks:
+        return 0, 0
+    done, pending = await asyncio.wait(tasks, timeout=budget)
+    # Cancelling only stops waiting: a thread blocked in its read runs on, so
+    # the flag keeps it from filling the caches once commands are running
+    stopped.set()
+    for task in pending:
+        task.cancel()
+    if pending:
+        print(f"Cache warmup stopped after {budget}s with {len(pending)} batches left")
+    counts = [_result(task) if task in done else 0 for task in tasks]
+    return sum(counts[: len(jobs)]), sum(counts[len(jobs) :])
+
+
+def _result(task):
+    if task.exception() is not None:
+        print(f"Cache warmup failed: {task.exception()}")
+        return 0
+    return task.result()
+
+
+class Saver(threading.Thread):
+    """
+    Background thread saving recent activity every interval seconds.
+    """
+
+    def __init__(self, save_once, interval):
+        super().__init__(name="avct-warmup-saver", daemon=True)
+        self.save_once = save_once
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.save_once()
+            except Exception as e:
+                print(f"Saving recent activity failed: {e}")
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def start_saver(save_once, interval):
+    """
+    Run save_once every interval seconds in the background. Returns the thread.
+    """
+    worker = Saver(save_once, interval)
+    worker.start()
+    return worker